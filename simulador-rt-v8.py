@@ -1,14 +1,17 @@
+import copy
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget,
                              QVBoxLayout, QHBoxLayout, QFormLayout, QLabel,
                              QLineEdit, QComboBox, QPushButton, QGroupBox,
                              QSpinBox, QDoubleSpinBox, QGridLayout, QTableWidget,
                              QTableWidgetItem, QFileDialog, QMessageBox, QTextEdit, QCheckBox, QDialog,
-                             QDialogButtonBox)
-from PyQt5.QtCore import Qt, QRegExp
+                             QDialogButtonBox, QTreeWidget, QTreeWidgetItem, QSlider, QDateEdit)
+from PyQt5.QtCore import Qt, QRegExp, QDate
 from PyQt5.QtGui import QRegExpValidator, QFont
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
@@ -82,6 +85,31 @@ class ConfiguracaoTributaria:
         # Limite para enquadramento no Simples Nacional - Art. 34º
         self.limite_simples = 4_800_000
 
+        # Tabelas do Simples Nacional (LC 123/2006): faixas de receita bruta em 12 meses com
+        # alíquota nominal e parcela a deduzir. "parcela_consumo" é a parte do DAS destinada a
+        # PIS, COFINS, IPI, ICMS e ISS (partilha da 1ª faixa), comparável à carga do regime normal.
+        self.simples_nacional = {
+            "anexos": {
+                "I": {  # Comércio
+                    "faixas": [[180_000, 0.040, 0], [360_000, 0.073, 5_940], [720_000, 0.095, 13_860],
+                               [1_800_000, 0.107, 22_500], [3_600_000, 0.143, 87_300], [4_800_000, 0.190, 378_000]],
+                    "parcela_consumo": 0.495
+                },
+                "II": {  # Indústria
+                    "faixas": [[180_000, 0.045, 0], [360_000, 0.078, 5_940], [720_000, 0.100, 13_860],
+                               [1_800_000, 0.112, 22_500], [3_600_000, 0.147, 85_500], [4_800_000, 0.300, 720_000]],
+                    "parcela_consumo": 0.535
+                },
+                "III": {  # Serviços
+                    "faixas": [[180_000, 0.060, 0], [360_000, 0.112, 9_360], [720_000, 0.135, 17_640],
+                               [1_800_000, 0.160, 35_640], [3_600_000, 0.210, 125_640], [4_800_000, 0.330, 648_000]],
+                    "parcela_consumo": 0.491
+                }
+            },
+            "anexo_setor": {"padrao": "I", "comercio": "I", "alimentos": "I", "industria": "II",
+                            "servicos": "III", "educacao": "III", "saude": "III", "transporte": "III"}
+        }
+
         # Regras de crédito - Art. 29º
         self.regras_credito = {
             "normal": 1.0,  # Crédito integral
@@ -146,6 +174,15 @@ class ConfiguracaoTributaria:
         # Configurações para incentivos fiscais
         self.incentivo_fiscal_icms = 0.0  # Percentual de redução (0.0 a 1.0)
 
+        # Redução dos incentivos de ICMS acompanhando a redução do imposto (opcional) e parcela da
+        # perda coberta pelo Fundo de Compensação de Benefícios Fiscais (até 2032)
+        self.cronograma_incentivos_icms = {
+            "ativo": False,
+            "multiplicadores": {},  # Anos ausentes: 1 - redução do ICMS em reducao_impostos_transicao
+            "compensacao": {2026: 1.0, 2027: 1.0, 2028: 1.0, 2029: 1.0, 2030: 1.0, 2031: 1.0, 2032: 1.0,
+                            2033: 0.0}
+        }
+
         # Regras de créditos cruzados
         self.creditos_cruzados = {
             2028: {"IBS_para_ICMS": 0.40},  # 40% do IBS pode compensar ICMS
@@ -164,9 +201,12 @@ class ConfiguracaoTributaria:
                     if "aliquotas_base" in config:
                         self.aliquotas_base = config["aliquotas_base"]
                     if "fase_transicao" in config:
-                        self.fase_transicao = config["fase_transicao"]
+                        # Chaves JSON são texto; os anos são usados como inteiros no cálculo
+                        self.fase_transicao = {int(ano): valor for ano, valor in config["fase_transicao"].items()}
                     if "setores_especiais" in config:
                         self.setores_especiais = config["setores_especiais"]
+                    if "simples_nacional" in config:
+                        self.simples_nacional = config["simples_nacional"]
                 return True
             except Exception as e:
                 print(f"Erro ao carregar configurações: {e}")
@@ -181,6 +221,7 @@ class ConfiguracaoTributaria:
                 "fase_transicao": self.fase_transicao,
                 "setores_especiais": self.setores_especiais,
                 "limite_simples": self.limite_simples,
+                "simples_nacional": self.simples_nacional,
                 "regras_credito": self.regras_credito
             }
             with open(arquivo, 'w', encoding='utf-8') as f:
@@ -272,12 +313,20 @@ class CalculadoraTributosAtuais:
 
             # Cálculo do ICMS
             # Substituir o cálculo do ICMS pelo método detalhado
-            resultado_icms = self.calcular_icms_detalhado(dados)
+            resultado_icms = self.calcular_icms_detalhado(dados, ano)
             icms_devido = resultado_icms["icms_devido"]
 
             # Atualizar a memória de cálculo
             self.memoria_calculo["ICMS"] = resultado_icms["memoria_calculo"]
 
+            # ICMS diferido no ano anterior vence neste ano (simulação encadeada)
+            icms_diferido_anterior = dados.get("icms_diferido_anterior", 0)
+            if icms_diferido_anterior > 0:
+                icms_devido += icms_diferido_anterior
+                self.memoria_calculo["ICMS"].append(
+                    f"ICMS diferido do ano anterior: R$ {formatar_br(icms_diferido_anterior)}; "
+                    f"ICMS devido no ano: R$ {formatar_br(icms_devido)}")
+
             # Cálculo do ISS (apenas para setores de serviços)
             iss_devido = 0
             if setor in ["servicos", "educacao", "saude"]:
@@ -331,7 +380,10 @@ class CalculadoraTributosAtuais:
                 "ISS": iss_devido,
                 "IPI": ipi_devido,
                 "total": total,
-                "economia_icms": resultado_icms["economia_tributaria"]  # Novo campo
+                "economia_icms": resultado_icms["economia_tributaria"],  # Novo campo
+                "saldo_icms": resultado_icms["saldo"],
+                "icms_diferido": resultado_icms["valor_diferido"],
+                "compensacao_icms": resultado_icms["compensacao"]
             }
 
             return impostos
@@ -341,18 +393,26 @@ class CalculadoraTributosAtuais:
             # Retornar valores padrão em caso de erro
             return {"PIS": 0, "COFINS": 0, "ICMS": 0, "ISS": 0, "IPI": 0, "total": 0}
 
-    def calcular_icms_detalhado(self, dados):
-        """Implementa o cálculo detalhado do ICMS considerando múltiplos incentivos fiscais."""
+    def calcular_icms_detalhado(self, dados, ano=None):
+        """Implementa o cálculo detalhado do ICMS considerando múltiplos incentivos fiscais.
+
+        Com o ano informado e o cronograma de incentivos ativo na configuração, os incentivos são
+        reduzidos pelo multiplicador do ano e a perda é parcialmente compensada pelo fundo.
+        """
+        if ano is not None and self.config.cronograma_incentivos_icms.get("ativo"):
+            return self._calcular_icms_cronograma(dados, ano)
         try:
             # Obter dados básicos
             faturamento = dados.get("faturamento", 0)
             custos = dados.get("custos_tributaveis", 0)
 
-            # Obter configurações específicas do ICMS
-            aliquota_entrada = self.config.icms_config.get("aliquota_entrada", 0.19)
-            aliquota_saida = self.config.icms_config.get("aliquota_saida", 0.19)
-            incentivos_saida = self.config.icms_config.get("incentivos_saida", [])
-            incentivos_entrada = self.config.icms_config.get("incentivos_entrada", [])
+            # Obter configurações específicas do ICMS (a empresa pode ter seu próprio pacote de incentivos)
+            icms_config = dados.get("icms_config") or self.config.icms_config
+            aliquota_entrada = icms_config.get("aliquota_entrada", 0.19)
+            aliquota_saida = icms_config.get("aliquota_saida", 0.19)
+            incentivos_saida = icms_config.get("incentivos_saida", [])
+            incentivos_entrada = icms_config.get("incentivos_entrada", [])
+            incentivos_apuracao = icms_config.get("incentivos_apuracao", [])
 
             # Criar memória de cálculo detalhada
             memoria_calculo = []
@@ -365,17 +425,24 @@ class CalculadoraTributosAtuais:
             debito_icms_normal = faturamento * aliquota_saida
             credito_normal = custos * aliquota_entrada
 
+            # Saldo credor transportado de períodos anteriores (simulação encadeada)
+            saldo_credor = dados.get("saldo_credor_icms", 0)
+
             memoria_calculo.append(
                 f"Débito ICMS (sem incentivo): R$ {formatar_br(faturamento)} × {formatar_br(aliquota_saida * 100)}% = R$ {formatar_br(debito_icms_normal)}")
             memoria_calculo.append(
                 f"Crédito normal: R$ {formatar_br(custos)} × {formatar_br(aliquota_entrada * 100)}% = R$ {formatar_br(credito_normal)}")
 
             # Se não houver incentivos configurados, retornar cálculo padrão
-            if not incentivos_saida and not incentivos_entrada:
+            if not incentivos_saida and not incentivos_entrada and not incentivos_apuracao:
                 icms_devido = debito_icms_normal - credito_normal
                 memoria_calculo.append(f"Nenhum incentivo fiscal aplicado")
                 memoria_calculo.append(
                     f"ICMS devido: R$ {formatar_br(debito_icms_normal)} - R$ {formatar_br(credito_normal)} = R$ {formatar_br(icms_devido)}")
+                if saldo_credor > 0:
+                    icms_devido -= saldo_credor
+                    memoria_calculo.append(
+                        f"Saldo credor anterior: R$ {formatar_br(saldo_credor)}; saldo após compensação: R$ {formatar_br(icms_devido)}")
 
                 # Calcular economia tributária
                 economia = 0
@@ -391,11 +458,15 @@ class CalculadoraTributosAtuais:
                     "icms_devido": max(0, icms_devido),
                     "economia_tributaria": economia,
                     "percentual_economia": percentual_economia,
+                    "saldo": icms_devido,
+                    "valor_diferido": 0,
+                    "compensacao": 0,
                     "memoria_calculo": memoria_calculo
                 }
 
             # Processar incentivos de saída (débitos)
             debito_total = 0
+            valor_diferido_total = 0
             faturamento_nao_incentivado = faturamento
 
             memoria_calculo.append(f"\n== Processando incentivos para débitos de ICMS (saídas) ==")
@@ -451,6 +522,7 @@ class CalculadoraTributosAtuais:
                 elif tipo == "Diferimento":
                     valor_diferido = faturamento_incentivado * aliquota_saida * percentual
                     debito_incentivado = (faturamento_incentivado * aliquota_saida) - valor_diferido
+                    valor_diferido_total += valor_diferido
 
                     memoria_calculo.append(
                         f"Valor total de débito: R$ {formatar_br(faturamento_incentivado * aliquota_saida)}")
@@ -545,12 +617,23 @@ class CalculadoraTributosAtuais:
 
                 credito_total += credito_incentivado
 
-            # No método calcular_icms_detalhado da classe CalculadoraTributosAtuais
-            # Após processar incentivos de entrada, adicionar:
+            # Adicionar crédito das operações não incentivadas
+            if custos_nao_incentivados > 0:
+                credito_nao_incentivado = custos_nao_incentivados * aliquota_entrada
+                credito_total += credito_nao_incentivado
+
+                memoria_calculo.append(f"\nOperações de entrada não incentivadas:")
+                memoria_calculo.append(f"Custos não incentivados: R$ {formatar_br(custos_nao_incentivados)}")
+                memoria_calculo.append(
+                    f"Crédito sobre operações não incentivadas: R$ {formatar_br(custos_nao_incentivados)} × {formatar_br(aliquota_entrada * 100)}% = R$ {formatar_br(credito_nao_incentivado)}")
 
-            # Processar incentivos de apuração (aplicados sobre o saldo devedor)
-            incentivos_apuracao = self.config.icms_config.get("incentivos_apuracao", [])
-            icms_antes_incentivos_apuracao = max(0, debito_total - credito_total)
+            memoria_calculo.append(f"\nTotal de créditos após incentivos: R$ {formatar_br(credito_total)}")
+
+            # Processar incentivos de apuração (aplicados sobre o saldo devedor, após débitos e créditos)
+            saldo = debito_total - credito_total - saldo_credor
+            if saldo_credor > 0:
+                memoria_calculo.append(f"\nSaldo credor anterior compensado: R$ {formatar_br(saldo_credor)}")
+            icms_antes_incentivos_apuracao = max(0, saldo)
 
             memoria_calculo.append(f"\n== Processando incentivos de apuração do ICMS ==")
             memoria_calculo.append(
@@ -602,26 +685,10 @@ class CalculadoraTributosAtuais:
                 memoria_calculo.append(f"\nTotal de reduções de apuração: R$ {formatar_br(reducao_total)}")
                 memoria_calculo.append(f"ICMS devido após incentivos de apuração: R$ {formatar_br(icms_devido)}")
 
-            # Adicionar crédito das operações não incentivadas
-            if custos_nao_incentivados > 0:
-                credito_nao_incentivado = custos_nao_incentivados * aliquota_entrada
-                credito_total += credito_nao_incentivado
-
-                memoria_calculo.append(f"\nOperações de entrada não incentivadas:")
-                memoria_calculo.append(f"Custos não incentivados: R$ {formatar_br(custos_nao_incentivados)}")
-                memoria_calculo.append(
-                    f"Crédito sobre operações não incentivadas: R$ {formatar_br(custos_nao_incentivados)} × {formatar_br(aliquota_entrada * 100)}% = R$ {formatar_br(credito_nao_incentivado)}")
-
-            memoria_calculo.append(f"\nTotal de créditos após incentivos: R$ {formatar_br(credito_total)}")
-
-            # Cálculo do ICMS devido
-            icms_devido = max(0, debito_total - credito_total)
-
             memoria_calculo.append(f"\n== Cálculo final do ICMS ==")
             memoria_calculo.append(f"Débitos totais: R$ {formatar_br(debito_total)}")
             memoria_calculo.append(f"Créditos totais: R$ {formatar_br(credito_total)}")
-            memoria_calculo.append(
-                f"ICMS devido: R$ {formatar_br(debito_total)} - R$ {formatar_br(credito_total)} = R$ {formatar_br(icms_devido)}")
+            memoria_calculo.append(f"ICMS devido: R$ {formatar_br(icms_devido)}")
 
             # Calcular economia tributária
             icms_sem_incentivo = debito_icms_normal - credito_normal
@@ -638,6 +705,9 @@ class CalculadoraTributosAtuais:
                 "icms_devido": max(0, icms_devido),  # Garantir que não seja negativo
                 "economia_tributaria": economia,
                 "percentual_economia": percentual_economia,
+                "saldo": saldo,
+                "valor_diferido": valor_diferido_total,
+                "compensacao": 0,
                 "memoria_calculo": memoria_calculo
             }
 
@@ -647,9 +717,38 @@ class CalculadoraTributosAtuais:
                 "icms_devido": 0,
                 "economia_tributaria": 0,
                 "percentual_economia": 0,
+                "saldo": 0,
+                "valor_diferido": 0,
+                "compensacao": 0,
                 "memoria_calculo": [f"Erro no cálculo: {str(e)}"]
             }
 
+    def _calcular_icms_cronograma(self, dados, ano):
+        """ICMS do ano com os incentivos reduzidos pelo cronograma e a compensação da perda pelo fundo."""
+        cronograma = CronogramaIncentivosICMS(self.config)
+        multiplicador = float(cronograma.multiplicador(ano))
+        cobertura = float(cronograma.cobertura(ano))
+
+        icms_config = dados.get("icms_config") or self.config.icms_config
+        reduzido = dict(icms_config)
+        for lista in ("incentivos_saida", "incentivos_entrada", "incentivos_apuracao"):
+            reduzido[lista] = [dict(incentivo, percentual=incentivo.get("percentual", 0.0) * multiplicador)
+                               for incentivo in icms_config.get(lista, [])]
+
+        integral = self.calcular_icms_detalhado(dados)
+        resultado = self.calcular_icms_detalhado(dict(dados, icms_config=reduzido))
+        perda = max(0, resultado["icms_devido"] - integral["icms_devido"])
+        resultado["compensacao"] = cobertura * perda
+
+        resultado["memoria_calculo"].insert(
+            0, f"Incentivos aplicados a {formatar_br(multiplicador * 100)}% em {ano} (redução do ICMS na transição)")
+        resultado["memoria_calculo"].append(
+            f"\nPerda de incentivo em relação ao benefício integral: R$ {formatar_br(perda)}")
+        resultado["memoria_calculo"].append(
+            f"Compensação pelo fundo: R$ {formatar_br(perda)} × {formatar_br(cobertura * 100)}% = "
+            f"R$ {formatar_br(resultado['compensacao'])}")
+        return resultado
+
     def obter_memoria_calculo(self):
         """Retorna a memória de cálculo dos tributos."""
         return self.memoria_calculo
@@ -914,7 +1013,7 @@ class CalculadoraIVADual:
                 f"ICMS final após crédito cruzado: R$ {formatar_br(icms_original)} - R$ {formatar_br(credito_ibs_para_icms)} = R$ {formatar_br(icms_final)}")
 
             impostos_atuais["ICMS"] = icms_final
-            impostos_atuais["total"] = sum(value for key, value in impostos_atuais.items() if key != "total")
+            impostos_atuais["total"] = sum(impostos_atuais.get(imposto, 0) for imposto in ["PIS", "COFINS", "ICMS", "ISS", "IPI"])
 
             self.memoria_calculo["creditos_cruzados"].append(
                 f"Total de impostos atuais após crédito cruzado: R$ {formatar_br(impostos_atuais['total'])}")
@@ -957,764 +1056,6906 @@ class CalculadoraIVADual:
         """Retorna a memória de cálculo dos tributos."""
         return self.memoria_calculo
     
-    def calcular_comparativo(self, dados, anos=None):
-        """Compara o imposto devido em diferentes anos da transição."""
+    def calcular_comparativo(self, dados, anos=None, encadeado=False):
+        """Compara o imposto devido em diferentes anos da transição.
+
+        encadeado: os créditos de IVA não utilizados, o saldo credor do ICMS e o ICMS diferido de
+        cada ano passam para o ano seguinte (o crédito anterior informado vale para o primeiro ano).
+        """
         if anos is None:
             anos = list(self.config.fase_transicao.keys())
         
         resultados = {}
+        dados_ano = dict(dados)
         for ano in anos:
-            resultados[ano] = self.calcular_imposto_devido(dados, ano)
+            resultados[ano] = self.calcular_imposto_devido(dados_ano, ano)
+            if encadeado:
+                resultado = resultados[ano]
+                impostos_atuais = resultado["impostos_atuais"]
+                dados_ano = dict(dados_ano,
+                                 creditos_anteriores=max(0, resultado["creditos"] - resultado["imposto_bruto"]),
+                                 saldo_credor_icms=max(0, -impostos_atuais.get("saldo_icms", 0)),
+                                 icms_diferido_anterior=impostos_atuais.get("icms_diferido", 0))
         
         return resultados
     
     def calcular_aliquotas_equivalentes(self, dados, carga_atual, ano):
         """Calcula as alíquotas de CBS e IBS que resultariam em carga tributária equivalente à atual."""
-        # Fator de transição para o ano
-        fator_transicao = self.config.fase_transicao.get(ano, 1.0)
-        
-        # Base tributável
-        base = self.calcular_base_tributavel(dados, ano)
-        
-        # Valor atual de impostos
-        valor_atual = dados["faturamento"] * (carga_atual / 100)
-        
-        # Considerando a proporção atual entre CBS e IBS (geralmente 1:2)
-        proporcao_cbs = 1/3  # CBS representa aproximadamente 1/3 do IVA Dual
-        
-        # Adaptação para o setor específico
-        setor_config = self.config.setores_especiais.get(dados["setor"], self.config.setores_especiais["padrao"])
-        reducao_cbs = setor_config["reducao_CBS"]
-        
-        # Ajuste na proporção considerando reduções setoriais
-        if reducao_cbs > 0:
-            # Se há redução de CBS, a proporção do IBS aumenta
-            proporcao_cbs = proporcao_cbs * (1 - reducao_cbs)
-        
-        # Créditos estimados (simplificação)
-        creditos_estimados = 0
-        if dados["custos_tributaveis"] > 0:
-            # Estimativa: créditos proporcionais aos custos tributáveis
-            creditos_estimados = (dados["custos_tributaveis"] / dados["faturamento"]) * valor_atual
-        
-        # Imposto bruto necessário para atingir o valor atual após créditos
-        imposto_bruto_necessario = valor_atual + creditos_estimados
-        
-        # Alíquotas equivalentes
-        if base > 0:
-            aliquota_total = imposto_bruto_necessario / base
-            aliquota_cbs = aliquota_total * proporcao_cbs
-            aliquota_ibs = aliquota_total * (1 - proporcao_cbs)
-        else:
-            aliquota_cbs = 0
-            aliquota_ibs = 0
-        
-        return {
-            "cbs_equivalente": aliquota_cbs,
-            "ibs_equivalente": aliquota_ibs,
-            "total_equivalente": aliquota_cbs + aliquota_ibs,
-            "valor_atual": valor_atual,
-            "base_calculo": base
-        }
+        return self.calcular_aliquotas_equivalentes_anos(dados, carga_atual, [ano])[ano]
+
+    def calcular_aliquotas_equivalentes_anos(self, dados, carga_atual, anos):
+        """Calcula as alíquotas equivalentes de vários anos em uma única resolução vetorizada.
+
+        As alíquotas são aquelas com as quais o total devido calculado pelo simulador (IVA Dual
+        e tributos atuais) é igual à carga atual informada.
+        """
+        carteira = CarteiraEmpresas.de_dados([dados])
+        resultados = CalculadoraLote(self.config).calcular_aliquotas_equivalentes(carteira, carga_atual, anos)
+
+        equivalentes = {}
+        for ano, resultado in resultados.items():
+            equivalentes[ano] = {chave: valor[0].item() for chave, valor in resultado.items()}
+        return equivalentes
+
+# Sinal aplicado ao percentual de cada tipo de incentivo do ICMS (fator = 1 + sinal × percentual).
+# Tipos ausentes seguem o cálculo padrão (fator 1), como em calcular_icms_detalhado.
+SINAIS_INCENTIVOS_ICMS = {
+    "saida": {
+        "Redução de Alíquota": -1.0,
+        "Crédito Presumido/Outorgado": -1.0,
+        "Redução de Base de Cálculo": -1.0,
+        "Diferimento": -1.0
+    },
+    "entrada": {
+        "Redução de Alíquota": -1.0,
+        "Crédito Presumido/Outorgado": 1.0,
+        "Estorno de Crédito": -1.0
+    },
+    "apuracao": {
+        "Crédito Presumido/Outorgado": 1.0,
+        "Redução do Saldo Devedor": 1.0
+    }
+}
+
+
+def impressao_digital_icms(icms_config):
+    """Gera uma chave que identifica o pacote de incentivos do ICMS para fins de cálculo."""
+    def normalizar(incentivos):
+        return tuple(
+            (incentivo.get("tipo", "Nenhum"),
+             float(incentivo.get("percentual", 0.0)),
+             float(incentivo.get("percentual_operacoes", 1.0)))
+            for incentivo in incentivos
+        )
 
-class GraficoMatplotlib(FigureCanvas):
-    """Widget para exibir gráficos usando Matplotlib."""
-    
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes = self.fig.add_subplot(111)
-        
-        super(GraficoMatplotlib, self).__init__(self.fig)
-        self.setParent(parent)
-    
-    def plotar_comparativo(self, dados, titulo=None):
-        """Plota um gráfico comparativo dos impostos por ano."""
-        self.axes.clear()
-        
-        anos = list(dados.keys())
-        cbs_valores = [dados[ano]["cbs"] for ano in anos]
-        ibs_valores = [dados[ano]["ibs"] for ano in anos]
-        creditos = [dados[ano]["creditos"] for ano in anos]
-        liquido = [dados[ano]["imposto_devido"] for ano in anos]
-        
-        x = range(len(anos))
-        largura = 0.2
-        
-        self.axes.bar([i - largura*1.5 for i in x], cbs_valores, width=largura, label='CBS', color='#3498db')
-        self.axes.bar([i - largura*0.5 for i in x], ibs_valores, width=largura, label='IBS', color='#2ecc71')
-        self.axes.bar([i + largura*0.5 for i in x], creditos, width=largura, label='Créditos', color='#e74c3c')
-        self.axes.bar([i + largura*1.5 for i in x], liquido, width=largura, label='Imposto Devido', color='#f39c12')
-        
-        self.axes.set_xticks(x)
-        self.axes.set_xticklabels(anos)
-        self.axes.set_ylabel('Valor (R$)')
-        self.axes.set_xlabel('Ano')
-        if titulo:
-            self.axes.set_title(titulo)
-        self.axes.legend()
-        self.axes.grid(True, linestyle='--', alpha=0.7)
-        
-        self.fig.tight_layout()
-        self.draw()
-    
-    def plotar_aliquotas_efetivas(self, dados, titulo=None):
-        """Plota a evolução das alíquotas efetivas ao longo dos anos."""
-        self.axes.clear()
-        
-        anos = list(dados.keys())
-        aliquotas_efetivas = [dados[ano]["aliquota_efetiva"] * 100 for ano in anos]
-        
-        self.axes.plot(anos, aliquotas_efetivas, 'o-', linewidth=2, markersize=8, color='#9b59b6')
-        
-        self.axes.set_ylabel('Alíquota Efetiva (%)')
-        self.axes.set_xlabel('Ano')
-        if titulo:
-            self.axes.set_title(titulo)
-        self.axes.grid(True, linestyle='--', alpha=0.7)
-        
-        # Adicionar valores nos pontos
-        for i, v in enumerate(aliquotas_efetivas):
-            self.axes.text(anos[i], v + 0.5, f"{v:.2f}%", ha='center')
-        
-        self.fig.tight_layout()
-        self.draw()
+    return (
+        float(icms_config.get("aliquota_entrada", 0.19)),
+        float(icms_config.get("aliquota_saida", 0.19)),
+        normalizar(icms_config.get("incentivos_saida", [])),
+        normalizar(icms_config.get("incentivos_entrada", [])),
+        normalizar(icms_config.get("incentivos_apuracao", []))
+    )
 
-class InterfaceSimulador(QMainWindow):
-    """Interface gráfica do simulador de reforma tributária."""
-    
-    def __init__(self, calculadora):
-        super().__init__()
-        
-        self.calculadora = calculadora
-        self.resultados = {}
-        
-        self.setWindowTitle("Simulador da Reforma Tributária - IVA Dual (CBS/IBS)")
-        self.setGeometry(100, 100, 1200, 800)
-        
-        self.init_ui()
 
-    def init_ui(self):
-        """Inicializa a interface gráfica."""
-        # Widget central
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
+def _fatiar_empresas(valor, indices, n_empresas):
+    """Seleciona as empresas indicadas quando o valor varia ao longo do eixo das empresas."""
+    valor = np.asarray(valor)
+    if n_empresas > 1 and valor.ndim and valor.shape[-1] == n_empresas:
+        return valor[..., indices]
+    return valor
 
-        # Layout principal (vertical)
-        layout_principal = QVBoxLayout(central_widget)
 
-        # Abas para organizar a interface
-        tabs = QTabWidget()
-        layout_principal.addWidget(tabs)
+class _Dual:
+    """Valor com derivadas parciais em modo direto, para o cálculo exato de sensibilidades.
 
-        # Tab de Simulação
-        tab_simulacao = QWidget()
-        tabs.addTab(tab_simulacao, "Simulação")
+    A derivada tem um parâmetro por linha (eixo 0) seguido da forma do valor. Cada max/min ou
+    comparação avaliada registra em "quebras" a folga até a troca de trecho e a derivada dessa
+    folga, permitindo saber quando uma variação cruza um ponto de quebra.
+    """
 
-        # Tab de Configurações
-        tab_configuracoes = QWidget()
-        tabs.addTab(tab_configuracoes, "Configurações")
+    __array_priority__ = 1000
 
-        # Tab de Memória de Cálculo (NOVA)
-        tab_memoria_calculo = QWidget()
-        tabs.addTab(tab_memoria_calculo, "Memória de Cálculo")
+    def __init__(self, valor, derivada, quebras):
+        self.valor = np.asarray(valor, dtype=float)
+        self.derivada = np.asarray(derivada, dtype=float)
+        self.quebras = quebras
 
-        # Tab de Ajuda
-        tab_ajuda = QWidget()
-        tabs.addTab(tab_ajuda, "Ajuda e Documentação")
+    def _novo(self, valor, derivada):
+        return _Dual(valor, derivada, self.quebras)
 
-        # Configuração da aba de simulação
-        self.configurar_aba_simulacao(tab_simulacao)
+    def __add__(self, outro):
+        valor, derivada, _ = _partes_dual(outro)
+        return self._novo(self.valor + valor, self.derivada + derivada)
 
-        # Configuração da aba de configurações
-        self.configurar_aba_configuracoes(tab_configuracoes)
+    __radd__ = __add__
 
-        # Configuração da aba de memória de cálculo (NOVA)
-        self.configurar_aba_memoria_calculo(tab_memoria_calculo)
+    def __sub__(self, outro):
+        valor, derivada, _ = _partes_dual(outro)
+        return self._novo(self.valor - valor, self.derivada - derivada)
 
-        # Configuração da aba de ajuda
-        self.configurar_aba_ajuda(tab_ajuda)
-    
-    def configurar_aba_simulacao(self, tab):
-        """Configura a aba de simulação com os campos e gráficos."""
-        # Layout principal da aba
-        layout = QHBoxLayout(tab)
-        
-        # Painel esquerdo (entrada de dados)
-        painel_entrada = QWidget()
-        layout_entrada = QVBoxLayout(painel_entrada)
-        layout.addWidget(painel_entrada, 1)
-        
-        # Painel direito (resultados)
-        painel_resultados = QWidget()
-        layout_resultados = QVBoxLayout(painel_resultados)
-        layout.addWidget(painel_resultados, 2)
-            
-        # Grupo de dados da empresa
-        grupo_empresa = QGroupBox("Dados da Empresa")
-        layout_empresa = QFormLayout(grupo_empresa)
-        layout_entrada.addWidget(grupo_empresa)
-        
-        # Campos para entrada de dados
-        self.campo_faturamento = QDoubleSpinBox()
-        self.campo_faturamento.setRange(0, 1000000000)
-        self.campo_faturamento.setDecimals(2)
-        self.campo_faturamento.setPrefix("R$ ")
-        self.campo_faturamento.setSingleStep(1000)
-        self.campo_faturamento.setValue(0)
-        layout_empresa.addRow("Faturamento Anual:", self.campo_faturamento)
-        
-        self.campo_custos = QDoubleSpinBox()
-        self.campo_custos.setRange(0, 1000000000)
-        self.campo_custos.setDecimals(2)
-        self.campo_custos.setPrefix("R$ ")
-        self.campo_custos.setSingleStep(1000)
-        self.campo_custos.setValue(0)
-        layout_empresa.addRow("Custos Tributáveis:", self.campo_custos)
-        
-        self.campo_custos_simples = QDoubleSpinBox()
-        self.campo_custos_simples.setRange(0, 1000000000)
-        self.campo_custos_simples.setDecimals(2)
-        self.campo_custos_simples.setPrefix("R$ ")
-        self.campo_custos_simples.setSingleStep(1000)
-        layout_empresa.addRow("Custos de Fornecedores do Simples:", self.campo_custos_simples)
-        
-        self.campo_creditos_anteriores = QDoubleSpinBox()
-        self.campo_creditos_anteriores.setRange(0, 1000000000)
-        self.campo_creditos_anteriores.setDecimals(2)
-        self.campo_creditos_anteriores.setPrefix("R$ ")
-        self.campo_creditos_anteriores.setSingleStep(1000)
-        layout_empresa.addRow("Créditos Anteriores:", self.campo_creditos_anteriores)
-        
-        self.campo_setor = QComboBox()
-        self.campo_setor.addItems(["padrao", "educacao", "saude", "alimentos", "transporte"])
-        layout_empresa.addRow("Setor de Atividade:", self.campo_setor)
-        
-        self.campo_regime = QComboBox()
-        self.campo_regime.addItems(["real", "presumido", "simples"])
-        layout_empresa.addRow("Regime Tributário:", self.campo_regime)
+    def __rsub__(self, outro):
+        valor, derivada, _ = _partes_dual(outro)
+        return self._novo(valor - self.valor, derivada - self.derivada)
 
-        # No método configurar_aba_simulacao
-        self.campo_carga_atual = QDoubleSpinBox()
-        self.campo_carga_atual.setRange(0, 100)
-        self.campo_carga_atual.setDecimals(2)
-        self.campo_carga_atual.setSuffix("%")
-        self.campo_carga_atual.setSingleStep(0.5)
-        self.campo_carga_atual.setValue(0)
-        layout_empresa.addRow("Carga Tributária Atual (%):", self.campo_carga_atual)
+    def __neg__(self):
+        return self._novo(-self.valor, -self.derivada)
 
-        # Adicionar no método configurar_aba_simulacao, após o campo de incentivo atual
-        # Substituir o campo simples de incentivo por um grupo de campos mais detalhados
+    def __mul__(self, outro):
+        valor, derivada, _ = _partes_dual(outro)
+        return self._novo(self.valor * valor, self.derivada * valor + self.valor * derivada)
 
-        # Modificar o método configurar_aba_simulacao na classe InterfaceSimulador
-        # Substituir a parte que cria o grupo de ICMS por:
+    __rmul__ = __mul__
 
-        # Criar grupo para parâmetros de ICMS e incentivos
-        grupo_icms = QGroupBox("Parâmetros de ICMS e Incentivos Fiscais")
-        layout_icms = QVBoxLayout(grupo_icms)
-        layout_entrada.addWidget(grupo_icms)
+    def __truediv__(self, outro):
+        valor, derivada, _ = _partes_dual(outro)
+        return self._novo(self.valor / valor, (self.derivada * valor - self.valor * derivada) / valor ** 2)
 
-        # Layout para alíquotas
-        layout_aliquotas = QFormLayout()
-        layout_icms.addLayout(layout_aliquotas)
+    def __rtruediv__(self, outro):
+        valor, derivada, _ = _partes_dual(outro)
+        return self._novo(valor / self.valor, (derivada * self.valor - valor * self.derivada) / self.valor ** 2)
 
-        # Alíquota média de entrada (insumos)
-        self.campo_aliquota_entrada = QDoubleSpinBox()
-        self.campo_aliquota_entrada.setRange(0, 30)
-        self.campo_aliquota_entrada.setDecimals(2)
-        self.campo_aliquota_entrada.setSuffix("%")
-        self.campo_aliquota_entrada.setValue(19.0)  # Valor padrão
-        layout_aliquotas.addRow("Alíquota Média de Entrada:", self.campo_aliquota_entrada)
+    def _comparar(self, outro, operador):
+        valor, derivada, _ = _partes_dual(outro)
+        self.quebras.append((self.valor - valor, self.derivada - derivada))
+        return operador(self.valor, valor)
 
-        # Alíquota média de saída (vendas)
-        self.campo_aliquota_saida = QDoubleSpinBox()
-        self.campo_aliquota_saida.setRange(0, 30)
-        self.campo_aliquota_saida.setDecimals(2)
-        self.campo_aliquota_saida.setSuffix("%")
-        self.campo_aliquota_saida.setValue(19.0)  # Valor padrão
-        layout_aliquotas.addRow("Alíquota Média de Saída:", self.campo_aliquota_saida)
+    def __gt__(self, outro):
+        return self._comparar(outro, np.greater)
 
-        # Adicionar abas para incentivos de saída e entrada
-        tabIncentivos = QTabWidget()
-        layout_icms.addWidget(tabIncentivos)
+    def __ge__(self, outro):
+        return self._comparar(outro, np.greater_equal)
 
-        # Tab para incentivos de saída
-        tabSaida = QWidget()
-        tabIncentivos.addTab(tabSaida, "Incentivos de Saída")
+    def __lt__(self, outro):
+        return self._comparar(outro, np.less)
 
-        # Tab para incentivos de entrada
-        tabEntrada = QWidget()
-        tabIncentivos.addTab(tabEntrada, "Incentivos de Entrada")
+    def __le__(self, outro):
+        return self._comparar(outro, np.less_equal)
 
-        # Tab para incentivos de apuração
-        tabApuracao = QWidget()
-        tabIncentivos.addTab(tabApuracao, "Incentivos de Apuração")
+    def __array_ufunc__(self, ufunc, metodo, *entradas, **kwargs):
+        if metodo != "__call__" or kwargs:
+            return NotImplemented
+        operacoes = {
+            np.add: lambda a, b: _como_dual(a, self) + b,
+            np.subtract: lambda a, b: _como_dual(a, self) - b,
+            np.multiply: lambda a, b: _como_dual(a, self) * b,
+            np.true_divide: lambda a, b: _como_dual(a, self) / b,
+            np.greater: lambda a, b: _como_dual(a, self) > b,
+            np.greater_equal: lambda a, b: _como_dual(a, self) >= b,
+            np.less: lambda a, b: _como_dual(a, self) < b,
+            np.less_equal: lambda a, b: _como_dual(a, self) <= b,
+            np.maximum: lambda a, b: _extremo_dual(a, b, self, np.greater_equal),
+            np.minimum: lambda a, b: _extremo_dual(a, b, self, np.less_equal),
+            np.negative: lambda a: -_como_dual(a, self)
+        }
+        if ufunc not in operacoes:
+            return NotImplemented
+        return operacoes[ufunc](*entradas)
+
+    def __array_function__(self, funcao, tipos, args, kwargs):
+        if funcao is np.shape:
+            return np.shape(_partes_dual(args[0])[0])
+        if funcao is np.where and len(args) == 3 and not kwargs:
+            condicao = _partes_dual(args[0])[0].astype(bool)
+            valor_a, derivada_a, _ = _partes_dual(args[1])
+            valor_b, derivada_b, _ = _partes_dual(args[2])
+            return self._novo(np.where(condicao, valor_a, valor_b), np.where(condicao, derivada_a, derivada_b))
+        return NotImplemented
+
+
+def _partes_dual(valor):
+    """Retorna valor, derivada e registro de quebras (derivada nula para valores comuns)."""
+    if isinstance(valor, _Dual):
+        return valor.valor, valor.derivada, valor.quebras
+    return np.asarray(valor, dtype=float), 0.0, None
+
+
+def _como_dual(valor, referencia):
+    """Converte um valor comum em _Dual de derivada nula, usando o registro da referência."""
+    if isinstance(valor, _Dual):
+        return valor
+    return _Dual(valor, 0.0, referencia.quebras)
+
+
+def _extremo_dual(a, b, referencia, escolhe_a):
+    """Máximo ou mínimo elemento a elemento, registrando a quebra entre os dois ramos."""
+    valor_a, derivada_a, _ = _partes_dual(a)
+    valor_b, derivada_b, _ = _partes_dual(b)
+    referencia.quebras.append((valor_a - valor_b, derivada_a - derivada_b))
+    condicao = escolhe_a(valor_a, valor_b)
+    return _Dual(np.where(condicao, valor_a, valor_b), np.where(condicao, derivada_a, derivada_b),
+                 referencia.quebras)
+
+
+def _dividir(numerador, denominador):
+    """Divide elemento a elemento, retornando zero onde o denominador não é positivo."""
+    if isinstance(numerador, _Dual) or isinstance(denominador, _Dual):
+        positivo = denominador > 0
+        return np.where(positivo, numerador / np.where(positivo, denominador, 1.0), 0.0)
+    numerador, denominador = np.broadcast_arrays(np.asarray(numerador, dtype=float),
+                                                 np.asarray(denominador, dtype=float))
+    resultado = np.zeros(numerador.shape)
+    np.divide(numerador, denominador, out=resultado, where=denominador > 0)
+    return resultado
+
+
+def resolver_raizes(funcao, alvo, inferior, superior, tolerancia=1e-10, max_iteracoes=100,
+                    expandir=True, max_expansoes=40):
+    """Resolve funcao(x) = alvo elemento a elemento pelo método de Illinois (falsa posição modificada).
+
+    funcao recebe e devolve arrays com a forma de alvo e deve ser monótona em cada elemento.
+    Com expandir=True, o limite superior é dobrado até cercar a raiz. Retorna o valor, o
+    resíduo, o número de iterações e as máscaras convergiu e com_raiz.
+    """
+    alvo = np.asarray(alvo, dtype=float)
+    a = np.broadcast_to(np.asarray(inferior, dtype=float), alvo.shape).copy()
+    b = np.broadcast_to(np.asarray(superior, dtype=float), alvo.shape).copy()
+    fa = funcao(a) - alvo
+    fb = funcao(b) - alvo
+
+    if expandir:
+        for _ in range(max_expansoes):
+            fora = np.sign(fa) * np.sign(fb) > 0
+            if not fora.any():
+                break
+            largura = np.where(b - a > 0, b - a, 1.0)
+            b = np.where(fora, b + largura, b)
+            fb = np.where(fora, funcao(b) - alvo, fb)
+
+    limite = tolerancia * np.maximum(1.0, np.abs(alvo))
+    com_raiz = np.sign(fa) * np.sign(fb) <= 0
+    # Sem raiz no intervalo, fica o extremo mais próximo do alvo
+    valor = np.where(np.abs(fa) <= np.abs(fb), a, b)
+    residuo = np.where(np.abs(fa) <= np.abs(fb), fa, fb)
+    convergiu = np.abs(residuo) <= limite
+    iteracoes = np.zeros(alvo.shape, dtype=int)
+    ativo = com_raiz & ~convergiu
+    lado = np.zeros(alvo.shape, dtype=int)
+
+    for _ in range(max_iteracoes):
+        if not ativo.any():
+            break
+        denominador = fb - fa
+        c = np.where(ativo & (denominador != 0), (a * fb - b * fa) / np.where(denominador != 0, denominador, 1.0), valor)
+        c = np.where(ativo & ((c <= np.minimum(a, b)) | (c >= np.maximum(a, b))), (a + b) / 2, c)
+        fc = funcao(c) - alvo
+
+        substitui_b = ativo & (np.sign(fc) == np.sign(fb))
+        substitui_a = ativo & ~substitui_b
+        # Illinois: quando o mesmo extremo é mantido duas vezes, seu valor é reduzido à metade
+        fa = np.where(substitui_b & (lado == -1), fa / 2, fa)
+        fb = np.where(substitui_a & (lado == 1), fb / 2, fb)
+        b, fb = np.where(substitui_b, c, b), np.where(substitui_b, fc, fb)
+        a, fa = np.where(substitui_a, c, a), np.where(substitui_a, fc, fa)
+        lado = np.where(substitui_b, -1, np.where(substitui_a, 1, lado))
+
+        iteracoes = iteracoes + ativo
+        valor = np.where(ativo, c, valor)
+        residuo = np.where(ativo, fc, residuo)
+        fechado = np.abs(b - a) <= 1e-15 * np.maximum(1.0, np.abs(c))
+        convergiu = convergiu | (ativo & ((np.abs(fc) <= limite) | fechado))
+        ativo = ativo & ~convergiu
+
+    return {
+        "valor": valor,
+        "residuo": residuo,
+        "iteracoes": iteracoes,
+        "convergiu": convergiu,
+        "com_raiz": com_raiz
+    }
+
+
+class IncentivosICMSCompilados:
+    """Forma fechada do cálculo detalhado do ICMS para um pacote de incentivos.
+
+    O encadeamento de incentivos de calcular_icms_detalhado é linear no faturamento e nos
+    custos; o pacote é interpretado uma única vez e reduzido a coeficientes.
+    """
+
+    LISTAS = ("saida", "entrada", "apuracao")
+
+    def __init__(self, icms_config):
+        self.aliquota_entrada = float(icms_config.get("aliquota_entrada", 0.19))
+        self.aliquota_saida = float(icms_config.get("aliquota_saida", 0.19))
+        self.tem_incentivos = any(icms_config.get(f"incentivos_{lista}") for lista in self.LISTAS)
+        self.incentivos = {
+            lista: self._compilar_lista(lista, icms_config.get(f"incentivos_{lista}", []))
+            for lista in self.LISTAS
+        }
+
+    @staticmethod
+    def _compilar_lista(lista, incentivos):
+        """Converte uma lista de incentivos em registros prontos para o cálculo vetorizado."""
+        compilados = []
+        for idx, incentivo in enumerate(incentivos):
+            tipo = incentivo.get("tipo", "Nenhum")
+            if tipo == "Nenhum":
+                continue
+            compilados.append({
+                "indice": idx,
+                "tipo": tipo,
+                "descricao": incentivo.get("descricao", f"Incentivo {idx + 1}"),
+                "percentual": float(incentivo.get("percentual", 0.0)),
+                "percentual_operacoes": float(incentivo.get("percentual_operacoes", 1.0)),
+                "sinal": SINAIS_INCENTIVOS_ICMS[lista].get(tipo, 0.0)
+            })
+        return compilados
+
+    def coeficientes(self, sobrescritas=None, ativos=None):
+        """Calcula os coeficientes do pacote.
+
+        sobrescritas: {(lista, indice, campo): valor} ou {campo_da_aliquota: valor}; a chave
+        "multiplicador" escala o percentual de todos os incentivos (ex.: um valor por ano)
+        ativos: {(lista, indice): máscara} para ligar/desligar incentivos (0 ou 1)
+        """
+        sobrescritas = sobrescritas or {}
+        ativos = ativos or {}
+        multiplicador = sobrescritas.get("multiplicador", 1.0)
+        coeficientes = {
+            "aliquota_saida": sobrescritas.get("aliquota_saida", self.aliquota_saida),
+            "aliquota_entrada": sobrescritas.get("aliquota_entrada", self.aliquota_entrada)
+        }
+
+        for lista in ("saida", "entrada"):
+            restante = 1.0
+            incentivado = 0.0
+            diferido = 0.0
+            for incentivo in self.incentivos[lista]:
+                chave = (lista, incentivo["indice"])
+                percentual = sobrescritas.get(chave + ("percentual",), incentivo["percentual"]) * multiplicador
+                operacoes = sobrescritas.get(chave + ("percentual_operacoes",), incentivo["percentual_operacoes"])
+                # Incentivos com percentual não positivo são ignorados pelo cálculo detalhado
+                ativo = np.greater(percentual, 0)
+                if chave in ativos:
+                    ativo = ativo & (np.asarray(ativos[chave]) > 0)
+
+                peso = np.where(ativo, restante * operacoes, 0.0)
+                restante = restante - peso
+                incentivado = incentivado + peso * (1 + incentivo["sinal"] * percentual)
+                if incentivo["tipo"] == "Diferimento":
+                    diferido = diferido + peso * percentual
+
+            coeficientes[f"{lista}_incentivada"] = incentivado
+            coeficientes[f"{lista}_residual"] = restante
+            if lista == "saida":
+                coeficientes["saida_diferida"] = diferido
+
+        reducao = 0.0
+        for incentivo in self.incentivos["apuracao"]:
+            chave = ("apuracao", incentivo["indice"])
+            percentual = sobrescritas.get(chave + ("percentual",), incentivo["percentual"]) * multiplicador
+            saldo = sobrescritas.get(chave + ("percentual_operacoes",), incentivo["percentual_operacoes"])
+            ativo = np.greater(percentual, 0)
+            if chave in ativos:
+                ativo = ativo & (np.asarray(ativos[chave]) > 0)
+            reducao = reducao + np.where(ativo, saldo * percentual * incentivo["sinal"], 0.0)
+        coeficientes["reducao_apuracao"] = reducao
+
+        return coeficientes
+
+    def avaliar(self, faturamento, custos, coeficientes=None, saldo_credor=0.0):
+        """Calcula o ICMS devido e a economia para arrays de faturamento e custos.
+
+        saldo_credor: saldo credor de períodos anteriores, abatido do saldo da apuração.
+        """
+        if coeficientes is None:
+            coeficientes = self.coeficientes()
+        aliquota_saida = coeficientes["aliquota_saida"]
+        aliquota_entrada = coeficientes["aliquota_entrada"]
+
+        # Débitos: parcela incentivada + parcela não incentivada (somente se positiva)
+        faturamento_residual = faturamento * coeficientes["saida_residual"]
+        debito_total = (faturamento * coeficientes["saida_incentivada"] * aliquota_saida +
+                        np.where(faturamento_residual > 0, faturamento_residual * aliquota_saida, 0.0))
+
+        custos_residuais = custos * coeficientes["entrada_residual"]
+        credito_total = (custos * coeficientes["entrada_incentivada"] * aliquota_entrada +
+                         np.where(custos_residuais > 0, custos_residuais * aliquota_entrada, 0.0))
+
+        saldo = debito_total - credito_total - saldo_credor
+        icms_devido = np.maximum(0, saldo) * np.maximum(0, 1 - coeficientes["reducao_apuracao"])
+
+        icms_sem_incentivo = faturamento * aliquota_saida - custos * aliquota_entrada
+        if self.tem_incentivos:
+            economia = icms_sem_incentivo - icms_devido
+        else:
+            economia = np.zeros(np.shape(icms_devido))
+
+        return {
+            "debito_total": debito_total,
+            "credito_total": credito_total,
+            "saldo": saldo,
+            "icms_devido": icms_devido,
+            "economia_tributaria": economia,
+            "percentual_economia": _dividir(economia, icms_sem_incentivo) * 100,
+            "valor_diferido": faturamento * coeficientes["saida_diferida"] * aliquota_saida
+        }
+
+    def participantes(self):
+        """Incentivos ativos (percentual positivo) que participam da atribuição de economia."""
+        return [(lista, incentivo) for lista in self.LISTAS for incentivo in self.incentivos[lista]
+                if incentivo["percentual"] > 0]
+
+    def _economias_coalizoes(self, faturamento, custos, mascaras, participantes):
+        """Economia de cada coalizão (linha de mascaras) em relação ao ICMS sem nenhum incentivo."""
+        ativos = {(lista, incentivo["indice"]): mascaras[:, [j]]
+                  for j, (lista, incentivo) in enumerate(participantes)}
+        icms = self.avaliar(faturamento, custos, self.coeficientes(ativos=ativos))["icms_devido"]
+        icms_sem_incentivos = self.avaliar(faturamento, custos, self.coeficientes(
+            ativos={chave: 0 for chave in ativos}))["icms_devido"]
+        return icms_sem_incentivos - icms
+
+    def atribuir_economia(self, faturamento, custos, max_exato=12, n_permutacoes=2000, semente=0):
+        """Atribui a economia do pacote a cada incentivo (valor de Shapley e exclusão individual).
+
+        Até max_exato incentivos o valor de Shapley é exato (todas as 2^K coalizões avaliadas em
+        uma única chamada vetorizada); acima disso é estimado por permutações sorteadas.
+        Retorna arrays com um incentivo por linha e uma empresa por coluna.
+        """
+        faturamento = np.atleast_1d(np.asarray(faturamento, dtype=float))
+        custos = np.atleast_1d(np.asarray(custos, dtype=float))
+        participantes = self.participantes()
+        k = len(participantes)
+        n = np.broadcast_shapes(faturamento.shape, custos.shape)[-1]
+        resultado = {
+            "incentivos": [{"lista": lista, "indice": incentivo["indice"], "descricao": incentivo["descricao"],
+                            "tipo": incentivo["tipo"]} for lista, incentivo in participantes],
+            "shapley": np.zeros((k, n)),
+            "exclusao": np.zeros((k, n)),
+            "erro_padrao": np.zeros((k, n)),
+            "economia_total": np.zeros(n),
+            "metodo": "exato"
+        }
+        if k == 0:
+            return resultado
+
+        # Exclusão individual: economia perdida ao retirar cada incentivo do pacote completo
+        mascaras = np.vstack([np.ones((1, k)), 1 - np.eye(k)])
+        economias = self._economias_coalizoes(faturamento, custos, mascaras, participantes)
+        resultado["economia_total"] = economias[0]
+        resultado["exclusao"] = economias[0] - economias[1:]
+
+        if k <= max_exato:
+            coalizoes = np.arange(2 ** k)
+            mascaras = (coalizoes[:, None] >> np.arange(k)) & 1
+            economias = self._economias_coalizoes(faturamento, custos, mascaras, participantes)
+            tamanhos = mascaras.sum(axis=1)
+            fatoriais = np.cumprod(np.concatenate([[1.0], np.arange(1, k + 1)]))
+            for i in range(k):
+                sem_i = coalizoes[mascaras[:, i] == 0]
+                pesos = fatoriais[tamanhos[sem_i]] * fatoriais[k - tamanhos[sem_i] - 1] / fatoriais[k]
+                resultado["shapley"][i] = (pesos[:, None] * (economias[sem_i | (1 << i)] - economias[sem_i])).sum(axis=0)
+            return resultado
+
+        # Estimativa por permutações: cada prefixo de cada permutação é uma coalizão
+        gerador = np.random.default_rng(semente)
+        ordens = np.argsort(gerador.random((n_permutacoes, k)), axis=1)
+        mascaras = np.zeros((n_permutacoes, k + 1, k))
+        for posicao in range(k):
+            mascaras[np.arange(n_permutacoes), posicao + 1:, ordens[:, posicao]] = 1
+        economias = self._economias_coalizoes(faturamento, custos, mascaras.reshape(-1, k), participantes)
+        economias = economias.reshape(n_permutacoes, k + 1, n)
+        marginais = np.zeros((n_permutacoes, k, n))
+        for posicao in range(k):
+            marginais[np.arange(n_permutacoes), ordens[:, posicao]] = economias[:, posicao + 1] - economias[:, posicao]
+        resultado["shapley"] = marginais.mean(axis=0)
+        resultado["erro_padrao"] = marginais.std(axis=0) / np.sqrt(n_permutacoes)
+        resultado["metodo"] = "amostral"
+        return resultado
+
+
+class CronogramaIncentivosICMS:
+    """Multiplicadores anuais dos incentivos de ICMS e cobertura do fundo de compensação.
+
+    Os dois cronogramas ficam em arrays densos indexados por ano a partir do primeiro ano
+    configurado; anos sem valor repetem o ano anterior e anos fora do intervalo assumem o
+    extremo mais próximo. Multiplicadores não informados seguem a redução do ICMS em
+    reducao_impostos_transicao (multiplicador = 1 - redução).
+    """
+
+    def __init__(self, config):
+        cronograma = config.cronograma_incentivos_icms
+        multiplicadores = {int(ano): valor for ano, valor in cronograma.get("multiplicadores", {}).items()}
+        compensacao = {int(ano): valor for ano, valor in cronograma.get("compensacao", {}).items()}
+        self.anos_explicitos = set(multiplicadores)
+        reducoes = config.reducao_impostos_transicao
+        anos = set(config.fase_transicao) | set(reducoes) | set(multiplicadores) | set(compensacao)
+        self.ano_inicial = min(anos)
+        n = max(anos) - self.ano_inicial + 1
+
+        self.multiplicadores = np.ones(n)
+        self.compensacao = np.zeros(n)
+        multiplicador, cobertura = 1.0, 0.0
+        for posicao in range(n):
+            ano = self.ano_inicial + posicao
+            if ano in multiplicadores:
+                multiplicador = multiplicadores[ano]
+            elif "ICMS" in reducoes.get(ano, {}):
+                multiplicador = 1 - reducoes[ano]["ICMS"]
+            cobertura = compensacao.get(ano, cobertura)
+            self.multiplicadores[posicao] = multiplicador
+            self.compensacao[posicao] = cobertura
+
+    def posicoes(self, anos):
+        return np.clip(np.asarray(anos) - self.ano_inicial, 0, len(self.multiplicadores) - 1)
+
+    def multiplicador(self, anos):
+        return self.multiplicadores[self.posicoes(anos)]
+
+    def cobertura(self, anos):
+        return self.compensacao[self.posicoes(anos)]
+
+    def sobrescritas(self, ano, sobrescritas=None):
+        """Sobrescritas do motor em lote com o multiplicador e a cobertura do(s) ano(s).
+
+        Uma sobrescrita "reducao_impostos_transicao.<ano>.ICMS" (ex.: vinda de RegrasVigencia)
+        substitui a redução da configuração nos anos sem multiplicador explícito.
+        """
+        multiplicador = self.multiplicador(ano)
+        caminho = f"reducao_impostos_transicao.{ano}.ICMS"
+        if sobrescritas and caminho in sobrescritas and int(ano) not in self.anos_explicitos:
+            multiplicador = 1 - np.asarray(sobrescritas[caminho], dtype=float)
+        return {"multiplicador_incentivos_icms": multiplicador,
+                "compensacao_incentivos_icms": self.cobertura(ano)}
+
+
+class CarteiraEmpresas:
+    """Dados de várias empresas organizados em colunas para o cálculo vetorizado."""
+
+    CAMPOS_NUMERICOS = ["faturamento", "custos_tributaveis", "custos_simples", "custos_rurais",
+                        "custos_importacoes", "creditos_anteriores", "vendas_b2b"]
+
+    def __init__(self, colunas, setores, regimes=None, icms_configs=None, nomes=None):
+        self.setores = np.asarray(setores, dtype=object)
+        n = len(self.setores)
+        self.colunas = {
+            campo: np.broadcast_to(np.asarray(colunas.get(campo, 0.0), dtype=float), (n,)).copy()
+            for campo in self.CAMPOS_NUMERICOS
+        }
+        self.regimes = np.asarray(regimes if regimes is not None else ["real"] * n, dtype=object)
+        self.icms_configs = list(icms_configs) if icms_configs is not None else [None] * n
+        self.nomes = list(nomes) if nomes is not None else [f"Empresa {i + 1}" for i in range(n)]
+        # Identifica carteiras derivadas por com_incentivos (distingue o ICMS no cache de estágios)
+        self.assinatura_icms = None
+        self._setores_unicos = None
+
+    @classmethod
+    def de_dados(cls, lista_dados):
+        """Cria a carteira a partir de uma lista de dicionários de dados de empresas."""
+        colunas = {campo: [dados.get(campo, 0) for dados in lista_dados] for campo in cls.CAMPOS_NUMERICOS}
+        return cls(
+            colunas,
+            setores=[dados.get("setor", "padrao") for dados in lista_dados],
+            regimes=[dados.get("regime", "real") for dados in lista_dados],
+            icms_configs=[dados.get("icms_config") for dados in lista_dados],
+            nomes=[dados.get("nome", f"Empresa {i + 1}") for i, dados in enumerate(lista_dados)]
+        )
+
+    def __len__(self):
+        return len(self.setores)
+
+    def subconjunto(self, indices):
+        """Retorna uma nova carteira somente com as empresas indicadas."""
+        indices = np.asarray(indices)
+        return CarteiraEmpresas(
+            {campo: valores[indices] for campo, valores in self.colunas.items()},
+            self.setores[indices],
+            self.regimes[indices],
+            [self.icms_configs[i] for i in indices],
+            [self.nomes[i] for i in indices]
+        )
+
+    def com_incentivos(self, incentivos, icms_padrao):
+        """Nova carteira com os incentivos informados ({lista: [incentivo, ...]}) acrescentados ao ICMS de cada empresa."""
+        for lista, adicionais in incentivos.items():
+            if lista not in SINAIS_INCENTIVOS_ICMS:
+                raise ValueError(f"Lista de incentivos desconhecida: {lista}")
+            for incentivo in adicionais:
+                if incentivo["tipo"] not in SINAIS_INCENTIVOS_ICMS[lista]:
+                    raise ValueError(f"O tipo {incentivo['tipo']} não se aplica aos incentivos de {lista}")
+
+        derivados = {}
+        icms_configs = []
+        for icms_config in self.icms_configs:
+            base = icms_config or icms_padrao
+            if id(base) not in derivados:
+                derivado = dict(base)
+                for lista, adicionais in incentivos.items():
+                    derivado[f"incentivos_{lista}"] = list(base.get(f"incentivos_{lista}", [])) + \
+                        [dict(incentivo) for incentivo in adicionais]
+                derivados[id(base)] = derivado
+            icms_configs.append(derivados[id(base)])
+
+        carteira = CarteiraEmpresas(self.colunas, self.setores, self.regimes, icms_configs, self.nomes)
+        adicionados = impressao_digital_icms({f"incentivos_{lista}": adicionais for lista, adicionais in incentivos.items()})
+        carteira.assinatura_icms = (self.assinatura_icms, adicionados[2:])
+        return carteira
+
+    def setores_unicos(self):
+        """Retorna os setores distintos e o índice do setor de cada empresa."""
+        if self._setores_unicos is None:
+            self._setores_unicos = np.unique(self.setores.astype(str), return_inverse=True)
+        return self._setores_unicos
+
+    def validar(self, configuracao):
+        """Aplica as regras de validar_dados a todas as empresas."""
+        faturamento = self.colunas["faturamento"]
+        regras = [
+            (faturamento < 0, "Faturamento não pode ser negativo"),
+            (self.colunas["custos_tributaveis"] > faturamento, "Custos tributáveis não podem exceder o faturamento"),
+            ((self.regimes == "simples") & (faturamento > configuracao.limite_simples),
+             f"Empresas do Simples Nacional devem ter faturamento anual até R$ {formatar_br(configuracao.limite_simples)}")
+        ]
+        for invalidas, mensagem in regras:
+            if np.any(invalidas):
+                indice = int(np.argmax(invalidas))
+                raise ValueError(f"{self.nomes[indice]}: {mensagem}")
+        return True
+
+
+class CalculadoraLote:
+    """Calcula o IVA Dual e os tributos atuais de uma carteira inteira de forma vetorizada.
+
+    Reproduz CalculadoraIVADual.calcular_imposto_devido sem a memória de cálculo. Parâmetros
+    da configuração podem ser sobrescritos por caminho (ex.: "aliquotas_base.CBS",
+    "fase_transicao.2030", "faturamento") com escalares ou arrays, combinados por broadcasting
+    com o eixo das empresas, que é sempre o último.
+    """
+
+    METRICAS = ["base_tributavel", "cbs", "ibs", "imposto_bruto", "creditos", "imposto_devido",
+                "PIS", "COFINS", "ICMS", "ISS", "IPI", "economia_icms", "credito_cruzado",
+                "impostos_atuais", "total_devido", "aliquota_efetiva"]
+
+    # Caminhos (exatos ou prefixos terminados em ".") que afetam cada estágio do cálculo
+    DEPENDENCIAS_ESTAGIOS = {
+        "iva": ("faturamento", "custos_tributaveis", "custos_simples", "custos_rurais", "custos_importacoes",
+                "creditos_anteriores", "compras_intragrupo", "creditos_intragrupo", "escala_iva",
+                "aliquotas_base.", "fase_transicao.",
+                "setores_especiais.", "regras_credito."),
+        "tributos_atuais": ("faturamento", "custos_tributaveis", "saldo_credor_icms", "icms_diferido_anterior",
+                            "multiplicador_incentivos_icms", "compensacao_incentivos_icms",
+                            "impostos_atuais.", "icms_config."),
+        "creditos_cruzados": ("creditos_cruzados.",)
+    }
+
+    def __init__(self, configuracao):
+        self.config = configuracao
+        self._pacotes_icms = {}
+
+    @staticmethod
+    def _parametro(sobrescritas, caminho, padrao):
+        """Obtém um parâmetro da configuração, respeitando as sobrescritas informadas."""
+        if caminho in sobrescritas:
+            valor = sobrescritas[caminho]
+            return valor if isinstance(valor, _Dual) else np.asarray(valor, dtype=float)
+        return padrao
+
+    def compilar_pacote_icms(self, icms_config):
+        """Compila (uma única vez) o pacote de incentivos do ICMS."""
+        chave = impressao_digital_icms(icms_config)
+        if chave not in self._pacotes_icms:
+            self._pacotes_icms[chave] = IncentivosICMSCompilados(icms_config)
+        return self._pacotes_icms[chave]
+
+    def particionar_por_pacote_icms(self, carteira):
+        """Agrupa as empresas pela impressão digital do pacote de incentivos do ICMS."""
+        grupos = {}
+        chaves_por_objeto = {}
+        for indice, icms_config in enumerate(carteira.icms_configs):
+            icms_config = icms_config or self.config.icms_config
+            # Empresas do mesmo programa costumam compartilhar o mesmo dicionário
+            chave = chaves_por_objeto.get(id(icms_config))
+            if chave is None:
+                chave = impressao_digital_icms(icms_config)
+                chaves_por_objeto[id(icms_config)] = chave
+                if chave not in self._pacotes_icms:
+                    self._pacotes_icms[chave] = IncentivosICMSCompilados(icms_config)
+            grupos.setdefault(chave, []).append(indice)
+
+        return [(self._pacotes_icms[chave], np.asarray(indices)) for chave, indices in grupos.items()]
+
+    def _entradas(self, carteira, sobrescritas):
+        """Colunas de entrada da carteira, com eventuais sobrescritas."""
+        return {campo: self._parametro(sobrescritas, campo, carteira.colunas[campo])
+                for campo in CarteiraEmpresas.CAMPOS_NUMERICOS}
+
+    def _parametros_iva(self, carteira, ano, sobrescritas):
+        """Resolve os parâmetros do IVA Dual por empresa para o ano informado."""
+        config = self.config
+        fator_transicao = self._parametro(sobrescritas, f"fase_transicao.{ano}", config.fase_transicao.get(ano, 1.0))
+        cbs_base = self._parametro(sobrescritas, "aliquotas_base.CBS", config.aliquotas_base["CBS"])
+
+        setores, inverso = carteira.setores_unicos()
+        aliquota_cbs = aliquota_ibs = fator_base = 0.0
+        for i, setor in enumerate(setores):
+            chave = setor if setor in config.setores_especiais else "padrao"
+            regras = config.setores_especiais[chave]
+            ibs = self._parametro(sobrescritas, f"setores_especiais.{chave}.IBS", regras["IBS"])
+            reducao = self._parametro(sobrescritas, f"setores_especiais.{chave}.reducao_CBS", regras["reducao_CBS"])
+            # Setores especiais têm redução adicional de 50% na base
+            fator = fator_transicao * 0.5 if chave == setor and setor != "padrao" else fator_transicao
+
+            mascara = inverso == i
+            aliquota_cbs = np.where(mascara, cbs_base * (1 - reducao) * fator_transicao, aliquota_cbs)
+            aliquota_ibs = np.where(mascara, ibs * fator_transicao, aliquota_ibs)
+            fator_base = np.where(mascara, fator, fator_base)
+
+        # Fator comum sobre as alíquotas do IVA, mantendo a proporção entre CBS e IBS
+        if "escala_iva" in sobrescritas:
+            escala = self._parametro(sobrescritas, "escala_iva", 1.0)
+            aliquota_cbs = aliquota_cbs * escala
+            aliquota_ibs = aliquota_ibs * escala
+
+        importacoes = config.regras_credito["importacoes"]
+        return {
+            "aliquota_cbs": aliquota_cbs,
+            "aliquota_ibs": aliquota_ibs,
+            "fator_base": fator_base,
+            "credito_simples": self._parametro(sobrescritas, "regras_credito.simples", config.regras_credito["simples"]),
+            "credito_rural": self._parametro(sobrescritas, "regras_credito.rural", config.regras_credito["rural"]),
+            "credito_importacoes_ibs": self._parametro(sobrescritas, "regras_credito.importacoes.IBS", importacoes["IBS"]),
+            "credito_importacoes_cbs": self._parametro(sobrescritas, "regras_credito.importacoes.CBS", importacoes["CBS"]),
+            # Grupo empresarial: compras intragrupo saem dos custos e dão crédito pelo débito da vendedora
+            "compras_intragrupo": self._parametro(sobrescritas, "compras_intragrupo", 0.0),
+            "creditos_intragrupo": self._parametro(sobrescritas, "creditos_intragrupo", 0.0)
+        }
+
+    def _estagio_iva(self, entradas, parametros):
+        """Base tributável, CBS, IBS, créditos e imposto devido do IVA Dual."""
+        aliquota_cbs = parametros["aliquota_cbs"]
+        aliquota_ibs = parametros["aliquota_ibs"]
+        aliquota_total = aliquota_cbs + aliquota_ibs
+
+        base = entradas["faturamento"] * parametros["fator_base"]
+        cbs = base * aliquota_cbs
+        ibs = base * aliquota_ibs
+        imposto_bruto = cbs + ibs
+
+        custos_normais = entradas["custos_tributaveis"] - parametros["compras_intragrupo"]
+        custos_simples = entradas["custos_simples"]
+        custos_rurais = entradas["custos_rurais"]
+        custos_importacoes = entradas["custos_importacoes"]
+        creditos_anteriores = entradas["creditos_anteriores"]
+
+        creditos = np.where(custos_normais > 0, custos_normais * aliquota_total, 0.0)
+
+        # Créditos do Simples limitados a 40% do imposto bruto
+        credito_simples = custos_simples * parametros["credito_simples"] * aliquota_total
+        creditos = creditos + np.where(custos_simples > 0, np.minimum(credito_simples, imposto_bruto * 0.40), 0.0)
+
+        creditos = creditos + np.where(
+            custos_rurais > 0, custos_rurais * (aliquota_ibs + aliquota_cbs * parametros["credito_rural"]), 0.0)
+        creditos = creditos + np.where(
+            custos_importacoes > 0,
+            custos_importacoes * (aliquota_ibs * parametros["credito_importacoes_ibs"] +
+                                  aliquota_cbs * parametros["credito_importacoes_cbs"]), 0.0)
+        creditos = creditos + np.where(creditos_anteriores > 0, creditos_anteriores, 0.0)
+        creditos = creditos + parametros["creditos_intragrupo"]
+
+        return {
+            "base_tributavel": base,
+            "cbs": cbs,
+            "ibs": ibs,
+            "imposto_bruto": imposto_bruto,
+            "creditos": creditos,
+            "imposto_devido": np.maximum(0, imposto_bruto - creditos)
+        }
+
+    def _sobrescritas_icms(self, sobrescritas):
+        """Converte caminhos "icms_config...." nas chaves usadas pelos pacotes compilados."""
+        convertidas = {}
+        for caminho, valor in sobrescritas.items():
+            partes = caminho.split(".")
+            if partes[0] != "icms_config":
+                continue
+            if not isinstance(valor, _Dual):
+                valor = np.asarray(valor, dtype=float)
+            if len(partes) == 2:
+                convertidas[partes[1]] = valor
+            elif len(partes) == 4 and partes[1].startswith("incentivos_"):
+                lista = partes[1][len("incentivos_"):]
+                convertidas[(lista, int(partes[2]), partes[3])] = valor
+        return convertidas
+
+    def _calcular_icms(self, carteira, entradas, sobrescritas):
+        """Calcula o ICMS de cada partição de empresas com uma única chamada por pacote.
+
+        Com "multiplicador_incentivos_icms" os incentivos são reduzidos e a perda em relação ao
+        benefício integral, vezes "compensacao_incentivos_icms", é a compensação do fundo.
+        """
+        sobrescritas_icms = self._sobrescritas_icms(sobrescritas)
+        if "multiplicador_incentivos_icms" not in sobrescritas:
+            resultado = self._avaliar_pacotes_icms(carteira, entradas, sobrescritas, sobrescritas_icms)
+            resultado["compensacao"] = np.zeros(np.shape(resultado["icms_devido"]))
+            return resultado
+
+        integral = self._avaliar_pacotes_icms(carteira, entradas, sobrescritas, sobrescritas_icms)
+        sobrescritas_icms["multiplicador"] = self._parametro(sobrescritas, "multiplicador_incentivos_icms", 1.0)
+        resultado = self._avaliar_pacotes_icms(carteira, entradas, sobrescritas, sobrescritas_icms)
+        cobertura = self._parametro(sobrescritas, "compensacao_incentivos_icms", 0.0)
+        resultado["compensacao"] = cobertura * np.maximum(0, resultado["icms_devido"] - integral["icms_devido"])
+        return resultado
+
+    def _avaliar_pacotes_icms(self, carteira, entradas, sobrescritas, sobrescritas_icms):
+        faturamento = entradas["faturamento"]
+        custos = entradas["custos_tributaveis"]
+        saldo_credor = self._parametro(sobrescritas, "saldo_credor_icms", 0.0)
+        particoes = self.particionar_por_pacote_icms(carteira)
+
+        if len(particoes) == 1:
+            pacote, _ = particoes[0]
+            return pacote.avaliar(faturamento, custos, pacote.coeficientes(sobrescritas_icms), saldo_credor)
+
+        n = len(carteira)
+        forma = np.broadcast_shapes(np.shape(faturamento), np.shape(custos), np.shape(saldo_credor), (n,),
+                                    *[np.shape(valor) for valor in sobrescritas_icms.values()])
+        resultado = {}
+        for pacote, indices in particoes:
+            coeficientes = pacote.coeficientes(
+                {chave: _fatiar_empresas(valor, indices, n) for chave, valor in sobrescritas_icms.items()})
+            parcial = pacote.avaliar(_fatiar_empresas(faturamento, indices, n),
+                                     _fatiar_empresas(custos, indices, n), coeficientes,
+                                     _fatiar_empresas(saldo_credor, indices, n))
+            for chave, valor in parcial.items():
+                if chave not in resultado:
+                    resultado[chave] = np.zeros(forma)
+                resultado[chave][..., indices] = np.broadcast_to(valor, forma[:-1] + (len(indices),))
+        return resultado
+
+    def _estagio_tributos_atuais(self, carteira, entradas, sobrescritas):
+        """PIS, COFINS, ICMS, ISS e IPI do sistema atual."""
+        impostos = self.config.impostos_atuais
+        faturamento = entradas["faturamento"]
+        custos = entradas["custos_tributaveis"]
+
+        aliquota_pis = self._parametro(sobrescritas, "impostos_atuais.PIS", impostos["PIS"])
+        aliquota_cofins = self._parametro(sobrescritas, "impostos_atuais.COFINS", impostos["COFINS"])
+        aliquota_iss = self._parametro(sobrescritas, "impostos_atuais.ISS.padrao", impostos["ISS"]["padrao"])
+        aliquota_ipi = self._parametro(sobrescritas, "impostos_atuais.IPI.industria", impostos["IPI"]["industria"])
+        fator_credito_ipi = 0.7  # Fator de aproveitamento de crédito do IPI
+
+        pis = faturamento * aliquota_pis - np.where(faturamento > 0, custos * aliquota_pis, 0.0)
+        cofins = faturamento * aliquota_cofins - np.where(faturamento > 0, custos * aliquota_cofins, 0.0)
+
+        icms = self._calcular_icms(carteira, entradas, sobrescritas)
+
+        setores = carteira.setores
+        setor_iss = np.isin(setores, ["servicos", "educacao", "saude"])
+        iss = np.where(setor_iss, faturamento * aliquota_iss, 0.0)
+
+        credito_ipi = np.where(faturamento > 0, custos * aliquota_ipi * fator_credito_ipi, 0.0)
+        ipi = np.where(setores == "industria", faturamento * aliquota_ipi - credito_ipi, 0.0)
+
+        # ICMS diferido no ano anterior vence neste ano (cálculo encadeado)
+        icms_diferido_anterior = self._parametro(sobrescritas, "icms_diferido_anterior", 0.0)
+
+        return {
+            "PIS": pis,
+            "COFINS": cofins,
+            "ICMS": icms["icms_devido"] + icms_diferido_anterior,
+            "ISS": iss,
+            "IPI": ipi,
+            "economia_icms": icms["economia_tributaria"],
+            "saldo_icms": icms["saldo"],
+            "icms_diferido": icms["valor_diferido"],
+            "compensacao_icms": icms["compensacao"]
+        }
+
+    def _estagio_creditos_cruzados(self, ano, ibs, icms, sobrescritas):
+        """Compensação de parte do IBS com o ICMS nos anos previstos."""
+        caminho = f"creditos_cruzados.{ano}.IBS_para_ICMS"
+        if ano not in self.config.creditos_cruzados and caminho not in sobrescritas:
+            return {"credito_cruzado": np.zeros(np.shape(icms)), "ICMS": icms}
+
+        percentual = self._parametro(sobrescritas, caminho,
+                                     self.config.creditos_cruzados.get(ano, {}).get("IBS_para_ICMS", 0))
+        credito = np.minimum(ibs * percentual, icms)
+        return {"credito_cruzado": credito, "ICMS": icms - credito}
+
+    @staticmethod
+    def _estagio_total(faturamento, iva, atuais, cruzados):
+        """Consolida os tributos atuais, o total devido e a alíquota efetiva."""
+        impostos_atuais = atuais["PIS"] + atuais["COFINS"] + cruzados["ICMS"] + atuais["ISS"] + atuais["IPI"]
+        total_devido = iva["imposto_devido"] + impostos_atuais
+        return {
+            "impostos_atuais": impostos_atuais,
+            "total_devido": total_devido,
+            "aliquota_efetiva": _dividir(total_devido, faturamento)
+        }
+
+    @classmethod
+    def afeta_estagio(cls, caminho, estagio, ano):
+        """Indica se um caminho sobrescrito interfere no estágio do ano informado."""
+        partes = caminho.split(".")
+        if partes[0] in ("fase_transicao", "creditos_cruzados") and len(partes) > 1 and partes[1] != str(ano):
+            return False
+        return any(caminho == prefixo or (prefixo.endswith(".") and caminho.startswith(prefixo))
+                   for prefixo in cls.DEPENDENCIAS_ESTAGIOS[estagio])
+
+    @classmethod
+    def chave_estagio(cls, estagio, ano, sobrescritas):
+        """Chave de cache de um estágio, formada somente pelas sobrescritas que o afetam."""
+        relevantes = []
+        for caminho in sorted(sobrescritas):
+            if cls.afeta_estagio(caminho, estagio, ano):
+                valor = sobrescritas[caminho]
+                if isinstance(valor, _Dual):
+                    relevantes.append((caminho, "derivadas", id(valor)))
+                    continue
+                valor = np.asarray(valor, dtype=float)
+                relevantes.append((caminho, valor.shape, valor.tobytes()))
+        return (estagio, ano, tuple(relevantes))
+
+    def calcular_ano(self, carteira, ano, sobrescritas=None, cache=None):
+        """Calcula todas as métricas de um ano para a carteira inteira.
+
+        cache: dicionário compartilhado entre chamadas com a mesma carteira (ou com carteiras
+        derivadas dela por com_incentivos); estágios cujas sobrescritas relevantes coincidem são
+        reaproveitados em vez de recalculados.
+        """
+        sobrescritas = sobrescritas or {}
+        if self.config.cronograma_incentivos_icms.get("ativo"):
+            sobrescritas = dict(CronogramaIncentivosICMS(self.config).sobrescritas(ano, sobrescritas), **sobrescritas)
+        if cache is None:
+            cache = {}
+        entradas = self._entradas(carteira, sobrescritas)
+
+        chave_iva = self.chave_estagio("iva", ano, sobrescritas)
+        if chave_iva not in cache:
+            cache[chave_iva] = self._estagio_iva(entradas, self._parametros_iva(carteira, ano, sobrescritas))
+        iva = cache[chave_iva]
+
+        chave_atuais = self.chave_estagio("tributos_atuais", ano, sobrescritas) + (carteira.assinatura_icms,)
+        if chave_atuais not in cache:
+            cache[chave_atuais] = self._estagio_tributos_atuais(carteira, entradas, sobrescritas)
+        atuais = cache[chave_atuais]
+
+        # Os créditos cruzados dependem do IBS e do ICMS calculados nos estágios anteriores
+        chave_cruzados = self.chave_estagio("creditos_cruzados", ano, sobrescritas) + (chave_iva, chave_atuais)
+        if chave_cruzados not in cache:
+            cache[chave_cruzados] = self._estagio_creditos_cruzados(ano, iva["ibs"], atuais["ICMS"], sobrescritas)
+        cruzados = cache[chave_cruzados]
+
+        total = self._estagio_total(entradas["faturamento"], iva, atuais, cruzados)
+
+        resultado = {}
+        resultado.update(iva)
+        resultado.update(atuais)
+        resultado.update(cruzados)
+        resultado.update(total)
+        return resultado
+
+    def calcular_incentivos_icms_anos(self, carteira, anos, sobrescritas=None):
+        """ICMS com o cronograma de incentivos para vários anos em uma única passada vetorizada.
+
+        Os coeficientes compilados de cada pacote são avaliados com o multiplicador e a cobertura
+        de todos os anos ao mesmo tempo (anos nas linhas, empresas nas colunas), mesmo com o
+        cronograma inativo na configuração.
+        """
+        anos = np.asarray(anos)
+        cronograma = CronogramaIncentivosICMS(self.config)
+        sobrescritas = dict({chave: valor[:, None] for chave, valor in cronograma.sobrescritas(anos).items()},
+                            **(sobrescritas or {}))
+        icms = self._calcular_icms(carteira, self._entradas(carteira, sobrescritas), sobrescritas)
+        return {
+            "anos": anos,
+            "multiplicador": cronograma.multiplicador(anos),
+            "cobertura": cronograma.cobertura(anos),
+            "icms_devido": icms["icms_devido"],
+            "economia_icms": icms["economia_tributaria"],
+            "compensacao": icms["compensacao"]
+        }
+
+    def calcular_comparativo(self, carteira, anos=None, sobrescritas=None, derivadas=None, regras=None,
+                             encadeado=False, projecao=None):
+        """Calcula os anos da transição para a carteira, validando os dados uma única vez.
+
+        derivadas: lista opcional de caminhos; cada ano passa a incluir "derivadas" e "quebras"
+        calculadas por calcular_derivadas.
+        regras: RegrasVigencia opcional; cada ano é calculado por calcular_periodo, com as
+        mudanças de regra no meio do ano proporcionais aos dias.
+        encadeado: os anos são percorridos em ordem e os créditos de IVA não utilizados, o saldo
+        credor do ICMS e o ICMS diferido de cada ano entram no ano seguinte; cada passo continua
+        vetorizado sobre as empresas, com o mesmo custo de um ano independente.
+        projecao: ProjecaoInsumos opcional; as entradas de cada ano são as colunas da matriz
+        projetada e cada ano passa a incluir as métricas em reais do ano base ("<métrica>_real")
+        e o "deflator" aplicado. No cálculo encadeado, créditos anteriores projetados valem
+        somente para o primeiro ano.
+        """
+        if anos is None:
+            anos = list(self.config.fase_transicao.keys())
+        anos = sorted(anos) if encadeado else list(anos)
+        carteira.validar(self.config)
+        sobrescritas = sobrescritas or {}
+        sobrescritas_anos = {ano: sobrescritas for ano in anos}
+        if projecao is not None:
+            matrizes = projecao.matrizes(carteira, anos, self.config)
+            sobrescritas_anos = {
+                ano: dict({campo: matriz[:, j] for campo, matriz in matrizes.items()}, **sobrescritas)
+                for j, ano in enumerate(anos)
+            }
+
+        if encadeado:
+            if derivadas:
+                raise ValueError("Derivadas não estão disponíveis no cálculo encadeado")
+            resultados = self._calcular_encadeado(carteira, anos, sobrescritas_anos, regras)
+        elif regras is not None:
+            if derivadas:
+                raise ValueError("Derivadas não estão disponíveis no cálculo com regras de vigência")
+            resultados = {ano: self.calcular_periodo(carteira, f"{ano}-01-01", f"{ano + 1}-01-01", regras,
+                                                     sobrescritas_anos[ano])
+                          for ano in anos}
+        elif not derivadas:
+            resultados = {ano: self.calcular_ano(carteira, ano, sobrescritas_anos[ano]) for ano in anos}
+        else:
+            resultados = {}
+            for ano in anos:
+                calculo = self.calcular_derivadas(carteira, ano, derivadas, sobrescritas_anos[ano])
+                resultados[ano] = dict(calculo["valores"], derivadas=calculo["derivadas"], quebras=calculo["quebras"])
+
+        if projecao is not None:
+            for ano, deflator in zip(anos, projecao.deflatores(anos)):
+                resultado = resultados[ano]
+                resultado.update({f"{metrica}_real": resultado[metrica] * deflator
+                                  for metrica in self.METRICAS if metrica != "aliquota_efetiva"})
+                resultado["deflator"] = deflator
+        return resultados
+
+    def _calcular_encadeado(self, carteira, anos, sobrescritas_anos, regras):
+        """Varredura dos anos em ordem, transportando saldos de um ano para o seguinte."""
+        n = len(carteira)
+        transporte = {
+            "creditos_anteriores": np.broadcast_to(
+                np.asarray(sobrescritas_anos[anos[0]].get("creditos_anteriores",
+                                                          carteira.colunas["creditos_anteriores"]),
+                           dtype=float), (n,)),
+            "saldo_credor_icms": np.zeros(n),
+            "icms_diferido_anterior": np.zeros(n)
+        }
+        resultados = {}
+        for ano in anos:
+            sobrescritas_ano = dict(sobrescritas_anos[ano], **transporte)
+            if regras is None:
+                resultado = self.calcular_ano(carteira, ano, sobrescritas_ano)
+            else:
+                resultado = self.calcular_periodo(carteira, f"{ano}-01-01", f"{ano + 1}-01-01", regras, sobrescritas_ano)
+            transporte = {
+                "creditos_anteriores": np.maximum(0, resultado["creditos"] - resultado["imposto_bruto"]),
+                "saldo_credor_icms": np.maximum(0, -resultado["saldo_icms"]),
+                "icms_diferido_anterior": resultado["icms_diferido"]
+            }
+            resultado.update({f"{chave}_transportado": valor for chave, valor in transporte.items()})
+            resultados[ano] = resultado
+        return resultados
+
+    def calcular_periodo(self, carteira, inicio, fim, regras, sobrescritas=None, cache=None):
+        """Calcula o período [inicio, fim) com as regras vigentes em cada data.
+
+        O período é dividido nas mudanças de regra e nas viradas de ano; cada parte é calculada
+        com as regras vigentes no seu início e as métricas são combinadas na proporção dos dias
+        (as entradas da carteira são os totais do período). Sobrescritas explícitas prevalecem
+        sobre as regras.
+        """
+        sobrescritas = sobrescritas or {}
+        segmentos = regras.segmentos(inicio, fim)
+        resultado = {}
+        for inicio_parte, _, peso in segmentos:
+            ano = int(str(inicio_parte.astype("datetime64[Y]")))
+            parte = self.calcular_ano(carteira, ano, dict(regras.sobrescritas(inicio_parte), **sobrescritas), cache)
+            for metrica, valor in parte.items():
+                resultado[metrica] = resultado.get(metrica, 0.0) + peso * valor
+        entradas = self._entradas(carteira, sobrescritas)
+        resultado["aliquota_efetiva"] = _dividir(resultado["total_devido"], entradas["faturamento"])
+        resultado["segmentos"] = segmentos
+        return resultado
+
+    def calcular_aliquotas_equivalentes(self, carteira, carga_atual, anos, sobrescritas=None,
+                                        tolerancia=1e-10, max_iteracoes=100):
+        """Encontra, por empresa e ano, as alíquotas de CBS e IBS que igualam o total devido à carga atual.
+
+        As alíquotas efetivas do setor são multiplicadas por um fator comum (mantendo a proporção
+        entre CBS e IBS) e o fator é resolvido para todas as empresas e anos de uma só vez.
+        """
+        sobrescritas = sobrescritas or {}
+        anos = list(anos)
+        n = len(carteira)
+        entradas = self._entradas(carteira, sobrescritas)
+        valor_atual = np.broadcast_to(entradas["faturamento"] * np.asarray(carga_atual, dtype=float) / 100, (n,))
+
+        def total_devido(escala):
+            total = np.empty(escala.shape)
+            for j, ano in enumerate(anos):
+                resultado = self.calcular_ano(carteira, ano, dict(sobrescritas, escala_iva=escala[j]))
+                total[j] = resultado["total_devido"]
+            return total
+
+        solucao = resolver_raizes(total_devido, np.broadcast_to(valor_atual, (len(anos), n)),
+                                  0.0, 1.0, tolerancia, max_iteracoes)
+
+        resultado = {}
+        for j, ano in enumerate(anos):
+            parametros = self._parametros_iva(carteira, ano, sobrescritas)
+            escala = solucao["valor"][j]
+            aliquota_cbs = escala * np.broadcast_to(parametros["aliquota_cbs"], (n,))
+            aliquota_ibs = escala * np.broadcast_to(parametros["aliquota_ibs"], (n,))
+            resultado[ano] = {
+                "cbs_equivalente": aliquota_cbs,
+                "ibs_equivalente": aliquota_ibs,
+                "total_equivalente": aliquota_cbs + aliquota_ibs,
+                "valor_atual": valor_atual,
+                "base_calculo": entradas["faturamento"] * np.broadcast_to(parametros["fator_base"], (n,)),
+                "fator_escala": escala,
+                "convergiu": solucao["convergiu"][j],
+                "iteracoes": solucao["iteracoes"][j],
+                "residuo": solucao["residuo"][j]
+            }
+        return resultado
+
+    def compilar_linear_por_partes(self, dados_empresa, ano, dominio=None, n_amostras=4096, semente=0,
+                                   sobrescritas=None):
+        """Compila o cálculo do ano, para o setor e o pacote de ICMS da empresa, em ModeloLinearPorPartes.
+
+        A configuração é copiada (o modelo vale para o retrato atual). As regiões são descobertas
+        avaliando amostras do domínio {variável: (mínimo, máximo)}; por padrão, de zero ao dobro do
+        faturamento da empresa, incluindo amostras com entradas nulas e o ponto da própria empresa.
+        """
+        lote = CalculadoraLote(copy.deepcopy(self.config))
+        icms_config = copy.deepcopy(dados_empresa.get("icms_config") or self.config.icms_config)
+        modelo = ModeloLinearPorPartes(lote, dados_empresa.get("setor", "padrao"), icms_config, ano, sobrescritas)
+
+        escala = max(2 * float(dados_empresa.get("faturamento", 0)), 1_000_000.0)
+        dominio = dict(dominio or {})
+        gerador = np.random.default_rng(semente)
+        amostras = np.empty((n_amostras, len(modelo.VARIAVEIS)))
+        for i, variavel in enumerate(modelo.VARIAVEIS):
+            inferior, superior = dominio.get(variavel, (0.0, escala / 2 if variavel == "creditos_anteriores" else escala))
+            amostras[:, i] = gerador.uniform(inferior, superior, n_amostras)
+            if variavel not in dominio or inferior <= 0 <= superior:
+                # Entradas nulas são comuns e ficam sobre fronteiras de várias comparações
+                amostras[gerador.random(n_amostras) < 0.25, i] = 0.0
+
+        modelo.aprender(amostras)
+        modelo.aprender({variavel: dados_empresa.get(variavel, 0.0) for variavel in modelo.VARIAVEIS})
+        return modelo
+
+    def buscar_meta(self, carteira, ano, metrica, alvo, variavel, compensar_com=None, limites=None,
+                    sobrescritas=None, tolerancia=1e-10, max_iteracoes=100):
+        """Encontra, para cada empresa, o valor da variável que leva a métrica do ano ao alvo.
+
+        variavel: coluna de entrada (ex.: "custos_tributaveis") ou percentual de incentivo
+        ("icms_config.incentivos_saida.0.percentual"). Com compensar_com, a soma da variável com
+        essa outra coluna é preservada (ex.: migração de compras do Simples para o regime normal).
+        limites: (inferior, superior) por empresa; por padrão de zero ao faturamento para custos
+        e de 0 a 1 para percentuais.
+        """
+        if metrica not in ("aliquota_efetiva", "total_devido", "imposto_devido"):
+            raise ValueError(f"Métrica não suportada na busca de meta: {metrica}")
+        sobrescritas = dict(sobrescritas or {})
+        n = len(carteira)
+        entradas = self._entradas(carteira, sobrescritas)
+
+        if variavel in carteira.colunas:
+            inferior, superior = 0.0, entradas["faturamento"]
+            if compensar_com is not None:
+                soma = entradas[variavel] + entradas[compensar_com]
+                superior = np.minimum(superior, soma) if variavel == "custos_tributaveis" else soma
+        elif variavel.startswith("icms_config.") and variavel.endswith(".percentual"):
+            inferior, superior = 0.0, 1.0
+        else:
+            raise ValueError(f"Variável não suportada na busca de meta: {variavel}")
+        if limites is not None:
+            inferior, superior = limites
+
+        def avaliar(valores):
+            sobrescritas_busca = dict(sobrescritas)
+            sobrescritas_busca[variavel] = valores
+            if compensar_com is not None:
+                sobrescritas_busca[compensar_com] = soma - valores
+            return self.calcular_ano(carteira, ano, sobrescritas_busca)[metrica]
+
+        solucao = resolver_raizes(avaliar, np.broadcast_to(np.asarray(alvo, dtype=float), (n,)),
+                                  np.broadcast_to(inferior, (n,)), np.broadcast_to(superior, (n,)),
+                                  tolerancia, max_iteracoes, expandir=False)
+        solucao["limites"] = (np.broadcast_to(inferior, (n,)), np.broadcast_to(superior, (n,)))
+        return solucao
+
+    def _valor_parametro(self, caminho, carteira, icms_config):
+        """Valor atual de um parâmetro por caminho (coluna, configuração ou incentivo do ICMS)."""
+        if caminho in carteira.colunas:
+            return carteira.colunas[caminho]
+        if caminho == "escala_iva":
+            return 1.0
+        if caminho.startswith("icms_config."):
+            valor = icms_config
+            for parte in caminho.split(".")[1:]:
+                valor = valor[int(parte)] if isinstance(valor, list) else valor[parte]
+            return float(valor)
+        return resolver_caminho_parametro(caminho, self.config)[1]
+
+    def calcular_derivadas(self, carteira, ano, parametros, sobrescritas=None):
+        """Calcula as métricas do ano e suas derivadas parciais exatas em relação aos parâmetros.
+
+        Retorna "valores" (métrica -> array por empresa), "derivadas" (métrica -> array com um
+        parâmetro por linha e uma empresa por coluna), "parametros" (valor atual por empresa) e
+        "quebras": para cada ramo max/min/comparação, os índices das empresas, a folga até a
+        troca de trecho e a derivada da folga. Dentro do trecho o modelo é linear nas entradas
+        e nas alíquotas, de modo que as derivadas valem para variações finitas.
+        """
+        sobrescritas = sobrescritas or {}
+        parametros = list(parametros)
+        n, k = len(carteira), len(parametros)
+        resultado = {"valores": {}, "derivadas": {}, "quebras": [],
+                     "parametros": {caminho: np.zeros(n) for caminho in parametros}}
+
+        # Cada pacote de ICMS é avaliado separadamente, pois os valores atuais dos
+        # percentuais de incentivo dependem do pacote
+        for _, indices in self.particionar_por_pacote_icms(carteira):
+            subcarteira = carteira.subconjunto(indices) if len(indices) < n else carteira
+            sub_sobrescritas = {caminho: _fatiar_empresas(valor, indices, n) for caminho, valor in sobrescritas.items()}
+            icms_config = carteira.icms_configs[indices[0]] or self.config.icms_config
+            quebras = []
+            for i, caminho in enumerate(parametros):
+                if caminho in sub_sobrescritas:
+                    valor = sub_sobrescritas[caminho]
+                else:
+                    valor = self._valor_parametro(caminho, subcarteira, icms_config)
+                valor = np.atleast_1d(np.asarray(valor, dtype=float))
+                semente = np.zeros((k,) + valor.shape)
+                semente[i] = 1.0
+                sub_sobrescritas[caminho] = _Dual(valor, semente, quebras)
+                resultado["parametros"][caminho][indices] = np.broadcast_to(valor, (len(indices),))
+
+            metricas = self.calcular_ano(subcarteira, ano, sub_sobrescritas)
+            for metrica, valor in metricas.items():
+                valor, derivada, _ = _partes_dual(valor)
+                resultado["valores"].setdefault(metrica, np.zeros(n))[indices] = np.broadcast_to(valor, (len(indices),))
+                resultado["derivadas"].setdefault(metrica, np.zeros((k, n)))[:, indices] = \
+                    np.broadcast_to(derivada, (k, len(indices)))
+
+            for folga, derivada in quebras:
+                resultado["quebras"].append((indices, np.broadcast_to(folga, (len(indices),)),
+                                             np.broadcast_to(derivada, (k, len(indices)))))
+        return resultado
+
+    @staticmethod
+    def faixas_lineares(derivadas):
+        """Variação máxima de cada parâmetro (para baixo e para cima) sem cruzar uma quebra.
+
+        Retorna dois arrays (parâmetro, empresa) com os limites inferior (<= 0) e superior (>= 0).
+        """
+        k, n = next(iter(derivadas["derivadas"].values())).shape
+        inferior = np.full((k, n), -np.inf)
+        superior = np.full((k, n), np.inf)
+        for indices, folga, derivada in derivadas["quebras"]:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                passo = np.where(derivada != 0, -folga / derivada, np.nan)
+            # Folga nula: qualquer variação com derivada não nula troca de trecho
+            superior[:, indices] = np.minimum(superior[:, indices], np.where(passo >= 0, passo, np.inf))
+            inferior[:, indices] = np.maximum(inferior[:, indices], np.where(passo <= 0, passo, -np.inf))
+        return inferior, superior
+
+    def curva_resposta(self, carteira, ano, caminho, inicio, fim, metricas=None, sobrescritas=None, max_pontos=500):
+        """Curva exata, linear por trechos, das métricas de uma empresa com o parâmetro variando de inicio a fim.
+
+        Os pontos são as quebras do modelo (obtidas de faixas_lineares), de modo que a interpolação
+        linear entre pontos consecutivos reproduz o cálculo. Após cada quebra é incluído um ponto
+        imediatamente à direita, que capta eventuais descontinuidades. A alíquota efetiva não é
+        linear no faturamento e deve ser obtida do total devido interpolado.
+        """
+        if len(carteira) != 1:
+            raise ValueError("A curva de resposta é calculada para uma única empresa")
+        if fim < inicio:
+            raise ValueError("O fim do intervalo deve ser maior ou igual ao início")
+        metricas = list(metricas or self.METRICAS)
+        sobrescritas = dict(sobrescritas or {})
+        passo_minimo = 1e-9 * max(1.0, abs(fim - inicio))
+
+        pontos = []
+        valores = {metrica: [] for metrica in metricas}
+        parametro = float(inicio)
+        while True:
+            sobrescritas[caminho] = parametro
+            calculo = self.calcular_derivadas(carteira, ano, [caminho], sobrescritas)
+            pontos.append(parametro)
+            for metrica in metricas:
+                valores[metrica].append(float(calculo["valores"][metrica][0]))
+            if parametro >= fim or len(pontos) >= max_pontos:
+                break
+            # Próxima quebra; sobre uma quebra (folga nula) avança um passo mínimo para a direita
+            _, superior = self.faixas_lineares(calculo)
+            parametro = min(float(fim), parametro + max(float(superior[0, 0]), passo_minimo))
+
+        curva = {metrica: np.asarray(lista) for metrica, lista in valores.items()}
+        curva["pontos"] = np.asarray(pontos)
+        return curva
+
+    def estimar_variacao(self, carteira, variacoes, anos=None, sobrescritas=None, metricas=None):
+        """Estima o efeito de variações de parâmetros a partir das derivadas.
+
+        variacoes: {caminho: variação}, escalar ou por empresa. Empresas em que alguma quebra é
+        cruzada são recalculadas exatamente; as demais usam a aproximação linear, exata dentro
+        do trecho para entradas e alíquotas (o fator de transição e a combinação de variações
+        simultâneas introduzem termos de segunda ordem).
+        """
+        if anos is None:
+            anos = list(self.config.fase_transicao.keys())
+        metricas = list(metricas or ["imposto_devido", "impostos_atuais", "total_devido", "aliquota_efetiva"])
+        sobrescritas = sobrescritas or {}
+        n = len(carteira)
+        caminhos = list(variacoes)
+        deltas = np.stack([np.broadcast_to(np.asarray(variacoes[caminho], dtype=float), (n,)) for caminho in caminhos])
+
+        resultados = {}
+        for ano in anos:
+            base = self.calcular_derivadas(carteira, ano, caminhos, sobrescritas)
+            estimado = {metrica: base["valores"][metrica] + (base["derivadas"][metrica] * deltas).sum(axis=0)
+                        for metrica in metricas + ["total_devido"]}
+            # A alíquota efetiva não é linear no faturamento: é obtida do total estimado
+            faturamento = np.broadcast_to(sobrescritas.get("faturamento", carteira.colunas["faturamento"]), (n,))
+            if "faturamento" in caminhos:
+                faturamento = base["parametros"]["faturamento"] + deltas[caminhos.index("faturamento")]
+            estimado["aliquota_efetiva"] = _dividir(estimado["total_devido"], faturamento)
+
+            cruzou = np.zeros(n, dtype=bool)
+            for indices, folga, derivada in base["quebras"]:
+                nova_folga = folga + (derivada * deltas[:, indices]).sum(axis=0)
+                cruzou[indices] |= np.sign(nova_folga) != np.sign(folga)
+
+            if cruzou.any():
+                indices = np.flatnonzero(cruzou)
+                sub_sobrescritas = {caminho: _fatiar_empresas(valor, indices, n) for caminho, valor in sobrescritas.items()}
+                for i, caminho in enumerate(caminhos):
+                    sub_sobrescritas[caminho] = base["parametros"][caminho][indices] + deltas[i, indices]
+                exato = self.calcular_ano(carteira.subconjunto(indices), ano, sub_sobrescritas)
+                for metrica in metricas:
+                    estimado[metrica][indices] = np.broadcast_to(exato[metrica], (len(indices),))
+
+            estimado["recalculadas"] = cruzou
+            resultados[ano] = estimado
+        return resultados
+
+    def atribuir_economia_icms(self, carteira, sobrescritas=None, **opcoes):
+        """Atribui a economia de ICMS de cada empresa aos seus incentivos.
+
+        Retorna uma lista de (pacote, índices das empresas, atribuição), uma entrada por pacote
+        de incentivos distinto da carteira (ver IncentivosICMSCompilados.atribuir_economia).
+        """
+        sobrescritas = sobrescritas or {}
+        n = len(carteira)
+        entradas = self._entradas(carteira, sobrescritas)
+        faturamento = np.broadcast_to(entradas["faturamento"], (n,))
+        custos = np.broadcast_to(entradas["custos_tributaveis"], (n,))
+        return [(pacote, indices, pacote.atribuir_economia(faturamento[indices], custos[indices], **opcoes))
+                for pacote, indices in self.particionar_por_pacote_icms(carteira)]
+
+    def _das_simples(self, carteira, faturamento):
+        """Parcela do DAS correspondente aos tributos sobre o consumo, pelo anexo do setor."""
+        simples = self.config.simples_nacional
+        das = np.zeros(np.shape(faturamento))
+        setores, inverso = carteira.setores_unicos()
+        for i, setor in enumerate(setores):
+            anexo = simples["anexos"][simples["anexo_setor"].get(setor, simples["anexo_setor"]["padrao"])]
+            faixas = np.asarray(anexo["faixas"], dtype=float)
+            # Receita até o limite da faixa (inclusive) pertence à faixa; acima do teto, última faixa
+            faixa = np.minimum(np.searchsorted(faixas[:, 0], faturamento, side="left"), len(faixas) - 1)
+            valor = np.maximum(0, faturamento * faixas[faixa, 1] - faixas[faixa, 2]) * anexo["parcela_consumo"]
+            das = np.where(inverso == i, valor, das)
+        return das
+
+    def comparar_regimes(self, carteira, anos=None, sobrescritas=None, repasse_credito=1.0):
+        """Compara, por empresa e ano, a permanência no Simples Nacional com o regime normal.
+
+        A carga no Simples é a parcela do DAS relativa aos tributos sobre o consumo mais o custo
+        do crédito que os compradores deixam de aproveitar (vendas_b2b × alíquota do IVA ×
+        (1 - regras_credito["simples"])), do qual repasse_credito é absorvido pela empresa. A carga
+        no regime normal é o total devido calculado pela CalculadoraLote. Arrays retornados têm
+        uma linha por empresa e uma coluna por ano.
+        """
+        sobrescritas = sobrescritas or {}
+        if anos is None:
+            anos = list(self.config.fase_transicao.keys())
+        carteira.validar(self.config)
+
+        n = len(carteira)
+        entradas = self._entradas(carteira, sobrescritas)
+        faturamento = np.broadcast_to(entradas["faturamento"], (n,))
+        vendas_b2b = np.minimum(np.broadcast_to(entradas["vendas_b2b"], (n,)), faturamento)
+        das = self._das_simples(carteira, faturamento)
+        elegivel = faturamento <= self.config.limite_simples
+        credito_simples = self._parametro(sobrescritas, "regras_credito.simples", self.config.regras_credito["simples"])
+
+        carga_normal = np.empty((n, len(anos)))
+        perda_credito = np.empty((n, len(anos)))
+        cache = {}
+        for j, ano in enumerate(anos):
+            carga_normal[:, j] = np.broadcast_to(self.calcular_ano(carteira, ano, sobrescritas, cache)["total_devido"], (n,))
+            parametros = self._parametros_iva(carteira, ano, sobrescritas)
+            aliquota = parametros["aliquota_cbs"] + parametros["aliquota_ibs"]
+            perda_credito[:, j] = np.broadcast_to(aliquota * (1 - credito_simples) * repasse_credito, (n,))
+
+        custo_credito = vendas_b2b[:, None] * perda_credito
+        carga_simples = np.where(elegivel[:, None], das[:, None] + custo_credito, np.inf)
+        simples_otimo = carga_simples < carga_normal
+        carga_otima = np.minimum(carga_normal, carga_simples)
+        carga_atual = np.where((carteira.regimes == "simples")[:, None], carga_simples, carga_normal)
+
+        # Anos em que o regime ótimo muda em relação ao ano anterior
+        trocas = np.zeros((n, len(anos)), dtype=bool)
+        trocas[:, 1:] = simples_otimo[:, 1:] != simples_otimo[:, :-1]
+
+        # Vendas a contribuintes do regime normal a partir das quais o Simples deixa de compensar
+        folga = carga_normal - das[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            indiferenca = np.where(perda_credito > 0, np.maximum(0, folga) / perda_credito,
+                                   np.where(folga > 0, np.inf, 0.0))
+        indiferenca = np.where(elegivel[:, None], indiferenca, np.nan)
+
+        return {
+            "anos": list(anos),
+            "elegivel": elegivel,
+            "das": das,
+            "carga_normal": carga_normal,
+            "carga_simples": carga_simples,
+            "custo_credito_compradores": custo_credito,
+            "regime_otimo": np.where(simples_otimo, "simples", "normal"),
+            "carga_otima": carga_otima,
+            "economia": carga_atual - carga_otima,
+            "trocas": trocas,
+            "vendas_b2b_indiferenca": indiferenca
+        }
+
+    @staticmethod
+    def empilhar(resultados, metrica):
+        """Empilha uma métrica dos resultados por ano em um array com os anos no último eixo."""
+        return np.stack([resultados[ano][metrica] for ano in resultados], axis=-1)
+
+
+class ModeloLinearPorPartes:
+    """Modelo compilado: regiões das entradas da empresa e coeficientes afins de cada métrica.
+
+    Com a configuração, o setor e o pacote de ICMS fixos, todo o cálculo do ano é uma composição
+    de funções afins das entradas com max, min e comparações. Cada comparação define um
+    hiperplano (folga afim); uma região é um padrão de sinais dessas folgas e, dentro dela,
+    todas as métricas são afins. Como a folga de cada comparação é afim enquanto as anteriores
+    mantêm o sinal, um ponto pertence à região se e somente se reproduz o seu padrão de sinais,
+    o que torna a avaliação exata. Pelo mesmo motivo, o hiperplano de cada comparação depende
+    apenas dos sinais das anteriores: as regiões ficam numa árvore indexada por esses sinais e
+    localizar um lote de pontos custa uma folga vetorizada por comparação, independentemente
+    do número de regiões. Pontos fora das regiões conhecidas (ou sobre uma fronteira) são
+    calculados pelo motor e a sua região é aprendida.
+    """
+
+    VARIAVEIS = ["faturamento", "custos_tributaveis", "custos_simples", "custos_rurais",
+                 "custos_importacoes", "creditos_anteriores"]
+    ROTULOS_VARIAVEIS = {"faturamento": "Faturamento", "custos_tributaveis": "Custos Tributáveis",
+                         "custos_simples": "Custos do Simples", "custos_rurais": "Custos Rurais",
+                         "custos_importacoes": "Custos de Importações", "creditos_anteriores": "Créditos Anteriores"}
+    TOLERANCIA = 1e-9
+
+    def __init__(self, calculadora_lote, setor, icms_config, ano, sobrescritas=None):
+        self.lote = calculadora_lote
+        self.setor = setor
+        self.icms_config = icms_config
+        self.ano = ano
+        self.sobrescritas = dict(sobrescritas or {})
+        self.metricas = [metrica for metrica in calculadora_lote.METRICAS if metrica != "aliquota_efetiva"]
+        v, m = len(self.VARIAVEIS), len(self.metricas)
+        self.sinais = None  # (regiões, hiperplanos): -1, 0 ou +1
+        self.normais = None  # (regiões, hiperplanos, variáveis)
+        self.deslocamentos = None  # (regiões, hiperplanos)
+        self.coeficientes = np.zeros((0, m, v))
+        self.constantes = np.zeros((0, m))
+        self._regioes = {}
+        # Árvore de sinais: o nó 0 é o destino dos ramos desconhecidos e o nó 1 é a raiz
+        self._planos_nos = [np.zeros(v + 1), np.zeros(v + 1)]
+        self._filhos_nos = [[0, 0, 0], [0, 0, 0]]
+        self._regioes_nos = [-1, -1]
+        self._profundidades_nos = [-1, 0]
+        self._compilar_arvore()
+
+    def __len__(self):
+        return len(self.coeficientes)
+
+    def _matriz(self, entradas):
+        """Matriz (pontos, variáveis) a partir de um dicionário de entradas (escalares ou arrays)."""
+        if isinstance(entradas, np.ndarray):
+            return np.atleast_2d(entradas).astype(float)
+        colunas = np.broadcast_arrays(*[np.atleast_1d(np.asarray(entradas.get(variavel, 0.0), dtype=float))
+                                        for variavel in self.VARIAVEIS])
+        return np.stack(colunas, axis=-1)
+
+    def aprender(self, pontos):
+        """Calcula os pontos com o motor, registra as regiões novas e retorna a região de cada ponto."""
+        pontos = self._matriz(pontos)
+        n = len(pontos)
+        carteira = CarteiraEmpresas({variavel: pontos[:, i] for i, variavel in enumerate(self.VARIAVEIS)},
+                                    [self.setor] * n, icms_configs=[self.icms_config] * n)
+        calculo = self.lote.calcular_derivadas(carteira, self.ano, self.VARIAVEIS, self.sobrescritas)
+
+        # Hiperplanos: folga(x) = normal · x + deslocamento
+        normais = np.stack([derivada.T for _, _, derivada in calculo["quebras"]], axis=1) if calculo["quebras"] \
+            else np.zeros((n, 0, len(self.VARIAVEIS)))
+        folgas = np.stack([folga for _, folga, _ in calculo["quebras"]], axis=1) if calculo["quebras"] else np.zeros((n, 0))
+        deslocamentos = folgas - np.einsum("nbv,nv->nb", normais, pontos)
+        escala = 1.0 + np.abs(folgas) + np.abs(normais * pontos[:, None, :]).sum(axis=2)
+        sinais = np.where(np.abs(folgas) <= self.TOLERANCIA * escala, 0, np.sign(folgas)).astype(np.int8)
+
+        coeficientes = np.stack([calculo["derivadas"][metrica].T for metrica in self.metricas], axis=1)
+        valores = np.stack([calculo["valores"][metrica] for metrica in self.metricas], axis=1)
+        constantes = valores - np.einsum("nmv,nv->nm", coeficientes, pontos)
+
+        if self.sinais is None:
+            self.sinais = np.zeros((0, sinais.shape[1]), dtype=np.int8)
+            self.normais = np.zeros((0,) + normais.shape[1:])
+            self.deslocamentos = np.zeros((0, sinais.shape[1]))
+
+        regioes = np.full(n, -1)
+        novas = []
+        for j in range(n):
+            chave = sinais[j].tobytes()
+            if chave not in self._regioes:
+                self._regioes[chave] = len(self) + len(novas)
+                novas.append(j)
+            regioes[j] = self._regioes[chave]
+        if novas:
+            self.sinais = np.vstack([self.sinais, sinais[novas]])
+            self.normais = np.concatenate([self.normais, normais[novas]])
+            self.deslocamentos = np.vstack([self.deslocamentos, deslocamentos[novas]])
+            self.coeficientes = np.concatenate([self.coeficientes, coeficientes[novas]])
+            self.constantes = np.vstack([self.constantes, constantes[novas]])
+            for regiao in range(len(self) - len(novas), len(self)):
+                self._inserir_na_arvore(regiao)
+            self._compilar_arvore()
+        return regioes
+
+    def _inserir_na_arvore(self, regiao):
+        """Acrescenta o caminho de sinais da região à árvore, criando os nós que faltam."""
+        no = 1
+        for k, sinal in enumerate(self.sinais[regiao]):
+            if self._filhos_nos[no] == [0, 0, 0]:
+                # Nó novo: o hiperplano é o mesmo para todas as regiões que passam por ele
+                self._planos_nos[no] = np.append(self.normais[regiao, k], self.deslocamentos[regiao, k])
+            if not self._filhos_nos[no][sinal + 1]:
+                self._filhos_nos[no][sinal + 1] = len(self._filhos_nos)
+                self._planos_nos.append(np.zeros(len(self.VARIAVEIS) + 1))
+                self._filhos_nos.append([0, 0, 0])
+                self._regioes_nos.append(-1)
+                self._profundidades_nos.append(k + 1)
+            no = self._filhos_nos[no][sinal + 1]
+        self._regioes_nos[no] = regiao
+
+    def _compilar_arvore(self):
+        """Arrays da árvore de sinais usados na localização vetorizada."""
+        self._arvore_planos = np.array(self._planos_nos)
+        self._arvore_filhos = np.array(self._filhos_nos, dtype=np.int64)
+        self._arvore_regioes = np.array(self._regioes_nos, dtype=np.int64)
+        # Níveis em que todos os nós comparam o mesmo hiperplano dispensam a busca por ponto
+        profundidades = np.array(self._profundidades_nos)
+        self._arvore_niveis = []
+        for nivel in range(self.sinais.shape[1] if self.sinais is not None else 0):
+            planos = self._arvore_planos[profundidades == nivel]
+            self._arvore_niveis.append(planos[0] if (planos == planos[0]).all() else None)
+
+    def localizar(self, pontos):
+        """Região de cada ponto (-1 se nenhuma região conhecida reproduz o seu padrão de sinais)."""
+        pontos = self._matriz(pontos)
+        if not len(self):
+            return np.full(len(pontos), -1)
+        absolutos = np.abs(pontos)
+        nos = np.ones(len(pontos), dtype=np.int64)
+        for plano in self._arvore_niveis:
+            if plano is None:
+                planos = self._arvore_planos[nos]
+                folgas = np.einsum("nv,nv->n", pontos, planos[:, :-1]) + planos[:, -1]
+                escala = np.einsum("nv,nv->n", absolutos, np.abs(planos[:, :-1]))
+            else:
+                folgas = pontos @ plano[:-1] + plano[-1]
+                escala = absolutos @ np.abs(plano[:-1])
+            limite = self.TOLERANCIA * (1.0 + np.abs(folgas) + escala)
+            # Filho 0, 1 ou 2 para folga negativa, nula (dentro da tolerância) ou positiva
+            nos = self._arvore_filhos[nos, 1 + (folgas > limite).view(np.int8) - (folgas < -limite).view(np.int8)]
+        return self._arvore_regioes[nos]
+
+    def avaliar(self, entradas, aprender=True):
+        """Avalia as métricas pelos coeficientes da região de cada ponto (exato)."""
+        pontos = self._matriz(entradas)
+        regioes = self.localizar(pontos)
+        faltantes = np.flatnonzero(regioes < 0)
+        if len(faltantes) and aprender:
+            regioes[faltantes] = self.aprender(pontos[faltantes])
+        elif len(faltantes):
+            raise ValueError(f"{len(faltantes)} ponto(s) fora das regiões compiladas")
+
+        valores = np.einsum("nmv,nv->nm", self.coeficientes[regioes], pontos) + self.constantes[regioes]
+        resultado = {metrica: valores[:, i] for i, metrica in enumerate(self.metricas)}
+        resultado["aliquota_efetiva"] = _dividir(resultado["total_devido"], pontos[:, 0])
+        resultado["regiao"] = regioes
+        return resultado
+
+    def inverter(self, metrica, alvo, entradas, variavel, compensar_com=None, limites=None, max_passos=1000):
+        """Resolve exatamente o valor da variável que leva a métrica ao alvo.
+
+        A variável percorre a reta x0 + t·(e_variavel - e_compensar_com) dentro dos limites (por
+        padrão, de zero a dez vezes a maior entrada da empresa), região a região: em cada uma a
+        métrica é afim em t e a saída da região é dada pelos seus hiperplanos, de modo que a raiz
+        é obtida em forma fechada. Retorna a menor solução de cada ponto.
+        """
+        pontos = self._matriz(entradas)
+        n = len(pontos)
+        alvo = np.broadcast_to(np.asarray(alvo, dtype=float), (n,))
+        coluna = self.VARIAVEIS.index(variavel)
+        direcao = np.zeros(len(self.VARIAVEIS))
+        direcao[coluna] = 1.0
+        if compensar_com is not None:
+            direcao[self.VARIAVEIS.index(compensar_com)] = -1.0
+        if limites is None:
+            limites = (0.0, 10 * np.maximum(np.abs(pontos).max(axis=1), 1.0))
+        inferior = np.broadcast_to(np.asarray(limites[0], dtype=float), (n,))
+        superior = np.broadcast_to(np.asarray(limites[1], dtype=float), (n,))
+        if np.any(superior < inferior):
+            raise ValueError("O limite superior deve ser maior ou igual ao inferior")
+
+        indice = self.metricas.index("total_devido" if metrica == "aliquota_efetiva" else metrica)
+        # total - alvo·faturamento = 0 também é afim
+        ajuste = np.zeros((n, len(self.VARIAVEIS)))
+        deslocamento_alvo = np.array(alvo)
+        if metrica == "aliquota_efetiva":
+            ajuste[:, 0] = alvo
+            deslocamento_alvo = np.zeros(n)
+        t = inferior - pontos[:, coluna]
+        fim = superior - pontos[:, coluna]
+        passo_minimo = 1e-9 * np.maximum(1.0, fim - t)
+        tolerancia = self.TOLERANCIA * (1.0 + np.abs(alvo))
+
+        # Todos os pontos avançam juntos, cada um na sua região, até encontrarem a raiz
+        valor = np.full(n, np.nan)
+        regiao_solucao = np.full(n, -1)
+        ativos = np.arange(n)
+        for _ in range(max_passos):
+            if not len(ativos):
+                break
+            x = pontos[ativos] + t[ativos, None] * direcao
+            r = self.localizar(x)
+            faltantes = r < 0
+            if faltantes.any():
+                r[faltantes] = self.aprender(x[faltantes])
+            coeficientes = self.coeficientes[r, indice] - ajuste[ativos]
+            residuo = np.einsum("nv,nv->n", coeficientes, x) + self.constantes[r, indice] - deslocamento_alvo[ativos]
+            inclinacao = coeficientes @ direcao
+
+            # Distância ao longo da reta até a saída da região
+            folgas = np.einsum("nbv,nv->nb", self.normais[r], x) + self.deslocamentos[r]
+            taxas = self.normais[r] @ direcao
+            sinais = self.sinais[r]
+            saindo = (sinais != 0) & (sinais * taxas < 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                distancias = np.where(saindo, -folgas / taxas, np.inf)
+                passo = np.where(inclinacao != 0, -residuo / inclinacao, np.nan)
+            alcance = np.minimum(fim[ativos] - t[ativos], distancias.min(axis=1, initial=np.inf))
+            alcance[np.any((sinais == 0) & (taxas != 0), axis=1)] = 0.0
+
+            raiz = (passo >= 0) & (passo <= alcance + passo_minimo[ativos])
+            nulo = ~raiz & (np.abs(residuo) <= tolerancia[ativos])
+            resolvidos = raiz | nulo
+            valor[ativos[resolvidos]] = (pontos[ativos, coluna] + t[ativos] + np.where(raiz, passo, 0.0))[resolvidos]
+            regiao_solucao[ativos[resolvidos]] = r[resolvidos]
+
+            continuar = ~resolvidos & (t[ativos] < fim[ativos])
+            # Sobre uma fronteira (alcance nulo) avança um passo mínimo
+            proximos = ativos[continuar]
+            t[proximos] = np.minimum(fim[proximos], t[proximos] + np.maximum(alcance[continuar], passo_minimo[proximos]))
+            ativos = proximos
+
+        encontrou = np.isfinite(valor)
+        residuo = np.full(n, np.nan)
+        if encontrou.any():
+            x = pontos[encontrou] + np.outer(valor[encontrou] - pontos[encontrou, coluna], direcao)
+            residuo[encontrou] = self.avaliar(x)[metrica] - alvo[encontrou]
+        return {"valor": valor, "convergiu": encontrou, "residuo": residuo, "regiao": regiao_solucao}
+
+    def _formula(self, coeficientes, constante, monetario=True):
+        """Texto de uma expressão afim das entradas."""
+        termos = [f"{formatar_br(c, 4)} × {self.ROTULOS_VARIAVEIS[v]}"
+                  for c, v in zip(coeficientes, self.VARIAVEIS) if abs(c) > 1e-12]
+        if abs(constante) > 1e-6 or not termos:
+            termos.append(f"R$ {formatar_br(constante)}" if monetario else formatar_br(constante, 4))
+        texto = " + ".join(termos).replace("+ -", "− ")
+        return "−" + texto[1:] if texto.startswith("-") else texto
+
+    def explicar(self, regiao, metricas=("base_tributavel", "imposto_devido", "ICMS", "impostos_atuais", "total_devido")):
+        """Linhas da memória de cálculo que descrevem a região: fórmulas afins e condições ativas."""
+        linhas = [f"Região {regiao + 1} de {len(self)} conhecidas no ano {self.ano}.",
+                  "Nesta região, cada valor é uma função afim das entradas da empresa:"]
+        for metrica in metricas:
+            i = self.metricas.index(metrica)
+            linhas.append(f"  {metrica} = {self._formula(self.coeficientes[regiao, i], self.constantes[regiao, i])}")
+
+        linhas.append("Condições que delimitam a região:")
+        vistas = set()
+        simbolos = {1: ">", -1: "<", 0: "="}
+        for normal, deslocamento, sinal in zip(self.normais[regiao], self.deslocamentos[regiao], self.sinais[regiao]):
+            if not np.any(np.abs(normal) > 1e-12):
+                continue
+            # Hiperplanos repetidos (mesma condição avaliada em mais de um estágio) aparecem uma vez
+            norma = np.abs(normal).max()
+            chave = (tuple(np.round(normal / norma, 9)), round(deslocamento / norma, 6), int(sinal))
+            if chave in vistas:
+                continue
+            vistas.add(chave)
+            linhas.append(f"  {self._formula(normal, deslocamento)} {simbolos[int(sinal)]} 0")
+        return linhas
+
+    def memoria(self, entradas):
+        """Explicação da região em que se encontra uma empresa (entradas escalares)."""
+        regiao = int(self.avaliar(entradas)["regiao"][0])
+        return self.explicar(regiao)
+
+
+class RegrasVigencia:
+    """Parâmetros com vigência a partir de datas, indexados por intervalo.
+
+    Cada caminho (ex.: "fase_transicao", "creditos_cruzados.IBS_para_ICMS",
+    "aliquotas_base.CBS") guarda as datas de início em ordem e o valor vigente a partir de
+    cada uma; o valor em uma data é obtido por busca binária. Caminhos cujo dicionário da
+    configuração é indexado por ano recebem o ano ao serem convertidos em sobrescritas do
+    motor (ex.: "fase_transicao" vira "fase_transicao.2027"). Da redução dos impostos na
+    transição, somente a do ICMS é lida pelo motor, como base do multiplicador dos incentivos
+    quando o cronograma de incentivos está ativo.
+    """
+
+    CAMINHOS_ANUAIS = ("fase_transicao", "creditos_cruzados", "reducao_impostos_transicao")
+
+    def __init__(self):
+        self._inicios = {}
+        self._valores = {}
+
+    @classmethod
+    def de_configuracao(cls, config):
+        """Regras equivalentes aos cronogramas anuais da configuração (vigência em 1º de janeiro)."""
+        regras = cls()
+        for ano, valor in config.fase_transicao.items():
+            regras.adicionar("fase_transicao", f"{ano}-01-01", valor)
+        anos = sorted(set(config.fase_transicao) | set(config.creditos_cruzados))
+        for ano in anos:
+            # Anos sem créditos cruzados encerram a regra do ano anterior
+            percentual = config.creditos_cruzados.get(ano, {}).get("IBS_para_ICMS", 0.0)
+            regras.adicionar("creditos_cruzados.IBS_para_ICMS", f"{ano}-01-01", percentual)
+        for ano, reducoes in config.reducao_impostos_transicao.items():
+            if "ICMS" in reducoes:
+                regras.adicionar("reducao_impostos_transicao.ICMS", f"{ano}-01-01", reducoes["ICMS"])
+        return regras
+
+    def caminhos(self):
+        return list(self._inicios)
+
+    def adicionar(self, caminho, inicio, valor):
+        """Inclui (ou substitui) o valor vigente a partir da data de início."""
+        inicio = np.datetime64(inicio, "D")
+        inicios = self._inicios.get(caminho, np.array([], dtype="datetime64[D]"))
+        valores = self._valores.get(caminho, [])
+        posicao = int(np.searchsorted(inicios, inicio))
+        if posicao < len(inicios) and inicios[posicao] == inicio:
+            valores[posicao] = valor
+        else:
+            inicios = np.insert(inicios, posicao, inicio)
+            valores.insert(posicao, valor)
+        self._inicios[caminho] = inicios
+        self._valores[caminho] = valores
+
+    def remover(self, caminho, inicio):
+        """Remove a regra do caminho iniciada na data informada."""
+        inicio = np.datetime64(inicio, "D")
+        inicios = self._inicios.get(caminho, np.array([], dtype="datetime64[D]"))
+        posicao = int(np.searchsorted(inicios, inicio))
+        if posicao == len(inicios) or inicios[posicao] != inicio:
+            raise ValueError(f"Não há regra de {caminho} com início em {inicio}")
+        self._inicios[caminho] = np.delete(inicios, posicao)
+        del self._valores[caminho][posicao]
+
+    def valor(self, caminho, data, padrao=None):
+        """Valor vigente na data (padrao, ou erro se não informado, antes da primeira vigência)."""
+        if caminho not in self._inicios:
+            raise ValueError(f"Parâmetro sem regras de vigência: {caminho}")
+        posicao = int(np.searchsorted(self._inicios[caminho], np.datetime64(data, "D"), side="right")) - 1
+        if posicao < 0:
+            if padrao is None:
+                raise ValueError(f"Não há regra de {caminho} vigente em {np.datetime64(data, 'D')}")
+            return padrao
+        return self._valores[caminho][posicao]
+
+    def mudancas(self, inicio, fim, caminhos=None):
+        """Datas, dentro de (inicio, fim), em que alguma regra muda de valor."""
+        inicio, fim = np.datetime64(inicio, "D"), np.datetime64(fim, "D")
+        datas = []
+        for caminho in caminhos or self._inicios:
+            inicios = self._inicios[caminho]
+            datas.append(inicios[np.searchsorted(inicios, inicio, side="right"):np.searchsorted(inicios, fim)])
+        return np.unique(np.concatenate(datas)) if datas else np.array([], dtype="datetime64[D]")
+
+    def segmentos(self, inicio, fim, caminhos=None):
+        """Divide [inicio, fim) nas mudanças de regra e de ano; retorna (início, fim, peso em dias) de cada parte."""
+        inicio, fim = np.datetime64(inicio, "D"), np.datetime64(fim, "D")
+        if fim <= inicio:
+            raise ValueError("O fim do período deve ser posterior ao início")
+        anos = np.arange(inicio.astype("datetime64[Y]") + 1, fim.astype("datetime64[Y]") + 1).astype("datetime64[D]")
+        cortes = np.unique(np.concatenate([[inicio], self.mudancas(inicio, fim, caminhos), anos[anos < fim], [fim]]))
+        total = (fim - inicio).astype(int)
+        return [(a, b, (b - a).astype(int) / total) for a, b in zip(cortes[:-1], cortes[1:])]
+
+    def sobrescritas(self, data):
+        """Sobrescritas do motor para as regras vigentes na data."""
+        data = np.datetime64(data, "D")
+        ano = int(str(data.astype("datetime64[Y]")))
+        sobrescritas = {}
+        for caminho, inicios in self._inicios.items():
+            posicao = int(np.searchsorted(inicios, data, side="right")) - 1
+            if posicao < 0:
+                continue
+            partes = caminho.split(".")
+            if partes[0] in self.CAMINHOS_ANUAIS:
+                partes.insert(1, str(ano))
+            sobrescritas[".".join(partes)] = self._valores[caminho][posicao]
+        return sobrescritas
+
+
+class LivroCreditos:
+    """Livro de eventos de crédito (somente inclusão), com consultas de saldo por período.
+
+    Cada evento tem período (ano * 12 + mês - 1), empresa, tributo, tipo e valor. Os saldos
+    derivam dos eventos: geração aumenta o crédito disponível, compensação o reduz, o pedido
+    de ressarcimento o transfere para "em ressarcimento" e o pagamento baixa esse valor. Os
+    eventos ficam em arrays que dobram de capacidade, e os saldos de vários períodos e de todas
+    as empresas são obtidos de uma só vez por contagem ponderada e soma acumulada.
+    """
+
+    TIPOS = ["geracao", "compensacao", "pedido_ressarcimento", "ressarcimento_pago"]
+    TRIBUTOS = ["IVA", "ICMS"]
+    # Efeito de cada tipo sobre (disponível, em ressarcimento)
+    EFEITOS = np.array([[1.0, 0.0], [-1.0, 0.0], [-1.0, 1.0], [0.0, -1.0]])
+
+    def __init__(self, n_empresas, capacidade=1024):
+        self.n_empresas = n_empresas
+        self._tamanho = 0
+        self._colunas = {
+            "periodo": np.empty(capacidade, dtype=np.int64),
+            "origem": np.empty(capacidade, dtype=np.int64),
+            "empresa": np.empty(capacidade, dtype=np.int64),
+            "tributo": np.empty(capacidade, dtype=np.int8),
+            "tipo": np.empty(capacidade, dtype=np.int8),
+            "valor": np.empty(capacidade)
+        }
+
+    def __len__(self):
+        return self._tamanho
+
+    @staticmethod
+    def periodo(ano, mes):
+        """Índice do período mensal."""
+        return ano * 12 + mes - 1
+
+    @staticmethod
+    def ano_mes(periodo):
+        """Ano e mês de um índice de período."""
+        return periodo // 12, periodo % 12 + 1
+
+    def registrar(self, periodo, tipo, valor, empresas=None, tributo="IVA", origem=None):
+        """Inclui um evento por empresa; valores nulos são ignorados.
+
+        valor: escalar ou array alinhado com empresas (por padrão, todas as empresas da carteira).
+        origem: período que originou o evento (o do pedido, para pagamentos de ressarcimento).
+        """
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de evento desconhecido: {tipo}")
+        if tributo not in self.TRIBUTOS:
+            raise ValueError(f"Tributo desconhecido: {tributo}")
+        empresas = np.arange(self.n_empresas) if empresas is None else np.atleast_1d(np.asarray(empresas))
+        valor = np.broadcast_to(np.asarray(valor, dtype=float), empresas.shape)
+        if np.any(valor < 0):
+            raise ValueError("Os valores dos eventos de crédito devem ser não negativos")
+        mascara = valor > 0
+        empresas, valor = empresas[mascara], valor[mascara]
+        k = len(valor)
+        if not k:
+            return
+
+        capacidade = len(self._colunas["valor"])
+        if self._tamanho + k > capacidade:
+            nova = max(2 * capacidade, self._tamanho + k)
+            for nome, coluna in self._colunas.items():
+                ampliada = np.empty(nova, dtype=coluna.dtype)
+                ampliada[:self._tamanho] = coluna[:self._tamanho]
+                self._colunas[nome] = ampliada
+
+        fatia = slice(self._tamanho, self._tamanho + k)
+        self._colunas["periodo"][fatia] = periodo
+        self._colunas["origem"][fatia] = periodo if origem is None else origem
+        self._colunas["empresa"][fatia] = empresas
+        self._colunas["tributo"][fatia] = self.TRIBUTOS.index(tributo)
+        self._colunas["tipo"][fatia] = self.TIPOS.index(tipo)
+        self._colunas["valor"][fatia] = valor
+        self._tamanho += k
+
+    def eventos(self):
+        """Colunas dos eventos registrados (visões somente leitura)."""
+        eventos = {}
+        for nome, coluna in self._colunas.items():
+            visao = coluna[:self._tamanho].view()
+            visao.flags.writeable = False
+            eventos[nome] = visao
+        return eventos
+
+    def saldos(self, periodos, tributo=None):
+        """Saldos ao fim de cada período informado, com forma (períodos, empresas).
+
+        Retorna "disponivel" (crédito a compensar), "em_ressarcimento" (pedido e ainda não pago)
+        e "imobilizado" (soma dos dois), somando os tributos quando tributo é None.
+        """
+        periodos = np.atleast_1d(np.asarray(periodos, dtype=np.int64))
+        ordem = np.argsort(periodos, kind="stable")
+        eventos = self.eventos()
+        mascara = np.ones(len(self), dtype=bool) if tributo is None else \
+            eventos["tributo"] == self.TRIBUTOS.index(tributo)
+
+        # Cada evento conta a partir do primeiro período consultado que não o antecede
+        faixa = np.searchsorted(periodos[ordem], eventos["periodo"][mascara], side="left")
+        indice = faixa * self.n_empresas + eventos["empresa"][mascara]
+        tamanho = (len(periodos) + 1) * self.n_empresas
+        resultado = {}
+        for j, nome in enumerate(["disponivel", "em_ressarcimento"]):
+            pesos = eventos["valor"][mascara] * self.EFEITOS[eventos["tipo"][mascara], j]
+            acumulado = np.cumsum(np.bincount(indice, weights=pesos, minlength=tamanho)
+                                  .reshape(len(periodos) + 1, self.n_empresas)[:-1], axis=0, dtype=float)
+            resultado[nome] = np.empty_like(acumulado)
+            resultado[nome][ordem] = acumulado
+        resultado["imobilizado"] = resultado["disponivel"] + resultado["em_ressarcimento"]
+        return resultado
+
+    def prazo_medio_ressarcimento(self):
+        """Prazo médio (meses) entre pedido e pagamento dos ressarcimentos de cada empresa, ponderado pelo valor."""
+        eventos = self.eventos()
+        pagos = eventos["tipo"] == self.TIPOS.index("ressarcimento_pago")
+        valor = eventos["valor"][pagos]
+        prazo = (eventos["periodo"][pagos] - eventos["origem"][pagos]) * valor
+        total = np.bincount(eventos["empresa"][pagos], weights=valor, minlength=self.n_empresas)
+        return _dividir(np.bincount(eventos["empresa"][pagos], weights=prazo, minlength=self.n_empresas), total)
+
+
+class ApuracaoMensal:
+    """Apuração mensal do IVA Dual e do ICMS com transporte dos saldos credores.
+
+    Cada mês é calculado para a carteira inteira com os parâmetros do seu ano; o crédito de
+    IVA não utilizado (créditos acima do imposto bruto) passa a ser crédito anterior do mês
+    seguinte e o saldo credor do ICMS é abatido da apuração seguinte. Os períodos são
+    produzidos por um gerador, de modo que a memória não cresce com o número de meses.
+    """
+
+    CAMPOS_MENSAIS = ["faturamento", "custos_tributaveis", "custos_simples", "custos_rurais", "custos_importacoes"]
+    METRICAS = ["cbs", "ibs", "imposto_bruto", "creditos", "imposto_devido", "PIS", "COFINS", "ICMS", "ISS",
+                "IPI", "credito_cruzado", "impostos_atuais", "total_devido"]
+    # Campos de estoque dos períodos (posição no fim do mês, não somados entre meses)
+    SALDOS = ["saldo_credor_iva_inicial", "saldo_credor_icms_inicial", "saldo_credor_iva", "saldo_credor_icms",
+              "em_ressarcimento", "credito_imobilizado"]
+
+    def __init__(self, calculadora_lote):
+        self.lote = calculadora_lote
+
+    @staticmethod
+    def serie_sazonal(valores_anuais, pesos, anos):
+        """Série mensal (meses, empresas) que distribui valores anuais pelos pesos dos 12 meses."""
+        pesos = np.asarray(pesos, dtype=float)
+        if pesos.shape != (12,) or np.any(pesos < 0) or pesos.sum() <= 0:
+            raise ValueError("Informe 12 pesos mensais não negativos com soma positiva")
+        valores_anuais = np.atleast_1d(np.asarray(valores_anuais, dtype=float))
+        return np.concatenate([np.outer(pesos / pesos.sum(), valores_anuais) for _ in anos])
+
+    def periodos(self, carteira, series, ano_inicial, mes_inicial=1, sobrescritas=None, livro=None,
+                 ressarcimento=0.0, prazo_ressarcimento=0, regras=None):
+        """Gera a apuração de cada mês a partir das séries mensais.
+
+        series: {campo: array (meses, empresas)} ou um iterável com um dicionário {campo: valor}
+        por mês. Campos ausentes usam o valor anual da carteira dividido por 12. O crédito
+        anterior da carteira é o saldo de abertura do primeiro mês.
+        ressarcimento: fração do saldo credor do IVA no fim de cada mês objeto de pedido de
+        ressarcimento, pago prazo_ressarcimento meses depois. livro: LivroCreditos que recebe
+        os eventos de geração, compensação, pedido e pagamento. regras: RegrasVigencia opcional;
+        meses com mudança de regra são divididos proporcionalmente aos dias.
+        """
+        if not 1 <= mes_inicial <= 12:
+            raise ValueError("O mês inicial deve estar entre 1 e 12")
+        if not 0 <= ressarcimento <= 1 or prazo_ressarcimento < 0:
+            raise ValueError("O ressarcimento deve estar entre 0 e 1 e o prazo não pode ser negativo")
+        sobrescritas = dict(sobrescritas or {})
+        carteira.validar(self.lote.config)
+        n = len(carteira)
+        if isinstance(series, dict):
+            meses = {len(np.atleast_2d(valor)) for valor in series.values()}
+            if len(meses) > 1:
+                raise ValueError("As séries mensais devem ter o mesmo número de meses")
+            matrizes = {campo: np.atleast_2d(valor) for campo, valor in series.items()}
+            series = ({campo: valor[i] for campo, valor in matrizes.items()} for i in range(meses.pop() if meses else 0))
+
+        saldo_iva = np.asarray(carteira.colunas["creditos_anteriores"], dtype=float)
+        saldo_icms = np.zeros(n)
+        # Pagamentos de ressarcimento agendados, por mês à frente (fila circular)
+        agendados = np.zeros((prazo_ressarcimento + 1, n))
+        em_ressarcimento = np.zeros(n)
+        ano, mes = ano_inicial, mes_inicial
+        if livro is not None:
+            livro.registrar(LivroCreditos.periodo(ano, mes), "geracao", saldo_iva)
+        for indice_mes, valores_mes in enumerate(series):
+            desconhecidos = set(valores_mes) - set(self.CAMPOS_MENSAIS)
+            if desconhecidos:
+                raise ValueError(f"Campos mensais desconhecidos: {', '.join(sorted(desconhecidos))}")
+            sobrescritas_mes = dict(sobrescritas, creditos_anteriores=saldo_iva, saldo_credor_icms=saldo_icms)
+            for campo in self.CAMPOS_MENSAIS:
+                valor = valores_mes.get(campo, carteira.colunas[campo] / 12)
+                sobrescritas_mes[campo] = np.broadcast_to(np.asarray(valor, dtype=float), (n,))
+
+            if regras is None:
+                resultado = self.lote.calcular_ano(carteira, ano, sobrescritas_mes)
+            else:
+                fim = f"{ano + mes // 12}-{mes % 12 + 1:02d}-01"
+                resultado = self.lote.calcular_periodo(carteira, f"{ano}-{mes:02d}-01", fim, regras, sobrescritas_mes)
+            periodo = {"ano": ano, "mes": mes, "faturamento": sobrescritas_mes["faturamento"],
+                       "credito_iva_utilizado": resultado["creditos"] - np.maximum(0, resultado["creditos"] -
+                                                                                   resultado["imposto_bruto"]),
+                       "saldo_credor_iva_inicial": saldo_iva, "saldo_credor_icms_inicial": saldo_icms}
+            periodo.update({metrica: resultado[metrica] for metrica in self.METRICAS})
+            novo_saldo_iva = np.maximum(0, resultado["creditos"] - resultado["imposto_bruto"])
+            novo_saldo_icms = np.maximum(0, -resultado["saldo_icms"])
+            pedido = novo_saldo_iva * ressarcimento
+            pago = agendados[indice_mes % len(agendados)].copy()
+            agendados[indice_mes % len(agendados)] = 0.0
+            if prazo_ressarcimento == 0:
+                pago = pago + pedido
+            else:
+                agendados[(indice_mes + prazo_ressarcimento) % len(agendados)] += pedido
+            em_ressarcimento = em_ressarcimento + pedido - pago
+
+            if livro is not None:
+                indice_periodo = LivroCreditos.periodo(ano, mes)
+                # O crédito gerado no mês é o total de créditos menos o saldo trazido do mês anterior
+                livro.registrar(indice_periodo, "geracao", resultado["creditos"] - saldo_iva)
+                livro.registrar(indice_periodo, "compensacao", periodo["credito_iva_utilizado"])
+                livro.registrar(indice_periodo, "pedido_ressarcimento", pedido)
+                # No ICMS, somente a variação do saldo credor é registrada
+                livro.registrar(indice_periodo, "geracao", np.maximum(0, novo_saldo_icms - saldo_icms), tributo="ICMS")
+                livro.registrar(indice_periodo, "compensacao", np.maximum(0, saldo_icms - novo_saldo_icms),
+                                tributo="ICMS")
+                livro.registrar(indice_periodo + prazo_ressarcimento, "ressarcimento_pago", pedido,
+                                origem=indice_periodo)
+
+            saldo_iva = novo_saldo_iva - pedido
+            saldo_icms = novo_saldo_icms
+            periodo["ressarcimento_pedido"] = pedido
+            periodo["ressarcimento_pago"] = pago
+            periodo["saldo_credor_iva"] = saldo_iva
+            periodo["saldo_credor_icms"] = saldo_icms
+            periodo["em_ressarcimento"] = em_ressarcimento
+            periodo["credito_imobilizado"] = saldo_iva + saldo_icms + em_ressarcimento
+            yield periodo
+
+            mes += 1
+            if mes > 12:
+                ano, mes = ano + 1, 1
+
+    @staticmethod
+    def empilhar(periodos, campos):
+        """Consome os períodos e empilha os campos em matrizes (meses, empresas).
+
+        Retorna (ano, mês) do primeiro período e as matrizes, prontas para CalendarioFiscal.agregar.
+        """
+        inicio = None
+        valores = {campo: [] for campo in campos}
+        for periodo in periodos:
+            if inicio is None:
+                inicio = (periodo["ano"], periodo["mes"])
+            for campo in campos:
+                valores[campo].append(periodo[campo])
+        return inicio, {campo: np.array(lista, dtype=float) for campo, lista in valores.items()}
+
+    def acumular(self, periodos, metricas=None):
+        """Consome os períodos e acumula, por ano, os totais das métricas, os saldos no fim do ano e o
+        crédito imobilizado médio (saldos credores mais ressarcimentos pendentes)."""
+        metricas = list(metricas or self.METRICAS)
+        anos = {}
+        for periodo in periodos:
+            ano = anos.setdefault(periodo["ano"], {"meses": 0, "meses_com_saldo_credor": 0})
+            ano["meses"] += 1
+            for metrica in metricas:
+                ano[metrica] = ano.get(metrica, 0.0) + periodo[metrica]
+            ano["meses_com_saldo_credor"] = ano["meses_com_saldo_credor"] + (
+                (periodo["saldo_credor_iva"] > 0) | (periodo["saldo_credor_icms"] > 0))
+            ano["saldo_credor_iva"] = periodo["saldo_credor_iva"]
+            ano["saldo_credor_icms"] = periodo["saldo_credor_icms"]
+            ano["em_ressarcimento"] = periodo["em_ressarcimento"]
+            ano["credito_imobilizado_medio"] = (ano.get("credito_imobilizado_medio", 0.0) * (ano["meses"] - 1) +
+                                                periodo["credito_imobilizado"]) / ano["meses"]
+            ano["maior_desembolso_mensal"] = np.maximum(ano.get("maior_desembolso_mensal", 0.0),
+                                                        periodo["total_devido"])
+        return anos
+
+
+class CalendarioFiscal:
+    """Calendário de períodos de apuração arbitrários (anos fiscais, trimestres, meses).
+
+    Cada período é um intervalo de datas [início, fim). Para cada grade mensal é calculada uma
+    única vez a matriz de pesos (períodos × meses) com a fração de dias de cada mês que pertence
+    a cada período; como os meses já são calculados com as regras vigentes em cada dia, a
+    conversão de toda a carteira para o calendário é um único produto matricial. Saldos (valores
+    de estoque) são lidos no mês que contém o último dia do período.
+    """
+
+    def __init__(self, inicios, fins, rotulos=None):
+        self.inicios = np.asarray(inicios, dtype="datetime64[D]")
+        self.fins = np.asarray(fins, dtype="datetime64[D]")
+        if self.inicios.shape != self.fins.shape or np.any(self.fins <= self.inicios):
+            raise ValueError("Cada período deve ter início anterior ao fim")
+        self.rotulos = list(rotulos) if rotulos is not None else [
+            f"{inicio} a {fim - np.timedelta64(1, 'D')}" for inicio, fim in zip(self.inicios, self.fins)]
+        self._pesos = {}
+
+    def __len__(self):
+        return len(self.inicios)
+
+    @staticmethod
+    def _meses(ano, mes, quantidade):
+        """Primeiro dia de quantidade + 1 meses consecutivos a partir de ano/mês."""
+        return (np.datetime64(f"{ano}-{mes:02d}", "M") + np.arange(quantidade + 1)).astype("datetime64[D]")
+
+    @classmethod
+    def anual(cls, ano_inicial, n_anos, mes_inicio=1):
+        """Anos civis (mes_inicio=1) ou anos fiscais iniciados no mês informado."""
+        limites = cls._meses(ano_inicial, mes_inicio, 12 * n_anos)[::12]
+        anos = range(ano_inicial, ano_inicial + n_anos)
+        rotulos = [str(ano) if mes_inicio == 1 else f"{ano}/{(ano + 1) % 100:02d}" for ano in anos]
+        return cls(limites[:-1], limites[1:], rotulos)
+
+    @classmethod
+    def trimestral(cls, ano_inicial, n_trimestres, mes_inicio=1):
+        """Trimestres consecutivos; com mes_inicio != 1, numerados dentro do ano fiscal."""
+        limites = cls._meses(ano_inicial, mes_inicio, 3 * n_trimestres)[::3]
+        rotulos = []
+        for indice in range(n_trimestres):
+            ano = ano_inicial + indice // 4
+            rotulos.append(f"{indice % 4 + 1}T{ano}" if mes_inicio == 1 else f"{indice % 4 + 1}T {ano}/{(ano + 1) % 100:02d}")
+        return cls(limites[:-1], limites[1:], rotulos)
+
+    @classmethod
+    def mensal(cls, ano_inicial, n_meses, mes_inicial=1):
+        limites = cls._meses(ano_inicial, mes_inicial, n_meses)
+        rotulos = [f"{str(inicio)[5:7]}/{str(inicio)[:4]}" for inicio in limites[:-1]]
+        return cls(limites[:-1], limites[1:], rotulos)
+
+    def pesos(self, ano_inicial, mes_inicial, n_meses):
+        """Matrizes de pesos (períodos × meses) de fluxos e de saldos e a cobertura de cada período.
+
+        A cobertura é a fração dos dias do período contida na grade mensal; períodos com
+        cobertura menor que 1 estão incompletos.
+        """
+        chave = (ano_inicial, mes_inicial, n_meses)
+        if chave not in self._pesos:
+            limites = self._meses(ano_inicial, mes_inicial, n_meses)
+            inicio_mes, fim_mes = limites[:-1], limites[1:]
+            sobreposicao = np.maximum(
+                0, (np.minimum(self.fins[:, None], fim_mes[None, :]) -
+                    np.maximum(self.inicios[:, None], inicio_mes[None, :])).astype(float))
+            fluxos = sobreposicao / (fim_mes - inicio_mes).astype(float)
+
+            ultimo_dia = self.fins - np.timedelta64(1, "D")
+            mes_final = np.searchsorted(inicio_mes, ultimo_dia, side="right") - 1
+            dentro = (mes_final >= 0) & (ultimo_dia < limites[-1])
+            saldos = np.zeros_like(fluxos)
+            saldos[np.flatnonzero(dentro), mes_final[dentro]] = 1.0
+
+            cobertura = sobreposicao.sum(axis=1) / (self.fins - self.inicios).astype(float)
+            self._pesos[chave] = (fluxos, saldos, cobertura)
+        return self._pesos[chave]
+
+    def agregar(self, matrizes, ano_inicial, mes_inicial=1, saldos=()):
+        """Converte matrizes mensais {campo: (meses, ...)} para os períodos do calendário.
+
+        Campos em saldos são lidos no fim do período; os demais são somados proporcionalmente
+        aos dias. Todos os campos de cada tipo são convertidos em um único produto matricial.
+        """
+        if not matrizes:
+            return {}
+        n_meses = {len(valor) for valor in matrizes.values()}
+        if len(n_meses) > 1:
+            raise ValueError("As matrizes mensais devem ter o mesmo número de meses")
+        n_meses = n_meses.pop()
+        fluxos, pesos_saldos, cobertura = self.pesos(ano_inicial, mes_inicial, n_meses)
+
+        resultado = {}
+        for pesos, campos in ((fluxos, [campo for campo in matrizes if campo not in saldos]),
+                              (pesos_saldos, [campo for campo in matrizes if campo in saldos])):
+            if not campos:
+                continue
+            valores = [np.asarray(matrizes[campo], dtype=float).reshape(n_meses, -1) for campo in campos]
+            produto = pesos @ np.concatenate(valores, axis=1)
+            inicio = 0
+            for campo, valor in zip(campos, valores):
+                largura = valor.shape[1]
+                resultado[campo] = produto[:, inicio:inicio + largura].reshape(
+                    (len(self),) + np.shape(matrizes[campo])[1:])
+                inicio += largura
+        resultado["cobertura"] = cobertura
+        return resultado
+
+
+class CustoFinanceiroCreditos:
+    """Custo de capital dos créditos imobilizados (saldos credores e ressarcimentos pendentes).
+
+    O saldo imobilizado no fim de cada mês custa a taxa mensal equivalente ao custo de capital
+    anual vigente no mês; o custo de cada mês é trazido a valor presente para o início da série
+    pelo desconto acumulado da mesma curva. O prazo de ressarcimento entra pela trajetória dos
+    saldos produzida por ApuracaoMensal.periodos.
+    """
+
+    def __init__(self, custo_capital):
+        # Custo de capital anual: escalar ou curva {ano: taxa}, com anos ausentes repetindo o anterior
+        if isinstance(custo_capital, dict):
+            self.curva = {int(ano): float(taxa) for ano, taxa in custo_capital.items()}
+        else:
+            self.curva = {0: float(custo_capital)}
+        if not self.curva or any(taxa <= -1 for taxa in self.curva.values()):
+            raise ValueError("O custo de capital deve ser maior que -100% ao ano")
+        self._anos = np.array(sorted(self.curva))
+        self._taxas = np.array([self.curva[ano] for ano in self._anos])
+
+    def taxas_mensais(self, ano_inicial, mes_inicial, n_meses):
+        """Taxa mensal equivalente de cada mês da grade."""
+        anos = ano_inicial + (mes_inicial - 1 + np.arange(n_meses)) // 12
+        posicoes = np.clip(np.searchsorted(self._anos, anos, side="right") - 1, 0, len(self._anos) - 1)
+        return (1 + self._taxas[posicoes]) ** (1 / 12) - 1
+
+    def calcular(self, saldos, ano_inicial, mes_inicial=1):
+        """Custo mensal e seu valor presente para saldos imobilizados (meses, empresas)."""
+        saldos = np.asarray(saldos, dtype=float)
+        taxas = self.taxas_mensais(ano_inicial, mes_inicial, len(saldos))
+        # Desconto do fim de cada mês até o início da série
+        desconto = np.cumprod(1 / (1 + taxas))
+        custo = saldos * taxas.reshape((-1,) + (1,) * (saldos.ndim - 1))
+        return {
+            "taxa_mensal": taxas,
+            "fator_desconto": desconto,
+            "custo": custo,
+            "valor_presente": custo * desconto.reshape((-1,) + (1,) * (saldos.ndim - 1))
+        }
+
+    def por_ano(self, saldos, ano_inicial, mes_inicial=1):
+        """Custo nominal e valor presente por ano civil, para cada empresa."""
+        calculo = self.calcular(saldos, ano_inicial, mes_inicial)
+        n_anos = (mes_inicial - 1 + len(calculo["custo"]) + 11) // 12
+        calendario = CalendarioFiscal.anual(ano_inicial, n_anos)
+        anual = calendario.agregar({"custo": calculo["custo"], "valor_presente": calculo["valor_presente"]},
+                                   ano_inicial, mes_inicial)
+        return {ano: {"custo_creditos": anual["custo"][i], "vp_custo_creditos": anual["valor_presente"][i]}
+                for i, ano in enumerate(range(ano_inicial, ano_inicial + n_anos))}
+
+    def da_apuracao(self, apuracao, carteira, series, ano_inicial, mes_inicial=1, **parametros):
+        """Executa a apuração mensal da carteira e calcula o custo dos créditos imobilizados por ano.
+
+        parametros: repassados a ApuracaoMensal.periodos (ressarcimento, prazo_ressarcimento, regras...).
+        """
+        _, matrizes = apuracao.empilhar(
+            apuracao.periodos(carteira, series, ano_inicial, mes_inicial, **parametros), ["credito_imobilizado"])
+        return self.por_ano(matrizes["credito_imobilizado"], ano_inicial, mes_inicial)
+
+
+class GrupoEmpresarial:
+    """Grupo de entidades com operações intragrupo, calculado de forma consolidada.
+
+    As vendas entre entidades ficam em uma matriz esparsa em coordenadas (vendedora,
+    compradora, valor), incluídas no faturamento da vendedora e nos custos tributáveis da
+    compradora. O débito de CBS/IBS de cada venda, calculado com as alíquotas da vendedora,
+    vira crédito da compradora (em vez do crédito sobre os custos pelas alíquotas da
+    compradora); os créditos de todas as entidades são somados por bincount e o grupo
+    inteiro é calculado em uma única chamada vetorizada.
+    """
+
+    def __init__(self, calculadora_lote, carteira, origem, destino, valores):
+        self.lote = calculadora_lote
+        self.carteira = carteira
+        n = len(carteira)
+        self.origem = np.asarray(origem, dtype=np.int64)
+        self.destino = np.asarray(destino, dtype=np.int64)
+        self.valores = np.asarray(valores, dtype=float)
+        if not self.origem.shape == self.destino.shape == self.valores.shape or self.origem.ndim != 1:
+            raise ValueError("Origem, destino e valores dos fluxos intragrupo devem ter o mesmo tamanho")
+        if len(self.origem) and (min(self.origem.min(), self.destino.min()) < 0 or
+                                 max(self.origem.max(), self.destino.max()) >= n):
+            raise ValueError("Fluxo intragrupo com entidade inexistente na carteira")
+        if np.any(self.origem == self.destino):
+            raise ValueError("Uma entidade não pode vender para si mesma")
+        if np.any(self.valores < 0):
+            raise ValueError("Os fluxos intragrupo não podem ser negativos")
+
+        self.vendas = np.bincount(self.origem, weights=self.valores, minlength=n)
+        self.compras = np.bincount(self.destino, weights=self.valores, minlength=n)
+        regras = [
+            (self.vendas > carteira.colunas["faturamento"] + 1e-6,
+             "Vendas intragrupo não podem exceder o faturamento"),
+            (self.compras > carteira.colunas["custos_tributaveis"] + 1e-6,
+             "Compras intragrupo não podem exceder os custos tributáveis")
+        ]
+        for invalidas, mensagem in regras:
+            if np.any(invalidas):
+                raise ValueError(f"{carteira.nomes[int(np.argmax(invalidas))]}: {mensagem}")
+
+    @classmethod
+    def de_matriz(cls, calculadora_lote, carteira, matriz):
+        """Cria o grupo a partir de uma matriz densa (vendedora × compradora) de vendas intragrupo."""
+        matriz = np.asarray(matriz, dtype=float)
+        origem, destino = np.nonzero(matriz)
+        return cls(calculadora_lote, carteira, origem, destino, matriz[origem, destino])
+
+    def debitos_creditos(self, ano, sobrescritas=None):
+        """Débito de CBS/IBS de cada vendedora sobre as vendas intragrupo e crédito de cada compradora."""
+        n = len(self.carteira)
+        parametros = self.lote._parametros_iva(self.carteira, ano, sobrescritas or {})
+        # Alíquota efetiva sobre o valor da venda (a base das vendas é reduzida pelo fator do setor)
+        taxa = np.broadcast_to(parametros["fator_base"] * (parametros["aliquota_cbs"] + parametros["aliquota_ibs"]),
+                               (n,))
+        debitos = self.vendas * taxa
+        creditos = np.bincount(self.destino, weights=self.valores * taxa[self.origem], minlength=n)
+        return debitos, creditos
+
+    def calcular_ano(self, ano, sobrescritas=None):
+        """Resultados das entidades e do grupo consolidado no ano.
+
+        O consolidado soma as métricas das entidades (débitos e créditos intragrupo se anulam),
+        informa os créditos que ficaram sem aproveitamento nas entidades e a diferença em
+        relação ao cálculo de cada entidade isolada.
+        """
+        sobrescritas = sobrescritas or {}
+        debitos, creditos = self.debitos_creditos(ano, sobrescritas)
+        entidades = self.lote.calcular_ano(self.carteira, ano, dict(
+            sobrescritas, compras_intragrupo=self.compras, creditos_intragrupo=creditos))
+        entidades["debitos_intragrupo"] = debitos
+        entidades["creditos_intragrupo"] = creditos
+        isoladas = self.lote.calcular_ano(self.carteira, ano, sobrescritas)
+
+        faturamento = self.lote._entradas(self.carteira, sobrescritas)["faturamento"]
+        consolidado = {metrica: float(np.sum(entidades[metrica]))
+                       for metrica in self.lote.METRICAS if metrica != "aliquota_efetiva"}
+        faturamento_externo = float(np.sum(faturamento) - self.vendas.sum())
+        consolidado.update({
+            "faturamento_externo": faturamento_externo,
+            "debitos_intragrupo": float(debitos.sum()),
+            "creditos_intragrupo": float(creditos.sum()),
+            "creditos_nao_aproveitados": float(np.sum(np.maximum(0, entidades["creditos"] - entidades["imposto_bruto"]))),
+            "total_devido_isolado": float(np.sum(isoladas["total_devido"])),
+            "aliquota_efetiva": consolidado["total_devido"] / faturamento_externo if faturamento_externo > 0 else 0.0
+        })
+        consolidado["diferenca_isolado"] = consolidado["total_devido"] - consolidado["total_devido_isolado"]
+        return {"entidades": entidades, "consolidado": consolidado}
+
+    def calcular_comparativo(self, anos=None, sobrescritas=None):
+        """Calcula o grupo nos anos da transição, validando a carteira uma única vez."""
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+        self.carteira.validar(self.lote.config)
+        return {ano: self.calcular_ano(ano, sobrescritas) for ano in anos}
+
+
+class FilaEventos:
+    """Fila de prioridade de eventos de caixa, ordenada de uma só vez.
+
+    Os eventos são agendados em blocos de arrays (empresa, dia, prioridade, valor) e a
+    ordenação por empresa, dia, prioridade e ordem de agendamento é feita por um único lexsort,
+    o que permite processar milhões de eventos sem laços em Python.
+    """
+
+    def __init__(self):
+        self._blocos = []
+        self._ordenada = None
+
+    def __len__(self):
+        return sum(len(bloco["valor"]) for bloco in self._blocos)
+
+    def agendar(self, dias, valores, prioridade, empresas=0):
+        """Agenda um bloco de eventos; escalares são repetidos para todos os eventos do bloco."""
+        dias = np.atleast_1d(np.asarray(dias, dtype=np.int64))
+        k = len(dias)
+        self._blocos.append({
+            "empresa": np.broadcast_to(np.asarray(empresas, dtype=np.int64), (k,)),
+            "dia": dias,
+            "prioridade": np.full(k, prioridade, dtype=np.int64),
+            "valor": np.broadcast_to(np.asarray(valores, dtype=float), (k,))
+        })
+        self._ordenada = None
+
+    def ordenar(self):
+        """Colunas dos eventos na ordem em que são processados."""
+        if self._ordenada is None:
+            if not self._blocos:
+                return {nome: np.zeros(0) for nome in ("empresa", "dia", "prioridade", "valor")}
+            colunas = {nome: np.concatenate([bloco[nome] for bloco in self._blocos]) for nome in self._blocos[0]}
+            ordem = np.lexsort((np.arange(len(colunas["valor"])), colunas["prioridade"], colunas["dia"],
+                                colunas["empresa"]))
+            self._ordenada = {nome: coluna[ordem] for nome, coluna in colunas.items()}
+        return self._ordenada
+
+    def posicoes_diarias(self, n_empresas, n_dias, saldo_inicial=0.0):
+        """Saldo de caixa no fim de cada dia, com forma (empresas, dias)."""
+        eventos = self.ordenar()
+        indice = eventos["empresa"] * n_dias + np.minimum(eventos["dia"], n_dias - 1)
+        fluxo = np.bincount(indice.astype(np.int64), weights=eventos["valor"], minlength=n_empresas * n_dias)
+        return np.cumsum(fluxo.reshape(n_empresas, n_dias), axis=1) + np.asarray(saldo_inicial, dtype=float).reshape(-1, 1)
+
+    def menor_saldo(self, n_empresas, saldo_inicial=0.0):
+        """Menor saldo de cada empresa ao longo dos eventos, respeitando a ordem do dia (prioridades)."""
+        eventos = self.ordenar()
+        saldo_inicial = np.broadcast_to(np.asarray(saldo_inicial, dtype=float), (n_empresas,))
+        menor = saldo_inicial.copy()
+        if not len(eventos["valor"]):
+            return menor
+        acumulado = np.cumsum(eventos["valor"])
+        inicios = np.searchsorted(eventos["empresa"], np.arange(n_empresas), side="left")
+        finais = np.searchsorted(eventos["empresa"], np.arange(n_empresas), side="right")
+        com_eventos = finais > inicios
+        # Saldo corrente de cada empresa: soma acumulada menos o acumulado antes do seu primeiro evento
+        anterior = np.where(inicios > 0, acumulado[np.maximum(inicios - 1, 0)], 0.0)
+        corrente = acumulado - np.repeat(anterior[com_eventos], (finais - inicios)[com_eventos]) + \
+            np.repeat(saldo_inicial[com_eventos], (finais - inicios)[com_eventos])
+        menor[com_eventos] = np.minimum(menor[com_eventos], np.minimum.reduceat(corrente, inicios[com_eventos]))
+        return menor
+
+
+class SimuladorSplitPayment:
+    """Fluxo de caixa diário sob o split payment comparado com a apuração atual.
+
+    Transações (vendas e compras) têm data de emissão e de pagamento, valor sem tributo e
+    alíquota do IVA. Na apuração atual, o cliente paga o valor com o tributo, os créditos
+    ficam disponíveis na emissão da compra e o saldo do mês é recolhido no vencimento do mês
+    seguinte. No split payment, o tributo da venda é retido na liquidação financeira e o crédito
+    da compra só fica disponível quando o tributo do fornecedor é retido (no pagamento da
+    compra). Nos dois modelos, a posição no vencimento do mês m é a parte ainda não extinta
+    dos débitos emitidos até m, descontados os créditos disponíveis das compras emitidas até m
+    e o que já foi recolhido (líquido de ressarcimentos): se positiva é recolhida; se negativa,
+    o saldo credor é ressarcido prazo_ressarcimento dias depois (ou compensado nos meses
+    seguintes, sem ressarcimento).
+    """
+
+    PRIORIDADES = {"recebimento": 0, "pagamento": 1, "recolhimento": 2}
+    MODELOS = ["atual", "split"]
+
+    def __init__(self, inicio, dia_vencimento=25, ressarcir_saldo_credor=True, prazo_ressarcimento=60):
+        if not 1 <= dia_vencimento <= 28:
+            raise ValueError("O dia de vencimento deve estar entre 1 e 28")
+        if prazo_ressarcimento < 0:
+            raise ValueError("O prazo de ressarcimento não pode ser negativo")
+        self.inicio = np.datetime64(inicio, "D")
+        self.dia_vencimento = dia_vencimento
+        self.ressarcir_saldo_credor = ressarcir_saldo_credor
+        self.prazo_ressarcimento = prazo_ressarcimento
+
+    def dia(self, data):
+        """Índice do dia de uma data (ou array de datas) em relação ao início."""
+        return (np.asarray(data, dtype="datetime64[D]") - self.inicio).astype(np.int64)
+
+    def _mes(self, dias):
+        """Mês (a partir do mês de início) de cada dia."""
+        datas = self.inicio + np.asarray(dias, dtype="timedelta64[D]")
+        return (datas.astype("datetime64[M]") - self.inicio.astype("datetime64[M]")).astype(np.int64)
+
+    def vencimentos(self, n_meses):
+        """Dia do vencimento da apuração de cada mês (no mês seguinte)."""
+        meses = self.inicio.astype("datetime64[M]") + np.arange(1, n_meses + 1)
+        return self.dia(meses.astype("datetime64[D]") + np.timedelta64(self.dia_vencimento - 1, "D"))
+
+    def simular(self, transacoes, n_empresas=None, n_dias=None, saldo_inicial=0.0):
+        """Simula os dois modelos e retorna as posições diárias de caixa de cada empresa.
+
+        transacoes: {"venda": bool, "emissao": dia, "pagamento": dia, "valor": valor sem tributo,
+        "aliquota": alíquota do IVA, "empresa": índice (opcional)}, todos arrays do mesmo tamanho.
+        """
+        venda = np.asarray(transacoes["venda"], dtype=bool)
+        emissao = np.asarray(transacoes["emissao"], dtype=np.int64)
+        pagamento = np.asarray(transacoes["pagamento"], dtype=np.int64)
+        valor = np.asarray(transacoes["valor"], dtype=float)
+        k = len(valor)
+        aliquota = np.broadcast_to(np.asarray(transacoes["aliquota"], dtype=float), (k,))
+        empresa = np.broadcast_to(np.asarray(transacoes.get("empresa", 0), dtype=np.int64), (k,))
+        if np.any(emissao < 0) or np.any(pagamento < emissao):
+            raise ValueError("As datas de emissão devem ser posteriores ao início e os pagamentos à emissão")
+        if n_empresas is None:
+            n_empresas = int(empresa.max()) + 1 if k else 1
+
+        tributo = valor * aliquota
+        n_meses = int(self._mes(max(emissao.max(), pagamento.max()) if k else 0)) + 1
+        vencimentos = self.vencimentos(n_meses)
+        if n_dias is None:
+            ultimo = vencimentos[-1] + (self.prazo_ressarcimento if self.ressarcir_saldo_credor else 0)
+            n_dias = int(max(ultimo, pagamento.max() if k else 0)) + 1
+
+        def acumulado_mensal(mascara, meses):
+            """Tributo acumulado por empresa até cada mês, pelo mês de cada transação selecionada."""
+            mascara = mascara & (meses < n_meses)
+            return np.bincount(empresa[mascara] * n_meses + meses[mascara], weights=tributo[mascara],
+                               minlength=n_empresas * n_meses).reshape(n_empresas, n_meses).cumsum(axis=1)
+
+        # Débitos e créditos por mês de emissão; no split, a retenção entra no primeiro
+        # vencimento que seja ao mesmo tempo posterior ao pagamento e de mês não anterior à emissão
+        meses_emissao = self._mes(emissao)
+        dias_vencimento = np.minimum(vencimentos, n_dias - 1)
+        meses_retencao = np.maximum(meses_emissao,
+                                    np.searchsorted(dias_vencimento, np.minimum(pagamento, n_dias - 1)))
+        debitos = acumulado_mensal(venda, meses_emissao)
+
+        resultado = {"dias": self.inicio + np.arange(n_dias), "vencimentos": self.inicio + vencimentos,
+                     "filas": {}, "recolhimentos": {}, "ressarcimentos": {}}
+        for modelo in self.MODELOS:
+            if modelo == "atual":
+                extintos = np.zeros((n_empresas, n_meses))
+                creditos = acumulado_mensal(~venda, meses_emissao)
+                recebido = valor + tributo
+            else:
+                extintos = acumulado_mensal(venda, meses_retencao)
+                creditos = acumulado_mensal(~venda, meses_retencao)
+                recebido = valor
+
+            # Posição de cada mês: parcela ainda não extinta, deduzido o recolhido líquido anterior
+            recolhimentos = np.zeros((n_empresas, n_meses))
+            ressarcimentos = np.zeros((n_empresas, n_meses))
+            recolhido = np.zeros(n_empresas)
+            for mes in range(n_meses):
+                posicao = debitos[:, mes] - extintos[:, mes] - creditos[:, mes] - recolhido
+                recolhimentos[:, mes] = np.maximum(0, posicao)
+                if self.ressarcir_saldo_credor:
+                    ressarcimentos[:, mes] = np.maximum(0, -posicao)
+                recolhido = recolhido + recolhimentos[:, mes] - ressarcimentos[:, mes]
+
+            fila = FilaEventos()
+            fila.agendar(pagamento[venda], recebido[venda], self.PRIORIDADES["recebimento"], empresa[venda])
+            fila.agendar(pagamento[~venda], -(valor + tributo)[~venda], self.PRIORIDADES["pagamento"], empresa[~venda])
+            fila.agendar(np.tile(vencimentos, n_empresas), -recolhimentos.ravel(), self.PRIORIDADES["recolhimento"],
+                         np.repeat(np.arange(n_empresas), n_meses))
+            fila.agendar(np.tile(vencimentos + self.prazo_ressarcimento, n_empresas), ressarcimentos.ravel(),
+                         self.PRIORIDADES["recebimento"], np.repeat(np.arange(n_empresas), n_meses))
+            resultado["filas"][modelo] = fila
+            resultado["recolhimentos"][modelo] = recolhimentos
+            resultado["ressarcimentos"][modelo] = ressarcimentos
+            resultado[f"caixa_{modelo}"] = fila.posicoes_diarias(n_empresas, n_dias, saldo_inicial)
+            resultado[f"menor_saldo_{modelo}"] = fila.menor_saldo(n_empresas, saldo_inicial)
+
+        resultado["diferenca"] = resultado["caixa_split"] - resultado["caixa_atual"]
+        return resultado
+
+    @staticmethod
+    def gerar_transacoes(n_dias, faturamento_anual, custos_anuais, aliquota, notas_por_dia=1,
+                         prazo_recebimento=30, prazo_pagamento=30):
+        """Transações uniformes ao longo do período a partir de valores anuais (uma empresa)."""
+        if notas_por_dia < 1:
+            raise ValueError("Informe ao menos uma nota por dia")
+        dias = np.repeat(np.arange(n_dias), notas_por_dia)
+        n = len(dias)
+        valor_venda = faturamento_anual / 365 / notas_por_dia
+        valor_compra = custos_anuais / 365 / notas_por_dia
+        return {
+            "venda": np.concatenate([np.ones(n, dtype=bool), np.zeros(n, dtype=bool)]),
+            "emissao": np.concatenate([dias, dias]),
+            "pagamento": np.concatenate([dias + prazo_recebimento, dias + prazo_pagamento]),
+            "valor": np.concatenate([np.full(n, valor_venda), np.full(n, valor_compra)]),
+            "aliquota": aliquota
+        }
+
+
+class ProjecaoInsumos:
+    """Projeção anual das entradas da carteira, montada como matriz empresa × ano.
+
+    Os valores da carteira valem para o ano base. Cada campo numérico pode crescer a uma taxa
+    anual constante (CAGR, escalar ou por empresa), acompanhar um índice (ex.: IPCA) ou receber
+    valores fixos em anos específicos, que prevalecem sobre o modelo de crescimento. As colunas
+    da matriz são passadas ao motor em lote como sobrescritas das entradas, sem cópias dos
+    dados por ano. Os resultados podem ser deflacionados para reais do ano base.
+    """
+
+    def __init__(self, ano_base=2026):
+        self.ano_base = ano_base
+        self.modelos = {}
+        self.valores_fixos = {}
+        self.indices = {}
+        self.deflator = None
+
+    def _validar_campo(self, campo):
+        if campo not in CarteiraEmpresas.CAMPOS_NUMERICOS:
+            raise ValueError(f"Campo sem projeção possível: {campo}")
+
+    def crescimento(self, campo, taxa):
+        """Crescimento anual composto do campo (ex.: 0.05 para 5% ao ano)."""
+        self._validar_campo(campo)
+        if np.any(np.asarray(taxa, dtype=float) <= -1):
+            raise ValueError(f"Taxa de crescimento de {campo} deve ser maior que -100%")
+        self.modelos[campo] = ("taxa", taxa)
+
+    def indexar(self, campo, indice):
+        """Corrige o campo pela variação do índice em relação ao ano base."""
+        self._validar_campo(campo)
+        if indice not in self.indices:
+            raise ValueError(f"Índice não carregado: {indice}")
+        self.modelos[campo] = ("indice", indice)
+
+    def fixar(self, campo, ano, valor):
+        """Valor do campo no ano (escalar ou por empresa), ignorando o modelo de crescimento."""
+        self._validar_campo(campo)
+        self.valores_fixos.setdefault(campo, {})[int(ano)] = valor
+
+    def adicionar_indice(self, nome, valores, variacao=False):
+        """Inclui um índice por ano: números-índice ou, com variacao=True, variações anuais.
+
+        As variações são acumuladas a partir do ano base (a variação de um ano leva o índice do
+        ano anterior ao ano informado).
+        """
+        valores = {int(ano): float(valor) for ano, valor in valores.items()}
+        if variacao:
+            niveis = {self.ano_base: 1.0}
+            for ano in range(self.ano_base + 1, max(valores, default=self.ano_base) + 1):
+                if ano not in valores:
+                    raise ValueError(f"Índice {nome} sem variação para {ano}")
+                niveis[ano] = niveis[ano - 1] * (1 + valores[ano])
+            for ano in range(self.ano_base - 1, min(valores, default=self.ano_base) - 1, -1):
+                if ano + 1 not in valores:
+                    raise ValueError(f"Índice {nome} sem variação para {ano + 1}")
+                niveis[ano] = niveis[ano + 1] / (1 + valores[ano + 1])
+            valores = niveis
+        if any(valor <= 0 for valor in valores.values()):
+            raise ValueError(f"Índice {nome} deve ser positivo")
+        self.indices[nome] = valores
+
+    def carregar_indices(self, arquivo):
+        """Carrega índices de um arquivo JSON ({nome: {ano: número-índice}} ou
+        {nome: {"variacao": {ano: variação}}})."""
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            conteudo = json.load(f)
+        for nome, valores in conteudo.items():
+            if "variacao" in valores:
+                self.adicionar_indice(nome, valores["variacao"], variacao=True)
+            else:
+                self.adicionar_indice(nome, valores)
+        return list(conteudo)
+
+    def deflacionar_por(self, indice):
+        """Define o deflator: nome de um índice carregado ou inflação anual constante."""
+        if isinstance(indice, str) and indice not in self.indices:
+            raise ValueError(f"Índice não carregado: {indice}")
+        self.deflator = indice
+
+    def _niveis(self, nome, anos):
+        """Índice dos anos relativo ao ano base."""
+        indice = self.indices[nome]
+        faltantes = [ano for ano in [self.ano_base] + list(anos) if ano not in indice]
+        if faltantes:
+            raise ValueError(f"Índice {nome} sem valor para {faltantes[0]}")
+        return np.array([indice[ano] for ano in anos]) / indice[self.ano_base]
+
+    def campos(self):
+        return sorted(set(self.modelos) | set(self.valores_fixos))
+
+    def matriz(self, carteira, campo, anos):
+        """Valores projetados do campo, com as empresas nas linhas e os anos nas colunas."""
+        n = len(carteira)
+        anos = np.asarray(anos)
+        base = carteira.colunas[campo]
+        tipo, parametro = self.modelos.get(campo, ("taxa", 0.0))
+        if tipo == "taxa":
+            taxa = np.broadcast_to(np.asarray(parametro, dtype=float), (n,))
+            fatores = (1 + taxa)[:, None] ** (anos - self.ano_base)[None, :]
+        else:
+            fatores = np.broadcast_to(self._niveis(parametro, anos), (n, len(anos)))
+        matriz = base[:, None] * fatores
+        for ano, valor in self.valores_fixos.get(campo, {}).items():
+            colunas = np.flatnonzero(anos == ano)
+            if len(colunas):
+                matriz[:, colunas[0]] = valor
+        return matriz
+
+    def matrizes(self, carteira, anos, configuracao):
+        """Matrizes de todos os campos projetados, validadas ano a ano como a carteira."""
+        matrizes = {campo: self.matriz(carteira, campo, anos) for campo in self.campos()}
+        faturamento = matrizes.get("faturamento", carteira.colunas["faturamento"][:, None])
+        custos = matrizes.get("custos_tributaveis", carteira.colunas["custos_tributaveis"][:, None])
+        regras = [
+            (np.broadcast_to(faturamento < 0, (len(carteira), len(anos))), "Faturamento não pode ser negativo"),
+            (np.broadcast_to(custos > faturamento, (len(carteira), len(anos))),
+             "Custos tributáveis não podem exceder o faturamento"),
+            (np.broadcast_to((carteira.regimes == "simples")[:, None] & (faturamento > configuracao.limite_simples),
+                             (len(carteira), len(anos))),
+             f"Empresas do Simples Nacional devem ter faturamento anual até R$ {formatar_br(configuracao.limite_simples)}")
+        ]
+        for invalidas, mensagem in regras:
+            if np.any(invalidas):
+                empresa, coluna = np.unravel_index(np.argmax(invalidas), invalidas.shape)
+                raise ValueError(f"{carteira.nomes[empresa]} ({anos[coluna]}): {mensagem}")
+        return matrizes
+
+    def deflatores(self, anos):
+        """Fator que converte valores nominais de cada ano em reais do ano base."""
+        anos = np.asarray(anos)
+        if self.deflator is None:
+            return np.ones(len(anos))
+        if isinstance(self.deflator, str):
+            return 1 / self._niveis(self.deflator, anos)
+        return (1 + float(self.deflator)) ** -(anos - self.ano_base).astype(float)
+
+
+# Parâmetros disponíveis para as análises avançadas: rótulo -> (caminho, escala de exibição).
+# "{setor}" é substituído pela chave do setor da empresa em setores_especiais.
+PARAMETROS_ANALISE = {
+    "Alíquota CBS (%)": ("aliquotas_base.CBS", 100),
+    "Alíquota IBS do Setor (%)": ("setores_especiais.{setor}.IBS", 100),
+    "Redução CBS do Setor (%)": ("setores_especiais.{setor}.reducao_CBS", 100),
+    "Faturamento (R$)": ("faturamento", 1),
+    "Custos Tributáveis (R$)": ("custos_tributaveis", 1),
+    "Custos do Simples (R$)": ("custos_simples", 1),
+    "Créditos Anteriores (R$)": ("creditos_anteriores", 1),
+    "Alíquota ICMS Saída (%)": ("icms_config.aliquota_saida", 100),
+    "Alíquota ICMS Entrada (%)": ("icms_config.aliquota_entrada", 100),
+    "Alíquota PIS (%)": ("impostos_atuais.PIS", 100),
+    "Alíquota COFINS (%)": ("impostos_atuais.COFINS", 100)
+}
+
+# Métricas exibidas nas análises avançadas: rótulo -> (métrica, escala de exibição)
+METRICAS_ANALISE = {
+    "Total Devido (R$)": ("total_devido", 1),
+    "Alíquota Efetiva (%)": ("aliquota_efetiva", 100),
+    "Imposto Devido IVA (R$)": ("imposto_devido", 1),
+    "Impostos Atuais (R$)": ("impostos_atuais", 1)
+}
+
+
+# Variáveis livres da busca de meta: rótulo -> (caminho, coluna compensada)
+VARIAVEIS_BUSCA_META = {
+    "Custos Tributáveis (R$)": ("custos_tributaveis", None),
+    "Custos Tributáveis, migrando do Simples (R$)": ("custos_tributaveis", "custos_simples"),
+    "Custos do Simples (R$)": ("custos_simples", None),
+    "Percentual de Incentivo de Saída (%)": ("icms_config.incentivos_saida.{linha}.percentual", None),
+    "Percentual de Incentivo de Entrada (%)": ("icms_config.incentivos_entrada.{linha}.percentual", None),
+    "Percentual de Incentivo de Apuração (%)": ("icms_config.incentivos_apuracao.{linha}.percentual", None)
+}
+
+
+def resolver_caminho_parametro(caminho, configuracao, setor="padrao"):
+    """Substitui o marcador de setor e retorna o caminho e o valor atual do parâmetro."""
+    chave_setor = setor if setor in configuracao.setores_especiais else "padrao"
+    caminho = caminho.replace("{setor}", chave_setor)
+    partes = caminho.split(".")
+    if len(partes) == 1:
+        return caminho, None  # Coluna de entrada da carteira
+
+    valor = configuracao
+    for parte in partes:
+        if isinstance(valor, dict):
+            chave = int(parte) if parte.isdigit() and int(parte) in valor else parte
+            valor = valor[chave]
+        elif isinstance(valor, list):
+            valor = valor[int(parte)]
+        else:
+            valor = getattr(valor, parte)
+    return caminho, float(valor)
+
+
+class ResultadoVarredura:
+    """Resultado de uma varredura, com uma dimensão por eixo de parâmetro, empresa e ano."""
+
+    def __init__(self, eixos, empresas, anos, dados):
+        self.eixos = eixos
+        self.empresas = empresas
+        self.anos = list(anos)
+        self.dados = dados
+        self.dimensoes = [caminho for caminho, _ in eixos] + ["empresa", "ano"]
+
+    @property
+    def forma(self):
+        return tuple(len(valores) for _, valores in self.eixos)
+
+    def selecionar(self, metrica, ano, empresa=None):
+        """Retorna a grade de uma métrica para o ano informado.
+
+        Sem empresa, os valores são somados na carteira (a alíquota efetiva é recalculada
+        sobre o faturamento total).
+        """
+        j = self.anos.index(ano)
+        if empresa is not None:
+            if not isinstance(empresa, int):
+                empresa = self.empresas.index(empresa)
+            return self.dados[metrica][..., empresa, j]
+
+        if metrica == "aliquota_efetiva":
+            return _dividir(self.dados["total_devido"][..., j].sum(axis=-1),
+                            self.dados["faturamento"][..., j].sum(axis=-1))
+        return self.dados[metrica][..., j].sum(axis=-1)
+
+
+class VarreduraParametros:
+    """Avalia a grade cartesiana de parâmetros em uma passagem vetorizada da CalculadoraLote."""
+
+    METRICAS_PADRAO = ["total_devido", "imposto_devido", "impostos_atuais", "aliquota_efetiva"]
+
+    def __init__(self, calculadora_lote, limite_elementos=4_000_000):
+        self.lote = calculadora_lote
+        self.limite_elementos = limite_elementos
+        self.eixos = []
+
+    def adicionar_eixo(self, caminho, valores):
+        """Adiciona um eixo à grade (caminho de parâmetro e valores a avaliar)."""
+        valores = np.asarray(valores, dtype=float)
+        if valores.ndim != 1 or len(valores) == 0:
+            raise ValueError(f"O eixo {caminho} deve ter ao menos um valor")
+        if any(caminho == existente for existente, _ in self.eixos):
+            raise ValueError(f"O parâmetro {caminho} já é um eixo da varredura")
+        self.eixos.append((caminho, valores))
+        return self
+
+    @staticmethod
+    def _sobrescritas_grade(eixos, fixas):
+        """Posiciona cada eixo em sua dimensão, deixando o eixo das empresas por último."""
+        sobrescritas = dict(fixas)
+        for i, (caminho, valores) in enumerate(eixos):
+            forma = [1] * (len(eixos) + 1)
+            forma[i] = len(valores)
+            sobrescritas[caminho] = valores.reshape(forma)
+        return sobrescritas
+
+    def executar(self, carteira, anos=None, metricas=None, sobrescritas=None):
+        """Avalia a grade inteira e retorna um ResultadoVarredura."""
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+        metricas = list(metricas or self.METRICAS_PADRAO)
+        carteira.validar(self.lote.config)
+
+        n = len(carteira)
+        forma_grade = tuple(len(valores) for _, valores in self.eixos)
+        dados = {metrica: np.empty(forma_grade + (n, len(anos))) for metrica in metricas + ["faturamento"]}
+
+        # A grade é dividida ao longo do primeiro eixo para limitar a memória utilizada
+        if self.eixos:
+            por_fatia = int(np.prod(forma_grade[1:], dtype=np.int64)) * n
+            passo = max(1, self.limite_elementos // max(1, por_fatia))
+            blocos = [slice(inicio, inicio + passo) for inicio in range(0, forma_grade[0], passo)]
+        else:
+            blocos = [slice(None)]
+
+        for bloco in blocos:
+            eixos_bloco = list(self.eixos)
+            if eixos_bloco:
+                caminho, valores = eixos_bloco[0]
+                eixos_bloco[0] = (caminho, valores[bloco])
+            sobrescritas_bloco = self._sobrescritas_grade(eixos_bloco, sobrescritas or {})
+            indice = (bloco,) if self.eixos else ()
+            forma_bloco = dados["faturamento"][indice].shape[:-1]
+
+            faturamento = sobrescritas_bloco.get("faturamento", carteira.colunas["faturamento"])
+            dados["faturamento"][indice] = np.broadcast_to(np.asarray(faturamento)[..., None], forma_bloco + (len(anos),))
+
+            for j, ano in enumerate(anos):
+                resultado = self.lote.calcular_ano(carteira, ano, sobrescritas_bloco)
+                for metrica in metricas:
+                    dados[metrica][indice + (Ellipsis, j)] = np.broadcast_to(resultado[metrica], forma_bloco)
+
+        return ResultadoVarredura(list(self.eixos), list(carteira.nomes), anos, dados)
+
+
+class ResultadoTornado:
+    """Métrica com cada parâmetro no valor baixo e no alto: arrays (parâmetro, empresa, ano)."""
+
+    def __init__(self, parametros, empresas, anos, base, baixo, alto):
+        self.parametros = parametros
+        self.empresas = list(empresas)
+        self.anos = list(anos)
+        self.base = base
+        self.baixo = baixo
+        self.alto = alto
+
+    def reduzir(self, valores, empresa=None, ano=None):
+        """Soma a métrica na carteira (ou seleciona uma empresa) e no período (ou em um ano)."""
+        if empresa is None:
+            valores = valores.sum(axis=-2)
+        else:
+            if not isinstance(empresa, int):
+                empresa = self.empresas.index(empresa)
+            valores = valores[..., empresa, :]
+        return valores.sum(axis=-1) if ano is None else valores[..., self.anos.index(ano)]
+
+    def impactos(self, empresa=None, ano=None, limite=None):
+        """Parâmetros ordenados pela amplitude do efeito sobre a métrica (maior primeiro).
+
+        Cada item traz o rótulo, os valores baixo e alto do parâmetro e as variações da métrica
+        em relação à base. Parâmetros sem efeito são omitidos.
+        """
+        base = float(self.reduzir(self.base, empresa, ano))
+        baixo = self.reduzir(self.baixo, empresa, ano) - base
+        alto = self.reduzir(self.alto, empresa, ano) - base
+        amplitude = np.abs(alto - baixo)
+        itens = []
+        for i in np.argsort(-amplitude, kind="stable"):
+            if amplitude[i] <= 1e-9 * max(1.0, abs(base)):
+                continue
+            parametro = self.parametros[i]
+            itens.append({"rotulo": parametro["rotulo"], "caminho": parametro["caminho"],
+                          "valor_baixo": parametro["valor_baixo"], "valor_alto": parametro["valor_alto"],
+                          "delta_baixo": float(baixo[i]), "delta_alto": float(alto[i]),
+                          "amplitude": float(amplitude[i])})
+        return itens[:limite] if limite else itens
+
+
+class AnaliseTornado:
+    """Sensibilidade por um parâmetro de cada vez (gráfico de tornado).
+
+    Todos os valores baixos e altos são posicionados em um único eixo de perturbação: a linha
+    0 é a base e as linhas 2i+1 e 2i+2 trazem o parâmetro i no valor baixo e no alto, com os
+    demais na base. Cada ano é uma única avaliação vetorizada, e os anos são calculados em
+    paralelo.
+    """
+
+    def __init__(self, calculadora_lote, max_threads=None):
+        self.lote = calculadora_lote
+        self.max_threads = max_threads
+        self.parametros = []
+
+    def adicionar_parametro(self, rotulo, caminho, baixo=None, alto=None, variacao=0.10, limites=None):
+        """Adiciona um parâmetro com valores baixo/alto absolutos ou variação relativa ao valor atual.
+
+        limites: (mínimo, máximo) aplicados aos valores perturbados (ex.: (0, 1) para percentuais).
+        """
+        if any(parametro["caminho"] == caminho for parametro in self.parametros):
+            raise ValueError(f"O parâmetro {caminho} já faz parte da análise")
+        if (baixo is None) != (alto is None):
+            raise ValueError(f"Informe os valores baixo e alto de {rotulo}, ou nenhum dos dois")
+        self.parametros.append({"rotulo": rotulo, "caminho": caminho, "baixo": baixo, "alto": alto,
+                                "variacao": float(variacao), "limites": limites})
+        return self
+
+    def adicionar_parametros_padrao(self, carteira, anos, variacao=0.10):
+        """Adiciona entradas, alíquotas dos setores da carteira, etapas da transição e incentivos."""
+        config = self.lote.config
+        rotulos_entradas = {"faturamento": "Faturamento", "custos_tributaveis": "Custos Tributáveis",
+                            "custos_simples": "Custos do Simples", "custos_rurais": "Custos Rurais",
+                            "custos_importacoes": "Custos de Importações", "creditos_anteriores": "Créditos Anteriores"}
+        for campo, rotulo in rotulos_entradas.items():
+            if np.any(carteira.colunas[campo] != 0):
+                self.adicionar_parametro(rotulo, campo, variacao=variacao, limites=(0, None))
+
+        fracao = (0, 1)
+        self.adicionar_parametro("Alíquota CBS", "aliquotas_base.CBS", variacao=variacao, limites=fracao)
+        setores = sorted({setor if setor in config.setores_especiais else "padrao"
+                          for setor in carteira.setores_unicos()[0]})
+        for setor in setores:
+            self.adicionar_parametro(f"Alíquota IBS ({setor})", f"setores_especiais.{setor}.IBS",
+                                     variacao=variacao, limites=fracao)
+            if config.setores_especiais[setor]["reducao_CBS"] > 0:
+                self.adicionar_parametro(f"Redução CBS ({setor})", f"setores_especiais.{setor}.reducao_CBS",
+                                         variacao=variacao, limites=fracao)
+        for ano in anos:
+            if ano in config.fase_transicao:
+                self.adicionar_parametro(f"Transição {ano}", f"fase_transicao.{ano}", variacao=variacao, limites=fracao)
+
+        self.adicionar_parametro("Créditos de Fornecedores do Simples", "regras_credito.simples",
+                                 variacao=variacao, limites=fracao)
+        self.adicionar_parametro("Alíquota PIS", "impostos_atuais.PIS", variacao=variacao, limites=fracao)
+        self.adicionar_parametro("Alíquota COFINS", "impostos_atuais.COFINS", variacao=variacao, limites=fracao)
+        self.adicionar_parametro("Alíquota ICMS Saída", "icms_config.aliquota_saida", variacao=variacao, limites=fracao)
+        self.adicionar_parametro("Alíquota ICMS Entrada", "icms_config.aliquota_entrada", variacao=variacao, limites=fracao)
+
+        # Incentivos do ICMS: percentual de cada posição existente em algum pacote da carteira
+        nomes_listas = {"saida": "Saída", "entrada": "Entrada", "apuracao": "Apuração"}
+        for lista in IncentivosICMSCompilados.LISTAS:
+            descricoes = {}
+            for icms_config in carteira.icms_configs:
+                for indice, incentivo in enumerate((icms_config or config.icms_config).get(f"incentivos_{lista}", [])):
+                    if incentivo.get("tipo", "Nenhum") != "Nenhum":
+                        descricoes.setdefault(indice, incentivo.get("descricao") or f"Incentivo {indice + 1}")
+            for indice, descricao in sorted(descricoes.items()):
+                self.adicionar_parametro(f"{descricao} ({nomes_listas[lista]})",
+                                         f"icms_config.incentivos_{lista}.{indice}.percentual",
+                                         variacao=variacao, limites=fracao)
+        return self
+
+    def _valores_atuais(self, caminho, carteira):
+        """Valor atual do parâmetro para cada empresa (incentivos dependem do pacote da empresa)."""
+        n = len(carteira)
+        if not caminho.startswith("icms_config."):
+            icms_config = self.lote.config.icms_config
+            return np.broadcast_to(np.asarray(self.lote._valor_parametro(caminho, carteira, icms_config),
+                                              dtype=float), (n,)).copy()
+
+        valores = np.zeros(n)
+        for _, indices in self.lote.particionar_por_pacote_icms(carteira):
+            icms_config = carteira.icms_configs[indices[0]] or self.lote.config.icms_config
+            try:
+                valores[indices] = self.lote._valor_parametro(caminho, carteira, icms_config)
+            except (KeyError, IndexError):
+                pass  # Pacote sem o incentivo: a sobrescrita é ignorada no cálculo
+        return valores
+
+    def executar(self, carteira, anos=None, metrica="total_devido", sobrescritas=None):
+        """Avalia todos os valores baixos e altos e retorna um ResultadoTornado."""
+        if not self.parametros:
+            raise ValueError("Nenhum parâmetro foi definido para a análise de tornado")
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+        carteira.validar(self.lote.config)
+
+        n, k = len(carteira), len(self.parametros)
+        linhas = 2 * k + 1
+        sobrescritas = dict(sobrescritas or {})
+        parametros = []
+        for i, parametro in enumerate(self.parametros):
+            caminho = parametro["caminho"]
+            if caminho in sobrescritas:
+                atual = np.broadcast_to(np.asarray(sobrescritas[caminho], dtype=float), (n,))
+            else:
+                atual = self._valores_atuais(caminho, carteira)
+            if parametro["baixo"] is not None:
+                baixo = np.broadcast_to(np.asarray(parametro["baixo"], dtype=float), (n,))
+                alto = np.broadcast_to(np.asarray(parametro["alto"], dtype=float), (n,))
+            else:
+                baixo = atual * (1 - parametro["variacao"])
+                alto = atual * (1 + parametro["variacao"])
+            if parametro["limites"] is not None:
+                minimo, maximo = parametro["limites"]
+                baixo = np.clip(baixo, minimo, maximo)
+                alto = np.clip(alto, minimo, maximo)
+
+            valores = np.repeat(atual[None, :], linhas, axis=0)
+            valores[2 * i + 1] = baixo
+            valores[2 * i + 2] = alto
+            sobrescritas[caminho] = valores
+            parametros.append(dict(parametro, valor_atual=atual, valor_baixo=baixo, valor_alto=alto))
+
+        def calcular(ano):
+            return np.broadcast_to(self.lote.calcular_ano(carteira, ano, sobrescritas)[metrica], (linhas, n))
+
+        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+            valores = np.stack(list(executor.map(calcular, anos)), axis=-1)
+
+        return ResultadoTornado(parametros, carteira.nomes, anos, valores[0], valores[1::2], valores[2::2])
+
+
+class ResultadoMonteCarlo:
+    """Amostras de uma simulação de Monte Carlo, com uma linha por sorteio e uma coluna por ano."""
+
+    def __init__(self, anos, amostras, entropia):
+        self.anos = list(anos)
+        self.amostras = amostras
+        self.entropia = entropia  # Permite reproduzir a simulação
+
+    @property
+    def n_amostras(self):
+        return len(next(iter(self.amostras.values())))
+
+    def percentis(self, metrica, quantis=(5, 25, 50, 75, 95)):
+        """Retorna os percentis da métrica, com uma linha por quantil e uma coluna por ano."""
+        return np.percentile(self.amostras[metrica], quantis, axis=0)
+
+    def tabela_percentis(self, metrica, quantis=(5, 25, 50, 75, 95)):
+        """Monta a tabela de percentis e média da métrica por ano."""
+        valores = self.percentis(metrica, quantis)
+        medias = self.amostras[metrica].mean(axis=0)
+        tabela = {}
+        for j, ano in enumerate(self.anos):
+            tabela[ano] = {f"P{q}": valores[i, j] for i, q in enumerate(quantis)}
+            tabela[ano]["media"] = medias[j]
+        return tabela
+
+
+class SimulacaoMonteCarlo:
+    """Simulação de Monte Carlo sobre a CalculadoraLote.
+
+    As amostras são sorteadas e avaliadas em blocos vetorizados. Cada bloco recebe um gerador
+    derivado de uma única SeedSequence, de modo que o resultado não depende da ordem de
+    execução das threads.
+    """
+
+    TIPOS = ("normal", "uniforme", "triangular", "lognormal")
+
+    def __init__(self, calculadora_lote, semente=None, tamanho_bloco=20_000, max_threads=None):
+        self.lote = calculadora_lote
+        self.semente = semente
+        self.tamanho_bloco = tamanho_bloco
+        self.max_threads = max_threads
+        self.distribuicoes = []
+
+    def adicionar_distribuicao(self, caminho, tipo, parametros, relativo=False):
+        """Define a distribuição de um parâmetro.
+
+        normal: (média, desvio); uniforme: (mínimo, máximo); triangular: (mínimo, moda, máximo);
+        lognormal: (média, desvio). Com relativo=True o valor sorteado é um fator sobre o valor
+        atual do parâmetro (ou sobre a coluna de cada empresa).
+        """
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Distribuição desconhecida: {tipo}")
+        parametros = tuple(float(p) for p in parametros)
+        esperados = 3 if tipo == "triangular" else 2
+        if len(parametros) != esperados:
+            raise ValueError(f"A distribuição {tipo} requer {esperados} parâmetros")
+        if tipo in ("normal", "lognormal") and parametros[1] < 0:
+            raise ValueError(f"O desvio da distribuição de {caminho} não pode ser negativo")
+        if tipo == "lognormal" and parametros[0] <= 0:
+            raise ValueError(f"A média da distribuição lognormal de {caminho} deve ser positiva")
+        if tipo in ("uniforme", "triangular") and list(parametros) != sorted(parametros):
+            raise ValueError(f"Parâmetros da distribuição de {caminho} devem estar em ordem crescente")
+        self.distribuicoes.append((caminho, tipo, parametros, relativo))
+        return self
+
+    @staticmethod
+    def _sortear(gerador, tipo, parametros, tamanho):
+        """Sorteia os valores de uma distribuição."""
+        if tipo == "normal":
+            return gerador.normal(parametros[0], parametros[1], tamanho)
+        if tipo == "uniforme":
+            return gerador.uniform(parametros[0], parametros[1], tamanho)
+        if tipo == "triangular":
+            minimo, moda, maximo = parametros
+            if minimo == maximo:
+                return np.full(tamanho, minimo)
+            return gerador.triangular(minimo, moda, maximo, tamanho)
+        # Lognormal parametrizada pela média e desvio da própria variável
+        media, desvio = parametros
+        sigma2 = np.log(1 + (desvio / media) ** 2)
+        return gerador.lognormal(np.log(media) - sigma2 / 2, np.sqrt(sigma2), tamanho)
+
+    def _avaliar_bloco(self, carteira, anos, semente, tamanho):
+        """Sorteia e avalia um bloco de amostras."""
+        gerador = np.random.default_rng(semente)
+        n = len(carteira)
+
+        sobrescritas = {}
+        for caminho, tipo, parametros, relativo in self.distribuicoes:
+            valores = np.maximum(0, self._sortear(gerador, tipo, parametros, tamanho))[:, None]
+            if relativo:
+                if caminho in carteira.colunas:
+                    valores = valores * carteira.colunas[caminho]
+                else:
+                    valores = valores * resolver_caminho_parametro(caminho, self.lote.config)[1]
+            sobrescritas[caminho] = valores
+
+        faturamento = np.broadcast_to(sobrescritas.get("faturamento", carteira.colunas["faturamento"]),
+                                      (tamanho, n)).sum(axis=-1)
+        total = np.empty((tamanho, len(anos)))
+        for j, ano in enumerate(anos):
+            resultado = self.lote.calcular_ano(carteira, ano, sobrescritas)
+            total[:, j] = np.broadcast_to(resultado["total_devido"], (tamanho, n)).sum(axis=-1)
+        return total, faturamento
+
+    def executar(self, carteira, n_amostras, anos=None):
+        """Executa a simulação e retorna os totais da carteira por sorteio e ano."""
+        if n_amostras < 1:
+            raise ValueError("O número de amostras deve ser positivo")
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+        carteira.validar(self.lote.config)
+        # Compila os pacotes de ICMS antes de distribuir os blocos entre as threads
+        self.lote.particionar_por_pacote_icms(carteira)
+
+        tamanhos = [min(self.tamanho_bloco, n_amostras - inicio) for inicio in range(0, n_amostras, self.tamanho_bloco)]
+        sequencia = np.random.SeedSequence(self.semente)
+        sementes = sequencia.spawn(len(tamanhos))
+
+        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+            blocos = list(executor.map(lambda args: self._avaliar_bloco(carteira, anos, *args),
+                                       zip(sementes, tamanhos)))
+
+        total = np.concatenate([bloco[0] for bloco in blocos])
+        faturamento = np.concatenate([bloco[1] for bloco in blocos])
+        amostras = {
+            "total_devido": total,
+            "aliquota_efetiva": _dividir(total, faturamento[:, None])
+        }
+        return ResultadoMonteCarlo(anos, amostras, sequencia.entropy)
+
+
+def achatar_parametros(valor, prefixo=""):
+    """Gera pares (caminho, valor) para as folhas numéricas de dicionários e listas aninhados."""
+    if isinstance(valor, dict):
+        for chave, item in valor.items():
+            yield from achatar_parametros(item, f"{prefixo}{chave}.")
+    elif isinstance(valor, list):
+        for indice, item in enumerate(valor):
+            yield from achatar_parametros(item, f"{prefixo}{indice}.")
+    elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        yield prefixo.rstrip("."), float(valor)
+
+
+def diferencas_configuracao(base, variante):
+    """Converte uma configuração variante em sobrescritas por caminho em relação à base."""
+    secoes = ["aliquotas_base", "fase_transicao", "setores_especiais", "regras_credito",
+              "impostos_atuais", "creditos_cruzados", "icms_config"]
+    sobrescritas = {}
+    for secao in secoes:
+        if not hasattr(variante, secao):
+            continue
+        valores_base = dict(achatar_parametros(getattr(base, secao), f"{secao}."))
+        for caminho, valor in achatar_parametros(getattr(variante, secao), f"{secao}."):
+            if caminho not in valores_base:
+                print(f"Aviso: parâmetro {caminho} não existe na configuração base e foi ignorado")
+            elif valor != valores_base[caminho]:
+                sobrescritas[caminho] = valor
+    return sobrescritas
+
+
+class ResultadoCenarios:
+    """Cubo comparativo de cenários: métrica -> array (cenário, empresa, ano)."""
+
+    def __init__(self, cenarios, empresas, anos, cubo, estatisticas):
+        self.cenarios = list(cenarios)
+        self.empresas = list(empresas)
+        self.anos = list(anos)
+        self.cubo = cubo
+        self.estatisticas = estatisticas
+
+    def tabela(self, metrica, empresa=None):
+        """Tabela lado a lado (ano -> {cenário: valor}) para uma empresa ou para a carteira."""
+        if empresa is None:
+            if metrica == "aliquota_efetiva":
+                valores = _dividir(self.cubo["total_devido"].sum(axis=1), self.cubo["faturamento"].sum(axis=1))
+            else:
+                valores = self.cubo[metrica].sum(axis=1)
+        else:
+            if not isinstance(empresa, int):
+                empresa = self.empresas.index(empresa)
+            valores = self.cubo[metrica][:, empresa, :]
+
+        return {ano: {cenario: valores[i, j] for i, cenario in enumerate(self.cenarios)}
+                for j, ano in enumerate(self.anos)}
+
+    def diferencas(self, metrica, referencia):
+        """Diferença de cada cenário em relação ao cenário de referência, por empresa e ano."""
+        return self.cubo[metrica] - self.cubo[metrica][self.cenarios.index(referencia)]
+
+
+class ConjuntoCenarios:
+    """Avalia vários cenários sobre a mesma carteira, calculando apenas os estágios que diferem.
+
+    Cada cenário é um conjunto de sobrescritas por caminho. Os estágios do cálculo são
+    armazenados pela combinação de sobrescritas que efetivamente os afetam (ver
+    CalculadoraLote.DEPENDENCIAS_ESTAGIOS), de modo que cenários que só alteram alíquotas do
+    IVA reaproveitam os tributos atuais e vice-versa.
+    """
+
+    METRICAS_PADRAO = ["base_tributavel", "cbs", "ibs", "creditos", "imposto_devido", "ICMS",
+                       "impostos_atuais", "total_devido", "aliquota_efetiva"]
+
+    def __init__(self, calculadora_lote):
+        self.lote = calculadora_lote
+        self.cenarios = {}
+
+    def adicionar_cenario(self, nome, sobrescritas=None, configuracao=None):
+        """Adiciona um cenário a partir de sobrescritas e/ou de uma configuração variante."""
+        if nome in self.cenarios:
+            raise ValueError(f"Já existe um cenário chamado {nome}")
+        cenario = {}
+        if configuracao is not None:
+            cenario.update(diferencas_configuracao(self.lote.config, configuracao))
+        cenario.update(sobrescritas or {})
+        self.cenarios[nome] = cenario
+        return self
+
+    def executar(self, carteira, anos=None, metricas=None):
+        """Avalia todos os cenários e retorna o cubo comparativo."""
+        if not self.cenarios:
+            raise ValueError("Nenhum cenário foi definido")
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+        metricas = list(metricas or self.METRICAS_PADRAO)
+        carteira.validar(self.lote.config)
+
+        n = len(carteira)
+        cubo = {metrica: np.empty((len(self.cenarios), n, len(anos))) for metrica in metricas + ["faturamento"]}
+        cache = {}
+        for i, (nome, sobrescritas) in enumerate(self.cenarios.items()):
+            faturamento = np.broadcast_to(sobrescritas.get("faturamento", carteira.colunas["faturamento"]), (n,))
+            cubo["faturamento"][i] = faturamento[:, None]
+            for j, ano in enumerate(anos):
+                resultado = self.lote.calcular_ano(carteira, ano, sobrescritas, cache)
+                for metrica in metricas:
+                    cubo[metrica][i, :, j] = np.broadcast_to(resultado[metrica], (n,))
+
+        estatisticas = {
+            "estagios_solicitados": 3 * len(self.cenarios) * len(anos),
+            "estagios_calculados": len(cache)
+        }
+        return ResultadoCenarios(self.cenarios.keys(), carteira.nomes, anos, cubo, estatisticas)
+
+
+class _CacheRegistrado(dict):
+    """Cache de estágios que registra as chaves consultadas desde a última limpeza do registro."""
+
+    def __init__(self):
+        super().__init__()
+        self.consultadas = set()
+
+    def __getitem__(self, chave):
+        self.consultadas.add(chave)
+        return super().__getitem__(chave)
+
+
+class ArvoreCenarios:
+    """Árvore de cenários em que cada nó registra apenas a sua alteração em relação ao pai.
+
+    A alteração de um nó é formada por sobrescritas por caminho (como em ConjuntoCenarios) e
+    por incentivos do ICMS acrescentados ao pacote de cada empresa. O cenário efetivo de um nó
+    acumula as alterações de todo o caminho desde a raiz. Todos os nós compartilham o cache de
+    estágios de CalculadoraLote, que é indexado somente pelas sobrescritas que afetam cada
+    estágio: um ramo que só acrescenta incentivos reaproveita o IVA do pai, por exemplo. O cache
+    e os resultados persistem entre avaliações, de modo que editar uma folha recalcula apenas os
+    estágios dessa folha que a edição alcança.
+    """
+
+    METRICAS_PADRAO = ConjuntoCenarios.METRICAS_PADRAO
+
+    def __init__(self, calculadora_lote, carteira, anos=None, metricas=None, nome_raiz="Base"):
+        self.lote = calculadora_lote
+        self.anos = list(anos) if anos is not None else list(calculadora_lote.config.fase_transicao.keys())
+        self.metricas = list(metricas or self.METRICAS_PADRAO)
+        self.raiz = nome_raiz
+        self.nos = {nome_raiz: {"pai": None, "filhos": [], "sobrescritas": {}, "incentivos": {}}}
+        self.resultados = {}
+        self.estatisticas = {}
+        self.definir_carteira(carteira)
+
+    def definir_carteira(self, carteira):
+        """Substitui a carteira base, descartando o cache e todos os resultados."""
+        carteira.validar(self.lote.config)
+        self.carteira = carteira
+        self.cache = _CacheRegistrado()
+        self._carteiras = {}
+        self._chaves = {}
+        self.resultados = {}
+
+    def adicionar_no(self, nome, pai=None, sobrescritas=None, incentivos=None, configuracao=None):
+        """Adiciona um ramo sob o nó pai (a raiz, se omitido) com a alteração informada."""
+        pai = pai or self.raiz
+        if nome in self.nos:
+            raise ValueError(f"Já existe um cenário chamado {nome}")
+        if pai not in self.nos:
+            raise ValueError(f"Cenário pai desconhecido: {pai}")
+        self.nos[nome] = {"pai": pai, "filhos": [], "sobrescritas": {}, "incentivos": {}}
+        self.nos[pai]["filhos"].append(nome)
+        self.editar_no(nome, sobrescritas, incentivos, configuracao)
+        return self
+
+    def editar_no(self, nome, sobrescritas=None, incentivos=None, configuracao=None):
+        """Substitui a alteração do nó; ele e seus descendentes serão reavaliados."""
+        if nome not in self.nos:
+            raise ValueError(f"Cenário desconhecido: {nome}")
+        alteracao = {}
+        if configuracao is not None:
+            alteracao.update(diferencas_configuracao(self.lote.config, configuracao))
+        alteracao.update(sobrescritas or {})
+        incentivos = {lista: [dict(incentivo) for incentivo in lista_incentivos]
+                      for lista, lista_incentivos in (incentivos or {}).items() if lista_incentivos}
+        for lista in incentivos:
+            if lista not in SINAIS_INCENTIVOS_ICMS:
+                raise ValueError(f"Lista de incentivos desconhecida: {lista}")
+        self.nos[nome]["sobrescritas"] = alteracao
+        self.nos[nome]["incentivos"] = incentivos
+        for descendente in self.descendentes(nome):
+            self.resultados.pop(descendente, None)
+            self._chaves.pop(descendente, None)
+        return self
+
+    def renomear_no(self, nome, novo_nome):
+        """Renomeia o nó, preservando sua posição e os resultados já calculados."""
+        if nome not in self.nos:
+            raise ValueError(f"Cenário desconhecido: {nome}")
+        if novo_nome in self.nos:
+            raise ValueError(f"Já existe um cenário chamado {novo_nome}")
+        no = self.nos.pop(nome)
+        self.nos[novo_nome] = no
+        if no["pai"] is None:
+            self.raiz = novo_nome
+        else:
+            irmaos = self.nos[no["pai"]]["filhos"]
+            irmaos[irmaos.index(nome)] = novo_nome
+        for filho in no["filhos"]:
+            self.nos[filho]["pai"] = novo_nome
+        for registro in (self.resultados, self._chaves):
+            if nome in registro:
+                registro[novo_nome] = registro.pop(nome)
+
+    def remover_no(self, nome):
+        """Remove o nó e todos os seus descendentes."""
+        if nome == self.raiz:
+            raise ValueError("O cenário base não pode ser removido")
+        if nome not in self.nos:
+            raise ValueError(f"Cenário desconhecido: {nome}")
+        self.nos[self.nos[nome]["pai"]]["filhos"].remove(nome)
+        for descendente in self.descendentes(nome):
+            del self.nos[descendente]
+            self.resultados.pop(descendente, None)
+            self._chaves.pop(descendente, None)
+
+    def descendentes(self, nome):
+        """O nó e seus descendentes, em pré-ordem."""
+        nomes = [nome]
+        for filho in self.nos[nome]["filhos"]:
+            nomes.extend(self.descendentes(filho))
+        return nomes
+
+    def caminho(self, nome):
+        """Nós da raiz até o nó informado."""
+        caminho = []
+        while nome is not None:
+            caminho.append(nome)
+            nome = self.nos[nome]["pai"]
+        return caminho[::-1]
+
+    def cenario_efetivo(self, nome):
+        """Sobrescritas e incentivos acumulados ao longo do caminho até o nó."""
+        sobrescritas = {}
+        incentivos = {}
+        for no in self.caminho(nome):
+            sobrescritas.update(self.nos[no]["sobrescritas"])
+            for lista, adicionais in self.nos[no]["incentivos"].items():
+                incentivos.setdefault(lista, []).extend(adicionais)
+        return sobrescritas, incentivos
+
+    def _carteira_no(self, incentivos):
+        """Carteira base com os incentivos acumulados (reaproveitada entre nós iguais)."""
+        if not incentivos:
+            return self.carteira
+        chave = impressao_digital_icms({f"incentivos_{lista}": adicionais for lista, adicionais in incentivos.items()})
+        if chave not in self._carteiras:
+            self._carteiras[chave] = self.carteira.com_incentivos(incentivos, self.lote.config.icms_config)
+        return self._carteiras[chave]
+
+    def avaliar(self):
+        """Avalia os nós sem resultado e retorna {nome: {métrica: array (empresas, anos)}}."""
+        n = len(self.carteira)
+        existentes = len(self.cache)
+        reavaliados = []
+        for nome in self.descendentes(self.raiz):
+            if nome in self.resultados:
+                continue
+            sobrescritas, incentivos = self.cenario_efetivo(nome)
+            carteira = self._carteira_no(incentivos)
+            resultado = {metrica: np.empty((n, len(self.anos))) for metrica in self.metricas}
+            self.cache.consultadas = set()
+            for j, ano in enumerate(self.anos):
+                calculo = self.lote.calcular_ano(carteira, ano, sobrescritas, self.cache)
+                for metrica in self.metricas:
+                    resultado[metrica][:, j] = np.broadcast_to(calculo[metrica], (n,))
+            self.resultados[nome] = resultado
+            self._chaves[nome] = self.cache.consultadas
+            reavaliados.append(nome)
+
+        calculados = len(self.cache) - existentes
+        self.estatisticas = {
+            "nos_avaliados": reavaliados,
+            "estagios_solicitados": 3 * len(reavaliados) * len(self.anos),
+            "estagios_calculados": calculados,
+            "estagios_reaproveitados": 3 * len(reavaliados) * len(self.anos) - calculados
+        }
+        if reavaliados:
+            # Descarta estágios que nenhum nó atual utiliza (ex.: versões antigas de nós editados)
+            usadas = set().union(*self._chaves.values())
+            for chave in list(self.cache):
+                if chave not in usadas:
+                    del self.cache[chave]
+        return self.resultados
+
+    def diferenca(self, nome, metrica="total_devido"):
+        """Variação da métrica do nó em relação ao pai, por empresa e ano."""
+        pai = self.nos[nome]["pai"]
+        if pai is None:
+            return np.zeros_like(self.resultados[nome][metrica])
+        return self.resultados[nome][metrica] - self.resultados[pai][metrica]
+
+
+class OtimizadorIncentivos:
+    """Busca a combinação de incentivos do ICMS que minimiza a carga tributária do período.
+
+    Cada candidato fica de fora ou entra com um dos percentuais de operações permitidos,
+    respeitando o limite de 100% das operações em cada lista e a exclusividade entre incentivos
+    do mesmo programa. A busca é um branch-and-bound sobre a forma fechada do ICMS: o limite
+    inferior de um nó supõe que as operações ainda livres recebem o melhor fator entre os
+    candidatos restantes, e nós que não podem superar os melhores planos já encontrados são
+    descartados. O ICMS diferido é apenas adiado e continua devido: a busca minimiza o ICMS do
+    ano somado ao diferido, e o total do período de cada plano inclui o ICMS diferido, como na
+    FronteiraIncentivos. Como apenas o ICMS varia entre os planos e o total do período é não
+    decrescente nessa soma, os planos de menor ICMS são também os de menor total.
+    """
+
+    def __init__(self, calculadora_lote):
+        self.lote = calculadora_lote
+        self.candidatos = []
+
+    def adicionar_candidato(self, lista, tipo, percentual, operacoes=(1.0,), descricao=None, programa=None):
+        """Adiciona um incentivo candidato com os percentuais de operações (ou do saldo) admissíveis."""
+        if lista not in IncentivosICMSCompilados.LISTAS:
+            raise ValueError(f"Lista de incentivos desconhecida: {lista}")
+        if tipo not in SINAIS_INCENTIVOS_ICMS[lista]:
+            raise ValueError(f"O tipo {tipo} não se aplica aos incentivos de {lista}")
+        if not 0 < percentual <= 1:
+            raise ValueError(f"O percentual do incentivo {descricao or tipo} deve estar entre 0% e 100%")
+        operacoes = sorted({float(valor) for valor in operacoes})
+        if not operacoes or operacoes[0] <= 0 or operacoes[-1] > 1:
+            raise ValueError(f"Os percentuais de operações de {descricao or tipo} devem estar entre 0% e 100%")
+
+        self.candidatos.append({
+            "lista": lista,
+            "tipo": tipo,
+            "percentual": float(percentual),
+            "operacoes": operacoes,
+            "descricao": descricao or f"Candidato {len(self.candidatos) + 1}",
+            "programa": programa or None
+        })
+        return self
+
+    def _pacote(self, dados_empresa):
+        """Monta o pacote com todos os candidatos, na ordem em que foram adicionados."""
+        base = dados_empresa.get("icms_config") or self.lote.config.icms_config
+        icms_config = {
+            "aliquota_entrada": base.get("aliquota_entrada", 0.19),
+            "aliquota_saida": base.get("aliquota_saida", 0.19)
+        }
+        for lista in IncentivosICMSCompilados.LISTAS:
+            icms_config[f"incentivos_{lista}"] = []
+        for candidato in self.candidatos:
+            incentivos = icms_config[f"incentivos_{candidato['lista']}"]
+            candidato["indice"] = len(incentivos)
+            incentivos.append({"descricao": candidato["descricao"], "tipo": candidato["tipo"],
+                               "percentual": candidato["percentual"],
+                               "percentual_operacoes": candidato["operacoes"][-1]})
+        return icms_config
+
+    def _sobrescritas(self, escolhas):
+        """Percentuais de cada candidato para um lote de planos (0 = incentivo fora do plano)."""
+        sobrescritas = {}
+        for j, candidato in enumerate(self.candidatos):
+            chave = (candidato["lista"], candidato["indice"])
+            sobrescritas[chave + ("percentual",)] = np.where(escolhas[:, j] > 0, candidato["percentual"], 0.0)
+            sobrescritas[chave + ("percentual_operacoes",)] = escolhas[:, j]
+        return sobrescritas
+
+    @staticmethod
+    def _icms_com_diferido(pacote, faturamento, custos, coeficientes):
+        """ICMS devido no ano somado ao ICMS diferido, que continua devido."""
+        avaliacao = pacote.avaliar(faturamento, custos, coeficientes)
+        return avaliacao["icms_devido"] + avaliacao["valor_diferido"]
+
+    def _fatores_restantes(self):
+        """Melhor fator possível dos candidatos ainda não decididos após cada nível da busca."""
+        k = len(self.candidatos)
+        fator_saida = np.ones(k + 1)
+        fator_entrada = np.ones(k + 1)
+        reducao_apuracao = np.zeros(k + 1)
+        for j in range(k - 1, -1, -1):
+            candidato = self.candidatos[j]
+            fator = 1 + SINAIS_INCENTIVOS_ICMS[candidato["lista"]][candidato["tipo"]] * candidato["percentual"]
+            if candidato["tipo"] == "Diferimento":
+                # O débito diferido volta ao objetivo: o diferimento não reduz o ICMS
+                fator = 1.0
+            fator_saida[j] = fator_saida[j + 1]
+            fator_entrada[j] = fator_entrada[j + 1]
+            reducao_apuracao[j] = reducao_apuracao[j + 1]
+            if candidato["lista"] == "saida":
+                fator_saida[j] = min(fator_saida[j], fator)
+            elif candidato["lista"] == "entrada":
+                fator_entrada[j] = max(fator_entrada[j], fator)
+            else:
+                reducao_apuracao[j] += max(0.0, (fator - 1) * candidato["operacoes"][-1])
+        # Índice j + 1: candidatos posteriores ao nível j
+        return fator_saida[1:], fator_entrada[1:], reducao_apuracao[1:]
+
+    def otimizar(self, dados_empresa, anos=None, melhores=5):
+        """Retorna os melhores planos (menor total no período) e a economia de cada um."""
+        if not self.candidatos:
+            raise ValueError("Nenhum incentivo candidato foi definido")
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+
+        icms_config = self._pacote(dados_empresa)
+        pacote = IncentivosICMSCompilados(icms_config)
+        carteira = CarteiraEmpresas.de_dados([dict(dados_empresa, icms_config=icms_config)])
+        carteira.validar(self.lote.config)
+        faturamento = float(carteira.colunas["faturamento"][0])
+        custos = float(carteira.colunas["custos_tributaveis"][0])
+
+        k = len(self.candidatos)
+        programas = sorted({c["programa"] for c in self.candidatos if c["programa"]})
+        fator_saida, fator_entrada, reducao_restante = self._fatores_restantes()
+
+        # Fronteira da busca: escolhas por candidato, operações usadas por lista e programas usados
+        escolhas = np.zeros((1, k))
+        operacoes_usadas = np.zeros((1, 2))
+        programas_usados = np.zeros((1, len(programas)), dtype=bool)
+        planos = escolhas.copy()
+        icms_planos = self._icms_com_diferido(pacote, faturamento, custos,
+                                              pacote.coeficientes(self._sobrescritas(escolhas)))
+        avaliados = podados = 0
+
+        for j, candidato in enumerate(self.candidatos):
+            opcoes = np.array([0.0] + candidato["operacoes"])
+            filhos = np.repeat(escolhas, len(opcoes), axis=0)
+            valores = np.tile(opcoes, len(escolhas))
+            filhos[:, j] = valores
+            usadas = np.repeat(operacoes_usadas, len(opcoes), axis=0)
+            usados = np.repeat(programas_usados, len(opcoes), axis=0)
+
+            viaveis = np.ones(len(filhos), dtype=bool)
+            if candidato["lista"] != "apuracao":
+                coluna = IncentivosICMSCompilados.LISTAS.index(candidato["lista"])
+                usadas[:, coluna] += valores
+                viaveis &= usadas[:, coluna] <= 1 + 1e-12
+            if candidato["programa"]:
+                coluna = programas.index(candidato["programa"])
+                viaveis &= ~(usados[:, coluna] & (valores > 0))
+                usados[:, coluna] |= valores > 0
+            filhos, valores, usadas, usados = filhos[viaveis], valores[viaveis], usadas[viaveis], usados[viaveis]
+
+            coeficientes = pacote.coeficientes(self._sobrescritas(filhos))
+            icms = self._icms_com_diferido(pacote, faturamento, custos, coeficientes)
+            avaliados += len(filhos)
+
+            # Filhos que incluem o candidato são planos novos; os demais repetem o plano do pai
+            novos = valores > 0
+            planos = np.vstack([planos, filhos[novos]])
+            icms_planos = np.concatenate([icms_planos, icms[novos]])
+            # Mantidos em ordem crescente: o último é o corte da poda
+            ordem = np.argsort(icms_planos, kind="stable")[:melhores]
+            planos, icms_planos = planos[ordem], icms_planos[ordem]
+            if j == k - 1:
+                break
+
+            # Limite inferior: operações livres recebem o melhor fator dos candidatos restantes
+            cobertura_saida = np.minimum(coeficientes["saida_residual"], np.maximum(0.0, 1 - usadas[:, 0]))
+            cobertura_entrada = np.minimum(coeficientes["entrada_residual"], np.maximum(0.0, 1 - usadas[:, 1]))
+            debito = faturamento * coeficientes["aliquota_saida"] * (
+                coeficientes["saida_incentivada"] + coeficientes["saida_residual"] -
+                cobertura_saida * (1 - fator_saida[j]))
+            credito = custos * coeficientes["aliquota_entrada"] * (
+                coeficientes["entrada_incentivada"] + coeficientes["entrada_residual"] +
+                cobertura_entrada * (fator_entrada[j] - 1))
+            limite_inferior = np.maximum(0, debito - credito) * np.maximum(
+                0, 1 - coeficientes["reducao_apuracao"] - reducao_restante[j])
+            limite_inferior = limite_inferior + faturamento * coeficientes["aliquota_saida"] * coeficientes["saida_diferida"]
+
+            manter = np.ones(len(filhos), dtype=bool)
+            if len(planos) >= melhores:
+                corte = icms_planos[-1]
+                manter = limite_inferior < corte - 1e-9 * max(1.0, abs(corte))
+            podados += int((~manter).sum())
+            escolhas, operacoes_usadas, programas_usados = filhos[manter], usadas[manter], usados[manter]
+            if not len(escolhas):
+                break
+
+        # Avaliação exata dos melhores planos (e do cenário sem incentivos) no período
+        lotes = np.vstack([np.zeros((1, k)), planos])
+        sobrescritas = {}
+        for (lista, indice, campo), valor in self._sobrescritas(lotes).items():
+            sobrescritas[f"icms_config.incentivos_{lista}.{indice}.{campo}"] = valor[:, None]
+        resultados = self.lote.calcular_comparativo(carteira, anos, sobrescritas)
+        diferidos = np.stack([np.broadcast_to(resultados[ano]["icms_diferido"], (len(lotes), 1))[:, 0]
+                              for ano in anos], axis=-1)
+        totais = np.stack([resultados[ano]["total_devido"][:, 0] for ano in anos], axis=-1) + diferidos
+        icms_anos = np.stack([resultados[ano]["ICMS"][:, 0] for ano in anos], axis=-1) + diferidos
+
+        lista_planos = []
+        for i, plano in enumerate(planos, start=1):
+            incentivos = [dict(descricao=c["descricao"], lista=c["lista"], tipo=c["tipo"], percentual=c["percentual"],
+                               percentual_operacoes=float(plano[j]), programa=c["programa"])
+                          for j, c in enumerate(self.candidatos) if plano[j] > 0]
+            lista_planos.append({
+                "incentivos": incentivos,
+                "icms": float(icms_planos[i - 1]),
+                "icms_periodo": float(icms_anos[i].sum()),
+                "icms_diferido_periodo": float(diferidos[i].sum()),
+                "total_periodo": float(totais[i].sum()),
+                "por_ano": {ano: float(totais[i, j]) for j, ano in enumerate(anos)},
+                "economia": float(totais[0].sum() - totais[i].sum())
+            })
+        lista_planos.sort(key=lambda plano: plano["total_periodo"])
+
+        return {
+            "planos": lista_planos,
+            "sem_incentivos": {"total_periodo": float(totais[0].sum()),
+                               "por_ano": {ano: float(totais[0, j]) for j, ano in enumerate(anos)}},
+            "nos_avaliados": avaliados,
+            "nos_podados": podados,
+            "combinacoes": int(np.prod([len(c["operacoes"]) + 1 for c in self.candidatos], dtype=float))
+        }
+
+
+class ResultadoFronteira:
+    """Planos não dominados entre a carga total do período e o maior desembolso anual."""
+
+    def __init__(self, anos, planos, nuvem, estatisticas):
+        self.anos = list(anos)
+        self.planos = planos
+        self.nuvem = nuvem
+        self.estatisticas = estatisticas
+
+
+class FronteiraIncentivos(OtimizadorIncentivos):
+    """Fronteira de Pareto entre carga tributária total e pico de desembolso anual.
+
+    Os candidatos são os mesmos do OtimizadorIncentivos, acrescidos de escolhas de mix de
+    custos (fração de uma coluna de custos transferida para outra). O ICMS diferido sai do
+    imposto do ano, mas é pago prazo_diferimento anos depois: conta integralmente na carga
+    total e entra no desembolso do ano da quitação (quando cair dentro do período). Os planos
+    são enumerados (ou sorteados, se forem muitos) e avaliados em lotes vetorizados, e apenas
+    os não dominados são mantidos a cada lote.
+    """
+
+    def __init__(self, calculadora_lote, tamanho_lote=4096, max_planos=200_000, semente=None):
+        super().__init__(calculadora_lote)
+        self.tamanho_lote = tamanho_lote
+        self.max_planos = max_planos
+        self.semente = semente
+        self.mixes = []
+
+    def adicionar_mix_custos(self, origem, destino, fracoes, descricao=None):
+        """Adiciona a escolha da fração dos custos de origem transferida para a coluna de destino."""
+        for campo in (origem, destino):
+            if campo not in CarteiraEmpresas.CAMPOS_NUMERICOS:
+                raise ValueError(f"Coluna de custos desconhecida: {campo}")
+        fracoes = sorted({float(fracao) for fracao in fracoes})
+        if not fracoes or fracoes[0] < 0 or fracoes[-1] > 1:
+            raise ValueError("As frações do mix de custos devem estar entre 0% e 100%")
+        self.mixes.append({"origem": origem, "destino": destino, "fracoes": fracoes,
+                           "descricao": descricao or f"{origem} → {destino}"})
+        return self
+
+    @staticmethod
+    def filtrar_nao_dominados(total, pico):
+        """Índices dos pontos não dominados (menor total e menor pico), ordenados pelo total."""
+        ordem = np.lexsort((pico, total))
+        pico_ordenado = pico[ordem]
+        # Um ponto é mantido se seu pico é menor que o de todos os pontos de total menor ou igual
+        minimo_anterior = np.concatenate([[np.inf], np.minimum.accumulate(pico_ordenado)[:-1]])
+        return ordem[pico_ordenado < minimo_anterior]
+
+    def _decodificar(self, indices, dimensoes):
+        """Converte índices de planos em dígitos (uma escolha por candidato ou mix)."""
+        passos = np.cumprod([1] + dimensoes[:-1], dtype=np.int64)
+        return (indices[:, None] // passos) % np.asarray(dimensoes, dtype=np.int64)
+
+    def explorar(self, dados_empresa, anos=None, prazo_diferimento=1, tamanho_nuvem=5000):
+        """Avalia os planos e retorna a fronteira de Pareto (ResultadoFronteira)."""
+        if not self.candidatos and not self.mixes:
+            raise ValueError("Nenhum incentivo candidato ou mix de custos foi definido")
+        if anos is None:
+            anos = list(self.lote.config.fase_transicao.keys())
+
+        icms_config = self._pacote(dados_empresa)
+        carteira = CarteiraEmpresas.de_dados([dict(dados_empresa, icms_config=icms_config)])
+        carteira.validar(self.lote.config)
+
+        k = len(self.candidatos)
+        opcoes = [[0.0] + candidato["operacoes"] for candidato in self.candidatos]
+        dimensoes = [len(valores) for valores in opcoes] + [len(mix["fracoes"]) for mix in self.mixes]
+        combinacoes = int(np.prod(dimensoes, dtype=float))
+        programas = sorted({c["programa"] for c in self.candidatos if c["programa"]})
+        gerador = np.random.default_rng(self.semente)
+
+        if combinacoes <= self.max_planos:
+            todos = np.arange(combinacoes, dtype=np.int64)
+            lotes = [todos[inicio:inicio + self.tamanho_lote] for inicio in range(0, combinacoes, self.tamanho_lote)]
+            digitos_lotes = (self._decodificar(indices, dimensoes) for indices in lotes)
+        else:
+            # Espaço grande demais: planos sorteados uniformemente (sem repetição)
+            sorteados = np.unique(np.column_stack([gerador.integers(0, d, self.max_planos) for d in dimensoes]), axis=0)
+            digitos_lotes = (sorteados[inicio:inicio + self.tamanho_lote]
+                             for inicio in range(0, len(sorteados), self.tamanho_lote))
+
+        arquivo_digitos = np.zeros((0, len(dimensoes)), dtype=np.int64)
+        arquivo_total = np.zeros(0)
+        arquivo_pico = np.zeros(0)
+        arquivo_caixa = np.zeros((0, len(anos)))
+        nuvem = []
+        avaliados = viaveis = 0
+
+        for digitos in digitos_lotes:
+            avaliados += len(digitos)
+            escolhas = np.column_stack([np.asarray(opcoes[j])[digitos[:, j]] for j in range(k)]) if k else \
+                np.zeros((len(digitos), 0))
+
+            # Restrições: operações por lista até 100% e um incentivo por programa
+            validos = np.ones(len(digitos), dtype=bool)
+            for lista in ("saida", "entrada"):
+                colunas = [j for j, c in enumerate(self.candidatos) if c["lista"] == lista]
+                if colunas:
+                    validos &= escolhas[:, colunas].sum(axis=1) <= 1 + 1e-12
+            for programa in programas:
+                colunas = [j for j, c in enumerate(self.candidatos) if c["programa"] == programa]
+                validos &= (escolhas[:, colunas] > 0).sum(axis=1) <= 1
+            digitos, escolhas = digitos[validos], escolhas[validos]
+            if not len(digitos):
+                continue
+            viaveis += len(digitos)
+
+            sobrescritas = {}
+            for (lista, indice, campo), valor in self._sobrescritas(escolhas).items():
+                sobrescritas[f"icms_config.incentivos_{lista}.{indice}.{campo}"] = valor[:, None]
+            for m, mix in enumerate(self.mixes):
+                fracao = np.asarray(mix["fracoes"])[digitos[:, k + m]][:, None]
+                origem = sobrescritas.get(mix["origem"], carteira.colunas[mix["origem"]])
+                destino = sobrescritas.get(mix["destino"], carteira.colunas[mix["destino"]])
+                sobrescritas[mix["destino"]] = destino + origem * fracao
+                sobrescritas[mix["origem"]] = origem * (1 - fracao)
+
+            cache = {}
+            devido = np.empty((len(digitos), len(anos)))
+            diferido = np.empty((len(digitos), len(anos)))
+            for j, ano in enumerate(anos):
+                resultado = self.lote.calcular_ano(carteira, ano, sobrescritas, cache)
+                devido[:, j] = np.broadcast_to(resultado["total_devido"], (len(digitos), 1))[:, 0]
+                diferido[:, j] = np.broadcast_to(resultado["icms_diferido"], (len(digitos), 1))[:, 0]
+
+            # Desembolso: imposto do ano mais o ICMS diferido quitado no ano
+            caixa = devido.copy()
+            if prazo_diferimento < len(anos):
+                caixa[:, prazo_diferimento:] += diferido[:, :len(anos) - prazo_diferimento]
+            total = devido.sum(axis=1) + diferido.sum(axis=1)
+            pico = caixa.max(axis=1)
+
+            nuvem.append(np.column_stack([total, pico]))
+
+            # Arquivo incremental: apenas pontos não dominados sobrevivem
+            arquivo_digitos = np.vstack([arquivo_digitos, digitos])
+            arquivo_total = np.concatenate([arquivo_total, total])
+            arquivo_pico = np.concatenate([arquivo_pico, pico])
+            arquivo_caixa = np.vstack([arquivo_caixa, caixa])
+            manter = self.filtrar_nao_dominados(arquivo_total, arquivo_pico)
+            arquivo_digitos, arquivo_total = arquivo_digitos[manter], arquivo_total[manter]
+            arquivo_pico, arquivo_caixa = arquivo_pico[manter], arquivo_caixa[manter]
+
+        planos = []
+        for digitos, total, pico, caixa in zip(arquivo_digitos, arquivo_total, arquivo_pico, arquivo_caixa):
+            incentivos = [dict(descricao=c["descricao"], lista=c["lista"], tipo=c["tipo"], percentual=c["percentual"],
+                               percentual_operacoes=opcoes[j][digitos[j]], programa=c["programa"])
+                          for j, c in enumerate(self.candidatos) if digitos[j] > 0]
+            mixes = [dict(descricao=mix["descricao"], origem=mix["origem"], destino=mix["destino"],
+                          fracao=mix["fracoes"][digitos[k + m]])
+                     for m, mix in enumerate(self.mixes)]
+            planos.append({"incentivos": incentivos, "mixes": mixes, "total": float(total), "pico": float(pico),
+                           "desembolso": {ano: float(caixa[j]) for j, ano in enumerate(anos)}})
+
+        # Amostra dos planos avaliados, para mostrar a região dominada no gráfico
+        nuvem = np.vstack(nuvem) if nuvem else np.zeros((0, 2))
+        if len(nuvem) > tamanho_nuvem:
+            nuvem = nuvem[gerador.choice(len(nuvem), tamanho_nuvem, replace=False)]
+        estatisticas = {"combinacoes": combinacoes, "avaliados": avaliados, "viaveis": viaveis,
+                        "amostral": combinacoes > self.max_planos}
+        return ResultadoFronteira(anos, planos, nuvem, estatisticas)
+
+
+class GraficoMatplotlib(FigureCanvas):
+    """Widget para exibir gráficos usando Matplotlib."""
+    
+    def __init__(self, parent=None, width=5, height=4, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.axes = self.fig.add_subplot(111)
+        
+        super(GraficoMatplotlib, self).__init__(self.fig)
+        self.setParent(parent)
+    
+    def plotar_comparativo(self, dados, titulo=None):
+        """Plota um gráfico comparativo dos impostos por ano."""
+        self.axes.clear()
+        
+        anos = list(dados.keys())
+        cbs_valores = [dados[ano]["cbs"] for ano in anos]
+        ibs_valores = [dados[ano]["ibs"] for ano in anos]
+        creditos = [dados[ano]["creditos"] for ano in anos]
+        liquido = [dados[ano]["imposto_devido"] for ano in anos]
+        
+        x = range(len(anos))
+        largura = 0.2
+        
+        # Barras guardadas para a atualização rápida durante o ajuste interativo
+        self._barras_comparativo = {
+            "cbs": self.axes.bar([i - largura*1.5 for i in x], cbs_valores, width=largura, label='CBS', color='#3498db'),
+            "ibs": self.axes.bar([i - largura*0.5 for i in x], ibs_valores, width=largura, label='IBS', color='#2ecc71'),
+            "creditos": self.axes.bar([i + largura*0.5 for i in x], creditos, width=largura, label='Créditos', color='#e74c3c'),
+            "imposto_devido": self.axes.bar([i + largura*1.5 for i in x], liquido, width=largura, label='Imposto Devido',
+                                            color='#f39c12')
+        }
+        
+        self.axes.set_xticks(x)
+        self.axes.set_xticklabels(anos)
+        self.axes.set_ylabel('Valor (R$)')
+        self.axes.set_xlabel('Ano')
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend()
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+        
+        self.fig.tight_layout()
+        self.draw()
+    
+    def plotar_aliquotas_efetivas(self, dados, titulo=None):
+        """Plota a evolução das alíquotas efetivas ao longo dos anos."""
+        self.axes.clear()
+        
+        anos = list(dados.keys())
+        aliquotas_efetivas = [dados[ano]["aliquota_efetiva"] * 100 for ano in anos]
+        
+        self._linha_aliquotas, = self.axes.plot(anos, aliquotas_efetivas, 'o-', linewidth=2, markersize=8, color='#9b59b6')
+        
+        self.axes.set_ylabel('Alíquota Efetiva (%)')
+        self.axes.set_xlabel('Ano')
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+        
+        # Adicionar valores nos pontos
+        self._rotulos_aliquotas = [self.axes.text(anos[i], v + 0.5, f"{v:.2f}%", ha='center')
+                                   for i, v in enumerate(aliquotas_efetivas)]
+        
+        self.fig.tight_layout()
+        self.draw()
+
+    def atualizar_comparativo_rapido(self, dados):
+        """Atualiza as alturas das barras do comparativo sem redesenhar o gráfico (mesmos anos)."""
+        barras = getattr(self, '_barras_comparativo', None)
+        anos = list(dados.keys())
+        if not barras or len(barras["cbs"]) != len(anos):
+            self.plotar_comparativo(dados)
+            return
+        for metrica, conjunto in barras.items():
+            for barra, ano in zip(conjunto, anos):
+                barra.set_height(dados[ano][metrica])
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.draw_idle()
+
+    def atualizar_aliquotas_rapido(self, dados):
+        """Atualiza a curva de alíquotas efetivas sem redesenhar o gráfico (mesmos anos)."""
+        linha = getattr(self, '_linha_aliquotas', None)
+        anos = list(dados.keys())
+        if linha is None or list(linha.get_xdata()) != anos:
+            self.plotar_aliquotas_efetivas(dados)
+            return
+        aliquotas_efetivas = [dados[ano]["aliquota_efetiva"] * 100 for ano in anos]
+        linha.set_ydata(aliquotas_efetivas)
+        for rotulo, ano, valor in zip(self._rotulos_aliquotas, anos, aliquotas_efetivas):
+            rotulo.set_position((ano, valor + 0.5))
+            rotulo.set_text(f"{valor:.2f}%")
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.draw_idle()
+
+    def plotar_mapa_calor(self, valores_x, valores_y, matriz, rotulo_x, rotulo_y, rotulo_valor,
+                          titulo=None, curvas_nivel=False):
+        """Plota uma grade de resultados como mapa de calor ou curvas de nível."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        if curvas_nivel and len(valores_x) > 1 and len(valores_y) > 1:
+            preenchido = self.axes.contourf(valores_x, valores_y, matriz, levels=12, cmap='viridis')
+            linhas = self.axes.contour(valores_x, valores_y, matriz, levels=12, colors='k', linewidths=0.5)
+            self.axes.clabel(linhas, inline=True, fontsize=7, fmt=lambda v: formatar_br(v))
+            barra = self.fig.colorbar(preenchido, ax=self.axes)
+        else:
+            malha = self.axes.pcolormesh(valores_x, valores_y, matriz, shading='nearest', cmap='viridis')
+            barra = self.fig.colorbar(malha, ax=self.axes)
+        barra.set_label(rotulo_valor)
+
+        self.axes.set_xlabel(rotulo_x)
+        self.axes.set_ylabel(rotulo_y)
+        if titulo:
+            self.axes.set_title(titulo)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_curva_parametro(self, valores_x, valores_y, rotulo_x, rotulo_y, titulo=None):
+        """Plota a resposta de uma métrica à variação de um único parâmetro."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        self.axes.plot(valores_x, valores_y, 'o-', linewidth=2, markersize=4, color='#3498db')
+        self.axes.set_xlabel(rotulo_x)
+        self.axes.set_ylabel(rotulo_y)
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_leque(self, anos, percentis, quantis, rotulo_y, titulo=None):
+        """Plota um gráfico em leque com as faixas de percentis por ano."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        # Faixas simétricas, da mais externa para a mais interna
+        n_faixas = len(quantis) // 2
+        for i in range(n_faixas):
+            alpha = 0.15 + 0.25 * i / max(1, n_faixas - 1)
+            self.axes.fill_between(anos, percentis[i], percentis[-1 - i], color='#3498db', alpha=alpha,
+                                   label=f"P{quantis[i]}–P{quantis[-1 - i]}")
+        if len(quantis) % 2:
+            self.axes.plot(anos, percentis[n_faixas], 'o-', color='#2c3e50', linewidth=2,
+                           label=f"Mediana (P{quantis[n_faixas]})")
+
+        self.axes.set_xlabel('Ano')
+        self.axes.set_ylabel(rotulo_y)
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend()
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_busca_meta(self, valores_x, valores_y, alvo, solucao, rotulo_x, rotulo_y, titulo=None):
+        """Plota a curva da métrica em função da variável, com a meta e a solução encontrada."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        self.axes.plot(valores_x, valores_y, '-', linewidth=2, color='#3498db', label=rotulo_y)
+        self.axes.axhline(alvo, color='#e74c3c', linestyle='--', label='Meta')
+        if solucao is not None:
+            self.axes.axvline(solucao, color='#2ecc71', linestyle=':')
+            self.axes.plot([solucao], [alvo], 'o', color='#2ecc71', markersize=8, label='Solução')
+
+        self.axes.set_xlabel(rotulo_x)
+        self.axes.set_ylabel(rotulo_y)
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend()
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_cenarios(self, anos, series, rotulo_y, titulo=None):
+        """Plota a evolução de uma métrica por ano para vários cenários."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        for nome, valores in series.items():
+            self.axes.plot(anos, valores, 'o-', linewidth=2, markersize=5, label=nome)
+
+        self.axes.set_xlabel('Ano')
+        self.axes.set_ylabel(rotulo_y)
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend()
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_apuracao_mensal(self, rotulos, devido, saldo_iva, saldo_icms, titulo=None, em_ressarcimento=None):
+        """Plota o total devido de cada mês e a evolução dos saldos credores transportados."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        posicoes = np.arange(len(rotulos))
+        self.axes.bar(posicoes, devido, color='#3498db', label='Total Devido')
+        self.axes.plot(posicoes, saldo_iva, 'o-', color='#27ae60', linewidth=2, markersize=3,
+                       label='Saldo Credor do IVA')
+        self.axes.plot(posicoes, saldo_icms, 's-', color='#e67e22', linewidth=2, markersize=3,
+                       label='Saldo Credor do ICMS')
+        if em_ressarcimento is not None and any(em_ressarcimento):
+            self.axes.plot(posicoes, em_ressarcimento, '^-', color='#8e44ad', linewidth=2, markersize=3,
+                           label='Em Ressarcimento')
+
+        # Rótulos trimestrais ou semestrais em períodos longos, para não sobrepor os meses
+        passo = 1 if len(rotulos) <= 24 else 3 if len(rotulos) <= 48 else 6
+        self.axes.set_xticks(posicoes[::passo])
+        self.axes.set_xticklabels(rotulos[::passo], rotation=45, ha='right')
+        self.axes.set_ylabel('Valor (R$)')
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend(loc='upper left')
+        self.axes.grid(True, axis='y', linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_caixa_diario(self, dias, series, titulo=None):
+        """Plota posições diárias de caixa (uma linha por modelo)."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        for nome, valores in series.items():
+            self.axes.plot(dias, valores, linewidth=1.5, label=nome)
+        self.axes.axhline(0, color='black', linewidth=0.8)
+
+        self.fig.autofmt_xdate()
+        self.axes.set_ylabel('Saldo de Caixa (R$)')
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend(loc='upper left')
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_tornado(self, impactos, base, rotulo_metrica, titulo=None):
+        """Plota o gráfico de tornado: variação da métrica com cada parâmetro no valor baixo e no alto."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        # Maior amplitude no topo
+        impactos = list(reversed(impactos))
+        posicoes = range(len(impactos))
+        rotulos = [item["rotulo"] for item in impactos]
+        self.axes.barh(posicoes, [item["delta_baixo"] for item in impactos], color='#3498db', label='Valor baixo')
+        self.axes.barh(posicoes, [item["delta_alto"] for item in impactos], color='#e67e22', label='Valor alto')
+        self.axes.axvline(0, color='black', linewidth=0.8)
+        self.axes.set_yticks(list(posicoes))
+        self.axes.set_yticklabels(rotulos)
+        self.axes.set_xlabel(f"Variação de {rotulo_metrica} em relação à base (R$ {formatar_br(base)})")
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend(loc='lower right')
+        self.axes.grid(True, axis='x', linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_fronteira(self, resultado, selecionado=None, titulo=None):
+        """Plota os planos avaliados e a fronteira de Pareto (pontos clicáveis)."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        if len(resultado.nuvem):
+            self.axes.scatter(resultado.nuvem[:, 0], resultado.nuvem[:, 1], s=8, color='#bdc3c7',
+                              alpha=0.6, label='Planos avaliados')
+        totais = [plano["total"] for plano in resultado.planos]
+        picos = [plano["pico"] for plano in resultado.planos]
+        self.axes.step(totais, picos, where='post', color='#2980b9', linewidth=1)
+        pontos = self.axes.scatter(totais, picos, s=40, color='#2980b9', zorder=3, picker=5,
+                                   label='Planos não dominados')
+        pontos.set_gid("fronteira")
+        if selecionado is not None:
+            self.axes.scatter([totais[selecionado]], [picos[selecionado]], s=140, facecolors='none',
+                              edgecolors='#e74c3c', linewidths=2, zorder=4, label='Plano selecionado')
+
+        self.axes.set_xlabel(f'Carga Total {resultado.anos[0]}-{resultado.anos[-1]} (R$)')
+        self.axes.set_ylabel('Maior Desembolso Anual (R$)')
+        if titulo:
+            self.axes.set_title(titulo)
+        self.axes.legend(loc='upper right')
+        self.axes.grid(True, linestyle='--', alpha=0.7)
+
+        self.fig.tight_layout()
+        self.draw()
+
+    def plotar_atribuicao_incentivos(self, atribuicao, titulo=None):
+        """Plota a economia de ICMS atribuída a cada incentivo (valor de Shapley)."""
+        self.fig.clear()
+        self.axes = self.fig.add_subplot(111)
+
+        nomes_listas = {"saida": "Saída", "entrada": "Entrada", "apuracao": "Apuração"}
+        rotulos = [f"{incentivo['descricao']} ({nomes_listas[incentivo['lista']]})"
+                   for incentivo in atribuicao["incentivos"]]
+        valores = [incentivo["shapley"] for incentivo in atribuicao["incentivos"]]
+
+        if all(valor >= 0 for valor in valores) and sum(valores) > 0:
+            self.axes.pie(valores, labels=rotulos, autopct='%1.1f%%', startangle=90)
+            self.axes.axis('equal')
+        else:
+            # Incentivos que aumentam o ICMS (ex.: estorno de crédito) têm contribuição negativa
+            cores = ['#2ecc71' if valor >= 0 else '#e74c3c' for valor in valores]
+            self.axes.barh(rotulos, valores, color=cores)
+            self.axes.axvline(0, color='black', linewidth=0.8)
+            self.axes.set_xlabel('Economia Atribuída (R$)')
+            self.axes.grid(True, axis='x', linestyle='--', alpha=0.7)
+
+        if titulo:
+            self.axes.set_title(titulo)
+
+        self.fig.tight_layout()
+        self.draw()
+
+class InterfaceSimulador(QMainWindow):
+    """Interface gráfica do simulador de reforma tributária."""
+
+    # Controles deslizantes da aba Simulação: caminho -> (rótulo, campo da interface, escala do campo)
+    CONTROLES_DESLIZANTES = {
+        "faturamento": ("Faturamento", "campo_faturamento", 1),
+        "custos_tributaveis": ("Custos Tributáveis", "campo_custos", 1),
+        "custos_simples": ("Custos do Simples", "campo_custos_simples", 1),
+        "icms_config.aliquota_entrada": ("Alíquota ICMS Entrada", "campo_aliquota_entrada", 100),
+        "icms_config.aliquota_saida": ("Alíquota ICMS Saída", "campo_aliquota_saida", 100)
+    }
+    RESOLUCAO_SLIDERS = 1000
+    MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+    # Parâmetros que podem mudar em uma data (valores em fração, exibidos em %)
+    PARAMETROS_VIGENCIA = {
+        "fase_transicao": "Fase de Transição do IVA",
+        "creditos_cruzados.IBS_para_ICMS": "Crédito Cruzado IBS → ICMS",
+        "aliquotas_base.CBS": "Alíquota Base da CBS",
+        "icms_config.aliquota_saida": "Alíquota ICMS Saída",
+        "icms_config.aliquota_entrada": "Alíquota ICMS Entrada",
+        "reducao_impostos_transicao.ICMS": "Redução do ICMS (cronograma de incentivos)"
+    }
+    
+    def __init__(self, calculadora):
+        super().__init__()
+        
+        self.calculadora = calculadora
+        self.resultados = {}
+        
+        self.setWindowTitle("Simulador da Reforma Tributária - IVA Dual (CBS/IBS)")
+        self.setGeometry(100, 100, 1200, 800)
+        
+        self.init_ui()
+
+    def init_ui(self):
+        """Inicializa a interface gráfica."""
+        # Widget central
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+
+        # Layout principal (vertical)
+        layout_principal = QVBoxLayout(central_widget)
+
+        # Abas para organizar a interface
+        tabs = QTabWidget()
+        layout_principal.addWidget(tabs)
+
+        # Tab de Simulação
+        tab_simulacao = QWidget()
+        tabs.addTab(tab_simulacao, "Simulação")
+
+        # Tab de Configurações
+        tab_configuracoes = QWidget()
+        tabs.addTab(tab_configuracoes, "Configurações")
+
+        # Tab de Memória de Cálculo (NOVA)
+        tab_memoria_calculo = QWidget()
+        tabs.addTab(tab_memoria_calculo, "Memória de Cálculo")
+
+        # Tab de Análises Avançadas
+        tab_analises = QWidget()
+        tabs.addTab(tab_analises, "Análises Avançadas")
+
+        # Tab de Ajuda
+        tab_ajuda = QWidget()
+        tabs.addTab(tab_ajuda, "Ajuda e Documentação")
+
+        # Configuração da aba de simulação
+        self.configurar_aba_simulacao(tab_simulacao)
+
+        # Configuração da aba de configurações
+        self.configurar_aba_configuracoes(tab_configuracoes)
+
+        # Configuração da aba de memória de cálculo (NOVA)
+        self.configurar_aba_memoria_calculo(tab_memoria_calculo)
+
+        # Configuração da aba de análises avançadas
+        self.configurar_aba_analises(tab_analises)
+
+        # Configuração da aba de ajuda
+        self.configurar_aba_ajuda(tab_ajuda)
+    
+    def configurar_aba_simulacao(self, tab):
+        """Configura a aba de simulação com os campos e gráficos."""
+        # Layout principal da aba
+        layout = QHBoxLayout(tab)
+        
+        # Painel esquerdo (entrada de dados)
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
+        
+        # Painel direito (resultados)
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
+            
+        # Grupo de dados da empresa
+        grupo_empresa = QGroupBox("Dados da Empresa")
+        layout_empresa = QFormLayout(grupo_empresa)
+        layout_entrada.addWidget(grupo_empresa)
+        
+        # Campos para entrada de dados
+        self.campo_faturamento = QDoubleSpinBox()
+        self.campo_faturamento.setRange(0, 1000000000)
+        self.campo_faturamento.setDecimals(2)
+        self.campo_faturamento.setPrefix("R$ ")
+        self.campo_faturamento.setSingleStep(1000)
+        self.campo_faturamento.setValue(0)
+        layout_empresa.addRow("Faturamento Anual:", self.campo_faturamento)
+        
+        self.campo_custos = QDoubleSpinBox()
+        self.campo_custos.setRange(0, 1000000000)
+        self.campo_custos.setDecimals(2)
+        self.campo_custos.setPrefix("R$ ")
+        self.campo_custos.setSingleStep(1000)
+        self.campo_custos.setValue(0)
+        layout_empresa.addRow("Custos Tributáveis:", self.campo_custos)
+        
+        self.campo_custos_simples = QDoubleSpinBox()
+        self.campo_custos_simples.setRange(0, 1000000000)
+        self.campo_custos_simples.setDecimals(2)
+        self.campo_custos_simples.setPrefix("R$ ")
+        self.campo_custos_simples.setSingleStep(1000)
+        layout_empresa.addRow("Custos de Fornecedores do Simples:", self.campo_custos_simples)
+        
+        self.campo_creditos_anteriores = QDoubleSpinBox()
+        self.campo_creditos_anteriores.setRange(0, 1000000000)
+        self.campo_creditos_anteriores.setDecimals(2)
+        self.campo_creditos_anteriores.setPrefix("R$ ")
+        self.campo_creditos_anteriores.setSingleStep(1000)
+        layout_empresa.addRow("Créditos Anteriores:", self.campo_creditos_anteriores)
+        
+        self.campo_setor = QComboBox()
+        self.campo_setor.addItems(["padrao", "educacao", "saude", "alimentos", "transporte"])
+        layout_empresa.addRow("Setor de Atividade:", self.campo_setor)
+        
+        self.campo_regime = QComboBox()
+        self.campo_regime.addItems(["real", "presumido", "simples"])
+        layout_empresa.addRow("Regime Tributário:", self.campo_regime)
+
+        # No método configurar_aba_simulacao
+        self.campo_carga_atual = QDoubleSpinBox()
+        self.campo_carga_atual.setRange(0, 100)
+        self.campo_carga_atual.setDecimals(2)
+        self.campo_carga_atual.setSuffix("%")
+        self.campo_carga_atual.setSingleStep(0.5)
+        self.campo_carga_atual.setValue(0)
+        layout_empresa.addRow("Carga Tributária Atual (%):", self.campo_carga_atual)
+
+        # Adicionar no método configurar_aba_simulacao, após o campo de incentivo atual
+        # Substituir o campo simples de incentivo por um grupo de campos mais detalhados
+
+        # Modificar o método configurar_aba_simulacao na classe InterfaceSimulador
+        # Substituir a parte que cria o grupo de ICMS por:
+
+        # Criar grupo para parâmetros de ICMS e incentivos
+        grupo_icms = QGroupBox("Parâmetros de ICMS e Incentivos Fiscais")
+        layout_icms = QVBoxLayout(grupo_icms)
+        layout_entrada.addWidget(grupo_icms)
+
+        # Layout para alíquotas
+        layout_aliquotas = QFormLayout()
+        layout_icms.addLayout(layout_aliquotas)
+
+        # Alíquota média de entrada (insumos)
+        self.campo_aliquota_entrada = QDoubleSpinBox()
+        self.campo_aliquota_entrada.setRange(0, 30)
+        self.campo_aliquota_entrada.setDecimals(2)
+        self.campo_aliquota_entrada.setSuffix("%")
+        self.campo_aliquota_entrada.setValue(19.0)  # Valor padrão
+        layout_aliquotas.addRow("Alíquota Média de Entrada:", self.campo_aliquota_entrada)
+
+        # Alíquota média de saída (vendas)
+        self.campo_aliquota_saida = QDoubleSpinBox()
+        self.campo_aliquota_saida.setRange(0, 30)
+        self.campo_aliquota_saida.setDecimals(2)
+        self.campo_aliquota_saida.setSuffix("%")
+        self.campo_aliquota_saida.setValue(19.0)  # Valor padrão
+        layout_aliquotas.addRow("Alíquota Média de Saída:", self.campo_aliquota_saida)
+
+        # Adicionar abas para incentivos de saída e entrada
+        tabIncentivos = QTabWidget()
+        layout_icms.addWidget(tabIncentivos)
+
+        # Tab para incentivos de saída
+        tabSaida = QWidget()
+        tabIncentivos.addTab(tabSaida, "Incentivos de Saída")
+
+        # Tab para incentivos de entrada
+        tabEntrada = QWidget()
+        tabIncentivos.addTab(tabEntrada, "Incentivos de Entrada")
+
+        # Tab para incentivos de apuração
+        tabApuracao = QWidget()
+        tabIncentivos.addTab(tabApuracao, "Incentivos de Apuração")
+
+        # Layout para incentivos de saída
+        layoutSaida = QVBoxLayout(tabSaida)
+        self.tabelaIncentivosSaida = QTableWidget()
+        self.tabelaIncentivosSaida.setColumnCount(4)
+        self.tabelaIncentivosSaida.setHorizontalHeaderLabels(["Descrição", "Tipo", "Percentual", "% Operações"])
+        self.tabelaIncentivosSaida.horizontalHeader().setStretchLastSection(True)
+        layoutSaida.addWidget(self.tabelaIncentivosSaida)
+
+        # Layout para incentivos de apuração
+        layoutApuracao = QVBoxLayout(tabApuracao)
+        self.tabelaIncentivosApuracao = QTableWidget()
+        self.tabelaIncentivosApuracao.setColumnCount(4)
+        self.tabelaIncentivosApuracao.setHorizontalHeaderLabels(["Descrição", "Tipo", "Percentual", "% Operações"])
+        self.tabelaIncentivosApuracao.horizontalHeader().setStretchLastSection(True)
+        layoutApuracao.addWidget(self.tabelaIncentivosApuracao)
+
+        # Botões para gerenciar incentivos de saída
+        layoutBotoesSaida = QHBoxLayout()
+        btnAddSaida = QPushButton("Adicionar")
+        btnAddSaida.clicked.connect(lambda: self.adicionar_incentivo("saida"))
+        layoutBotoesSaida.addWidget(btnAddSaida)
+
+        btnRemoverSaida = QPushButton("Remover")
+        btnRemoverSaida.clicked.connect(lambda: self.remover_incentivo("saida"))
+        layoutBotoesSaida.addWidget(btnRemoverSaida)
+
+        btnEditarSaida = QPushButton("Editar")
+        btnEditarSaida.clicked.connect(lambda: self.editar_incentivo("saida"))
+        layoutBotoesSaida.addWidget(btnEditarSaida)
+
+        layoutSaida.addLayout(layoutBotoesSaida)
+
+        # Layout para incentivos de entrada
+        layoutEntrada = QVBoxLayout(tabEntrada)
+        self.tabelaIncentivosEntrada = QTableWidget()
+        self.tabelaIncentivosEntrada.setColumnCount(4)
+        self.tabelaIncentivosEntrada.setHorizontalHeaderLabels(["Descrição", "Tipo", "Percentual", "% Operações"])
+        self.tabelaIncentivosEntrada.horizontalHeader().setStretchLastSection(True)
+        layoutEntrada.addWidget(self.tabelaIncentivosEntrada)
+
+        # Botões para gerenciar incentivos de entrada
+        layoutBotoesEntrada = QHBoxLayout()
+        btnAddEntrada = QPushButton("Adicionar")
+        btnAddEntrada.clicked.connect(lambda: self.adicionar_incentivo("entrada"))
+        layoutBotoesEntrada.addWidget(btnAddEntrada)
+
+        btnRemoverEntrada = QPushButton("Remover")
+        btnRemoverEntrada.clicked.connect(lambda: self.remover_incentivo("entrada"))
+        layoutBotoesEntrada.addWidget(btnRemoverEntrada)
+
+        btnEditarEntrada = QPushButton("Editar")
+        btnEditarEntrada.clicked.connect(lambda: self.editar_incentivo("entrada"))
+        layoutBotoesEntrada.addWidget(btnEditarEntrada)
+
+        layoutEntrada.addLayout(layoutBotoesEntrada)
+
+        # Botões para gerenciar incentivos de apuração
+        layoutBotoesApuracao = QHBoxLayout()
+        btnAddApuracao = QPushButton("Adicionar")
+        btnAddApuracao.clicked.connect(lambda: self.adicionar_incentivo("apuracao"))
+        layoutBotoesApuracao.addWidget(btnAddApuracao)
+
+        btnRemoverApuracao = QPushButton("Remover")
+        btnRemoverApuracao.clicked.connect(lambda: self.remover_incentivo("apuracao"))
+        layoutBotoesApuracao.addWidget(btnRemoverApuracao)
+
+        btnEditarApuracao = QPushButton("Editar")
+        btnEditarApuracao.clicked.connect(lambda: self.editar_incentivo("apuracao"))
+        layoutBotoesApuracao.addWidget(btnEditarApuracao)
+
+        layoutApuracao.addLayout(layoutBotoesApuracao)
+
+        # Impacto na receita pública (opcional)
+        self.campo_impacto_receita = QCheckBox("Calcular impacto na receita pública")
+        layout_icms.addWidget(self.campo_impacto_receita)
+
+        # Percentual de operações incentivadas
+        self.campo_operacoes_incentivadas = QDoubleSpinBox()
+        self.campo_operacoes_incentivadas.setRange(0, 100)
+        self.campo_operacoes_incentivadas.setDecimals(2)
+        self.campo_operacoes_incentivadas.setSuffix("%")
+        self.campo_operacoes_incentivadas.setValue(100.0)  # Valor padrão
+        layout_aliquotas.addRow("% Operações Incentivadas:", self.campo_operacoes_incentivadas)
+
+        # Impacto na receita pública (opcional)
+        self.campo_impacto_receita = QCheckBox("Calcular impacto na receita pública")
+        layout_icms.addWidget(self.campo_impacto_receita)
+
+        self.check_cronograma_incentivos = QCheckBox(
+            "Reduzir incentivos com a redução do ICMS (com compensação pelo fundo até 2032)")
+        layout_icms.addWidget(self.check_cronograma_incentivos)
+
+        # Adicionar campo para carga tributária atual
+        self.campo_carga_atual = QDoubleSpinBox()
+        self.campo_carga_atual.setRange(0, 100)
+        self.campo_carga_atual.setDecimals(2)
+        self.campo_carga_atual.setSuffix("%")
+        self.campo_carga_atual.setSingleStep(0.5)
+        self.campo_carga_atual.setValue(25.0)  # Valor default baseado em média nacional
+        layout_empresa.addRow("Carga Tributária Atual Estimada (%):", self.campo_carga_atual)
+        
+        # Grupo de parâmetros da simulação
+        grupo_simulacao = QGroupBox("Parâmetros da Simulação")
+        layout_simulacao = QFormLayout(grupo_simulacao)
+        layout_entrada.addWidget(grupo_simulacao)
+        
+        self.campo_ano_inicial = QSpinBox()
+        self.campo_ano_inicial.setRange(2026, 2033)
+        self.campo_ano_inicial.setValue(2026)
+        layout_simulacao.addRow("Ano Inicial:", self.campo_ano_inicial)
+        
+        self.campo_ano_final = QSpinBox()
+        self.campo_ano_final.setRange(2026, 2033)
+        self.campo_ano_final.setValue(2033)
+        layout_simulacao.addRow("Ano Final:", self.campo_ano_final)
+
+        self.campo_custo_capital = QDoubleSpinBox()
+        self.campo_custo_capital.setRange(0, 100)
+        self.campo_custo_capital.setDecimals(2)
+        self.campo_custo_capital.setSuffix("% a.a.")
+        self.campo_custo_capital.setValue(12.0)
+        self.campo_custo_capital.setToolTip(
+            "Custo de capital aplicado aos créditos imobilizados; a trajetória dos saldos usa a sazonalidade "
+            "e o ressarcimento informados na aba Apuração Mensal")
+        layout_simulacao.addRow("Custo de Capital:", self.campo_custo_capital)
+
+        self.check_encadear_anos = QCheckBox("Encadear anos (transportar créditos e ICMS diferido)")
+        self.check_encadear_anos.setToolTip(
+            "Os créditos não utilizados, o saldo credor do ICMS e o ICMS diferido de cada ano "
+            "entram no ano seguinte; o crédito anterior informado vale para o ano inicial")
+        layout_simulacao.addRow(self.check_encadear_anos)
+
+        # Ajuste interativo por controles deslizantes
+        grupo_ajuste = QGroupBox("Ajuste Interativo")
+        layout_ajuste = QFormLayout(grupo_ajuste)
+        layout_entrada.addWidget(grupo_ajuste)
+
+        self.check_ajuste_instantaneo = QCheckBox("Atualização instantânea (curvas de resposta)")
+        self.check_ajuste_instantaneo.setToolTip(
+            "Durante o arraste, os resultados são interpolados de curvas exatas pré-calculadas; "
+            "ao soltar, a simulação é refeita")
+        layout_ajuste.addRow(self.check_ajuste_instantaneo)
+
+        self.sliders_simulacao = {}
+        self.intervalos_sliders = {}
+        self.curvas_resposta = None
+        for caminho, (rotulo, _, _) in self.CONTROLES_DESLIZANTES.items():
+            slider = QSlider(Qt.Horizontal)
+            slider.setRange(0, self.RESOLUCAO_SLIDERS)
+            slider.sliderPressed.connect(lambda caminho=caminho: self.preparar_curvas_resposta(caminho))
+            slider.valueChanged.connect(lambda posicao, caminho=caminho: self.mover_slider(caminho, posicao))
+            slider.sliderReleased.connect(self.soltar_slider)
+            layout_ajuste.addRow(f"{rotulo}:", slider)
+            self.sliders_simulacao[caminho] = slider
+        for _, campo, _ in self.CONTROLES_DESLIZANTES.values():
+            getattr(self, campo).valueChanged.connect(self.sincronizar_sliders)
+        self.sincronizar_sliders()
+        
+        # Botão de simulação
+        botao_simular = QPushButton("Simular")
+        botao_simular.clicked.connect(self.executar_simulacao)
+        layout_entrada.addWidget(botao_simular)
+        
+        # Adicionar espaço flexível
+        layout_entrada.addStretch()
+        
+        # Resultados - Tabela comparativa
+        grupo_tabela = QGroupBox("Resultados da Simulação")
+        layout_tabela = QVBoxLayout(grupo_tabela)
+        layout_resultados.addWidget(grupo_tabela)
+        
+        self.tabela_resultados = QTableWidget()
+        self.tabela_resultados.setColumnCount(6)
+        self.tabela_resultados.setHorizontalHeaderLabels(["Ano", "CBS", "IBS", "Imposto Bruto", "Créditos", "Imposto Devido"])
+        self.tabela_resultados.horizontalHeader().setStretchLastSection(True)
+        layout_tabela.addWidget(self.tabela_resultados)
+        
+         # Resultados - Gráficos
+        grupo_graficos = QGroupBox("Gráficos Comparativos")
+        layout_graficos = QVBoxLayout(grupo_graficos)
+        # Nome usado pelos gráficos criados sob demanda para se inserirem neste layout
+        layout_graficos.setObjectName("layout_graficos")
+        layout_resultados.addWidget(grupo_graficos)
+        
+        # Gráficos existentes
+        self.grafico_comparativo = GraficoMatplotlib(width=6, height=4)
+        layout_graficos.addWidget(self.grafico_comparativo)
+        
+        self.grafico_aliquotas = GraficoMatplotlib(width=6, height=4)
+        layout_graficos.addWidget(self.grafico_aliquotas)
+        
+        # ADICIONAR: Novo gráfico para a transição
+        self.grafico_transicao = GraficoMatplotlib(width=6, height=4)
+        layout_graficos.addWidget(self.grafico_transicao)
+        
+        # Botões para exportar resultados
+        grupo_exportar = QGroupBox("Exportar Resultados")
+        layout_exportar = QHBoxLayout(grupo_exportar)
+        layout_resultados.addWidget(grupo_exportar)
+        
+        botao_exportar_pdf = QPushButton("Exportar PDF")
+        botao_exportar_pdf.clicked.connect(self.exportar_pdf)
+        layout_exportar.addWidget(botao_exportar_pdf)
+        
+        botao_exportar_excel = QPushButton("Exportar Excel")
+        botao_exportar_excel.clicked.connect(self.exportar_excel)
+        layout_exportar.addWidget(botao_exportar_excel)
+
+    def atualizar_campos_incentivo(self, tipo_selecionado):
+        """Atualiza os campos relacionados aos incentivos conforme o tipo selecionado."""
+        # Habilitar/desabilitar campos conforme necessário
+        campos_habilitados = tipo_selecionado != "Nenhum"
+        self.campo_percentual_incentivo.setEnabled(campos_habilitados)
+        self.campo_operacoes_incentivadas.setEnabled(campos_habilitados)
+
+        # Ajustar rótulos e dicas conforme o tipo de incentivo
+        if tipo_selecionado == "Redução de Alíquota":
+            self.campo_percentual_incentivo.setPrefix("")
+            self.campo_percentual_incentivo.setToolTip("Percentual de redução sobre a alíquota normal")
+        elif tipo_selecionado == "Crédito Presumido/Outorgado":
+            self.campo_percentual_incentivo.setPrefix("")
+            self.campo_percentual_incentivo.setToolTip("Percentual do débito que será creditado adicionalmente")
+        elif tipo_selecionado == "Redução de Base de Cálculo":
+            self.campo_percentual_incentivo.setPrefix("")
+            self.campo_percentual_incentivo.setToolTip("Percentual de redução sobre a base de cálculo")
+        elif tipo_selecionado == "Diferimento":
+            self.campo_percentual_incentivo.setPrefix("")
+            self.campo_percentual_incentivo.setToolTip("Percentual do imposto que será diferido")
+
+    def configurar_aba_memoria_calculo(self, tab):
+        """Configura a aba de memória de cálculo."""
+        # Layout principal da aba
+        layout = QVBoxLayout(tab)
+
+        # Título
+        titulo = QLabel("Memória de Cálculo")
+        titulo.setFont(QFont("Arial", 14, QFont.Bold))
+        layout.addWidget(titulo)
+
+        # Seleção do ano para exibir a memória de cálculo
+        layout_selecao = QHBoxLayout()
+        layout.addLayout(layout_selecao)
+
+        label_ano = QLabel("Selecione o ano:")
+        layout_selecao.addWidget(label_ano)
+
+        self.combo_ano_memoria = QComboBox()
+        layout_selecao.addWidget(self.combo_ano_memoria)
+
+        botao_atualizar = QPushButton("Atualizar Memória")
+        botao_atualizar.clicked.connect(self.atualizar_memoria_calculo)
+        layout_selecao.addWidget(botao_atualizar)
+
+        layout_selecao.addStretch()
+
+        # Área de texto para exibir a memória de cálculo
+        self.texto_memoria = QTextEdit()
+        self.texto_memoria.setReadOnly(True)
+        self.texto_memoria.setFont(QFont("Consolas", 10))
+        layout.addWidget(self.texto_memoria)
+
+        # Botão para exportar a memória de cálculo
+        botao_exportar = QPushButton("Exportar Memória de Cálculo")
+        botao_exportar.clicked.connect(self.exportar_memoria_calculo)
+        layout.addWidget(botao_exportar)
+
+    def atualizar_combo_anos_memoria(self):
+        """Atualiza o combobox com os anos disponíveis na memória de cálculo."""
+        self.combo_ano_memoria.clear()
+        if self.resultados:
+            for ano in sorted(self.resultados.keys()):
+                self.combo_ano_memoria.addItem(str(ano))
+
+    def atualizar_memoria_calculo(self):
+        """Atualiza a exibição da memória de cálculo para o ano selecionado."""
+        ano_selecionado = self.combo_ano_memoria.currentText()
+        if not ano_selecionado or not self.resultados:
+            self.texto_memoria.setPlainText("Não há dados disponíveis. Execute uma simulação primeiro.")
+            return
+
+        ano = int(ano_selecionado)
+        if ano not in self.resultados:
+            self.texto_memoria.setPlainText(f"Não há resultados para o ano {ano}.")
+            return
+
+        # Obter a memória de cálculo
+        memoria = self.calculadora.memoria_calculo
+
+        # Formatar a memória de cálculo para exibição
+        texto = f"=== MEMÓRIA DE CÁLCULO - ANO {ano} ===\n\n"
+
+        # Validação de dados
+        texto += "=== VALIDAÇÃO DE DADOS ===\n"
+        for linha in memoria.get("validacao", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # Base tributável
+        texto += "=== BASE TRIBUTÁVEL ===\n"
+        for linha in memoria.get("base_tributavel", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # Alíquotas
+        texto += "=== ALÍQUOTAS ===\n"
+        for linha in memoria.get("aliquotas", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # CBS
+        texto += "=== CÁLCULO DA CBS ===\n"
+        for linha in memoria.get("cbs", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # IBS
+        texto += "=== CÁLCULO DO IBS ===\n"
+        for linha in memoria.get("ibs", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # Créditos
+        texto += "=== CÁLCULO DOS CRÉDITOS ===\n"
+        for linha in memoria.get("creditos", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # Imposto devido
+        texto += "=== CÁLCULO DO IMPOSTO DEVIDO ===\n"
+        for linha in memoria.get("imposto_devido", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # Impostos Atuais
+        texto += "=== CÁLCULO DOS IMPOSTOS ATUAIS ===\n"
+
+        # PIS
+        texto += "\n--- PIS ---\n"
+        for linha in memoria.get("impostos_atuais", {}).get("PIS", []):
+            texto += f"{linha}\n"
+
+        # COFINS
+        texto += "\n--- COFINS ---\n"
+        for linha in memoria.get("impostos_atuais", {}).get("COFINS", []):
+            texto += f"{linha}\n"
+
+        # ICMS
+        texto += "\n--- ICMS ---\n"
+        for linha in memoria.get("impostos_atuais", {}).get("ICMS", []):
+            texto += f"{linha}\n"
+
+        # ISS
+        texto += "\n--- ISS ---\n"
+        for linha in memoria.get("impostos_atuais", {}).get("ISS", []):
+            texto += f"{linha}\n"
+
+        # IPI
+        texto += "\n--- IPI ---\n"
+        for linha in memoria.get("impostos_atuais", {}).get("IPI", []):
+            texto += f"{linha}\n"
+
+        # Total Impostos Atuais
+        texto += "\n--- TOTAL IMPOSTOS ATUAIS ---\n"
+        for linha in memoria.get("impostos_atuais", {}).get("total", []):
+            texto += f"{linha}\n"
+        texto += "\n"
+
+        # Créditos Cruzados
+        if memoria.get("creditos_cruzados"):
+            texto += "=== CRÉDITOS CRUZADOS ===\n"
+            for linha in memoria.get("creditos_cruzados", []):
+                texto += f"{linha}\n"
+            texto += "\n"
+
+        # Total Devido
+        texto += "=== TOTAL DEVIDO ===\n"
+        for linha in memoria.get("total_devido", []):
+            texto += f"{linha}\n"
+
+        # Alíquotas equivalentes à carga atual
+        equivalente = getattr(self, 'aliquotas_equivalentes', {}).get(ano, {})
+        if "convergiu" in equivalente:
+            texto += "\n=== ALÍQUOTAS EQUIVALENTES À CARGA ATUAL ===\n"
+            texto += f"Carga atual: R$ {formatar_br(equivalente['valor_atual'])}\n"
+            if equivalente["convergiu"]:
+                texto += (f"CBS equivalente: {formatar_br(equivalente['cbs_equivalente'] * 100)}%; "
+                          f"IBS equivalente: {formatar_br(equivalente['ibs_equivalente'] * 100)}% "
+                          f"(fator {formatar_br(equivalente['fator_escala'], 6)} sobre as alíquotas do ano)\n")
+            else:
+                texto += (f"Sem solução exata: nenhuma alíquota de IVA iguala o total devido à carga atual "
+                          f"(fator {formatar_br(equivalente['fator_escala'], 6)}, resíduo de "
+                          f"R$ {formatar_br(equivalente['residuo'])})\n")
+
+        # Região do modelo linear por partes
+        try:
+            linhas_modelo = self.memoria_modelo_linear(ano)
+        except Exception as e:
+            linhas_modelo = [f"Não foi possível compilar o modelo linear por partes: {e}"]
+        if linhas_modelo:
+            texto += "\n=== MODELO LINEAR POR PARTES ===\n"
+            for linha in linhas_modelo:
+                texto += f"{linha}\n"
+
+        # Exibir a memória de cálculo
+        self.texto_memoria.setPlainText(texto)
+
+    def exportar_memoria_calculo(self):
+        """Exporta a memória de cálculo para um arquivo de texto."""
+        if not self.texto_memoria.toPlainText():
+            QMessageBox.warning(self, "Sem Dados",
+                                "Não há memória de cálculo para exportar. Execute uma simulação primeiro.")
+            return
+
+        try:
+            # Mostrar diálogo para salvar arquivo
+            opcoes = QFileDialog.Options()
+            arquivo, _ = QFileDialog.getSaveFileName(
+                self, "Exportar Memória de Cálculo", "",
+                "Arquivos de Texto (*.txt);;Todos os Arquivos (*)",
+                options=opcoes
+            )
+
+            if arquivo:
+                if not arquivo.endswith('.txt'):
+                    arquivo += '.txt'
+
+                with open(arquivo, 'w', encoding='utf-8') as f:
+                    f.write(self.texto_memoria.toPlainText())
+
+                QMessageBox.information(self, "Exportação Concluída",
+                                        f"A memória de cálculo foi exportada com sucesso para:\n{arquivo}")
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Ocorreu um erro ao exportar a memória de cálculo:\n{str(e)}")
+
+    def configurar_aba_configuracoes(self, tab):
+        """Configura a aba de configurações com os parâmetros do sistema."""
+        # Layout principal da aba
+        layout = QVBoxLayout(tab)
+        
+        # Grupo para alíquotas base
+        grupo_aliquotas = QGroupBox("Alíquotas Base")
+        layout_aliquotas = QFormLayout(grupo_aliquotas)
+        layout.addWidget(grupo_aliquotas)
+        
+        self.campo_cbs = QDoubleSpinBox()
+        self.campo_cbs.setRange(0, 100)
+        self.campo_cbs.setDecimals(2)
+        self.campo_cbs.setSuffix("%")
+        self.campo_cbs.setValue(self.calculadora.config.aliquotas_base["CBS"] * 100)
+        layout_aliquotas.addRow("Alíquota CBS:", self.campo_cbs)
+        
+        self.campo_ibs = QDoubleSpinBox()
+        self.campo_ibs.setRange(0, 100)
+        self.campo_ibs.setDecimals(2)
+        self.campo_ibs.setSuffix("%")
+        self.campo_ibs.setValue(self.calculadora.config.aliquotas_base["IBS"] * 100)
+        layout_aliquotas.addRow("Alíquota IBS:", self.campo_ibs)
+        
+        # Grupo para fases de transição
+        grupo_fases = QGroupBox("Fases de Transição")
+        layout_fases = QGridLayout(grupo_fases)
+        layout.addWidget(grupo_fases)
+        
+        # Cabeçalho
+        layout_fases.addWidget(QLabel("Ano"), 0, 0)
+        layout_fases.addWidget(QLabel("Percentual"), 0, 1)
+        
+        # Campos para cada ano
+        self.campos_fases = {}
+        row = 1
+        for ano, percentual in self.calculadora.config.fase_transicao.items():
+            layout_fases.addWidget(QLabel(str(ano)), row, 0)
+            
+            campo = QDoubleSpinBox()
+            campo.setRange(0, 100)
+            campo.setDecimals(2)
+            campo.setSuffix("%")
+            campo.setValue(percentual * 100)
+            
+            layout_fases.addWidget(campo, row, 1)
+            self.campos_fases[ano] = campo
+            row += 1
+        
+        # Grupo para setores especiais
+        grupo_setores = QGroupBox("Alíquotas Setoriais")
+        layout_setores = QGridLayout(grupo_setores)
+        layout.addWidget(grupo_setores)
+        
+        # Cabeçalho
+        layout_setores.addWidget(QLabel("Setor"), 0, 0)
+        layout_setores.addWidget(QLabel("IBS"), 0, 1)
+        layout_setores.addWidget(QLabel("Redução CBS"), 0, 2)
+        
+        # Campos para cada setor
+        self.campos_setores_ibs = {}
+        self.campos_setores_reducao = {}
+        row = 1
+        for setor, valores in self.calculadora.config.setores_especiais.items():
+            layout_setores.addWidget(QLabel(setor), row, 0)
+            
+            campo_ibs = QDoubleSpinBox()
+            campo_ibs.setRange(0, 100)
+            campo_ibs.setDecimals(2)
+            campo_ibs.setSuffix("%")
+            campo_ibs.setValue(valores["IBS"] * 100)
+            layout_setores.addWidget(campo_ibs, row, 1)
+            self.campos_setores_ibs[setor] = campo_ibs
+            
+            campo_reducao = QDoubleSpinBox()
+            campo_reducao.setRange(0, 100)
+            campo_reducao.setDecimals(2)
+            campo_reducao.setSuffix("%")
+            campo_reducao.setValue(valores["reducao_CBS"] * 100)
+            layout_setores.addWidget(campo_reducao, row, 2)
+            self.campos_setores_reducao[setor] = campo_reducao
+            
+            row += 1
+        
+        # Botões para salvar/carregar configurações
+        layout_botoes = QHBoxLayout()
+        layout.addLayout(layout_botoes)
+        
+        botao_carregar = QPushButton("Carregar Configurações")
+        botao_carregar.clicked.connect(self.carregar_configuracoes)
+        layout_botoes.addWidget(botao_carregar)
+        
+        botao_salvar = QPushButton("Salvar Configurações")
+        botao_salvar.clicked.connect(self.salvar_configuracoes)
+        layout_botoes.addWidget(botao_salvar)
+        
+        botao_restaurar = QPushButton("Restaurar Padrões")
+        botao_restaurar.clicked.connect(self.restaurar_configuracoes)
+        layout_botoes.addWidget(botao_restaurar)
+        
+        # Adicionar espaço flexível
+        layout.addStretch()
+    
+    def configurar_aba_analises(self, tab):
+        """Configura a aba de análises avançadas (varreduras e demais estudos em lote)."""
+        layout = QVBoxLayout(tab)
+
+        titulo = QLabel("Análises Avançadas")
+        titulo.setFont(QFont("Arial", 14, QFont.Bold))
+        layout.addWidget(titulo)
+
+        descricao = QLabel("As análises utilizam os dados da empresa e os incentivos informados na aba Simulação.")
+        layout.addWidget(descricao)
+
+        self.abas_analises = QTabWidget()
+        layout.addWidget(self.abas_analises)
 
-        # Layout para incentivos de saída
-        layoutSaida = QVBoxLayout(tabSaida)
-        self.tabelaIncentivosSaida = QTableWidget()
-        self.tabelaIncentivosSaida.setColumnCount(4)
-        self.tabelaIncentivosSaida.setHorizontalHeaderLabels(["Descrição", "Tipo", "Percentual", "% Operações"])
-        self.tabelaIncentivosSaida.horizontalHeader().setStretchLastSection(True)
-        layoutSaida.addWidget(self.tabelaIncentivosSaida)
+        painel_varredura = QWidget()
+        self.abas_analises.addTab(painel_varredura, "Varredura de Parâmetros")
+        self.configurar_painel_varredura(painel_varredura)
 
-        # Layout para incentivos de apuração
-        layoutApuracao = QVBoxLayout(tabApuracao)
-        self.tabelaIncentivosApuracao = QTableWidget()
-        self.tabelaIncentivosApuracao.setColumnCount(4)
-        self.tabelaIncentivosApuracao.setHorizontalHeaderLabels(["Descrição", "Tipo", "Percentual", "% Operações"])
-        self.tabelaIncentivosApuracao.horizontalHeader().setStretchLastSection(True)
-        layoutApuracao.addWidget(self.tabelaIncentivosApuracao)
+        painel_monte_carlo = QWidget()
+        self.abas_analises.addTab(painel_monte_carlo, "Monte Carlo")
+        self.configurar_painel_monte_carlo(painel_monte_carlo)
 
-        # Botões para gerenciar incentivos de saída
-        layoutBotoesSaida = QHBoxLayout()
-        btnAddSaida = QPushButton("Adicionar")
-        btnAddSaida.clicked.connect(lambda: self.adicionar_incentivo("saida"))
-        layoutBotoesSaida.addWidget(btnAddSaida)
+        painel_busca_meta = QWidget()
+        self.abas_analises.addTab(painel_busca_meta, "Busca de Meta")
+        self.configurar_painel_busca_meta(painel_busca_meta)
 
-        btnRemoverSaida = QPushButton("Remover")
-        btnRemoverSaida.clicked.connect(lambda: self.remover_incentivo("saida"))
-        layoutBotoesSaida.addWidget(btnRemoverSaida)
+        painel_cenarios = QWidget()
+        self.abas_analises.addTab(painel_cenarios, "Cenários")
+        self.configurar_painel_cenarios(painel_cenarios)
 
-        btnEditarSaida = QPushButton("Editar")
-        btnEditarSaida.clicked.connect(lambda: self.editar_incentivo("saida"))
-        layoutBotoesSaida.addWidget(btnEditarSaida)
+        painel_sensibilidades = QWidget()
+        self.abas_analises.addTab(painel_sensibilidades, "Sensibilidades")
+        self.configurar_painel_sensibilidades(painel_sensibilidades)
 
-        layoutSaida.addLayout(layoutBotoesSaida)
+        painel_otimizacao = QWidget()
+        self.abas_analises.addTab(painel_otimizacao, "Otimização de Incentivos")
+        self.configurar_painel_otimizacao(painel_otimizacao)
 
-        # Layout para incentivos de entrada
-        layoutEntrada = QVBoxLayout(tabEntrada)
-        self.tabelaIncentivosEntrada = QTableWidget()
-        self.tabelaIncentivosEntrada.setColumnCount(4)
-        self.tabelaIncentivosEntrada.setHorizontalHeaderLabels(["Descrição", "Tipo", "Percentual", "% Operações"])
-        self.tabelaIncentivosEntrada.horizontalHeader().setStretchLastSection(True)
-        layoutEntrada.addWidget(self.tabelaIncentivosEntrada)
+        painel_regimes = QWidget()
+        self.abas_analises.addTab(painel_regimes, "Escolha de Regime")
+        self.configurar_painel_regimes(painel_regimes)
 
-        # Botões para gerenciar incentivos de entrada
-        layoutBotoesEntrada = QHBoxLayout()
-        btnAddEntrada = QPushButton("Adicionar")
-        btnAddEntrada.clicked.connect(lambda: self.adicionar_incentivo("entrada"))
-        layoutBotoesEntrada.addWidget(btnAddEntrada)
+        painel_tornado = QWidget()
+        self.abas_analises.addTab(painel_tornado, "Tornado")
+        self.configurar_painel_tornado(painel_tornado)
 
-        btnRemoverEntrada = QPushButton("Remover")
-        btnRemoverEntrada.clicked.connect(lambda: self.remover_incentivo("entrada"))
-        layoutBotoesEntrada.addWidget(btnRemoverEntrada)
+        painel_fronteira = QWidget()
+        self.abas_analises.addTab(painel_fronteira, "Fronteira Carga × Caixa")
+        self.configurar_painel_fronteira(painel_fronteira)
 
-        btnEditarEntrada = QPushButton("Editar")
-        btnEditarEntrada.clicked.connect(lambda: self.editar_incentivo("entrada"))
-        layoutBotoesEntrada.addWidget(btnEditarEntrada)
+        painel_arvore = QWidget()
+        self.abas_analises.addTab(painel_arvore, "Árvore de Cenários")
+        self.configurar_painel_arvore(painel_arvore)
 
-        layoutEntrada.addLayout(layoutBotoesEntrada)
+        painel_mensal = QWidget()
+        self.abas_analises.addTab(painel_mensal, "Apuração Mensal")
+        self.configurar_painel_apuracao_mensal(painel_mensal)
 
-        # Botões para gerenciar incentivos de apuração
-        layoutBotoesApuracao = QHBoxLayout()
-        btnAddApuracao = QPushButton("Adicionar")
-        btnAddApuracao.clicked.connect(lambda: self.adicionar_incentivo("apuracao"))
-        layoutBotoesApuracao.addWidget(btnAddApuracao)
+        painel_split = QWidget()
+        self.abas_analises.addTab(painel_split, "Split Payment")
+        self.configurar_painel_split_payment(painel_split)
 
-        btnRemoverApuracao = QPushButton("Remover")
-        btnRemoverApuracao.clicked.connect(lambda: self.remover_incentivo("apuracao"))
-        layoutBotoesApuracao.addWidget(btnRemoverApuracao)
+    def configurar_painel_varredura(self, painel):
+        """Configura o painel de varredura de parâmetros."""
+        layout = QHBoxLayout(painel)
 
-        btnEditarApuracao = QPushButton("Editar")
-        btnEditarApuracao.clicked.connect(lambda: self.editar_incentivo("apuracao"))
-        layoutBotoesApuracao.addWidget(btnEditarApuracao)
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
 
-        layoutApuracao.addLayout(layoutBotoesApuracao)
+        grupo_eixos = QGroupBox("Eixos da Varredura")
+        layout_eixos = QGridLayout(grupo_eixos)
+        layout_entrada.addWidget(grupo_eixos)
+
+        layout_eixos.addWidget(QLabel("Parâmetro"), 0, 1)
+        layout_eixos.addWidget(QLabel("Mínimo"), 0, 2)
+        layout_eixos.addWidget(QLabel("Máximo"), 0, 3)
+        layout_eixos.addWidget(QLabel("Passos"), 0, 4)
+
+        self.campos_eixos_varredura = []
+        for i, padrao in enumerate(["Alíquota CBS (%)", "Alíquota IBS do Setor (%)"]):
+            combo = QComboBox()
+            if i > 0:
+                combo.addItem("Nenhum")
+            combo.addItems(list(PARAMETROS_ANALISE.keys()))
+            combo.setCurrentText(padrao)
+
+            campo_minimo = QDoubleSpinBox()
+            campo_minimo.setRange(0, 1000000000)
+            campo_minimo.setDecimals(2)
+
+            campo_maximo = QDoubleSpinBox()
+            campo_maximo.setRange(0, 1000000000)
+            campo_maximo.setDecimals(2)
+
+            campo_passos = QSpinBox()
+            campo_passos.setRange(2, 500)
+            campo_passos.setValue(41)
+
+            layout_eixos.addWidget(QLabel(f"Eixo {i + 1}:"), i + 1, 0)
+            layout_eixos.addWidget(combo, i + 1, 1)
+            layout_eixos.addWidget(campo_minimo, i + 1, 2)
+            layout_eixos.addWidget(campo_maximo, i + 1, 3)
+            layout_eixos.addWidget(campo_passos, i + 1, 4)
+
+            self.campos_eixos_varredura.append((combo, campo_minimo, campo_maximo, campo_passos))
+            combo.currentTextChanged.connect(lambda _, indice=i: self.sugerir_intervalo_varredura(indice))
+            self.sugerir_intervalo_varredura(i)
+
+        grupo_exibicao = QGroupBox("Exibição")
+        layout_exibicao = QFormLayout(grupo_exibicao)
+        layout_entrada.addWidget(grupo_exibicao)
+
+        self.combo_metrica_varredura = QComboBox()
+        self.combo_metrica_varredura.addItems(list(METRICAS_ANALISE.keys()))
+        layout_exibicao.addRow("Métrica:", self.combo_metrica_varredura)
+
+        self.combo_ano_varredura = QComboBox()
+        self.combo_ano_varredura.addItems([str(ano) for ano in self.calculadora.config.fase_transicao.keys()])
+        self.combo_ano_varredura.setCurrentText("2033")
+        layout_exibicao.addRow("Ano:", self.combo_ano_varredura)
+
+        self.combo_visual_varredura = QComboBox()
+        self.combo_visual_varredura.addItems(["Mapa de Calor", "Curvas de Nível"])
+        layout_exibicao.addRow("Visualização:", self.combo_visual_varredura)
+
+        # Alterar a exibição não exige recalcular a grade
+        self.combo_metrica_varredura.currentTextChanged.connect(self.exibir_varredura)
+        self.combo_ano_varredura.currentTextChanged.connect(self.exibir_varredura)
+        self.combo_visual_varredura.currentTextChanged.connect(self.exibir_varredura)
+
+        botao_varredura = QPushButton("Executar Varredura")
+        botao_varredura.clicked.connect(self.executar_varredura)
+        layout_entrada.addWidget(botao_varredura)
+
+        self.label_status_varredura = QLabel("")
+        layout_entrada.addWidget(self.label_status_varredura)
+        layout_entrada.addStretch()
 
-        # Impacto na receita pública (opcional)
-        self.campo_impacto_receita = QCheckBox("Calcular impacto na receita pública")
-        layout_icms.addWidget(self.campo_impacto_receita)
+        self.grafico_varredura = GraficoMatplotlib(width=7, height=5)
+        layout.addWidget(self.grafico_varredura, 2)
 
-        # Percentual de operações incentivadas
-        self.campo_operacoes_incentivadas = QDoubleSpinBox()
-        self.campo_operacoes_incentivadas.setRange(0, 100)
-        self.campo_operacoes_incentivadas.setDecimals(2)
-        self.campo_operacoes_incentivadas.setSuffix("%")
-        self.campo_operacoes_incentivadas.setValue(100.0)  # Valor padrão
-        layout_aliquotas.addRow("% Operações Incentivadas:", self.campo_operacoes_incentivadas)
+        self.resultado_varredura = None
 
-        # Impacto na receita pública (opcional)
-        self.campo_impacto_receita = QCheckBox("Calcular impacto na receita pública")
-        layout_icms.addWidget(self.campo_impacto_receita)
+    def obter_valor_parametro_analise(self, rotulo):
+        """Retorna o valor atual (na escala de exibição) de um parâmetro das análises avançadas."""
+        caminho, escala = PARAMETROS_ANALISE[rotulo]
+        campos_entrada = {
+            "faturamento": self.campo_faturamento,
+            "custos_tributaveis": self.campo_custos,
+            "custos_simples": self.campo_custos_simples,
+            "creditos_anteriores": self.campo_creditos_anteriores
+        }
+        if caminho in campos_entrada:
+            return campos_entrada[caminho].value()
+        if caminho == "icms_config.aliquota_saida":
+            return self.campo_aliquota_saida.value()
+        if caminho == "icms_config.aliquota_entrada":
+            return self.campo_aliquota_entrada.value()
+
+        _, valor = resolver_caminho_parametro(caminho, self.calculadora.config, self.campo_setor.currentText())
+        return valor * escala
+
+    def sugerir_intervalo_varredura(self, indice):
+        """Preenche mínimo e máximo do eixo em torno do valor atual do parâmetro."""
+        combo, campo_minimo, campo_maximo, _ = self.campos_eixos_varredura[indice]
+        rotulo = combo.currentText()
+        habilitado = rotulo in PARAMETROS_ANALISE
+        campo_minimo.setEnabled(habilitado)
+        campo_maximo.setEnabled(habilitado)
+        if not habilitado:
+            return
 
-        # Adicionar campo para carga tributária atual
-        self.campo_carga_atual = QDoubleSpinBox()
-        self.campo_carga_atual.setRange(0, 100)
-        self.campo_carga_atual.setDecimals(2)
-        self.campo_carga_atual.setSuffix("%")
-        self.campo_carga_atual.setSingleStep(0.5)
-        self.campo_carga_atual.setValue(25.0)  # Valor default baseado em média nacional
-        layout_empresa.addRow("Carga Tributária Atual Estimada (%):", self.campo_carga_atual)
-        
-        # Grupo de parâmetros da simulação
-        grupo_simulacao = QGroupBox("Parâmetros da Simulação")
-        layout_simulacao = QFormLayout(grupo_simulacao)
-        layout_entrada.addWidget(grupo_simulacao)
-        
-        self.campo_ano_inicial = QSpinBox()
-        self.campo_ano_inicial.setRange(2026, 2033)
-        self.campo_ano_inicial.setValue(2026)
-        layout_simulacao.addRow("Ano Inicial:", self.campo_ano_inicial)
-        
-        self.campo_ano_final = QSpinBox()
-        self.campo_ano_final.setRange(2026, 2033)
-        self.campo_ano_final.setValue(2033)
-        layout_simulacao.addRow("Ano Final:", self.campo_ano_final)
-        
-        # Botão de simulação
-        botao_simular = QPushButton("Simular")
-        botao_simular.clicked.connect(self.executar_simulacao)
-        layout_entrada.addWidget(botao_simular)
-        
-        # Adicionar espaço flexível
+        valor = self.obter_valor_parametro_analise(rotulo)
+        if PARAMETROS_ANALISE[rotulo][1] == 1:
+            campo_minimo.setValue(valor * 0.5)
+            campo_maximo.setValue(valor * 1.5 if valor > 0 else 1000000)
+        else:
+            campo_minimo.setValue(max(0, valor - 1.5))
+            campo_maximo.setValue(valor + 1.5)
+
+    def executar_varredura(self):
+        """Executa a varredura de parâmetros para a empresa informada na aba Simulação."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            varredura = VarreduraParametros(CalculadoraLote(self.calculadora.config))
+
+            for combo, campo_minimo, campo_maximo, campo_passos in self.campos_eixos_varredura:
+                rotulo = combo.currentText()
+                if rotulo not in PARAMETROS_ANALISE:
+                    continue
+                if campo_maximo.value() < campo_minimo.value():
+                    raise ValueError(f"O máximo do eixo '{rotulo}' deve ser maior que o mínimo")
+                caminho, escala = PARAMETROS_ANALISE[rotulo]
+                caminho, _ = resolver_caminho_parametro(caminho, self.calculadora.config, dados_empresa["setor"])
+                valores = np.linspace(campo_minimo.value(), campo_maximo.value(), campo_passos.value())
+                varredura.adicionar_eixo(caminho, valores / escala)
+
+            self.resultado_varredura = varredura.executar(carteira)
+            self.rotulos_varredura = [combo.currentText() for combo, *_ in self.campos_eixos_varredura
+                                      if combo.currentText() in PARAMETROS_ANALISE]
+
+            pontos = int(np.prod(self.resultado_varredura.forma))
+            anos = len(self.resultado_varredura.anos)
+            self.label_status_varredura.setText(f"{formatar_br(pontos, 0)} cenários × {anos} anos avaliados.")
+            self.exibir_varredura()
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Varredura",
+                                 f"Ocorreu um erro durante a varredura:\n{str(e)}")
+
+    def exibir_varredura(self):
+        """Exibe o resultado da última varredura conforme métrica, ano e visualização escolhidos."""
+        if self.resultado_varredura is None:
+            return
+
+        rotulo_metrica = self.combo_metrica_varredura.currentText()
+        metrica, escala_metrica = METRICAS_ANALISE[rotulo_metrica]
+        ano = int(self.combo_ano_varredura.currentText())
+        matriz = self.resultado_varredura.selecionar(metrica, ano) * escala_metrica
+
+        eixos = [valores * PARAMETROS_ANALISE[rotulo][1]
+                 for (_, valores), rotulo in zip(self.resultado_varredura.eixos, self.rotulos_varredura)]
+        titulo = f"{rotulo_metrica} - {ano}"
+
+        if len(eixos) == 1:
+            self.grafico_varredura.plotar_curva_parametro(
+                eixos[0], matriz, self.rotulos_varredura[0], rotulo_metrica, titulo)
+        else:
+            # Primeiro eixo nas linhas (y) e segundo nas colunas (x)
+            self.grafico_varredura.plotar_mapa_calor(
+                eixos[1], eixos[0], matriz, self.rotulos_varredura[1], self.rotulos_varredura[0],
+                rotulo_metrica, titulo, curvas_nivel=self.combo_visual_varredura.currentText() == "Curvas de Nível")
+
+    def configurar_painel_monte_carlo(self, painel):
+        """Configura o painel de simulação de Monte Carlo."""
+        layout = QHBoxLayout(painel)
+
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
+
+        grupo_distribuicoes = QGroupBox("Distribuições dos Parâmetros")
+        layout_distribuicoes = QVBoxLayout(grupo_distribuicoes)
+        layout_entrada.addWidget(grupo_distribuicoes)
+
+        ajuda = QLabel("Normal/Lognormal: A = média, B = desvio. Uniforme: A = mínimo, B = máximo.\n"
+                       "Triangular: A = mínimo, B = moda, C = máximo. No modo relativo, os valores\n"
+                       "são fatores sobre o valor atual (1,00 = valor atual).")
+        layout_distribuicoes.addWidget(ajuda)
+
+        self.tabela_distribuicoes = QTableWidget()
+        self.tabela_distribuicoes.setColumnCount(6)
+        self.tabela_distribuicoes.setHorizontalHeaderLabels(["Parâmetro", "Distribuição", "A", "B", "C", "Modo"])
+        self.tabela_distribuicoes.horizontalHeader().setStretchLastSection(True)
+        layout_distribuicoes.addWidget(self.tabela_distribuicoes)
+
+        layout_botoes = QHBoxLayout()
+        layout_distribuicoes.addLayout(layout_botoes)
+
+        botao_adicionar = QPushButton("Adicionar")
+        botao_adicionar.clicked.connect(lambda: self.adicionar_linha_distribuicao())
+        layout_botoes.addWidget(botao_adicionar)
+
+        botao_remover = QPushButton("Remover")
+        botao_remover.clicked.connect(self.remover_linha_distribuicao)
+        layout_botoes.addWidget(botao_remover)
+
+        # Incertezas mais comuns: faturamento, mix de custos e alíquota final do IBS
+        self.adicionar_linha_distribuicao("Faturamento (R$)", "Normal", (1.0, 0.10, 0.0), "Relativo")
+        self.adicionar_linha_distribuicao("Custos Tributáveis (R$)", "Uniforme", (0.85, 1.15, 0.0), "Relativo")
+        ibs_setor = self.obter_valor_parametro_analise("Alíquota IBS do Setor (%)")
+        self.adicionar_linha_distribuicao("Alíquota IBS do Setor (%)", "Triangular",
+                                          (ibs_setor - 1.5, ibs_setor, ibs_setor + 1.5), "Absoluto")
+
+        grupo_execucao = QGroupBox("Execução")
+        layout_execucao = QFormLayout(grupo_execucao)
+        layout_entrada.addWidget(grupo_execucao)
+
+        self.campo_amostras_mc = QSpinBox()
+        self.campo_amostras_mc.setRange(100, 2000000)
+        self.campo_amostras_mc.setSingleStep(10000)
+        self.campo_amostras_mc.setValue(100000)
+        layout_execucao.addRow("Número de Amostras:", self.campo_amostras_mc)
+
+        self.campo_semente_mc = QSpinBox()
+        self.campo_semente_mc.setRange(0, 2147483647)
+        self.campo_semente_mc.setValue(2026)
+        layout_execucao.addRow("Semente:", self.campo_semente_mc)
+
+        self.combo_metrica_mc = QComboBox()
+        self.combo_metrica_mc.addItems(["Total Devido (R$)", "Alíquota Efetiva (%)"])
+        self.combo_metrica_mc.currentTextChanged.connect(self.exibir_monte_carlo)
+        layout_execucao.addRow("Métrica:", self.combo_metrica_mc)
+
+        botao_executar = QPushButton("Executar Monte Carlo")
+        botao_executar.clicked.connect(self.executar_monte_carlo)
+        layout_entrada.addWidget(botao_executar)
+
+        self.label_status_mc = QLabel("")
+        layout_entrada.addWidget(self.label_status_mc)
+
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
+
+        self.grafico_monte_carlo = GraficoMatplotlib(width=7, height=4)
+        layout_resultados.addWidget(self.grafico_monte_carlo)
+
+        self.tabela_percentis_mc = QTableWidget()
+        self.tabela_percentis_mc.setColumnCount(7)
+        self.tabela_percentis_mc.setHorizontalHeaderLabels(["Ano", "P5", "P25", "P50", "P75", "P95", "Média"])
+        self.tabela_percentis_mc.horizontalHeader().setStretchLastSection(True)
+        layout_resultados.addWidget(self.tabela_percentis_mc)
+
+        self.resultado_monte_carlo = None
+
+    def adicionar_linha_distribuicao(self, parametro="Faturamento (R$)", distribuicao="Normal",
+                                     valores=(1.0, 0.1, 0.0), modo="Relativo"):
+        """Adiciona uma linha à tabela de distribuições do Monte Carlo."""
+        linha = self.tabela_distribuicoes.rowCount()
+        self.tabela_distribuicoes.insertRow(linha)
+
+        combo_parametro = QComboBox()
+        combo_parametro.addItems(list(PARAMETROS_ANALISE.keys()))
+        combo_parametro.setCurrentText(parametro)
+        self.tabela_distribuicoes.setCellWidget(linha, 0, combo_parametro)
+
+        combo_distribuicao = QComboBox()
+        combo_distribuicao.addItems(["Normal", "Uniforme", "Triangular", "Lognormal"])
+        combo_distribuicao.setCurrentText(distribuicao)
+        self.tabela_distribuicoes.setCellWidget(linha, 1, combo_distribuicao)
+
+        for coluna, valor in enumerate(valores, start=2):
+            campo = QDoubleSpinBox()
+            campo.setRange(0, 1000000000)
+            campo.setDecimals(4)
+            campo.setValue(valor)
+            self.tabela_distribuicoes.setCellWidget(linha, coluna, campo)
+
+        combo_modo = QComboBox()
+        combo_modo.addItems(["Relativo", "Absoluto"])
+        combo_modo.setCurrentText(modo)
+        self.tabela_distribuicoes.setCellWidget(linha, 5, combo_modo)
+
+    def remover_linha_distribuicao(self):
+        """Remove a linha selecionada da tabela de distribuições."""
+        linha = self.tabela_distribuicoes.currentRow()
+        if linha >= 0:
+            self.tabela_distribuicoes.removeRow(linha)
+
+    def executar_monte_carlo(self):
+        """Executa a simulação de Monte Carlo para a empresa informada na aba Simulação."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            simulacao = SimulacaoMonteCarlo(CalculadoraLote(self.calculadora.config),
+                                            semente=self.campo_semente_mc.value())
+
+            for linha in range(self.tabela_distribuicoes.rowCount()):
+                rotulo = self.tabela_distribuicoes.cellWidget(linha, 0).currentText()
+                tipo = self.tabela_distribuicoes.cellWidget(linha, 1).currentText().lower()
+                relativo = self.tabela_distribuicoes.cellWidget(linha, 5).currentText() == "Relativo"
+                valores = [self.tabela_distribuicoes.cellWidget(linha, coluna).value() for coluna in (2, 3, 4)]
+                valores = valores[:3] if tipo == "triangular" else valores[:2]
+
+                caminho, escala = PARAMETROS_ANALISE[rotulo]
+                caminho, _ = resolver_caminho_parametro(caminho, self.calculadora.config, dados_empresa["setor"])
+                if not relativo:
+                    valores = [valor / escala for valor in valores]
+                simulacao.adicionar_distribuicao(caminho, tipo, valores, relativo)
+
+            ano_inicial = self.campo_ano_inicial.value()
+            ano_final = self.campo_ano_final.value()
+            self.resultado_monte_carlo = simulacao.executar(
+                carteira, self.campo_amostras_mc.value(), list(range(ano_inicial, ano_final + 1)))
+
+            self.label_status_mc.setText(
+                f"{formatar_br(self.resultado_monte_carlo.n_amostras, 0)} amostras avaliadas "
+                f"(semente {self.campo_semente_mc.value()}).")
+            self.exibir_monte_carlo()
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro no Monte Carlo",
+                                 f"Ocorreu um erro durante a simulação de Monte Carlo:\n{str(e)}")
+
+    def exibir_monte_carlo(self):
+        """Atualiza o gráfico em leque e a tabela de percentis do Monte Carlo."""
+        if self.resultado_monte_carlo is None:
+            return
+
+        rotulo = self.combo_metrica_mc.currentText()
+        metrica, escala = METRICAS_ANALISE[rotulo]
+        quantis = (5, 25, 50, 75, 95)
+        resultado = self.resultado_monte_carlo
+
+        self.grafico_monte_carlo.plotar_leque(
+            resultado.anos, resultado.percentis(metrica, quantis) * escala, quantis, rotulo,
+            f"Distribuição de {rotulo.split(' (')[0]} por Ano")
+
+        tabela = resultado.tabela_percentis(metrica, quantis)
+        self.tabela_percentis_mc.setRowCount(len(tabela))
+        for linha, (ano, valores) in enumerate(tabela.items()):
+            self.tabela_percentis_mc.setItem(linha, 0, QTableWidgetItem(str(ano)))
+            for coluna, chave in enumerate([f"P{q}" for q in quantis] + ["media"], start=1):
+                valor = valores[chave] * escala
+                texto = f"{formatar_br(valor)}%" if escala == 100 else f"R$ {formatar_br(valor)}"
+                self.tabela_percentis_mc.setItem(linha, coluna, QTableWidgetItem(texto))
+
+    def configurar_painel_busca_meta(self, painel):
+        """Configura o painel de busca de meta (valor de entrada para atingir uma carga alvo)."""
+        layout = QHBoxLayout(painel)
+
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
+
+        grupo_meta = QGroupBox("Meta")
+        layout_meta = QFormLayout(grupo_meta)
+        layout_entrada.addWidget(grupo_meta)
+
+        self.combo_metrica_meta = QComboBox()
+        self.combo_metrica_meta.addItems(["Alíquota Efetiva (%)", "Total Devido (R$)", "Imposto Devido IVA (R$)"])
+        self.combo_metrica_meta.currentTextChanged.connect(self.atualizar_campo_alvo_meta)
+        layout_meta.addRow("Métrica:", self.combo_metrica_meta)
+
+        self.combo_ano_meta = QComboBox()
+        self.combo_ano_meta.addItems([str(ano) for ano in self.calculadora.config.fase_transicao.keys()])
+        self.combo_ano_meta.setCurrentText("2033")
+        layout_meta.addRow("Ano:", self.combo_ano_meta)
+
+        self.campo_alvo_meta = QDoubleSpinBox()
+        self.campo_alvo_meta.setRange(0, 1000000000)
+        self.campo_alvo_meta.setDecimals(2)
+        layout_meta.addRow("Valor Alvo:", self.campo_alvo_meta)
+
+        grupo_variavel = QGroupBox("Variável Livre")
+        layout_variavel = QFormLayout(grupo_variavel)
+        layout_entrada.addWidget(grupo_variavel)
+
+        self.combo_variavel_meta = QComboBox()
+        self.combo_variavel_meta.addItems(list(VARIAVEIS_BUSCA_META.keys()))
+        self.combo_variavel_meta.currentTextChanged.connect(self.atualizar_campo_alvo_meta)
+        layout_variavel.addRow("Variável:", self.combo_variavel_meta)
+
+        self.campo_linha_incentivo_meta = QSpinBox()
+        self.campo_linha_incentivo_meta.setRange(1, 100)
+        layout_variavel.addRow("Linha do Incentivo:", self.campo_linha_incentivo_meta)
+
+        botao_buscar = QPushButton("Buscar Meta")
+        botao_buscar.clicked.connect(self.executar_busca_meta)
+        layout_entrada.addWidget(botao_buscar)
+
+        self.label_resultado_meta = QLabel("")
+        self.label_resultado_meta.setWordWrap(True)
+        layout_entrada.addWidget(self.label_resultado_meta)
+        layout_entrada.addStretch()
+
+        self.grafico_busca_meta = GraficoMatplotlib(width=7, height=5)
+        layout.addWidget(self.grafico_busca_meta, 2)
+
+        self.atualizar_campo_alvo_meta()
+
+    def atualizar_campo_alvo_meta(self):
+        """Ajusta o campo de valor alvo e a linha do incentivo conforme as opções escolhidas."""
+        if METRICAS_ANALISE[self.combo_metrica_meta.currentText()][1] == 100:
+            self.campo_alvo_meta.setPrefix("")
+            self.campo_alvo_meta.setSuffix("%")
+        else:
+            self.campo_alvo_meta.setPrefix("R$ ")
+            self.campo_alvo_meta.setSuffix("")
+        incentivo = "Incentivo" in self.combo_variavel_meta.currentText()
+        self.campo_linha_incentivo_meta.setEnabled(incentivo)
+
+    def executar_busca_meta(self):
+        """Executa a busca de meta para a empresa informada na aba Simulação."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            lote = CalculadoraLote(self.calculadora.config)
+
+            rotulo_metrica = self.combo_metrica_meta.currentText()
+            metrica, escala_metrica = METRICAS_ANALISE[rotulo_metrica]
+            rotulo_variavel = self.combo_variavel_meta.currentText()
+            variavel, compensar_com = VARIAVEIS_BUSCA_META[rotulo_variavel]
+            variavel = variavel.replace("{linha}", str(self.campo_linha_incentivo_meta.value() - 1))
+            escala_variavel = 100 if variavel.startswith("icms_config.") else 1
+            ano = int(self.combo_ano_meta.currentText())
+            alvo = self.campo_alvo_meta.value() / escala_metrica
+
+            if variavel.startswith("icms_config."):
+                lista, linha = variavel.split(".")[1:3]
+                if int(linha) >= len(self.calculadora.config.icms_config[lista]):
+                    raise ValueError(f"Não há incentivo na linha {int(linha) + 1} da lista selecionada")
+
+            solucao = lote.buscar_meta(carteira, ano, metrica, alvo, variavel, compensar_com)
+            inferior, superior = (limite[0] for limite in solucao["limites"])
+
+            # Curva da métrica ao longo do intervalo da variável
+            valores = np.linspace(inferior, superior, 201)
+            sobrescritas = {variavel: valores[:, None]}
+            if compensar_com is not None:
+                soma = dados_empresa[variavel] + dados_empresa[compensar_com]
+                sobrescritas[compensar_com] = soma - valores[:, None]
+            curva = lote.calcular_ano(carteira, ano, sobrescritas)[metrica][:, 0]
+
+            valor = solucao["valor"][0]
+            if solucao["convergiu"][0]:
+                texto = f"Solução: {rotulo_variavel.split(' (')[0]} = "
+                texto += f"{formatar_br(valor * 100)}%" if escala_variavel == 100 else f"R$ {formatar_br(valor)}"
+                texto += f" ({solucao['iteracoes'][0]} iterações)."
+                if compensar_com is not None:
+                    migrado = valor - dados_empresa[variavel]
+                    texto += f"\nCompras migradas do Simples para o regime normal: R$ {formatar_br(migrado)}."
+                marcador = valor * escala_variavel
+            else:
+                obtido = (alvo + solucao["residuo"][0]) * escala_metrica
+                texto = (f"A meta não é atingível no intervalo da variável. O valor mais próximo é "
+                         f"{formatar_br(obtido)} no extremo {formatar_br(valor * escala_variavel)}.")
+                marcador = None
+            self.label_resultado_meta.setText(texto)
+
+            self.grafico_busca_meta.plotar_busca_meta(
+                valores * escala_variavel, curva * escala_metrica, alvo * escala_metrica, marcador,
+                rotulo_variavel, rotulo_metrica, f"Busca de Meta - {ano}")
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Busca de Meta",
+                                 f"Ocorreu um erro durante a busca de meta:\n{str(e)}")
+
+    def configurar_painel_cenarios(self, painel):
+        """Configura o painel de comparação de cenários legislativos."""
+        layout = QHBoxLayout(painel)
+
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
+
+        grupo_cenarios = QGroupBox("Cenários")
+        layout_cenarios = QVBoxLayout(grupo_cenarios)
+        layout_entrada.addWidget(grupo_cenarios)
+
+        self.tabela_cenarios = QTableWidget()
+        self.tabela_cenarios.setColumnCount(3)
+        self.tabela_cenarios.setHorizontalHeaderLabels(["Nome", "Origem", "Parâmetros Alterados"])
+        self.tabela_cenarios.horizontalHeader().setStretchLastSection(True)
+        layout_cenarios.addWidget(self.tabela_cenarios)
+
+        layout_botoes = QHBoxLayout()
+        layout_cenarios.addLayout(layout_botoes)
+
+        botao_atual = QPushButton("Adicionar Configuração Atual")
+        botao_atual.clicked.connect(self.adicionar_cenario_atual)
+        layout_botoes.addWidget(botao_atual)
+
+        botao_arquivo = QPushButton("Adicionar Arquivo")
+        botao_arquivo.clicked.connect(self.adicionar_cenario_arquivo)
+        layout_botoes.addWidget(botao_arquivo)
+
+        botao_remover = QPushButton("Remover")
+        botao_remover.clicked.connect(self.remover_cenario)
+        layout_botoes.addWidget(botao_remover)
+
+        grupo_exibicao = QGroupBox("Exibição")
+        layout_exibicao = QFormLayout(grupo_exibicao)
+        layout_entrada.addWidget(grupo_exibicao)
+
+        self.combo_metrica_cenarios = QComboBox()
+        self.combo_metrica_cenarios.addItems(list(METRICAS_ANALISE.keys()))
+        self.combo_metrica_cenarios.currentTextChanged.connect(self.exibir_cenarios)
+        layout_exibicao.addRow("Métrica:", self.combo_metrica_cenarios)
+
+        botao_comparar = QPushButton("Comparar Cenários")
+        botao_comparar.clicked.connect(self.executar_cenarios)
+        layout_entrada.addWidget(botao_comparar)
+
+        self.label_status_cenarios = QLabel("")
+        layout_entrada.addWidget(self.label_status_cenarios)
+        layout_entrada.addStretch()
+
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
+
+        self.grafico_cenarios = GraficoMatplotlib(width=7, height=4)
+        layout_resultados.addWidget(self.grafico_cenarios)
+
+        self.tabela_comparacao_cenarios = QTableWidget()
+        layout_resultados.addWidget(self.tabela_comparacao_cenarios)
+
+        self.cenarios_analise = []
+        self.resultado_cenarios = None
+
+    def registrar_cenario(self, nome, origem, configuracao):
+        """Registra um cenário na lista e na tabela de cenários."""
+        nomes = [cenario[0] for cenario in self.cenarios_analise]
+        base_nome, sufixo = nome, 2
+        while nome in nomes:
+            nome = f"{base_nome} ({sufixo})"
+            sufixo += 1
+
+        alterados = len(diferencas_configuracao(self.calculadora.config, configuracao)) if configuracao else 0
+        self.cenarios_analise.append((nome, configuracao))
+
+        linha = self.tabela_cenarios.rowCount()
+        self.tabela_cenarios.insertRow(linha)
+        self.tabela_cenarios.setItem(linha, 0, QTableWidgetItem(nome))
+        self.tabela_cenarios.setItem(linha, 1, QTableWidgetItem(origem))
+        self.tabela_cenarios.setItem(linha, 2, QTableWidgetItem(str(alterados)))
+
+    def adicionar_cenario_atual(self):
+        """Adiciona a configuração em uso como cenário de referência."""
+        self.registrar_cenario("Configuração Atual", "Em uso", None)
+
+    def adicionar_cenario_arquivo(self):
+        """Adiciona um cenário a partir de um arquivo de configurações salvo."""
+        arquivo, _ = QFileDialog.getOpenFileName(self, "Adicionar Cenário", "", "Arquivos JSON (*.json)")
+        if not arquivo:
+            return
+
+        configuracao = ConfiguracaoTributaria()
+        if configuracao.carregar_configuracoes(arquivo):
+            nome = os.path.splitext(os.path.basename(arquivo))[0]
+            self.registrar_cenario(nome, arquivo, configuracao)
+        else:
+            QMessageBox.warning(self, "Aviso", "Não foi possível carregar o arquivo de configurações.")
+
+    def remover_cenario(self):
+        """Remove o cenário selecionado."""
+        linha = self.tabela_cenarios.currentRow()
+        if linha >= 0:
+            self.tabela_cenarios.removeRow(linha)
+            del self.cenarios_analise[linha]
+
+    def executar_cenarios(self):
+        """Avalia todos os cenários para a empresa informada na aba Simulação."""
+        try:
+            if not self.cenarios_analise:
+                self.adicionar_cenario_atual()
+
+            dados_empresa = self.coletar_dados_empresa()
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            conjunto = ConjuntoCenarios(CalculadoraLote(self.calculadora.config))
+            for nome, configuracao in self.cenarios_analise:
+                conjunto.adicionar_cenario(nome, configuracao=configuracao)
+
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            self.resultado_cenarios = conjunto.executar(carteira, anos)
+
+            estatisticas = self.resultado_cenarios.estatisticas
+            self.label_status_cenarios.setText(
+                f"{len(self.cenarios_analise)} cenários avaliados; {estatisticas['estagios_calculados']} de "
+                f"{estatisticas['estagios_solicitados']} estágios calculados (demais reaproveitados).")
+            self.exibir_cenarios()
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro nos Cenários",
+                                 f"Ocorreu um erro durante a comparação de cenários:\n{str(e)}")
+
+    def exibir_cenarios(self):
+        """Atualiza o gráfico e a tabela lado a lado da comparação de cenários."""
+        if self.resultado_cenarios is None:
+            return
+
+        rotulo = self.combo_metrica_cenarios.currentText()
+        metrica, escala = METRICAS_ANALISE[rotulo]
+        resultado = self.resultado_cenarios
+        tabela = resultado.tabela(metrica, empresa=0)
+
+        series = {cenario: [tabela[ano][cenario] * escala for ano in resultado.anos] for cenario in resultado.cenarios}
+        self.grafico_cenarios.plotar_cenarios(resultado.anos, series, rotulo, f"{rotulo.split(' (')[0]} por Cenário")
+
+        self.tabela_comparacao_cenarios.clear()
+        self.tabela_comparacao_cenarios.setColumnCount(len(resultado.cenarios) + 1)
+        self.tabela_comparacao_cenarios.setHorizontalHeaderLabels(["Ano"] + resultado.cenarios)
+        self.tabela_comparacao_cenarios.setRowCount(len(resultado.anos))
+        for linha, ano in enumerate(resultado.anos):
+            self.tabela_comparacao_cenarios.setItem(linha, 0, QTableWidgetItem(str(ano)))
+            for coluna, cenario in enumerate(resultado.cenarios, start=1):
+                valor = tabela[ano][cenario] * escala
+                texto = f"{formatar_br(valor)}%" if escala == 100 else f"R$ {formatar_br(valor)}"
+                self.tabela_comparacao_cenarios.setItem(linha, coluna, QTableWidgetItem(texto))
+
+    def configurar_painel_sensibilidades(self, painel):
+        """Configura o painel de sensibilidades (derivadas exatas do total devido)."""
+        layout = QVBoxLayout(painel)
+
+        layout_selecao = QHBoxLayout()
+        layout.addLayout(layout_selecao)
+
+        layout_selecao.addWidget(QLabel("Ano:"))
+        self.combo_ano_sensibilidades = QComboBox()
+        self.combo_ano_sensibilidades.addItems([str(ano) for ano in self.calculadora.config.fase_transicao.keys()])
+        self.combo_ano_sensibilidades.setCurrentText("2033")
+        layout_selecao.addWidget(self.combo_ano_sensibilidades)
+
+        botao_calcular = QPushButton("Calcular Sensibilidades")
+        botao_calcular.clicked.connect(self.executar_sensibilidades)
+        layout_selecao.addWidget(botao_calcular)
+        layout_selecao.addStretch()
+
+        descricao = QLabel("Variação do total devido e da alíquota efetiva por 1 ponto percentual (alíquotas) "
+                           "ou por R$ 1.000,00 (valores). A faixa linear indica quanto o parâmetro pode variar "
+                           "sem mudar de trecho de cálculo, intervalo em que a estimativa é exata.")
+        descricao.setWordWrap(True)
+        layout.addWidget(descricao)
+
+        self.tabela_sensibilidades = QTableWidget()
+        self.tabela_sensibilidades.setColumnCount(5)
+        self.tabela_sensibilidades.setHorizontalHeaderLabels(
+            ["Parâmetro", "Valor Atual", "Δ Total Devido", "Δ Alíquota Efetiva (p.p.)", "Faixa Linear"])
+        self.tabela_sensibilidades.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.tabela_sensibilidades)
+
+    def executar_sensibilidades(self):
+        """Calcula as derivadas do total devido em relação aos parâmetros das análises."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            lote = CalculadoraLote(self.calculadora.config)
+            carteira.validar(self.calculadora.config)
+            ano = int(self.combo_ano_sensibilidades.currentText())
+
+            rotulos = list(PARAMETROS_ANALISE.keys())
+            caminhos = [resolver_caminho_parametro(PARAMETROS_ANALISE[rotulo][0], self.calculadora.config,
+                                                   dados_empresa["setor"])[0] for rotulo in rotulos]
+            derivadas = lote.calcular_derivadas(carteira, ano, caminhos)
+            inferior, superior = lote.faixas_lineares(derivadas)
+            faturamento = dados_empresa["faturamento"]
+
+            def formatar_limite(valor, escala):
+                if np.isinf(valor):
+                    return "-∞" if valor < 0 else "+∞"
+                sinal = "+" if valor > 0 else ""
+                return f"{sinal}{formatar_br(valor * escala + 0.0)}{'%' if escala == 100 else ''}"
+
+            self.tabela_sensibilidades.setRowCount(len(rotulos))
+            for linha, (rotulo, caminho) in enumerate(zip(rotulos, caminhos)):
+                escala = PARAMETROS_ANALISE[rotulo][1]
+                unidade = 0.01 if escala == 100 else 1000.0
+                valor_atual = derivadas["parametros"][caminho][0]
+                delta_total = derivadas["derivadas"]["total_devido"][linha, 0] * unidade
+
+                # Derivada da alíquota efetiva a partir do total (regra do quociente no faturamento)
+                delta_aliquota = delta_total / faturamento if faturamento > 0 else 0.0
+                if caminho == "faturamento" and faturamento > 0:
+                    delta_aliquota -= derivadas["valores"]["total_devido"][0] * unidade / faturamento ** 2
+
+                texto_valor = f"{formatar_br(valor_atual * 100)}%" if escala == 100 else f"R$ {formatar_br(valor_atual)}"
+                faixa = f"{formatar_limite(inferior[linha, 0], escala)} a {formatar_limite(superior[linha, 0], escala)}"
+                for coluna, texto in enumerate([rotulo, texto_valor, f"R$ {formatar_br(delta_total)}",
+                                                formatar_br(delta_aliquota * 100, 4), faixa]):
+                    self.tabela_sensibilidades.setItem(linha, coluna, QTableWidgetItem(texto))
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro nas Sensibilidades",
+                                 f"Ocorreu um erro durante o cálculo das sensibilidades:\n{str(e)}")
+
+    def configurar_painel_otimizacao(self, painel):
+        """Configura o painel de otimização da combinação de incentivos do ICMS."""
+        layout = QHBoxLayout(painel)
+
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
+
+        grupo_candidato = QGroupBox("Incentivo Candidato")
+        layout_candidato = QFormLayout(grupo_candidato)
+        layout_entrada.addWidget(grupo_candidato)
+
+        self.combo_lista_candidato = QComboBox()
+        self.combo_lista_candidato.addItems(["Saída", "Entrada", "Apuração"])
+        self.combo_lista_candidato.currentTextChanged.connect(self.atualizar_tipos_candidato)
+        layout_candidato.addRow("Operações:", self.combo_lista_candidato)
+
+        self.combo_tipo_candidato = QComboBox()
+        layout_candidato.addRow("Tipo:", self.combo_tipo_candidato)
+
+        self.campo_descricao_candidato = QLineEdit()
+        layout_candidato.addRow("Descrição:", self.campo_descricao_candidato)
+
+        self.campo_percentual_candidato = QDoubleSpinBox()
+        self.campo_percentual_candidato.setRange(0.01, 100)
+        self.campo_percentual_candidato.setDecimals(2)
+        self.campo_percentual_candidato.setSuffix("%")
+        self.campo_percentual_candidato.setValue(10)
+        layout_candidato.addRow("Percentual:", self.campo_percentual_candidato)
+
+        self.campo_operacoes_candidato = QLineEdit("25; 50; 75; 100")
+        self.campo_operacoes_candidato.setToolTip("Percentuais de operações (ou do saldo) admissíveis, separados por ';'")
+        layout_candidato.addRow("% Operações Admissíveis:", self.campo_operacoes_candidato)
+
+        self.campo_programa_candidato = QLineEdit()
+        self.campo_programa_candidato.setToolTip("Incentivos do mesmo programa são mutuamente exclusivos")
+        layout_candidato.addRow("Programa:", self.campo_programa_candidato)
+
+        layout_botoes = QHBoxLayout()
+        layout_entrada.addLayout(layout_botoes)
+
+        botao_adicionar = QPushButton("Adicionar Candidato")
+        botao_adicionar.clicked.connect(self.adicionar_candidato_otimizacao)
+        layout_botoes.addWidget(botao_adicionar)
+
+        botao_importar = QPushButton("Importar da Simulação")
+        botao_importar.clicked.connect(self.importar_candidatos_otimizacao)
+        layout_botoes.addWidget(botao_importar)
+
+        botao_remover = QPushButton("Remover")
+        botao_remover.clicked.connect(self.remover_candidato_otimizacao)
+        layout_botoes.addWidget(botao_remover)
+
+        self.tabela_candidatos = QTableWidget()
+        self.tabela_candidatos.setColumnCount(6)
+        self.tabela_candidatos.setHorizontalHeaderLabels(
+            ["Operações", "Tipo", "Descrição", "Percentual", "% Operações Admissíveis", "Programa"])
+        self.tabela_candidatos.horizontalHeader().setStretchLastSection(True)
+        layout_entrada.addWidget(self.tabela_candidatos)
+
+        layout_execucao = QHBoxLayout()
+        layout_entrada.addLayout(layout_execucao)
+
+        layout_execucao.addWidget(QLabel("Melhores planos:"))
+        self.campo_melhores_planos = QSpinBox()
+        self.campo_melhores_planos.setRange(1, 50)
+        self.campo_melhores_planos.setValue(5)
+        layout_execucao.addWidget(self.campo_melhores_planos)
+
+        botao_otimizar = QPushButton("Otimizar")
+        botao_otimizar.clicked.connect(self.executar_otimizacao)
+        layout_execucao.addWidget(botao_otimizar)
+
+        self.label_status_otimizacao = QLabel("")
+        self.label_status_otimizacao.setWordWrap(True)
+        layout_entrada.addWidget(self.label_status_otimizacao)
+
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
+
+        self.tabela_planos = QTableWidget()
+        self.tabela_planos.setColumnCount(5)
+        self.tabela_planos.setHorizontalHeaderLabels(
+            ["Plano", "Incentivos", "ICMS no Período", "Total no Período", "Economia"])
+        self.tabela_planos.horizontalHeader().setStretchLastSection(True)
+        layout_resultados.addWidget(self.tabela_planos)
+
+        botao_aplicar = QPushButton("Aplicar Plano Selecionado na Simulação")
+        botao_aplicar.clicked.connect(self.aplicar_plano_otimizacao)
+        layout_resultados.addWidget(botao_aplicar)
+
+        self.candidatos_otimizacao = []
+        self.resultado_otimizacao = None
+        self.atualizar_tipos_candidato()
+
+    def atualizar_tipos_candidato(self):
+        """Atualiza os tipos de incentivo disponíveis para a lista de operações escolhida."""
+        lista = {"Saída": "saida", "Entrada": "entrada", "Apuração": "apuracao"}[self.combo_lista_candidato.currentText()]
+        self.combo_tipo_candidato.clear()
+        self.combo_tipo_candidato.addItems(list(SINAIS_INCENTIVOS_ICMS[lista].keys()))
+
+    def registrar_candidato_otimizacao(self, lista, tipo, descricao, percentual, operacoes, programa):
+        """Registra um candidato na lista e na tabela de candidatos."""
+        nomes_listas = {"saida": "Saída", "entrada": "Entrada", "apuracao": "Apuração"}
+        self.candidatos_otimizacao.append(dict(lista=lista, tipo=tipo, descricao=descricao, percentual=percentual,
+                                               operacoes=operacoes, programa=programa))
+
+        linha = self.tabela_candidatos.rowCount()
+        self.tabela_candidatos.insertRow(linha)
+        textos = [nomes_listas[lista], tipo, descricao, f"{formatar_br(percentual * 100)}%",
+                  "; ".join(f"{formatar_br(valor * 100)}%" for valor in operacoes), programa or ""]
+        for coluna, texto in enumerate(textos):
+            self.tabela_candidatos.setItem(linha, coluna, QTableWidgetItem(texto))
+
+    def adicionar_candidato_otimizacao(self):
+        """Adiciona o incentivo candidato informado no formulário."""
+        try:
+            lista = {"Saída": "saida", "Entrada": "entrada", "Apuração": "apuracao"}[self.combo_lista_candidato.currentText()]
+            operacoes = [float(valor.replace('%', '').replace(',', '.')) / 100
+                         for valor in self.campo_operacoes_candidato.text().split(';') if valor.strip()]
+            descricao = self.campo_descricao_candidato.text() or f"Candidato {len(self.candidatos_otimizacao) + 1}"
+            percentual = self.campo_percentual_candidato.value() / 100
+            tipo = self.combo_tipo_candidato.currentText()
+            programa = self.campo_programa_candidato.text().strip() or None
+
+            # Valida o candidato antes de registrá-lo
+            OtimizadorIncentivos(CalculadoraLote(self.calculadora.config)).adicionar_candidato(
+                lista, tipo, percentual, operacoes, descricao, programa)
+            self.registrar_candidato_otimizacao(lista, tipo, descricao, percentual, sorted(set(operacoes)), programa)
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro no Candidato",
+                                 f"Ocorreu um erro ao adicionar o candidato:\n{str(e)}")
+
+    def importar_candidatos_otimizacao(self):
+        """Importa como candidatos os incentivos informados na aba Simulação."""
+        self.coletar_dados_empresa()
+        icms_config = self.calculadora.config.icms_config
+        for lista in IncentivosICMSCompilados.LISTAS:
+            for incentivo in icms_config.get(f"incentivos_{lista}", []):
+                if incentivo["tipo"] not in SINAIS_INCENTIVOS_ICMS[lista] or incentivo["percentual"] <= 0:
+                    continue
+                self.registrar_candidato_otimizacao(lista, incentivo["tipo"], incentivo["descricao"],
+                                                    incentivo["percentual"], [incentivo["percentual_operacoes"]], None)
+
+    def remover_candidato_otimizacao(self):
+        """Remove o candidato selecionado."""
+        linha = self.tabela_candidatos.currentRow()
+        if linha >= 0:
+            self.tabela_candidatos.removeRow(linha)
+            del self.candidatos_otimizacao[linha]
+
+    def executar_otimizacao(self):
+        """Busca os melhores planos de incentivos para a empresa informada na aba Simulação."""
+        try:
+            if not self.candidatos_otimizacao:
+                QMessageBox.warning(self, "Aviso", "Adicione ao menos um incentivo candidato.")
+                return
+
+            dados_empresa = self.coletar_dados_empresa()
+            otimizador = OtimizadorIncentivos(CalculadoraLote(self.calculadora.config))
+            for candidato in self.candidatos_otimizacao:
+                otimizador.adicionar_candidato(**candidato)
+
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            self.resultado_otimizacao = otimizador.otimizar(dados_empresa, anos, self.campo_melhores_planos.value())
+            resultado = self.resultado_otimizacao
+
+            self.label_status_otimizacao.setText(
+                f"{formatar_br(resultado['combinacoes'], 0)} combinações possíveis; "
+                f"{formatar_br(resultado['nos_avaliados'], 0)} nós avaliados e "
+                f"{formatar_br(resultado['nos_podados'], 0)} ramos descartados pelo limite inferior. "
+                f"Total sem incentivos: R$ {formatar_br(resultado['sem_incentivos']['total_periodo'])}.")
+
+            planos = resultado["planos"]
+            self.tabela_planos.setRowCount(len(planos))
+            for linha, plano in enumerate(planos):
+                incentivos = "; ".join(f"{incentivo['descricao']} ({formatar_br(incentivo['percentual_operacoes'] * 100)}%)"
+                                       for incentivo in plano["incentivos"]) or "Nenhum incentivo"
+                textos = [str(linha + 1), incentivos, f"R$ {formatar_br(plano['icms_periodo'])}",
+                          f"R$ {formatar_br(plano['total_periodo'])}", f"R$ {formatar_br(plano['economia'])}"]
+                for coluna, texto in enumerate(textos):
+                    self.tabela_planos.setItem(linha, coluna, QTableWidgetItem(texto))
+            self.tabela_planos.resizeColumnsToContents()
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Otimização",
+                                 f"Ocorreu um erro durante a otimização de incentivos:\n{str(e)}")
+
+    def aplicar_plano_otimizacao(self):
+        """Substitui os incentivos da aba Simulação pelos do plano selecionado."""
+        linha = self.tabela_planos.currentRow()
+        if self.resultado_otimizacao is None or linha < 0:
+            QMessageBox.warning(self, "Seleção Necessária", "Selecione um plano para aplicar.")
+            return
+        self.aplicar_incentivos_simulacao(self.resultado_otimizacao["planos"][linha]["incentivos"])
+
+    def aplicar_incentivos_simulacao(self, incentivos):
+        """Substitui as tabelas de incentivos da aba Simulação pelos incentivos informados."""
+        tabelas = {"saida": self.tabelaIncentivosSaida, "entrada": self.tabelaIncentivosEntrada,
+                   "apuracao": self.tabelaIncentivosApuracao}
+        for tabela in tabelas.values():
+            tabela.setRowCount(0)
+        for incentivo in incentivos:
+            tabela = tabelas[incentivo["lista"]]
+            row = tabela.rowCount()
+            tabela.insertRow(row)
+            tabela.setItem(row, 0, QTableWidgetItem(incentivo["descricao"]))
+            tabela.setItem(row, 1, QTableWidgetItem(incentivo["tipo"]))
+            tabela.setItem(row, 2, QTableWidgetItem(f"{round(incentivo['percentual'] * 100, 4)}%"))
+            tabela.setItem(row, 3, QTableWidgetItem(f"{round(incentivo['percentual_operacoes'] * 100, 4)}%"))
+
+    def configurar_painel_regimes(self, painel):
+        """Configura o painel de comparação entre o Simples Nacional e o regime normal."""
+        layout = QHBoxLayout(painel)
+
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
+
+        grupo_compradores = QGroupBox("Compradores")
+        layout_compradores = QFormLayout(grupo_compradores)
+        layout_entrada.addWidget(grupo_compradores)
+
+        self.campo_percentual_b2b = QDoubleSpinBox()
+        self.campo_percentual_b2b.setRange(0, 100)
+        self.campo_percentual_b2b.setDecimals(2)
+        self.campo_percentual_b2b.setSuffix("%")
+        self.campo_percentual_b2b.setToolTip("Parcela do faturamento vendida a contribuintes do regime normal")
+        layout_compradores.addRow("Vendas a Empresas do Regime Normal:", self.campo_percentual_b2b)
+
+        self.campo_repasse_credito = QDoubleSpinBox()
+        self.campo_repasse_credito.setRange(0, 100)
+        self.campo_repasse_credito.setDecimals(2)
+        self.campo_repasse_credito.setSuffix("%")
+        self.campo_repasse_credito.setValue(100)
+        self.campo_repasse_credito.setToolTip("Parcela do crédito não aproveitado pelos compradores que a empresa "
+                                              "absorve em preço para manter-se competitiva")
+        layout_compradores.addRow("Crédito Perdido Absorvido:", self.campo_repasse_credito)
+
+        botao_comparar = QPushButton("Comparar Regimes")
+        botao_comparar.clicked.connect(self.executar_comparacao_regimes)
+        layout_entrada.addWidget(botao_comparar)
+
+        self.label_resultado_regimes = QLabel("")
+        self.label_resultado_regimes.setWordWrap(True)
+        layout_entrada.addWidget(self.label_resultado_regimes)
         layout_entrada.addStretch()
-        
-        # Resultados - Tabela comparativa
-        grupo_tabela = QGroupBox("Resultados da Simulação")
-        layout_tabela = QVBoxLayout(grupo_tabela)
-        layout_resultados.addWidget(grupo_tabela)
-        
-        self.tabela_resultados = QTableWidget()
-        self.tabela_resultados.setColumnCount(6)
-        self.tabela_resultados.setHorizontalHeaderLabels(["Ano", "CBS", "IBS", "Imposto Bruto", "Créditos", "Imposto Devido"])
-        self.tabela_resultados.horizontalHeader().setStretchLastSection(True)
-        layout_tabela.addWidget(self.tabela_resultados)
-        
-         # Resultados - Gráficos
-        grupo_graficos = QGroupBox("Gráficos Comparativos")
-        layout_graficos = QVBoxLayout(grupo_graficos)
-        layout_resultados.addWidget(grupo_graficos)
-        
-        # Gráficos existentes
-        self.grafico_comparativo = GraficoMatplotlib(width=6, height=4)
-        layout_graficos.addWidget(self.grafico_comparativo)
-        
-        self.grafico_aliquotas = GraficoMatplotlib(width=6, height=4)
-        layout_graficos.addWidget(self.grafico_aliquotas)
-        
-        # ADICIONAR: Novo gráfico para a transição
-        self.grafico_transicao = GraficoMatplotlib(width=6, height=4)
-        layout_graficos.addWidget(self.grafico_transicao)
-        
-        # Botões para exportar resultados
-        grupo_exportar = QGroupBox("Exportar Resultados")
-        layout_exportar = QHBoxLayout(grupo_exportar)
-        layout_resultados.addWidget(grupo_exportar)
-        
-        botao_exportar_pdf = QPushButton("Exportar PDF")
-        botao_exportar_pdf.clicked.connect(self.exportar_pdf)
-        layout_exportar.addWidget(botao_exportar_pdf)
-        
-        botao_exportar_excel = QPushButton("Exportar Excel")
-        botao_exportar_excel.clicked.connect(self.exportar_excel)
-        layout_exportar.addWidget(botao_exportar_excel)
 
-    def atualizar_campos_incentivo(self, tipo_selecionado):
-        """Atualiza os campos relacionados aos incentivos conforme o tipo selecionado."""
-        # Habilitar/desabilitar campos conforme necessário
-        campos_habilitados = tipo_selecionado != "Nenhum"
-        self.campo_percentual_incentivo.setEnabled(campos_habilitados)
-        self.campo_operacoes_incentivadas.setEnabled(campos_habilitados)
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
 
-        # Ajustar rótulos e dicas conforme o tipo de incentivo
-        if tipo_selecionado == "Redução de Alíquota":
-            self.campo_percentual_incentivo.setPrefix("")
-            self.campo_percentual_incentivo.setToolTip("Percentual de redução sobre a alíquota normal")
-        elif tipo_selecionado == "Crédito Presumido/Outorgado":
-            self.campo_percentual_incentivo.setPrefix("")
-            self.campo_percentual_incentivo.setToolTip("Percentual do débito que será creditado adicionalmente")
-        elif tipo_selecionado == "Redução de Base de Cálculo":
-            self.campo_percentual_incentivo.setPrefix("")
-            self.campo_percentual_incentivo.setToolTip("Percentual de redução sobre a base de cálculo")
-        elif tipo_selecionado == "Diferimento":
-            self.campo_percentual_incentivo.setPrefix("")
-            self.campo_percentual_incentivo.setToolTip("Percentual do imposto que será diferido")
+        self.grafico_regimes = GraficoMatplotlib(width=7, height=4)
+        layout_resultados.addWidget(self.grafico_regimes)
 
-    def configurar_aba_memoria_calculo(self, tab):
-        """Configura a aba de memória de cálculo."""
-        # Layout principal da aba
-        layout = QVBoxLayout(tab)
+        self.tabela_regimes = QTableWidget()
+        self.tabela_regimes.setColumnCount(6)
+        self.tabela_regimes.setHorizontalHeaderLabels(
+            ["Ano", "Regime Normal", "Simples Nacional", "Crédito Perdido pelos Compradores", "Regime Ótimo",
+             "Vendas B2B de Indiferença"])
+        self.tabela_regimes.horizontalHeader().setStretchLastSection(True)
+        layout_resultados.addWidget(self.tabela_regimes)
 
-        # Título
-        titulo = QLabel("Memória de Cálculo")
-        titulo.setFont(QFont("Arial", 14, QFont.Bold))
-        layout.addWidget(titulo)
+    def executar_comparacao_regimes(self):
+        """Compara o Simples Nacional e o regime normal para a empresa informada na aba Simulação."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            dados_empresa["vendas_b2b"] = dados_empresa["faturamento"] * self.campo_percentual_b2b.value() / 100
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            lote = CalculadoraLote(self.calculadora.config)
+
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            resultado = lote.comparar_regimes(carteira, anos, repasse_credito=self.campo_repasse_credito.value() / 100)
+            elegivel = bool(resultado["elegivel"][0])
+
+            normal = resultado["carga_normal"][0]
+            simples = resultado["carga_simples"][0]
+            series = {"Regime Normal": list(normal)}
+            if elegivel:
+                series["Simples Nacional"] = list(simples)
+            self.grafico_regimes.plotar_cenarios(anos, series, "Carga Tributária (R$)", "Carga por Regime Tributário")
+
+            self.tabela_regimes.setRowCount(len(anos))
+            for linha, ano in enumerate(anos):
+                indiferenca = resultado["vendas_b2b_indiferenca"][0, linha]
+                if not elegivel:
+                    texto_indiferenca = "-"
+                elif np.isinf(indiferenca):
+                    texto_indiferenca = "Qualquer volume"
+                else:
+                    texto_indiferenca = f"R$ {formatar_br(indiferenca)}"
+                textos = [str(ano), f"R$ {formatar_br(normal[linha])}",
+                          f"R$ {formatar_br(simples[linha])}" if elegivel else "Não elegível",
+                          f"R$ {formatar_br(resultado['custo_credito_compradores'][0, linha])}" if elegivel else "-",
+                          "Simples Nacional" if resultado["regime_otimo"][0, linha] == "simples" else "Regime Normal",
+                          texto_indiferenca]
+                for coluna, texto in enumerate(textos):
+                    self.tabela_regimes.setItem(linha, coluna, QTableWidgetItem(texto))
+            self.tabela_regimes.resizeColumnsToContents()
+
+            if not elegivel:
+                texto = (f"Faturamento acima do limite do Simples Nacional "
+                         f"(R$ {formatar_br(self.calculadora.config.limite_simples)}); somente o regime normal é possível.")
+            else:
+                texto = (f"Parcela do DAS relativa aos tributos sobre o consumo: R$ {formatar_br(resultado['das'][0])}. "
+                         f"Economia no período em relação ao regime atual: "
+                         f"R$ {formatar_br(resultado['economia'][0].sum())}.")
+                anos_troca = [str(ano) for ano, troca in zip(anos, resultado["trocas"][0]) if troca]
+                if anos_troca:
+                    texto += f" O regime ótimo muda em: {', '.join(anos_troca)}."
+            self.label_resultado_regimes.setText(texto)
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Comparação de Regimes",
+                                 f"Ocorreu um erro durante a comparação de regimes:\n{str(e)}")
+
+    def configurar_painel_tornado(self, painel):
+        """Configura o painel do gráfico de tornado (parâmetros que mais movem o total devido)."""
+        layout = QVBoxLayout(painel)
 
-        # Seleção do ano para exibir a memória de cálculo
         layout_selecao = QHBoxLayout()
         layout.addLayout(layout_selecao)
 
-        label_ano = QLabel("Selecione o ano:")
-        layout_selecao.addWidget(label_ano)
+        layout_selecao.addWidget(QLabel("Variação:"))
+        self.campo_variacao_tornado = QDoubleSpinBox()
+        self.campo_variacao_tornado.setRange(0.1, 100)
+        self.campo_variacao_tornado.setDecimals(1)
+        self.campo_variacao_tornado.setSuffix("%")
+        self.campo_variacao_tornado.setValue(10)
+        layout_selecao.addWidget(self.campo_variacao_tornado)
+
+        layout_selecao.addWidget(QLabel("Ano:"))
+        self.combo_ano_tornado = QComboBox()
+        self.combo_ano_tornado.addItem("Período")
+        self.combo_ano_tornado.addItems([str(ano) for ano in self.calculadora.config.fase_transicao.keys()])
+        self.combo_ano_tornado.currentTextChanged.connect(self.exibir_tornado)
+        layout_selecao.addWidget(self.combo_ano_tornado)
+
+        layout_selecao.addWidget(QLabel("Parâmetros exibidos:"))
+        self.campo_limite_tornado = QSpinBox()
+        self.campo_limite_tornado.setRange(3, 50)
+        self.campo_limite_tornado.setValue(12)
+        self.campo_limite_tornado.valueChanged.connect(self.exibir_tornado)
+        layout_selecao.addWidget(self.campo_limite_tornado)
+
+        botao_calcular = QPushButton("Calcular Tornado")
+        botao_calcular.clicked.connect(self.executar_tornado)
+        layout_selecao.addWidget(botao_calcular)
+        layout_selecao.addStretch()
 
-        self.combo_ano_memoria = QComboBox()
-        layout_selecao.addWidget(self.combo_ano_memoria)
+        self.grafico_tornado = GraficoMatplotlib(width=8, height=5)
+        layout.addWidget(self.grafico_tornado)
 
-        botao_atualizar = QPushButton("Atualizar Memória")
-        botao_atualizar.clicked.connect(self.atualizar_memoria_calculo)
-        layout_selecao.addWidget(botao_atualizar)
+        self.resultado_tornado = None
 
-        layout_selecao.addStretch()
+    def calcular_tornado(self, dados_empresa, anos, variacao):
+        """Calcula o tornado do total devido para a empresa com os parâmetros padrão."""
+        carteira = CarteiraEmpresas.de_dados([dados_empresa])
+        analise = AnaliseTornado(CalculadoraLote(self.calculadora.config))
+        analise.adicionar_parametros_padrao(carteira, anos, variacao)
+        return analise.executar(carteira, anos)
 
-        # Área de texto para exibir a memória de cálculo
-        self.texto_memoria = QTextEdit()
-        self.texto_memoria.setReadOnly(True)
-        self.texto_memoria.setFont(QFont("Consolas", 10))
-        layout.addWidget(self.texto_memoria)
+    def tornado_relatorio(self):
+        """Tornado do total devido no período simulado, para os relatórios exportados."""
+        anos = sorted(self.resultados.keys())
+        variacao = self.campo_variacao_tornado.value() / 100
+        resultado = self.calcular_tornado(self.coletar_dados_empresa(), anos, variacao)
+        impactos = resultado.impactos(empresa=0, limite=self.campo_limite_tornado.value())
+        return impactos, resultado.reduzir(resultado.base, 0), variacao, anos
 
-        # Botão para exportar a memória de cálculo
-        botao_exportar = QPushButton("Exportar Memória de Cálculo")
-        botao_exportar.clicked.connect(self.exportar_memoria_calculo)
-        layout.addWidget(botao_exportar)
+    def executar_tornado(self):
+        """Executa a análise de tornado para a empresa informada na aba Simulação."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            self.resultado_tornado = self.calcular_tornado(dados_empresa, anos,
+                                                           self.campo_variacao_tornado.value() / 100)
+            self.exibir_tornado()
 
-    def atualizar_combo_anos_memoria(self):
-        """Atualiza o combobox com os anos disponíveis na memória de cálculo."""
-        self.combo_ano_memoria.clear()
-        if self.resultados:
-            for ano in sorted(self.resultados.keys()):
-                self.combo_ano_memoria.addItem(str(ano))
+        except Exception as e:
+            QMessageBox.critical(self, "Erro no Tornado",
+                                 f"Ocorreu um erro durante a análise de tornado:\n{str(e)}")
 
-    def atualizar_memoria_calculo(self):
-        """Atualiza a exibição da memória de cálculo para o ano selecionado."""
-        ano_selecionado = self.combo_ano_memoria.currentText()
-        if not ano_selecionado or not self.resultados:
-            self.texto_memoria.setPlainText("Não há dados disponíveis. Execute uma simulação primeiro.")
+    def exibir_tornado(self):
+        """Atualiza o gráfico de tornado para o ano (ou período) selecionado."""
+        resultado = self.resultado_tornado
+        if resultado is None:
+            return
+        texto_ano = self.combo_ano_tornado.currentText()
+        ano = None if texto_ano == "Período" else int(texto_ano)
+        if ano is not None and ano not in resultado.anos:
+            self.grafico_tornado.axes.clear()
+            self.grafico_tornado.axes.set_title(f"O ano {ano} não faz parte do período simulado")
+            self.grafico_tornado.draw()
             return
 
-        ano = int(ano_selecionado)
-        if ano not in self.resultados:
-            self.texto_memoria.setPlainText(f"Não há resultados para o ano {ano}.")
+        impactos = resultado.impactos(empresa=0, ano=ano, limite=self.campo_limite_tornado.value())
+        base = resultado.reduzir(resultado.base, 0, ano)
+        periodo = f"{resultado.anos[0]}-{resultado.anos[-1]}" if ano is None else str(ano)
+        variacao = formatar_br(self.campo_variacao_tornado.value(), 1)
+        self.grafico_tornado.plotar_tornado(impactos, base, "Total Devido",
+                                            f"Sensibilidade do Total Devido ({periodo}, ±{variacao}%)")
+
+    def configurar_painel_fronteira(self, painel):
+        """Configura o painel da fronteira entre carga tributária total e pico de desembolso."""
+        layout = QVBoxLayout(painel)
+
+        layout_opcoes = QHBoxLayout()
+        layout.addLayout(layout_opcoes)
+
+        layout_opcoes.addWidget(QLabel("Prazo do diferimento:"))
+        self.campo_prazo_diferimento = QSpinBox()
+        self.campo_prazo_diferimento.setRange(1, 20)
+        self.campo_prazo_diferimento.setValue(1)
+        self.campo_prazo_diferimento.setSuffix(" ano(s)")
+        self.campo_prazo_diferimento.setToolTip("Anos entre o diferimento do ICMS e a sua quitação")
+        layout_opcoes.addWidget(self.campo_prazo_diferimento)
+
+        self.check_mix_fronteira = QCheckBox("Migrar compras do Simples para o regime normal:")
+        self.check_mix_fronteira.setChecked(True)
+        layout_opcoes.addWidget(self.check_mix_fronteira)
+        self.campo_fracoes_mix = QLineEdit("0; 25; 50; 75; 100")
+        self.campo_fracoes_mix.setToolTip("Percentuais das compras de fornecedores do Simples migradas, separados por ';'")
+        layout_opcoes.addWidget(self.campo_fracoes_mix)
+
+        layout_opcoes.addWidget(QLabel("Máximo de planos:"))
+        self.campo_max_planos_fronteira = QSpinBox()
+        self.campo_max_planos_fronteira.setRange(100, 1_000_000)
+        self.campo_max_planos_fronteira.setSingleStep(10_000)
+        self.campo_max_planos_fronteira.setValue(200_000)
+        layout_opcoes.addWidget(self.campo_max_planos_fronteira)
+
+        botao_calcular = QPushButton("Calcular Fronteira")
+        botao_calcular.clicked.connect(self.executar_fronteira)
+        layout_opcoes.addWidget(botao_calcular)
+        layout_opcoes.addStretch()
+
+        layout.addWidget(QLabel("Os incentivos candidatos são os da aba Otimização de Incentivos. "
+                                "Clique em um ponto da fronteira para ver o plano."))
+
+        self.label_status_fronteira = QLabel("")
+        self.label_status_fronteira.setWordWrap(True)
+        layout.addWidget(self.label_status_fronteira)
+
+        self.grafico_fronteira = GraficoMatplotlib(width=8, height=5)
+        self.grafico_fronteira.mpl_connect('pick_event', self.selecionar_ponto_fronteira)
+        layout.addWidget(self.grafico_fronteira, 2)
+
+        self.tabela_fronteira = QTableWidget()
+        self.tabela_fronteira.setColumnCount(5)
+        self.tabela_fronteira.setHorizontalHeaderLabels(
+            ["Plano", "Incentivos", "Compras Migradas do Simples", "Carga Total", "Pico de Desembolso"])
+        self.tabela_fronteira.horizontalHeader().setStretchLastSection(True)
+        self.tabela_fronteira.setSelectionBehavior(QTableWidget.SelectRows)
+        self.tabela_fronteira.itemSelectionChanged.connect(self.exibir_fronteira)
+        layout.addWidget(self.tabela_fronteira, 1)
+
+        botao_aplicar = QPushButton("Aplicar Plano Selecionado")
+        botao_aplicar.clicked.connect(self.aplicar_plano_fronteira)
+        layout.addWidget(botao_aplicar)
+
+        self.resultado_fronteira = None
+
+    def executar_fronteira(self):
+        """Calcula a fronteira de Pareto para a empresa informada na aba Simulação."""
+        try:
+            fracoes = []
+            if self.check_mix_fronteira.isChecked():
+                fracoes = [float(valor.replace(',', '.')) / 100
+                           for valor in self.campo_fracoes_mix.text().split(';') if valor.strip()]
+            if not self.candidatos_otimizacao and not fracoes:
+                QMessageBox.warning(self, "Aviso",
+                                    "Adicione incentivos candidatos ou habilite a migração de compras do Simples.")
+                return
+
+            dados_empresa = self.coletar_dados_empresa()
+            fronteira = FronteiraIncentivos(CalculadoraLote(self.calculadora.config),
+                                            max_planos=self.campo_max_planos_fronteira.value(), semente=0)
+            for candidato in self.candidatos_otimizacao:
+                fronteira.adicionar_candidato(**candidato)
+            if fracoes:
+                fronteira.adicionar_mix_custos("custos_simples", "custos_tributaveis", fracoes,
+                                               "Compras migradas do Simples")
+
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            self.resultado_fronteira = fronteira.explorar(dados_empresa, anos, self.campo_prazo_diferimento.value())
+            resultado = self.resultado_fronteira
+
+            estatisticas = resultado.estatisticas
+            busca = "planos sorteados" if estatisticas["amostral"] else "planos enumerados"
+            self.label_status_fronteira.setText(
+                f"{formatar_br(estatisticas['combinacoes'], 0)} combinações possíveis; "
+                f"{formatar_br(estatisticas['avaliados'], 0)} {busca}, {formatar_br(estatisticas['viaveis'], 0)} viáveis; "
+                f"{len(resultado.planos)} planos não dominados.")
+
+            self.tabela_fronteira.blockSignals(True)
+            self.tabela_fronteira.setRowCount(len(resultado.planos))
+            for linha, plano in enumerate(resultado.planos):
+                incentivos = "; ".join(f"{incentivo['descricao']} ({formatar_br(incentivo['percentual_operacoes'] * 100)}%)"
+                                       for incentivo in plano["incentivos"]) or "Nenhum incentivo"
+                migrado = f"{formatar_br(plano['mixes'][0]['fracao'] * 100)}%" if plano["mixes"] else "-"
+                textos = [str(linha + 1), incentivos, migrado, f"R$ {formatar_br(plano['total'])}",
+                          f"R$ {formatar_br(plano['pico'])}"]
+                for coluna, texto in enumerate(textos):
+                    self.tabela_fronteira.setItem(linha, coluna, QTableWidgetItem(texto))
+            self.tabela_fronteira.resizeColumnsToContents()
+            self.tabela_fronteira.blockSignals(False)
+            self.exibir_fronteira()
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Fronteira",
+                                 f"Ocorreu um erro durante o cálculo da fronteira:\n{str(e)}")
+
+    def exibir_fronteira(self):
+        """Atualiza o gráfico da fronteira, destacando o plano selecionado na tabela."""
+        if self.resultado_fronteira is None:
             return
+        linha = self.tabela_fronteira.currentRow()
+        self.grafico_fronteira.plotar_fronteira(self.resultado_fronteira, linha if linha >= 0 else None,
+                                                "Carga Total × Pico de Desembolso Anual")
 
-        # Obter a memória de cálculo
-        memoria = self.calculadora.memoria_calculo
+    def selecionar_ponto_fronteira(self, evento):
+        """Seleciona na tabela o plano correspondente ao ponto clicado na fronteira."""
+        if self.resultado_fronteira is None or evento.artist.get_gid() != "fronteira" or not len(evento.ind):
+            return
+        self.tabela_fronteira.selectRow(int(evento.ind[0]))
 
-        # Formatar a memória de cálculo para exibição
-        texto = f"=== MEMÓRIA DE CÁLCULO - ANO {ano} ===\n\n"
+    def aplicar_plano_fronteira(self):
+        """Aplica os incentivos e o mix de custos do plano selecionado na aba Simulação."""
+        linha = self.tabela_fronteira.currentRow()
+        if self.resultado_fronteira is None or linha < 0:
+            QMessageBox.warning(self, "Seleção Necessária", "Selecione um plano para aplicar.")
+            return
 
-        # Validação de dados
-        texto += "=== VALIDAÇÃO DE DADOS ===\n"
-        for linha in memoria.get("validacao", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        plano = self.resultado_fronteira.planos[linha]
+        self.aplicar_incentivos_simulacao(plano["incentivos"])
+        for mix in plano["mixes"]:
+            migrado = self.campo_custos_simples.value() * mix["fracao"]
+            self.campo_custos.setValue(self.campo_custos.value() + migrado)
+            self.campo_custos_simples.setValue(self.campo_custos_simples.value() - migrado)
 
-        # Base tributável
-        texto += "=== BASE TRIBUTÁVEL ===\n"
-        for linha in memoria.get("base_tributavel", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+    def configurar_painel_arvore(self, painel):
+        """Configura o painel da árvore de cenários (cada ramo registra apenas a sua alteração)."""
+        layout = QVBoxLayout(painel)
 
-        # Alíquotas
-        texto += "=== ALÍQUOTAS ===\n"
-        for linha in memoria.get("aliquotas", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        layout_botoes = QHBoxLayout()
+        layout.addLayout(layout_botoes)
 
-        # CBS
-        texto += "=== CÁLCULO DA CBS ===\n"
-        for linha in memoria.get("cbs", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        botao_adicionar = QPushButton("Adicionar Ramo")
+        botao_adicionar.setToolTip("Adiciona um ramo sob o cenário selecionado")
+        botao_adicionar.clicked.connect(self.adicionar_ramo_cenario)
+        layout_botoes.addWidget(botao_adicionar)
+
+        botao_editar = QPushButton("Editar Ramo")
+        botao_editar.clicked.connect(self.editar_ramo_cenario)
+        layout_botoes.addWidget(botao_editar)
+
+        botao_remover = QPushButton("Remover Ramo")
+        botao_remover.clicked.connect(self.remover_ramo_cenario)
+        layout_botoes.addWidget(botao_remover)
+
+        botao_avaliar = QPushButton("Avaliar Árvore")
+        botao_avaliar.clicked.connect(self.avaliar_arvore_cenarios)
+        layout_botoes.addWidget(botao_avaliar)
+        layout_botoes.addStretch()
+
+        self.arvore_widget = QTreeWidget()
+        self.arvore_widget.setColumnCount(4)
+        self.arvore_widget.setHeaderLabels(["Cenário", "Alteração", "Total Devido", "Variação em Relação ao Pai"])
+        layout.addWidget(self.arvore_widget)
+
+        self.label_status_arvore = QLabel("")
+        self.label_status_arvore.setWordWrap(True)
+        layout.addWidget(self.label_status_arvore)
+
+        self.arvore_cenarios = None
+        self._dados_arvore = None
+        self.atualizar_arvore_widget()
+
+    def parametros_arvore(self):
+        """Parâmetros que um ramo pode alterar: (rótulo, caminho, monetário)."""
+        config = self.calculadora.config
+        parametros = [("Faturamento", "faturamento", True), ("Custos Tributáveis", "custos_tributaveis", True),
+                      ("Custos do Simples", "custos_simples", True), ("Créditos Anteriores", "creditos_anteriores", True),
+                      ("Compras de Fornecedores do Simples (% das compras)", "participacao_simples", False),
+                      ("Alíquota CBS", "aliquotas_base.CBS", False)]
+        parametros += [(f"Alíquota IBS ({setor})", f"setores_especiais.{setor}.IBS", False)
+                       for setor in config.setores_especiais]
+        parametros += [(f"Transição {ano}", f"fase_transicao.{ano}", False) for ano in config.fase_transicao]
+        parametros += [("Créditos de Fornecedores do Simples", "regras_credito.simples", False),
+                       ("Alíquota ICMS Saída", "icms_config.aliquota_saida", False),
+                       ("Alíquota ICMS Entrada", "icms_config.aliquota_entrada", False)]
+        return parametros
+
+    def descrever_alteracao(self, no):
+        """Resumo textual da alteração de um nó da árvore."""
+        rotulos = {caminho: rotulo for rotulo, caminho, _ in self.parametros_arvore()}
+        monetarios = set(CarteiraEmpresas.CAMPOS_NUMERICOS)
+        partes = []
+        for caminho, valor in no["sobrescritas"].items():
+            valor = float(np.ravel(valor)[0])
+            texto = f"R$ {formatar_br(valor)}" if caminho in monetarios else f"{formatar_br(valor * 100)}%"
+            partes.append(f"{rotulos.get(caminho, caminho)} = {texto}")
+        for adicionais in no["incentivos"].values():
+            partes.extend(f"+ {incentivo['descricao']} ({formatar_br(incentivo['percentual'] * 100)}%)"
+                          for incentivo in adicionais)
+        return "; ".join(partes) or "-"
+
+    def obter_arvore_cenarios(self):
+        """Árvore de cenários sobre a empresa da aba Simulação (o cache é descartado se os dados mudarem)."""
+        dados_empresa = self.coletar_dados_empresa()
+        dados_empresa["icms_config"] = self.calculadora.config.icms_config
+        anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+        assinatura = (repr(sorted(dados_empresa.items())), tuple(anos))
+        carteira = CarteiraEmpresas.de_dados([dados_empresa])
+        if self.arvore_cenarios is None:
+            self.arvore_cenarios = ArvoreCenarios(CalculadoraLote(self.calculadora.config), carteira, anos)
+        elif assinatura != self._dados_arvore:
+            self.arvore_cenarios.anos = anos
+            self.arvore_cenarios.definir_carteira(carteira)
+        self._dados_arvore = assinatura
+        return self.arvore_cenarios
+
+    def dialogo_ramo(self, titulo, nome="", sobrescritas=None, incentivos=None, dados_empresa=None):
+        """Diálogo de edição de um ramo; retorna (nome, sobrescritas, incentivos) ou None."""
+        dialog = QDialog(self)
+        dialog.setWindowTitle(titulo)
+        dialog.resize(700, 500)
+        layout = QVBoxLayout(dialog)
+
+        layout_nome = QFormLayout()
+        layout.addLayout(layout_nome)
+        campo_nome = QLineEdit(nome)
+        layout_nome.addRow("Nome do cenário:", campo_nome)
+
+        # Alterações de parâmetros
+        grupo_parametros = QGroupBox("Parâmetros Alterados")
+        layout_parametros = QVBoxLayout(grupo_parametros)
+        layout.addWidget(grupo_parametros)
+
+        parametros = self.parametros_arvore()
+        layout_novo_parametro = QHBoxLayout()
+        layout_parametros.addLayout(layout_novo_parametro)
+        combo_parametro = QComboBox()
+        combo_parametro.addItems([rotulo for rotulo, _, _ in parametros])
+        layout_novo_parametro.addWidget(combo_parametro, 2)
+        campo_valor = QLineEdit()
+        campo_valor.setPlaceholderText("Valor (R$ ou %)")
+        layout_novo_parametro.addWidget(campo_valor, 1)
+        botao_parametro = QPushButton("Incluir")
+        layout_novo_parametro.addWidget(botao_parametro)
+
+        tabela_parametros = QTableWidget()
+        tabela_parametros.setColumnCount(2)
+        tabela_parametros.setHorizontalHeaderLabels(["Parâmetro", "Valor"])
+        tabela_parametros.horizontalHeader().setStretchLastSection(True)
+        layout_parametros.addWidget(tabela_parametros)
+
+        alteracao = dict(sobrescritas or {})
+        rotulos = {caminho: rotulo for rotulo, caminho, _ in parametros}
+        monetarios = set(CarteiraEmpresas.CAMPOS_NUMERICOS)
+
+        def atualizar_parametros():
+            tabela_parametros.setRowCount(len(alteracao))
+            for linha, (caminho, valor) in enumerate(alteracao.items()):
+                valor = float(np.ravel(valor)[0])
+                texto = f"R$ {formatar_br(valor)}" if caminho in monetarios else f"{formatar_br(valor * 100)}%"
+                tabela_parametros.setItem(linha, 0, QTableWidgetItem(rotulos.get(caminho, caminho)))
+                tabela_parametros.setItem(linha, 1, QTableWidgetItem(texto))
+
+        def incluir_parametro():
+            try:
+                _, caminho, monetario = parametros[combo_parametro.currentIndex()]
+                texto = campo_valor.text().replace('R$', '').replace('%', '').strip()
+                if ',' in texto:
+                    texto = texto.replace('.', '').replace(',', '.')
+                valor = float(texto)
+                if caminho == "participacao_simples":
+                    # Redistribui as compras totais entre fornecedores do Simples e do regime normal
+                    compras = dados_empresa["custos_tributaveis"] + dados_empresa["custos_simples"]
+                    alteracao["custos_simples"] = compras * valor / 100
+                    alteracao["custos_tributaveis"] = compras * (1 - valor / 100)
+                else:
+                    alteracao[caminho] = valor if monetario else valor / 100
+                atualizar_parametros()
+            except ValueError:
+                QMessageBox.warning(dialog, "Valor Inválido", "Informe um valor numérico.")
+
+        def remover_parametro():
+            linha = tabela_parametros.currentRow()
+            if linha >= 0:
+                del alteracao[list(alteracao)[linha]]
+                atualizar_parametros()
+
+        botao_parametro.clicked.connect(incluir_parametro)
+        botao_remover_parametro = QPushButton("Remover Parâmetro")
+        botao_remover_parametro.clicked.connect(remover_parametro)
+        layout_parametros.addWidget(botao_remover_parametro)
+
+        # Incentivos acrescentados
+        grupo_incentivos = QGroupBox("Incentivos do ICMS Acrescentados")
+        layout_incentivos = QVBoxLayout(grupo_incentivos)
+        layout.addWidget(grupo_incentivos)
+
+        layout_novo_incentivo = QHBoxLayout()
+        layout_incentivos.addLayout(layout_novo_incentivo)
+        nomes_listas = {"Saída": "saida", "Entrada": "entrada", "Apuração": "apuracao"}
+        combo_lista = QComboBox()
+        combo_lista.addItems(list(nomes_listas))
+        layout_novo_incentivo.addWidget(combo_lista)
+        combo_tipo = QComboBox()
+        layout_novo_incentivo.addWidget(combo_tipo, 1)
+        campo_descricao = QLineEdit()
+        campo_descricao.setPlaceholderText("Descrição")
+        layout_novo_incentivo.addWidget(campo_descricao, 1)
+        campo_percentual = QDoubleSpinBox()
+        campo_percentual.setRange(0.01, 100)
+        campo_percentual.setSuffix("%")
+        campo_percentual.setValue(10)
+        layout_novo_incentivo.addWidget(campo_percentual)
+        campo_operacoes = QDoubleSpinBox()
+        campo_operacoes.setRange(0.01, 100)
+        campo_operacoes.setSuffix("%")
+        campo_operacoes.setValue(100)
+        campo_operacoes.setToolTip("Percentual das operações (ou do saldo) abrangido")
+        layout_novo_incentivo.addWidget(campo_operacoes)
+        botao_incentivo = QPushButton("Incluir")
+        layout_novo_incentivo.addWidget(botao_incentivo)
+
+        def atualizar_tipos():
+            combo_tipo.clear()
+            combo_tipo.addItems(list(SINAIS_INCENTIVOS_ICMS[nomes_listas[combo_lista.currentText()]].keys()))
+
+        combo_lista.currentTextChanged.connect(atualizar_tipos)
+        atualizar_tipos()
+
+        tabela_incentivos = QTableWidget()
+        tabela_incentivos.setColumnCount(5)
+        tabela_incentivos.setHorizontalHeaderLabels(["Operações", "Tipo", "Descrição", "Percentual", "% Operações"])
+        tabela_incentivos.horizontalHeader().setStretchLastSection(True)
+        layout_incentivos.addWidget(tabela_incentivos)
+
+        adicionados = [(lista, dict(incentivo)) for lista, lista_incentivos in (incentivos or {}).items()
+                       for incentivo in lista_incentivos]
+
+        def atualizar_incentivos():
+            rotulos_listas = {valor: chave for chave, valor in nomes_listas.items()}
+            tabela_incentivos.setRowCount(len(adicionados))
+            for linha, (lista, incentivo) in enumerate(adicionados):
+                textos = [rotulos_listas[lista], incentivo["tipo"], incentivo["descricao"],
+                          f"{formatar_br(incentivo['percentual'] * 100)}%",
+                          f"{formatar_br(incentivo['percentual_operacoes'] * 100)}%"]
+                for coluna, texto in enumerate(textos):
+                    tabela_incentivos.setItem(linha, coluna, QTableWidgetItem(texto))
+
+        def incluir_incentivo():
+            adicionados.append((nomes_listas[combo_lista.currentText()], {
+                "descricao": campo_descricao.text() or combo_tipo.currentText(),
+                "tipo": combo_tipo.currentText(),
+                "percentual": campo_percentual.value() / 100,
+                "percentual_operacoes": campo_operacoes.value() / 100}))
+            atualizar_incentivos()
+
+        def remover_incentivo():
+            linha = tabela_incentivos.currentRow()
+            if linha >= 0:
+                del adicionados[linha]
+                atualizar_incentivos()
+
+        botao_incentivo.clicked.connect(incluir_incentivo)
+        botao_remover_incentivo = QPushButton("Remover Incentivo")
+        botao_remover_incentivo.clicked.connect(remover_incentivo)
+        layout_incentivos.addWidget(botao_remover_incentivo)
+
+        atualizar_parametros()
+        atualizar_incentivos()
 
-        # IBS
-        texto += "=== CÁLCULO DO IBS ===\n"
-        for linha in memoria.get("ibs", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        botoes = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botoes.accepted.connect(dialog.accept)
+        botoes.rejected.connect(dialog.reject)
+        layout.addWidget(botoes)
+
+        if not dialog.exec_():
+            return None
+        agrupados = {}
+        for lista, incentivo in adicionados:
+            agrupados.setdefault(lista, []).append(incentivo)
+        return campo_nome.text().strip(), alteracao, agrupados
+
+    def no_selecionado_arvore(self):
+        """Nome do cenário selecionado na árvore (ou None)."""
+        item = self.arvore_widget.currentItem()
+        return item.text(0) if item is not None else None
+
+    def adicionar_ramo_cenario(self):
+        """Adiciona um ramo sob o cenário selecionado (ou sob o cenário base)."""
+        try:
+            arvore = self.obter_arvore_cenarios()
+            pai = self.no_selecionado_arvore() or arvore.raiz
+            ramo = self.dialogo_ramo(f"Novo Ramo de {pai}", dados_empresa=self.coletar_dados_empresa())
+            if ramo is None:
+                return
+            nome, sobrescritas, incentivos = ramo
+            if not nome:
+                raise ValueError("Informe o nome do cenário")
+            arvore.adicionar_no(nome, pai, sobrescritas, incentivos)
+            self.avaliar_arvore_cenarios()
 
-        # Créditos
-        texto += "=== CÁLCULO DOS CRÉDITOS ===\n"
-        for linha in memoria.get("creditos", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Árvore de Cenários",
+                                 f"Ocorreu um erro ao adicionar o ramo:\n{str(e)}")
+
+    def editar_ramo_cenario(self):
+        """Edita a alteração do cenário selecionado; somente ele e seus descendentes são reavaliados."""
+        nome = self.no_selecionado_arvore()
+        if nome is None or self.arvore_cenarios is None or nome == self.arvore_cenarios.raiz:
+            QMessageBox.warning(self, "Seleção Necessária", "Selecione um ramo (diferente do cenário base) para editar.")
+            return
+        try:
+            arvore = self.obter_arvore_cenarios()
+            no = arvore.nos[nome]
+            ramo = self.dialogo_ramo(f"Editar {nome}", nome, no["sobrescritas"], no["incentivos"],
+                                     self.coletar_dados_empresa())
+            if ramo is None:
+                return
+            novo_nome, sobrescritas, incentivos = ramo
+            if novo_nome and novo_nome != nome:
+                arvore.renomear_no(nome, novo_nome)
+                nome = novo_nome
+            arvore.editar_no(nome, sobrescritas, incentivos)
+            self.avaliar_arvore_cenarios()
 
-        # Imposto devido
-        texto += "=== CÁLCULO DO IMPOSTO DEVIDO ===\n"
-        for linha in memoria.get("imposto_devido", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Árvore de Cenários",
+                                 f"Ocorreu um erro ao editar o ramo:\n{str(e)}")
+
+    def remover_ramo_cenario(self):
+        """Remove o ramo selecionado e seus descendentes."""
+        nome = self.no_selecionado_arvore()
+        if nome is None or self.arvore_cenarios is None:
+            QMessageBox.warning(self, "Seleção Necessária", "Selecione um ramo para remover.")
+            return
+        try:
+            self.arvore_cenarios.remover_no(nome)
+            self.atualizar_arvore_widget()
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Árvore de Cenários",
+                                 f"Ocorreu um erro ao remover o ramo:\n{str(e)}")
 
-        # Impostos Atuais
-        texto += "=== CÁLCULO DOS IMPOSTOS ATUAIS ===\n"
+    def avaliar_arvore_cenarios(self):
+        """Avalia os cenários ainda não calculados e atualiza a árvore."""
+        try:
+            arvore = self.obter_arvore_cenarios()
+            arvore.avaliar()
+            estatisticas = arvore.estatisticas
+            self.label_status_arvore.setText(
+                f"{len(estatisticas['nos_avaliados'])} cenário(s) avaliado(s); "
+                f"{estatisticas['estagios_calculados']} estágios calculados e "
+                f"{estatisticas['estagios_reaproveitados']} reaproveitados do cache "
+                f"({len(arvore.cache)} estágios em cache).")
+            self.atualizar_arvore_widget()
 
-        # PIS
-        texto += "\n--- PIS ---\n"
-        for linha in memoria.get("impostos_atuais", {}).get("PIS", []):
-            texto += f"{linha}\n"
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Árvore de Cenários",
+                                 f"Ocorreu um erro durante a avaliação da árvore:\n{str(e)}")
+
+    def atualizar_arvore_widget(self):
+        """Redesenha a árvore com a alteração, o total do período e a variação de cada cenário."""
+        self.arvore_widget.clear()
+        arvore = self.arvore_cenarios
+        if arvore is None:
+            QTreeWidgetItem(self.arvore_widget, ["Base", "-", "", ""])
+            return
 
-        # COFINS
-        texto += "\n--- COFINS ---\n"
-        for linha in memoria.get("impostos_atuais", {}).get("COFINS", []):
-            texto += f"{linha}\n"
+        def inserir(nome, pai_item):
+            no = arvore.nos[nome]
+            textos = [nome, self.descrever_alteracao(no), "", ""]
+            if nome in arvore.resultados:
+                textos[2] = f"R$ {formatar_br(arvore.resultados[nome]['total_devido'].sum())}"
+                if no["pai"] is not None and no["pai"] in arvore.resultados:
+                    textos[3] = f"R$ {formatar_br(arvore.diferenca(nome).sum())}"
+            item = QTreeWidgetItem(pai_item, textos)
+            for filho in no["filhos"]:
+                inserir(filho, item)
+            return item
+
+        inserir(arvore.raiz, self.arvore_widget)
+        self.arvore_widget.expandAll()
+        for coluna in range(4):
+            self.arvore_widget.resizeColumnToContents(coluna)
+
+    def configurar_painel_apuracao_mensal(self, painel):
+        """Configura o painel de apuração mensal com sazonalidade e transporte de saldos credores."""
+        layout = QHBoxLayout(painel)
 
-        # ICMS
-        texto += "\n--- ICMS ---\n"
-        for linha in memoria.get("impostos_atuais", {}).get("ICMS", []):
-            texto += f"{linha}\n"
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
 
-        # ISS
-        texto += "\n--- ISS ---\n"
-        for linha in memoria.get("impostos_atuais", {}).get("ISS", []):
-            texto += f"{linha}\n"
+        grupo_sazonalidade = QGroupBox("Sazonalidade (peso de cada mês no valor anual)")
+        layout_sazonalidade = QVBoxLayout(grupo_sazonalidade)
+        layout_entrada.addWidget(grupo_sazonalidade)
+
+        self.tabela_sazonalidade = QTableWidget(12, 2)
+        self.tabela_sazonalidade.setHorizontalHeaderLabels(["Faturamento", "Custos"])
+        self.tabela_sazonalidade.setVerticalHeaderLabels(self.MESES)
+        self.campos_sazonalidade = []
+        for mes in range(12):
+            campos = []
+            for coluna in range(2):
+                campo = QDoubleSpinBox()
+                campo.setRange(0, 1000)
+                campo.setDecimals(2)
+                campo.setValue(1)
+                self.tabela_sazonalidade.setCellWidget(mes, coluna, campo)
+                campos.append(campo)
+            self.campos_sazonalidade.append(campos)
+        layout_sazonalidade.addWidget(self.tabela_sazonalidade)
+
+        grupo_ressarcimento = QGroupBox("Ressarcimento do Saldo Credor do IVA")
+        layout_ressarcimento = QFormLayout(grupo_ressarcimento)
+        layout_entrada.addWidget(grupo_ressarcimento)
+
+        self.campo_ressarcimento = QDoubleSpinBox()
+        self.campo_ressarcimento.setRange(0, 100)
+        self.campo_ressarcimento.setDecimals(2)
+        self.campo_ressarcimento.setSuffix("%")
+        self.campo_ressarcimento.setToolTip("Parcela do saldo credor no fim de cada mês objeto de pedido de ressarcimento")
+        layout_ressarcimento.addRow("Saldo Pedido em Ressarcimento:", self.campo_ressarcimento)
+
+        self.campo_prazo_ressarcimento = QSpinBox()
+        self.campo_prazo_ressarcimento.setRange(0, 120)
+        self.campo_prazo_ressarcimento.setSuffix(" meses")
+        self.campo_prazo_ressarcimento.setValue(2)
+        layout_ressarcimento.addRow("Prazo de Pagamento:", self.campo_prazo_ressarcimento)
+
+        grupo_vigencia = QGroupBox("Mudanças de Regra com Data de Vigência")
+        layout_vigencia = QVBoxLayout(grupo_vigencia)
+        layout_entrada.addWidget(grupo_vigencia)
+
+        self.tabela_vigencia = QTableWidget(0, 3)
+        self.tabela_vigencia.setHorizontalHeaderLabels(["Parâmetro", "Vigente a partir de", "Valor"])
+        self.tabela_vigencia.horizontalHeader().setStretchLastSection(True)
+        layout_vigencia.addWidget(self.tabela_vigencia)
+
+        layout_botoes_vigencia = QHBoxLayout()
+        botao_adicionar_regra = QPushButton("Adicionar Regra")
+        botao_adicionar_regra.clicked.connect(self.adicionar_regra_vigencia)
+        layout_botoes_vigencia.addWidget(botao_adicionar_regra)
+        botao_remover_regra = QPushButton("Remover Regra")
+        botao_remover_regra.clicked.connect(
+            lambda: self.tabela_vigencia.removeRow(self.tabela_vigencia.currentRow()))
+        layout_botoes_vigencia.addWidget(botao_remover_regra)
+        layout_vigencia.addLayout(layout_botoes_vigencia)
+
+        grupo_calendario = QGroupBox("Períodos de Apuração")
+        layout_calendario = QFormLayout(grupo_calendario)
+        layout_entrada.addWidget(grupo_calendario)
+
+        self.combo_calendario_mensal = QComboBox()
+        self.combo_calendario_mensal.addItems(["Mensal", "Trimestral", "Ano civil", "Ano fiscal"])
+        layout_calendario.addRow("Consolidar por:", self.combo_calendario_mensal)
+
+        self.combo_inicio_ano_fiscal = QComboBox()
+        self.combo_inicio_ano_fiscal.addItems(self.MESES)
+        self.combo_inicio_ano_fiscal.setCurrentIndex(6)
+        layout_calendario.addRow("Início do Ano Fiscal:", self.combo_inicio_ano_fiscal)
+
+        botao_calcular = QPushButton("Calcular Apuração Mensal")
+        botao_calcular.clicked.connect(self.executar_apuracao_mensal)
+        layout_entrada.addWidget(botao_calcular)
+
+        self.label_resultado_mensal = QLabel("")
+        self.label_resultado_mensal.setWordWrap(True)
+        layout_entrada.addWidget(self.label_resultado_mensal)
 
-        # IPI
-        texto += "\n--- IPI ---\n"
-        for linha in memoria.get("impostos_atuais", {}).get("IPI", []):
-            texto += f"{linha}\n"
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
 
-        # Total Impostos Atuais
-        texto += "\n--- TOTAL IMPOSTOS ATUAIS ---\n"
-        for linha in memoria.get("impostos_atuais", {}).get("total", []):
-            texto += f"{linha}\n"
-        texto += "\n"
+        self.grafico_mensal = GraficoMatplotlib(width=7, height=4)
+        layout_resultados.addWidget(self.grafico_mensal)
+
+        self.tabela_mensal = QTableWidget()
+        self.tabela_mensal.setColumnCount(8)
+        self.tabela_mensal.setHorizontalHeaderLabels(
+            ["Mês", "Faturamento", "IVA Devido", "ICMS", "Total Devido", "Saldo Credor IVA", "Saldo Credor ICMS",
+             "Em Ressarcimento"])
+        self.tabela_mensal.horizontalHeader().setStretchLastSection(True)
+        layout_resultados.addWidget(self.tabela_mensal)
+
+    def adicionar_regra_vigencia(self):
+        """Inclui uma linha de mudança de regra na tabela de vigências."""
+        linha = self.tabela_vigencia.rowCount()
+        self.tabela_vigencia.insertRow(linha)
+
+        combo = QComboBox()
+        for caminho, rotulo in self.PARAMETROS_VIGENCIA.items():
+            combo.addItem(rotulo, caminho)
+        self.tabela_vigencia.setCellWidget(linha, 0, combo)
+
+        data = QDateEdit()
+        data.setDisplayFormat("dd/MM/yyyy")
+        data.setCalendarPopup(True)
+        data.setDate(QDate(self.campo_ano_inicial.value(), 7, 1))
+        self.tabela_vigencia.setCellWidget(linha, 1, data)
+
+        valor = QDoubleSpinBox()
+        valor.setRange(0, 100)
+        valor.setDecimals(2)
+        valor.setSuffix("%")
+        self.tabela_vigencia.setCellWidget(linha, 2, valor)
+
+    def regras_vigencia_interface(self):
+        """Regras de vigência da configuração acrescidas das mudanças informadas na tabela."""
+        regras = RegrasVigencia.de_configuracao(self.calculadora.config)
+        for linha in range(self.tabela_vigencia.rowCount()):
+            caminho = self.tabela_vigencia.cellWidget(linha, 0).currentData()
+            inicio = self.tabela_vigencia.cellWidget(linha, 1).date().toString("yyyy-MM-dd")
+            regras.adicionar(caminho, inicio, self.tabela_vigencia.cellWidget(linha, 2).value() / 100)
+        return regras
+
+    def series_mensais_interface(self, carteira, anos):
+        """Séries mensais da carteira com a sazonalidade informada no painel de apuração mensal."""
+        pesos_faturamento = [campos[0].value() for campos in self.campos_sazonalidade]
+        pesos_custos = [campos[1].value() for campos in self.campos_sazonalidade]
+        series = {"faturamento": ApuracaoMensal.serie_sazonal(carteira.colunas["faturamento"], pesos_faturamento, anos)}
+        for campo in ApuracaoMensal.CAMPOS_MENSAIS[1:]:
+            series[campo] = ApuracaoMensal.serie_sazonal(carteira.colunas[campo], pesos_custos, anos)
+        return series
+
+    def executar_apuracao_mensal(self):
+        """Executa a apuração mensal da empresa informada na aba Simulação no período simulado."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            apuracao = ApuracaoMensal(CalculadoraLote(self.calculadora.config))
+
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            series = self.series_mensais_interface(carteira, anos)
+
+            livro = LivroCreditos(len(carteira))
+            regras = self.regras_vigencia_interface() if self.tabela_vigencia.rowCount() else None
+            campos = ["faturamento", "imposto_devido", "ICMS", "total_devido", "saldo_credor_iva",
+                      "saldo_credor_icms", "em_ressarcimento"]
+            _, mensal = apuracao.empilhar(apuracao.periodos(
+                carteira, series, anos[0], livro=livro, ressarcimento=self.campo_ressarcimento.value() / 100,
+                prazo_ressarcimento=self.campo_prazo_ressarcimento.value(), regras=regras), campos)
+            meses_credores = int(np.sum((mensal["saldo_credor_iva"][:, 0] > 0) | (mensal["saldo_credor_icms"][:, 0] > 0)))
+
+            # Consolidação no calendário escolhido (um produto matricial sobre os resultados mensais)
+            consolidacao = self.combo_calendario_mensal.currentText()
+            inicio_fiscal = self.combo_inicio_ano_fiscal.currentIndex() + 1
+            if consolidacao == "Trimestral":
+                calendario = CalendarioFiscal.trimestral(anos[0], 4 * len(anos))
+            elif consolidacao == "Ano civil":
+                calendario = CalendarioFiscal.anual(anos[0], len(anos))
+            elif consolidacao == "Ano fiscal" and inicio_fiscal > 1:
+                calendario = CalendarioFiscal.anual(anos[0] - 1, len(anos) + 1, inicio_fiscal)
+            elif consolidacao == "Ano fiscal":
+                calendario = CalendarioFiscal.anual(anos[0], len(anos))
+            else:
+                calendario = CalendarioFiscal.mensal(anos[0], 12 * len(anos))
+            periodos = calendario.agregar(mensal, anos[0], saldos=ApuracaoMensal.SALDOS)
+            rotulos = [f"{self.MESES[int(str(inicio)[5:7]) - 1]}/{str(inicio)[:4]}" for inicio in calendario.inicios] \
+                if consolidacao == "Mensal" else calendario.rotulos
+            linhas = [[rotulo + (" (parcial)" if cobertura < 1 else "")] + [periodos[campo][i, 0] for campo in campos]
+                      for i, (rotulo, cobertura) in enumerate(zip(rotulos, periodos["cobertura"]))]
+
+            self.tabela_mensal.setHorizontalHeaderItem(0, QTableWidgetItem(
+                "Mês" if consolidacao == "Mensal" else "Período"))
+            self.tabela_mensal.setRowCount(len(linhas))
+            for linha, valores in enumerate(linhas):
+                textos = [valores[0]] + [f"R$ {formatar_br(valor)}" for valor in valores[1:]]
+                for coluna, texto in enumerate(textos):
+                    self.tabela_mensal.setItem(linha, coluna, QTableWidgetItem(texto))
+            self.tabela_mensal.resizeColumnsToContents()
+
+            self.grafico_mensal.plotar_apuracao_mensal(
+                [valores[0] for valores in linhas], [valores[4] for valores in linhas],
+                [valores[5] for valores in linhas], [valores[6] for valores in linhas],
+                f"Apuração {consolidacao} ({anos[0]}-{anos[-1]})", [valores[7] for valores in linhas])
+
+            # Capital de giro imobilizado em créditos, reconstituído a partir do livro de eventos
+            saldos = livro.saldos(np.arange(LivroCreditos.periodo(anos[0], 1), LivroCreditos.periodo(anos[-1] + 1, 1)))
+            maior_mes = int(np.argmax(mensal["total_devido"][:, 0]))
+            texto = (f"Total devido no período: R$ {formatar_br(mensal['total_devido'][:, 0].sum())}. "
+                     f"Maior desembolso mensal: R$ {formatar_br(mensal['total_devido'][maior_mes, 0])} "
+                     f"({self.MESES[maior_mes % 12]}/{anos[0] + maior_mes // 12}). "
+                     f"Meses encerrados com saldo credor: {meses_credores} de {len(mensal['total_devido'])}. "
+                     f"Crédito imobilizado médio: R$ {formatar_br(saldos['imobilizado'][:, 0].mean())}; "
+                     f"máximo: R$ {formatar_br(saldos['imobilizado'][:, 0].max())}.")
+            if self.campo_ressarcimento.value() > 0:
+                texto += f" Prazo médio de ressarcimento: {formatar_br(livro.prazo_medio_ressarcimento()[0], 1)} meses."
+            self.label_resultado_mensal.setText(texto)
 
-        # Créditos Cruzados
-        if memoria.get("creditos_cruzados"):
-            texto += "=== CRÉDITOS CRUZADOS ===\n"
-            for linha in memoria.get("creditos_cruzados", []):
-                texto += f"{linha}\n"
-            texto += "\n"
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Apuração Mensal",
+                                 f"Ocorreu um erro durante a apuração mensal:\n{str(e)}")
 
-        # Total Devido
-        texto += "=== TOTAL DEVIDO ===\n"
-        for linha in memoria.get("total_devido", []):
-            texto += f"{linha}\n"
+    def configurar_painel_split_payment(self, painel):
+        """Configura o painel de fluxo de caixa diário com split payment e com a apuração atual."""
+        layout = QHBoxLayout(painel)
 
-        # Exibir a memória de cálculo
-        self.texto_memoria.setPlainText(texto)
+        painel_entrada = QWidget()
+        layout_entrada = QVBoxLayout(painel_entrada)
+        layout.addWidget(painel_entrada, 1)
 
-    def exportar_memoria_calculo(self):
-        """Exporta a memória de cálculo para um arquivo de texto."""
-        if not self.texto_memoria.toPlainText():
-            QMessageBox.warning(self, "Sem Dados",
-                                "Não há memória de cálculo para exportar. Execute uma simulação primeiro.")
-            return
+        grupo_prazos = QGroupBox("Prazos")
+        layout_prazos = QFormLayout(grupo_prazos)
+        layout_entrada.addWidget(grupo_prazos)
+
+        self.combo_ano_split = QComboBox()
+        self.combo_ano_split.addItems([str(ano) for ano in self.calculadora.config.fase_transicao.keys()])
+        self.combo_ano_split.setCurrentText("2033")
+        layout_prazos.addRow("Ano:", self.combo_ano_split)
+
+        self.campo_prazo_recebimento_split = QSpinBox()
+        self.campo_prazo_recebimento_split.setRange(0, 365)
+        self.campo_prazo_recebimento_split.setSuffix(" dias")
+        self.campo_prazo_recebimento_split.setValue(30)
+        layout_prazos.addRow("Prazo Médio de Recebimento:", self.campo_prazo_recebimento_split)
+
+        self.campo_prazo_pagamento_split = QSpinBox()
+        self.campo_prazo_pagamento_split.setRange(0, 365)
+        self.campo_prazo_pagamento_split.setSuffix(" dias")
+        self.campo_prazo_pagamento_split.setValue(30)
+        layout_prazos.addRow("Prazo Médio de Pagamento:", self.campo_prazo_pagamento_split)
+
+        self.campo_vencimento_split = QSpinBox()
+        self.campo_vencimento_split.setRange(1, 28)
+        self.campo_vencimento_split.setValue(25)
+        layout_prazos.addRow("Dia de Vencimento da Apuração:", self.campo_vencimento_split)
+
+        self.campo_prazo_ressarcimento_split = QSpinBox()
+        self.campo_prazo_ressarcimento_split.setRange(0, 365)
+        self.campo_prazo_ressarcimento_split.setSuffix(" dias")
+        self.campo_prazo_ressarcimento_split.setValue(60)
+        layout_prazos.addRow("Prazo de Ressarcimento:", self.campo_prazo_ressarcimento_split)
+
+        self.campo_notas_dia_split = QSpinBox()
+        self.campo_notas_dia_split.setRange(1, 10000)
+        self.campo_notas_dia_split.setValue(10)
+        layout_prazos.addRow("Notas Emitidas por Dia:", self.campo_notas_dia_split)
+
+        botao_simular = QPushButton("Simular Fluxo de Caixa")
+        botao_simular.clicked.connect(self.executar_split_payment)
+        layout_entrada.addWidget(botao_simular)
 
-        try:
-            # Mostrar diálogo para salvar arquivo
-            opcoes = QFileDialog.Options()
-            arquivo, _ = QFileDialog.getSaveFileName(
-                self, "Exportar Memória de Cálculo", "",
-                "Arquivos de Texto (*.txt);;Todos os Arquivos (*)",
-                options=opcoes
-            )
+        self.label_resultado_split = QLabel("")
+        self.label_resultado_split.setWordWrap(True)
+        layout_entrada.addWidget(self.label_resultado_split)
+        layout_entrada.addStretch()
 
-            if arquivo:
-                if not arquivo.endswith('.txt'):
-                    arquivo += '.txt'
+        painel_resultados = QWidget()
+        layout_resultados = QVBoxLayout(painel_resultados)
+        layout.addWidget(painel_resultados, 2)
 
-                with open(arquivo, 'w', encoding='utf-8') as f:
-                    f.write(self.texto_memoria.toPlainText())
+        self.grafico_split = GraficoMatplotlib(width=7, height=4)
+        layout_resultados.addWidget(self.grafico_split)
 
-                QMessageBox.information(self, "Exportação Concluída",
-                                        f"A memória de cálculo foi exportada com sucesso para:\n{arquivo}")
+        self.tabela_split = QTableWidget()
+        self.tabela_split.setColumnCount(5)
+        self.tabela_split.setHorizontalHeaderLabels(
+            ["Vencimento", "Recolhimento Atual", "Recolhimento Split", "Ressarcimento Split",
+             "Diferença de Caixa no Vencimento"])
+        self.tabela_split.horizontalHeader().setStretchLastSection(True)
+        layout_resultados.addWidget(self.tabela_split)
+
+    def executar_split_payment(self):
+        """Simula um ano de notas da empresa informada na aba Simulação nos dois modelos de recolhimento."""
+        try:
+            dados_empresa = self.coletar_dados_empresa()
+            ano = int(self.combo_ano_split.currentText())
+            aliquota = self.calculadora.config.obter_aliquotas_efetivas(dados_empresa.get("setor", "padrao"), ano)["total"]
+
+            simulador = SimuladorSplitPayment(f"{ano}-01-01", self.campo_vencimento_split.value(),
+                                              prazo_ressarcimento=self.campo_prazo_ressarcimento_split.value())
+            transacoes = SimuladorSplitPayment.gerar_transacoes(
+                365, dados_empresa["faturamento"], dados_empresa["custos_tributaveis"], aliquota,
+                self.campo_notas_dia_split.value(), self.campo_prazo_recebimento_split.value(),
+                self.campo_prazo_pagamento_split.value())
+            resultado = simulador.simular(transacoes)
+
+            self.grafico_split.plotar_caixa_diario(
+                resultado["dias"].tolist(), {"Apuração Atual": resultado["caixa_atual"][0],
+                                                     "Split Payment": resultado["caixa_split"][0]},
+                f"Posição Diária de Caixa ({ano})")
+
+            vencimentos = resultado["vencimentos"]
+            dias_vencimento = np.minimum(simulador.dia(vencimentos), len(resultado["dias"]) - 1)
+            self.tabela_split.setRowCount(len(vencimentos))
+            for linha, vencimento in enumerate(vencimentos):
+                textos = [vencimento.tolist().strftime("%d/%m/%Y"),
+                          f"R$ {formatar_br(resultado['recolhimentos']['atual'][0, linha])}",
+                          f"R$ {formatar_br(resultado['recolhimentos']['split'][0, linha])}",
+                          f"R$ {formatar_br(resultado['ressarcimentos']['split'][0, linha])}",
+                          f"R$ {formatar_br(resultado['diferenca'][0, dias_vencimento[linha]])}"]
+                for coluna, texto in enumerate(textos):
+                    self.tabela_split.setItem(linha, coluna, QTableWidgetItem(texto))
+            self.tabela_split.resizeColumnsToContents()
+
+            diferenca = resultado["diferenca"][0]
+            self.label_resultado_split.setText(
+                f"{len(transacoes['valor'])} notas simuladas. "
+                f"Diferença média de caixa (split − atual): R$ {formatar_br(diferenca.mean())}; "
+                f"maior redução: R$ {formatar_br(diferenca.min())}. "
+                f"Menor saldo: R$ {formatar_br(resultado['menor_saldo_atual'][0])} na apuração atual e "
+                f"R$ {formatar_br(resultado['menor_saldo_split'][0])} com split payment.")
 
         except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Ocorreu um erro ao exportar a memória de cálculo:\n{str(e)}")
+            QMessageBox.critical(self, "Erro na Simulação de Split Payment",
+                                 f"Ocorreu um erro durante a simulação de split payment:\n{str(e)}")
 
-    def configurar_aba_configuracoes(self, tab):
-        """Configura a aba de configurações com os parâmetros do sistema."""
-        # Layout principal da aba
-        layout = QVBoxLayout(tab)
-        
-        # Grupo para alíquotas base
-        grupo_aliquotas = QGroupBox("Alíquotas Base")
-        layout_aliquotas = QFormLayout(grupo_aliquotas)
-        layout.addWidget(grupo_aliquotas)
-        
-        self.campo_cbs = QDoubleSpinBox()
-        self.campo_cbs.setRange(0, 100)
-        self.campo_cbs.setDecimals(2)
-        self.campo_cbs.setSuffix("%")
-        self.campo_cbs.setValue(self.calculadora.config.aliquotas_base["CBS"] * 100)
-        layout_aliquotas.addRow("Alíquota CBS:", self.campo_cbs)
-        
-        self.campo_ibs = QDoubleSpinBox()
-        self.campo_ibs.setRange(0, 100)
-        self.campo_ibs.setDecimals(2)
-        self.campo_ibs.setSuffix("%")
-        self.campo_ibs.setValue(self.calculadora.config.aliquotas_base["IBS"] * 100)
-        layout_aliquotas.addRow("Alíquota IBS:", self.campo_ibs)
-        
-        # Grupo para fases de transição
-        grupo_fases = QGroupBox("Fases de Transição")
-        layout_fases = QGridLayout(grupo_fases)
-        layout.addWidget(grupo_fases)
-        
-        # Cabeçalho
-        layout_fases.addWidget(QLabel("Ano"), 0, 0)
-        layout_fases.addWidget(QLabel("Percentual"), 0, 1)
-        
-        # Campos para cada ano
-        self.campos_fases = {}
-        row = 1
-        for ano, percentual in self.calculadora.config.fase_transicao.items():
-            layout_fases.addWidget(QLabel(str(ano)), row, 0)
-            
-            campo = QDoubleSpinBox()
-            campo.setRange(0, 100)
-            campo.setDecimals(2)
-            campo.setSuffix("%")
-            campo.setValue(percentual * 100)
-            
-            layout_fases.addWidget(campo, row, 1)
-            self.campos_fases[ano] = campo
-            row += 1
-        
-        # Grupo para setores especiais
-        grupo_setores = QGroupBox("Alíquotas Setoriais")
-        layout_setores = QGridLayout(grupo_setores)
-        layout.addWidget(grupo_setores)
-        
-        # Cabeçalho
-        layout_setores.addWidget(QLabel("Setor"), 0, 0)
-        layout_setores.addWidget(QLabel("IBS"), 0, 1)
-        layout_setores.addWidget(QLabel("Redução CBS"), 0, 2)
-        
-        # Campos para cada setor
-        self.campos_setores_ibs = {}
-        self.campos_setores_reducao = {}
-        row = 1
-        for setor, valores in self.calculadora.config.setores_especiais.items():
-            layout_setores.addWidget(QLabel(setor), row, 0)
-            
-            campo_ibs = QDoubleSpinBox()
-            campo_ibs.setRange(0, 100)
-            campo_ibs.setDecimals(2)
-            campo_ibs.setSuffix("%")
-            campo_ibs.setValue(valores["IBS"] * 100)
-            layout_setores.addWidget(campo_ibs, row, 1)
-            self.campos_setores_ibs[setor] = campo_ibs
-            
-            campo_reducao = QDoubleSpinBox()
-            campo_reducao.setRange(0, 100)
-            campo_reducao.setDecimals(2)
-            campo_reducao.setSuffix("%")
-            campo_reducao.setValue(valores["reducao_CBS"] * 100)
-            layout_setores.addWidget(campo_reducao, row, 2)
-            self.campos_setores_reducao[setor] = campo_reducao
-            
-            row += 1
-        
-        # Botões para salvar/carregar configurações
-        layout_botoes = QHBoxLayout()
-        layout.addLayout(layout_botoes)
-        
-        botao_carregar = QPushButton("Carregar Configurações")
-        botao_carregar.clicked.connect(self.carregar_configuracoes)
-        layout_botoes.addWidget(botao_carregar)
-        
-        botao_salvar = QPushButton("Salvar Configurações")
-        botao_salvar.clicked.connect(self.salvar_configuracoes)
-        layout_botoes.addWidget(botao_salvar)
-        
-        botao_restaurar = QPushButton("Restaurar Padrões")
-        botao_restaurar.clicked.connect(self.restaurar_configuracoes)
-        layout_botoes.addWidget(botao_restaurar)
-        
-        # Adicionar espaço flexível
-        layout.addStretch()
-    
     def configurar_aba_ajuda(self, tab):
         """Configura a aba de ajuda com documentação sobre a reforma tributária."""
         # Layout principal da aba
@@ -1776,135 +8017,197 @@ class InterfaceSimulador(QMainWindow):
         # Adicionar espaço flexível
         layout.addStretch()
 
-    def executar_simulacao(self):
-        """Executa a simulação com os dados inseridos."""
-        try:
-            # Coletar dados da empresa
-            dados_empresa = {
-                "faturamento": self.campo_faturamento.value(),
-                "custos_tributaveis": self.campo_custos.value(),
-                "custos_simples": self.campo_custos_simples.value(),
-                "creditos_anteriores": self.campo_creditos_anteriores.value(),
-                "setor": self.campo_setor.currentText(),
-                "regime": self.campo_regime.currentText(),
-                # ADICIONADO: inicializar imposto_devido para evitar erro
-                "imposto_devido": 0
-            }
-
-            # Configurar incentivo fiscal do ICMS (se existir o campo)
-            # Atualizar configurações do ICMS
-            self.calculadora.config.icms_config = {
-                "aliquota_entrada": self.campo_aliquota_entrada.value() / 100,
-                "aliquota_saida": self.campo_aliquota_saida.value() / 100,
-                "incentivos_saida": [],
-                "incentivos_entrada": []
-            }
-
-            # Construir lista de incentivos de saída
-            for row in range(self.tabelaIncentivosSaida.rowCount()):
-                descricao = self.tabelaIncentivosSaida.item(row, 0).text()
-                tipo_incentivo = self.tabelaIncentivosSaida.item(row, 1).text()
-                percentual = float(self.tabelaIncentivosSaida.item(row, 2).text().replace('%', '')) / 100
-                perc_operacoes = float(self.tabelaIncentivosSaida.item(row, 3).text().replace('%', '')) / 100
-
-                incentivo = {
-                    "descricao": descricao,
-                    "tipo": tipo_incentivo,
-                    "percentual": percentual,
-                    "percentual_operacoes": perc_operacoes,
-                    "aplicavel_saidas": True,
-                    "aplicavel_entradas": False
-                }
-
-                self.calculadora.config.icms_config["incentivos_saida"].append(incentivo)
-
-            # Construir lista de incentivos de entrada
-            for row in range(self.tabelaIncentivosEntrada.rowCount()):
-                descricao = self.tabelaIncentivosEntrada.item(row, 0).text()
-                tipo_incentivo = self.tabelaIncentivosEntrada.item(row, 1).text()
-                percentual = float(self.tabelaIncentivosEntrada.item(row, 2).text().replace('%', '')) / 100
-                perc_operacoes = float(self.tabelaIncentivosEntrada.item(row, 3).text().replace('%', '')) / 100
-
-                incentivo = {
-                    "descricao": descricao,
-                    "tipo": tipo_incentivo,
-                    "percentual": percentual,
-                    "percentual_operacoes": perc_operacoes,
-                    "aplicavel_saidas": False,
-                    "aplicavel_entradas": True
-                }
-
-                self.calculadora.config.icms_config["incentivos_entrada"].append(incentivo)
-
-            # Construir lista de incentivos de apuração
-            for row in range(self.tabelaIncentivosApuracao.rowCount()):
-                descricao = self.tabelaIncentivosApuracao.item(row, 0).text()
-                tipo_incentivo = self.tabelaIncentivosApuracao.item(row, 1).text()
-                percentual = float(self.tabelaIncentivosApuracao.item(row, 2).text().replace('%', '')) / 100
-                perc_saldo = float(self.tabelaIncentivosApuracao.item(row, 3).text().replace('%', '')) / 100
-
-                incentivo = {
-                    "descricao": descricao,
-                    "tipo": tipo_incentivo,
-                    "percentual": percentual,
-                    "percentual_operacoes": perc_saldo,  # Representa percentual do saldo para apuração
-                    "aplicavel_saidas": False,
-                    "aplicavel_entradas": False,
-                    "aplicavel_apuracao": True
-                }
-
-                self.calculadora.config.icms_config["incentivos_apuracao"].append(incentivo)
-
-            # Obter carga tributária atual
-            carga_atual = self.campo_carga_atual.value()
+    def coletar_dados_empresa(self):
+        """Coleta os dados da empresa e atualiza a configuração do ICMS a partir da interface."""
+        # Coletar dados da empresa
+        dados_empresa = {
+            "faturamento": self.campo_faturamento.value(),
+            "custos_tributaveis": self.campo_custos.value(),
+            "custos_simples": self.campo_custos_simples.value(),
+            "creditos_anteriores": self.campo_creditos_anteriores.value(),
+            "setor": self.campo_setor.currentText(),
+            "regime": self.campo_regime.currentText(),
+            # ADICIONADO: inicializar imposto_devido para evitar erro
+            "imposto_devido": 0
+        }
 
-            # Definir anos para simulação
-            ano_inicial = self.campo_ano_inicial.value()
-            ano_final = self.campo_ano_final.value()
-            anos = list(range(ano_inicial, ano_final + 1))
+        # Configurar incentivo fiscal do ICMS (se existir o campo)
+        self.calculadora.config.cronograma_incentivos_icms["ativo"] = self.check_cronograma_incentivos.isChecked()
 
-            # Executar simulação
-            self.resultados = self.calculadora.calcular_comparativo(dados_empresa, anos)
+        # Atualizar configurações do ICMS
+        self.calculadora.config.icms_config = {
+            "aliquota_entrada": self.campo_aliquota_entrada.value() / 100,
+            "aliquota_saida": self.campo_aliquota_saida.value() / 100,
+            "incentivos_saida": [],
+            "incentivos_entrada": [],
+            "incentivos_apuracao": []
+        }
 
-            # Calcular alíquotas equivalentes para cada ano
-            self.aliquotas_equivalentes = {}
-            for ano in anos:
-                self.aliquotas_equivalentes[ano] = self.calculadora.calcular_aliquotas_equivalentes(
-                    dados_empresa, carga_atual, ano
-                )
+        # Construir lista de incentivos de saída
+        for row in range(self.tabelaIncentivosSaida.rowCount()):
+            descricao = self.tabelaIncentivosSaida.item(row, 0).text()
+            tipo_incentivo = self.tabelaIncentivosSaida.item(row, 1).text()
+            percentual = float(self.tabelaIncentivosSaida.item(row, 2).text().replace('%', '')) / 100
+            perc_operacoes = float(self.tabelaIncentivosSaida.item(row, 3).text().replace('%', '')) / 100
+
+            incentivo = {
+                "descricao": descricao,
+                "tipo": tipo_incentivo,
+                "percentual": percentual,
+                "percentual_operacoes": perc_operacoes,
+                "aplicavel_saidas": True,
+                "aplicavel_entradas": False
+            }
 
-            # Atualizar tabela
-            self.atualizar_tabela_resultados()
+            self.calculadora.config.icms_config["incentivos_saida"].append(incentivo)
+
+        # Construir lista de incentivos de entrada
+        for row in range(self.tabelaIncentivosEntrada.rowCount()):
+            descricao = self.tabelaIncentivosEntrada.item(row, 0).text()
+            tipo_incentivo = self.tabelaIncentivosEntrada.item(row, 1).text()
+            percentual = float(self.tabelaIncentivosEntrada.item(row, 2).text().replace('%', '')) / 100
+            perc_operacoes = float(self.tabelaIncentivosEntrada.item(row, 3).text().replace('%', '')) / 100
+
+            incentivo = {
+                "descricao": descricao,
+                "tipo": tipo_incentivo,
+                "percentual": percentual,
+                "percentual_operacoes": perc_operacoes,
+                "aplicavel_saidas": False,
+                "aplicavel_entradas": True
+            }
 
-            # Atualizar gráficos
-            self.grafico_comparativo.plotar_comparativo(
-                self.resultados,
-                f"Comparativo de Impostos ({ano_inicial}-{ano_final})"
-            )
+            self.calculadora.config.icms_config["incentivos_entrada"].append(incentivo)
+
+        # Construir lista de incentivos de apuração
+        for row in range(self.tabelaIncentivosApuracao.rowCount()):
+            descricao = self.tabelaIncentivosApuracao.item(row, 0).text()
+            tipo_incentivo = self.tabelaIncentivosApuracao.item(row, 1).text()
+            percentual = float(self.tabelaIncentivosApuracao.item(row, 2).text().replace('%', '')) / 100
+            perc_saldo = float(self.tabelaIncentivosApuracao.item(row, 3).text().replace('%', '')) / 100
+
+            incentivo = {
+                "descricao": descricao,
+                "tipo": tipo_incentivo,
+                "percentual": percentual,
+                "percentual_operacoes": perc_saldo,  # Representa percentual do saldo para apuração
+                "aplicavel_saidas": False,
+                "aplicavel_entradas": False,
+                "aplicavel_apuracao": True
+            }
 
-            self.grafico_aliquotas.plotar_aliquotas_efetivas(
-                self.resultados,
-                "Evolução da Alíquota Efetiva"
-            )
+            self.calculadora.config.icms_config["incentivos_apuracao"].append(incentivo)
+
+        return dados_empresa
+
+    def intervalo_slider(self, caminho):
+        """Intervalo (na unidade do cálculo) percorrido pelo controle deslizante do parâmetro."""
+        faturamento = self.campo_faturamento.value()
+        custos = self.campo_custos.value()
+        if caminho == "faturamento":
+            # Os custos tributáveis não podem exceder o faturamento
+            return custos, max(2 * faturamento, custos + 1_000_000)
+        if caminho == "custos_tributaveis":
+            return 0.0, faturamento
+        if caminho == "custos_simples":
+            return 0.0, max(2 * self.campo_custos_simples.value(), faturamento, 100_000)
+        _, campo, escala = self.CONTROLES_DESLIZANTES[caminho]
+        return 0.0, getattr(self, campo).maximum() / escala
+
+    def sincronizar_sliders(self):
+        """Recalcula os intervalos e posiciona os controles deslizantes nos valores atuais."""
+        for caminho, slider in self.sliders_simulacao.items():
+            _, campo, escala = self.CONTROLES_DESLIZANTES[caminho]
+            inicio, fim = self.intervalo_slider(caminho)
+            self.intervalos_sliders[caminho] = (inicio, fim)
+            valor = getattr(self, campo).value() / escala
+            posicao = 0 if fim <= inicio else round((valor - inicio) / (fim - inicio) * self.RESOLUCAO_SLIDERS)
+            slider.blockSignals(True)
+            slider.setValue(int(min(max(posicao, 0), self.RESOLUCAO_SLIDERS)))
+            slider.blockSignals(False)
+
+    def preparar_curvas_resposta(self, caminho):
+        """Pré-calcula as curvas exatas das métricas exibidas ao longo do intervalo do controle."""
+        self.curvas_resposta = None
+        # As curvas tratam cada ano isoladamente; no modo encadeado o resultado é refeito ao soltar
+        if not self.check_ajuste_instantaneo.isChecked() or self.check_encadear_anos.isChecked():
+            return
+        try:
+            self.sincronizar_sliders()
+            dados_empresa = self.coletar_dados_empresa()
+            dados_empresa["icms_config"] = self.calculadora.config.icms_config
+            carteira = CarteiraEmpresas.de_dados([dados_empresa])
+            lote = CalculadoraLote(self.calculadora.config)
+            inicio, fim = self.intervalos_sliders[caminho]
+            anos = list(range(self.campo_ano_inicial.value(), self.campo_ano_final.value() + 1))
+            metricas = ["base_tributavel", "cbs", "ibs", "imposto_bruto", "creditos", "imposto_devido", "total_devido"]
+            self.curvas_resposta = {
+                "caminho": caminho,
+                "faturamento": dados_empresa["faturamento"],
+                "curvas": {ano: lote.curva_resposta(carteira, ano, caminho, inicio, fim, metricas) for ano in anos}
+            }
+        except Exception as e:
+            print(f"Aviso: Não foi possível pré-calcular as curvas de resposta: {e}")
 
-            # Plotar gráfico de transição
-            try:
-                if hasattr(self, 'plotar_comparativo_transicao') and hasattr(self, 'grafico_transicao'):
-                    self.plotar_comparativo_transicao()
-            except Exception as e:
-                print(f"Aviso: Não foi possível plotar o gráfico de transição: {e}")
+    def interpolar_curvas_resposta(self, valor):
+        """Resultados por ano interpolados das curvas pré-calculadas (sem chamar o motor de cálculo)."""
+        curvas = self.curvas_resposta
+        faturamento = valor if curvas["caminho"] == "faturamento" else curvas["faturamento"]
+        resultados = {}
+        for ano, curva in curvas["curvas"].items():
+            resultado = {metrica: float(np.interp(valor, curva["pontos"], valores))
+                         for metrica, valores in curva.items() if metrica != "pontos"}
+            resultado["ano"] = ano
+            resultado["aliquota_efetiva"] = resultado["total_devido"] / faturamento if faturamento > 0 else 0
+            resultados[ano] = resultado
+        return resultados
 
-            # Adicionar gráfico de comparação com carga atual (se existir)
-            if hasattr(self, 'plotar_comparativo_carga_atual'):
-                self.plotar_comparativo_carga_atual()
+    def mover_slider(self, caminho, posicao):
+        """Atualiza o campo do parâmetro e, no arraste com atualização instantânea, os resultados interpolados."""
+        _, campo, escala = self.CONTROLES_DESLIZANTES[caminho]
+        inicio, fim = self.intervalos_sliders[caminho]
+        valor = inicio + (fim - inicio) * posicao / self.RESOLUCAO_SLIDERS
+        campo = getattr(self, campo)
+        campo.blockSignals(True)
+        campo.setValue(valor * escala)
+        campo.blockSignals(False)
+
+        slider = self.sliders_simulacao[caminho]
+        if not self.check_ajuste_instantaneo.isChecked():
+            return
+        if not slider.isSliderDown():
+            # Teclado ou clique na trilha: recálculo exato imediato
+            self.soltar_slider()
+            return
+        if self.curvas_resposta is None or self.curvas_resposta["caminho"] != caminho:
+            return
 
-            # Adicionar após as chamadas de plotagem existentes
-            # Plotar gráfico de incentivos fiscais
-            self.plotar_comparativo_incentivos()
+        self.resultados = self.interpolar_curvas_resposta(valor)
+        carga_atual = self.campo_carga_atual.value() / 100
+        faturamento = self.campo_faturamento.value()
+        self.aliquotas_equivalentes = {ano: dict(getattr(self, 'aliquotas_equivalentes', {}).get(ano, {}),
+                                                 valor_atual=faturamento * carga_atual)
+                                       for ano in self.resultados}
+        self.atualizar_tabela_resultados()
+        self.grafico_comparativo.atualizar_comparativo_rapido(self.resultados)
+        self.grafico_aliquotas.atualizar_aliquotas_rapido(self.resultados)
+
+    def soltar_slider(self):
+        """Refaz a simulação exata com os valores escolhidos nos controles deslizantes."""
+        self.curvas_resposta = None
+        if not self.check_ajuste_instantaneo.isChecked():
+            return
+        try:
+            self.processar_simulacao()
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Simulação",
+                                 f"Ocorreu um erro durante a simulação:\n{str(e)}")
+        self.sincronizar_sliders()
 
-            # Atualizar a aba de memória de cálculo
-            self.atualizar_combo_anos_memoria()
-            self.atualizar_memoria_calculo()
+    def executar_simulacao(self):
+        """Executa a simulação com os dados inseridos."""
+        try:
+            self.processar_simulacao()
 
             QMessageBox.information(self, "Simulação Concluída",
                                     "A simulação foi concluída com sucesso!")
@@ -1913,102 +8216,94 @@ class InterfaceSimulador(QMainWindow):
             QMessageBox.critical(self, "Erro na Simulação",
                                  f"Ocorreu um erro durante a simulação:\n{str(e)}")
 
-    # Adicionar ao método plotar_comparativo_incentivos na classe InterfaceSimulador
-
-    def plotar_comparativo_incentivos(self):
-        """Plota um gráfico para comparar o ICMS com e sem incentivos fiscais."""
-        if not hasattr(self, 'grafico_incentivos'):
-            self.grafico_incentivos = GraficoMatplotlib(width=6, height=4)
-            layout = self.findChild(QVBoxLayout, "layout_graficos")
-            if layout:
-                layout.addWidget(self.grafico_incentivos)
-
-        # Verificar se existem resultados para plotar
-        if not self.resultados:
-            self.grafico_incentivos.axes.set_title("Sem dados para visualização")
-            self.grafico_incentivos.draw()
-            return
-
-        self.grafico_incentivos.axes.clear()
-        anos = list(self.resultados.keys())
-
-        # Preparar dados para o gráfico
-        icms_normal = []
-        icms_incentivado = []
-        economia = []
-
-        for ano, resultado in self.resultados.items():
-            icms_devido = resultado["impostos_atuais"].get("ICMS", 0)
-            economia_icms = resultado["impostos_atuais"].get("economia_icms", 0)
-            icms_normal.append(icms_devido + economia_icms)
-            icms_incentivado.append(icms_devido)
-            economia.append(economia_icms)
+    def processar_simulacao(self):
+        """Calcula a simulação e atualiza tabela, gráficos e memória de cálculo."""
+        dados_empresa = self.coletar_dados_empresa()
 
-        # Criar o gráfico
-        x = range(len(anos))
-        largura = 0.35
+        # Obter carga tributária atual
+        carga_atual = self.campo_carga_atual.value()
 
-        self.grafico_incentivos.axes.bar([i - largura / 2 for i in x], icms_normal,
-                                         width=largura, label='ICMS sem Incentivo', color='#e74c3c')
-        self.grafico_incentivos.axes.bar([i + largura / 2 for i in x], icms_incentivado,
-                                         width=largura, label='ICMS com Incentivo', color='#2ecc71')
+        # Definir anos para simulação
+        ano_inicial = self.campo_ano_inicial.value()
+        ano_final = self.campo_ano_final.value()
+        anos = list(range(ano_inicial, ano_final + 1))
 
-        self.grafico_incentivos.axes.set_xticks(x)
-        self.grafico_incentivos.axes.set_xticklabels(anos)
-        self.grafico_incentivos.axes.set_ylabel('Valor (R$)')
-        self.grafico_incentivos.axes.set_xlabel('Ano')
-        self.grafico_incentivos.axes.set_title('Impacto dos Incentivos Fiscais no ICMS')
-        self.grafico_incentivos.axes.legend()
-        self.grafico_incentivos.axes.grid(True, linestyle='--', alpha=0.7)
+        # Executar simulação
+        self.resultados = self.calculadora.calcular_comparativo(dados_empresa, anos,
+                                                                encadeado=self.check_encadear_anos.isChecked())
 
-        # Adicionar detalhamento por incentivo (quando houver múltiplos)
-        if hasattr(self, 'tabelaIncentivosSaida') and self.tabelaIncentivosSaida.rowCount() > 0:
-            # Verificar se temos mais de um incentivo para exibir detalhamento
-            if self.tabelaIncentivosSaida.rowCount() > 1:
-                # Criar um segundo gráfico para detalhar os incentivos
-                # Este gráfico mostra a contribuição de cada incentivo para a economia total
-                if not hasattr(self, 'grafico_detalhamento'):
-                    self.grafico_detalhamento = GraficoMatplotlib(width=6, height=4)
-                    layout = self.findChild(QVBoxLayout, "layout_graficos")
-                    if layout:
-                        layout.addWidget(self.grafico_detalhamento)
-
-                self.grafico_detalhamento.axes.clear()
-                self.grafico_detalhamento.axes.set_title('Detalhamento da Economia por Incentivo')
-
-                # Valores fictícios para ilustração (em uma implementação real, estes valores seriam
-                # calculados individualmente para cada incentivo no método calcular_icms_detalhado)
-                incentivos = []
-                valores = []
+        # Custo financeiro dos créditos imobilizados em cada ano
+        self.calcular_custo_creditos(dados_empresa, anos)
 
-                for row in range(self.tabelaIncentivosSaida.rowCount()):
-                    descricao = self.tabelaIncentivosSaida.item(row, 0).text()
-                    tipo = self.tabelaIncentivosSaida.item(row, 1).text()
-                    incentivos.append(f"{descricao} ({tipo})")
+        # Atribuir a economia de ICMS a cada incentivo
+        self.atribuicao_incentivos = self.calcular_atribuicao_incentivos(dados_empresa)
 
-                    # Valor fictício - em uma implementação real, este valor viria do cálculo detalhado
-                    # Aqui estamos apenas distribuindo a economia total entre os incentivos para ilustração
-                    valores.append(economia[0] / self.tabelaIncentivosSaida.rowCount() * (row + 1) /
-                                   self.tabelaIncentivosSaida.rowCount())
+        # Calcular alíquotas equivalentes de todos os anos de uma só vez
+        self.aliquotas_equivalentes = self.calculadora.calcular_aliquotas_equivalentes_anos(
+            dados_empresa, carga_atual, anos
+        )
 
-                # Criar gráfico de pizza
-                self.grafico_detalhamento.axes.pie(valores, labels=incentivos, autopct='%1.1f%%',
-                                                   shadow=True, startangle=90)
-                self.grafico_detalhamento.axes.axis('equal')  # Iguala proporções para ter círculo perfeito
+        # Atualizar tabela
+        self.atualizar_tabela_resultados()
 
-                self.grafico_detalhamento.fig.tight_layout()
-                self.grafico_detalhamento.draw()
+        # Atualizar gráficos
+        self.grafico_comparativo.plotar_comparativo(
+            self.resultados,
+            f"Comparativo de Impostos ({ano_inicial}-{ano_final})"
+        )
 
-        # Adicionar valores de economia nos gráficos
-        for i, v in enumerate(economia):
-            if v > 0:
-                self.grafico_incentivos.axes.text(i, icms_incentivado[i] + v / 2,
-                                                  f"Economia:\nR$ {formatar_br(v)}",
-                                                  ha='center', va='center',
-                                                  bbox=dict(facecolor='white', alpha=0.7))
+        self.grafico_aliquotas.plotar_aliquotas_efetivas(
+            self.resultados,
+            "Evolução da Alíquota Efetiva"
+        )
 
-        self.grafico_incentivos.fig.tight_layout()
-        self.grafico_incentivos.draw()
+        # Plotar gráfico de transição
+        try:
+            if hasattr(self, 'plotar_comparativo_transicao') and hasattr(self, 'grafico_transicao'):
+                self.plotar_comparativo_transicao()
+        except Exception as e:
+            print(f"Aviso: Não foi possível plotar o gráfico de transição: {e}")
+
+        # Adicionar gráfico de comparação com carga atual (se existir)
+        if hasattr(self, 'plotar_comparativo_carga_atual'):
+            self.plotar_comparativo_carga_atual()
+
+        # Adicionar após as chamadas de plotagem existentes
+        # Plotar gráfico de incentivos fiscais
+        self.plotar_comparativo_incentivos()
+
+        # Modelos lineares por partes são compilados sob demanda para a memória de cálculo
+        self.dados_modelo_linear = dados_empresa
+        self.modelos_lineares = {}
+
+        # Atualizar a aba de memória de cálculo
+        self.atualizar_combo_anos_memoria()
+        self.atualizar_memoria_calculo()
+
+    def calcular_custo_creditos(self, dados_empresa, anos):
+        """Acrescenta aos resultados o custo de capital dos créditos imobilizados em cada ano (nominal e
+        a valor presente), pela apuração mensal com o ressarcimento informado."""
+        carteira = CarteiraEmpresas.de_dados([dados_empresa])
+        apuracao = ApuracaoMensal(CalculadoraLote(self.calculadora.config))
+        custo = CustoFinanceiroCreditos(self.campo_custo_capital.value() / 100)
+        por_ano = custo.da_apuracao(apuracao, carteira, self.series_mensais_interface(carteira, anos), anos[0],
+                                    ressarcimento=self.campo_ressarcimento.value() / 100,
+                                    prazo_ressarcimento=self.campo_prazo_ressarcimento.value())
+        for ano in anos:
+            self.resultados[ano].update({chave: float(valor[0]) for chave, valor in por_ano[ano].items()})
+
+    def memoria_modelo_linear(self, ano):
+        """Linhas da memória de cálculo com a região do modelo linear por partes em que a empresa se encontra."""
+        dados_empresa = getattr(self, 'dados_modelo_linear', None)
+        if dados_empresa is None:
+            return []
+        if ano not in self.modelos_lineares:
+            lote = CalculadoraLote(self.calculadora.config)
+            self.modelos_lineares[ano] = lote.compilar_linear_por_partes(dados_empresa, ano)
+        modelo = self.modelos_lineares[ano]
+        entradas = {variavel: dados_empresa.get(variavel, 0.0) for variavel in modelo.VARIAVEIS}
+        total = float(modelo.avaliar(entradas)["total_devido"][0])
+        return modelo.memoria(entradas) + [f"Total devido pelo modelo compilado: R$ {formatar_br(total)}"]
 
     def atualizar_tabela_resultados(self):
         """Atualiza a tabela com os resultados da simulação."""
@@ -2016,11 +8311,11 @@ class InterfaceSimulador(QMainWindow):
         self.tabela_resultados.setRowCount(0)
 
         # Ajustar colunas para mostrar impostos atuais e novos
-        self.tabela_resultados.setColumnCount(10)
+        self.tabela_resultados.setColumnCount(11)
         self.tabela_resultados.setHorizontalHeaderLabels([
             "Ano", "CBS", "IBS", "Subtotal Novo",
             "PIS/COFINS", "ICMS", "ISS/IPI", "Subtotal Atual",
-            "Total", "Var. Carga (%)"
+            "Total", "Custo Fin. Créditos (VP)", "Var. Carga (%)"
         ])
         
         # Adicionar linhas com resultados
@@ -2053,10 +8348,37 @@ class InterfaceSimulador(QMainWindow):
                 item_diferenca.setForeground(QBrush(QColor("#2ecc71")))  # Verde se diminuir
             
             self.tabela_resultados.setItem(row, 7, item_diferenca)
+            self.tabela_resultados.setItem(row, 8, QTableWidgetItem(formatar_valor(resultado["total_devido"])))
+            if "vp_custo_creditos" in resultado:
+                item_custo = QTableWidgetItem(formatar_valor(resultado["vp_custo_creditos"]))
+                item_custo.setToolTip(f"Custo no ano (nominal): {formatar_valor(resultado['custo_creditos'])}")
+                self.tabela_resultados.setItem(row, 9, item_custo)
         
         # Ajustar tamanho das colunas
         self.tabela_resultados.resizeColumnsToContents()
 
+    def calcular_atribuicao_incentivos(self, dados_empresa):
+        """Calcula a economia de ICMS atribuída a cada incentivo (Shapley e exclusão individual)."""
+        pacote = IncentivosICMSCompilados(dados_empresa.get("icms_config") or self.calculadora.config.icms_config)
+        atribuicao = pacote.atribuir_economia(dados_empresa.get("faturamento", 0),
+                                              dados_empresa.get("custos_tributaveis", 0))
+        incentivos = []
+        for i, incentivo in enumerate(atribuicao["incentivos"]):
+            incentivos.append(dict(incentivo, shapley=float(atribuicao["shapley"][i, 0]),
+                                   exclusao=float(atribuicao["exclusao"][i, 0])))
+        return {
+            "incentivos": incentivos,
+            "economia_total": float(atribuicao["economia_total"][0]),
+            "metodo": atribuicao["metodo"]
+        }
+
+    def economia_atribuida(self, lista=None, indice=None, medida="shapley"):
+        """Soma a economia atribuída ("shapley" ou "exclusao") aos incentivos de uma lista ou a um incentivo."""
+        atribuicao = getattr(self, 'atribuicao_incentivos', None) or {"incentivos": []}
+        return sum(incentivo[medida] for incentivo in atribuicao["incentivos"]
+                   if (lista is None or incentivo["lista"] == lista) and
+                   (indice is None or incentivo["indice"] == indice))
+
     def plotar_comparativo_incentivos(self):
         """Plota um gráfico para comparar o ICMS com e sem incentivos fiscais."""
         if not hasattr(self, 'grafico_incentivos'):
@@ -2103,6 +8425,17 @@ class InterfaceSimulador(QMainWindow):
         self.grafico_incentivos.axes.legend()
         self.grafico_incentivos.axes.grid(True, linestyle='--', alpha=0.7)
 
+        # Detalhamento da economia por incentivo (quando houver mais de um incentivo ativo)
+        atribuicao = getattr(self, 'atribuicao_incentivos', None)
+        if atribuicao and len(atribuicao["incentivos"]) > 1:
+            if not hasattr(self, 'grafico_detalhamento'):
+                self.grafico_detalhamento = GraficoMatplotlib(width=6, height=4)
+                layout = self.findChild(QVBoxLayout, "layout_graficos")
+                if layout:
+                    layout.addWidget(self.grafico_detalhamento)
+            self.grafico_detalhamento.plotar_atribuicao_incentivos(
+                atribuicao, 'Detalhamento da Economia por Incentivo')
+
         # Adicionar valores de economia nos gráficos
         for i, v in enumerate(economia):
             if v > 0:
@@ -2387,7 +8720,7 @@ class InterfaceSimulador(QMainWindow):
             cabecalhos = [
                 "Ano", "CBS (R$)", "IBS (R$)", "Imposto Bruto (R$)",
                 "Créditos (R$)", "Imposto Devido (R$)", "Carga Atual (R$)",
-                "Diferença (R$)", "Alíquota Efetiva (%)"
+                "Diferença (R$)", "Alíquota Efetiva (%)", "Custo Fin. Créditos (R$)"
             ]
             dados_resultados = [cabecalhos]
 
@@ -2406,7 +8739,8 @@ class InterfaceSimulador(QMainWindow):
                     f"{formatar_br(resultado['imposto_devido'])}",
                     f"{formatar_br(valor_atual)}",
                     f"{formatar_br(diferenca)}",
-                    f"{formatar_br(resultado['aliquota_efetiva'] * 100)}%"
+                    f"{formatar_br(resultado['aliquota_efetiva'] * 100)}%",
+                    f"{formatar_br(resultado.get('vp_custo_creditos', 0))}"
                 ]
                 dados_resultados.append(linha)
 
@@ -2591,17 +8925,15 @@ class InterfaceSimulador(QMainWindow):
                     ["Categoria", "ICMS Original", "ICMS Final", "Redução", "% Economia"]
                 ]
 
-                # Valores demonstrativos - numa implementação real, estes valores seriam
-                # calculados detalhadamente durante a simulação
                 icms_sem_incentivo = resultado["impostos_atuais"].get("ICMS", 0) + resultado["impostos_atuais"].get(
                     "economia_icms", 0)
                 icms_final = resultado["impostos_atuais"].get("ICMS", 0)
                 economia_total = resultado["impostos_atuais"].get("economia_icms", 0)
 
-                # Estimamos a participação de cada tipo de incentivo (exemplo simplificado)
-                economia_saida = economia_total * 0.6  # 60% da economia vem de incentivos de saída
-                economia_entrada = economia_total * 0.2  # 20% da economia vem de incentivos de entrada
-                economia_apuracao = economia_total * 0.2  # 20% da economia vem de incentivos de apuração
+                # Participação de cada tipo de incentivo: soma dos valores de Shapley da lista
+                economia_saida = self.economia_atribuida("saida")
+                economia_entrada = self.economia_atribuida("entrada")
+                economia_apuracao = self.economia_atribuida("apuracao")
 
                 # Calcular percentual de economia
                 perc_total = (economia_total / icms_sem_incentivo * 100) if icms_sem_incentivo > 0 else 0
@@ -2651,9 +8983,10 @@ class InterfaceSimulador(QMainWindow):
 
                 # Nota explicativa
                 nota = """
-                Nota: A distribuição do impacto entre os diferentes tipos de incentivos é uma estimativa, 
-                pois na prática os incentivos interagem de forma complexa, podendo um afetar a base de cálculo 
-                do outro. Para uma análise precisa, recomenda-se a consulta com especialistas tributários.
+                Nota: Como os incentivos interagem (um pode afetar a base de cálculo do outro), a economia de 
+                cada incentivo é atribuída pelo valor de Shapley: a média da redução de ICMS que ele provoca 
+                ao ser acrescentado a todas as combinações dos demais incentivos. A soma das parcelas é igual 
+                à economia do pacote completo.
                 """
                 elementos.append(Paragraph(nota.strip(), normal_estilo))
                 elementos.append(Spacer(1, 0.2 * inch))
@@ -2661,7 +8994,8 @@ class InterfaceSimulador(QMainWindow):
             # Configurar tabela com mais colunas para incluir o comparativo
             tabela_resultados = Table(dados_resultados,
                                       colWidths=[0.5 * inch, 0.8 * inch, 0.8 * inch, 0.9 * inch,
-                                                 0.8 * inch, 0.9 * inch, 0.8 * inch, 0.8 * inch, 0.8 * inch])
+                                                 0.8 * inch, 0.9 * inch, 0.8 * inch, 0.8 * inch, 0.8 * inch,
+                                                 0.8 * inch])
             tabela_resultados.setStyle(TableStyle([
                 ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -2756,6 +9090,33 @@ class InterfaceSimulador(QMainWindow):
                         normal_estilo))
                 elementos.append(Spacer(1, 0.2 * inch))
 
+            # Sensibilidade do total devido (gráfico de tornado)
+            try:
+                import io
+                from reportlab.platypus import Image
+
+                impactos, base, variacao, anos = self.tornado_relatorio()
+                grafico = GraficoMatplotlib(width=7, height=5)
+                grafico.plotar_tornado(impactos, base, "Total Devido",
+                                       f"Sensibilidade do Total Devido ({anos[0]}-{anos[-1]}, ±{formatar_br(variacao * 100, 1)}%)")
+                imagem = io.BytesIO()
+                grafico.fig.savefig(imagem, format='png', dpi=150)
+                imagem.seek(0)
+
+                elementos.append(Paragraph("Sensibilidade do Total Devido", subtitulo_estilo))
+                elementos.append(Spacer(1, 0.1 * inch))
+                elementos.append(Image(imagem, width=6.5 * inch, height=6.5 * inch * 5 / 7))
+                texto_tornado = f"""
+                Cada barra mostra a variação do total devido no período quando apenas aquele parâmetro é 
+                reduzido (azul) ou aumentado (laranja) em {formatar_br(variacao * 100, 1)}%, mantidos os demais. 
+                Os parâmetros estão ordenados pelo tamanho do efeito.
+                """
+                elementos.append(Paragraph(texto_tornado, normal_estilo))
+                elementos.append(Spacer(1, 0.2 * inch))
+
+            except Exception as tornado_error:
+                print(f"Erro ao gerar o gráfico de tornado: {tornado_error}")
+
             # Conclusão
             elementos.append(Paragraph("Conclusão", subtitulo_estilo))
             elementos.append(Spacer(1, 0.1 * inch))
@@ -3066,13 +9427,13 @@ class InterfaceSimulador(QMainWindow):
                 # Adicionar título
                 ws_resultados['A1'] = "Resultados da Simulação"
                 ws_resultados['A1'].font = Font(bold=True, size=14)
-                ws_resultados.merge_cells('A1:I1')  # Ajustado para mais colunas
+                ws_resultados.merge_cells('A1:K1')  # Ajustado para mais colunas
 
                 # Cabeçalho dos resultados (INCLUINDO COLUNAS DE COMPARATIVO)
                 cabecalhos = [
                     "Ano", "CBS (R$)", "IBS (R$)", "Imposto Bruto (R$)", "Créditos (R$)",
                     "Imposto Devido (R$)", "Carga Atual (R$)", "Diferença (R$)",
-                    "Alíquota Efetiva (%)"
+                    "Alíquota Efetiva (%)", "Total Devido (R$)", "Custo Fin. Créditos - VP (R$)"
                 ]
 
                 for col, header in enumerate(cabecalhos, 1):
@@ -3095,13 +9456,15 @@ class InterfaceSimulador(QMainWindow):
                     ws_resultados.cell(row=i, column=7, value=valor_atual)  # NOVO
                     ws_resultados.cell(row=i, column=8, value=diferenca)  # NOVO
                     ws_resultados.cell(row=i, column=9, value=resultado['aliquota_efetiva'])
+                    ws_resultados.cell(row=i, column=10, value=resultado['total_devido'])
+                    ws_resultados.cell(row=i, column=11, value=resultado.get('vp_custo_creditos', 0))
 
                     # Formatar coluna de alíquota como percentual
                     cell = ws_resultados.cell(row=i, column=9)
                     cell.number_format = '0,00%'
 
                     # Formatar valores monetários
-                    for col in range(2, 9):
+                    for col in list(range(2, 9)) + [10, 11]:
                         cell = ws_resultados.cell(row=i, column=col)
                         cell.number_format = '#.##0,00'
 
@@ -3113,7 +9476,7 @@ class InterfaceSimulador(QMainWindow):
                         cell_diferenca.font = Font(color="008000")  # Verde para redução
 
                 # Ajustar largura das colunas
-                for col in range(1, 10):
+                for col in range(1, 12):
                     ws_resultados.column_dimensions[chr(64 + col)].width = 18
 
                 # Adicionar gráfico de barras
@@ -3555,6 +9918,57 @@ class InterfaceSimulador(QMainWindow):
 
                 ws_equiv.add_chart(equiv_chart, f"A{linha_equiv + 6}")
 
+                # Aba com a sensibilidade do total devido (gráfico de tornado)
+                impactos, base, variacao, anos_tornado = self.tornado_relatorio()
+                ws_tornado = wb.create_sheet(title="Sensibilidade (Tornado)")
+
+                ws_tornado['A1'] = (f"Sensibilidade do Total Devido {anos_tornado[0]}-{anos_tornado[-1]} "
+                                    f"(±{formatar_br(variacao * 100, 1)}%)")
+                ws_tornado['A1'].font = Font(bold=True, size=14)
+                ws_tornado.merge_cells('A1:F1')
+                ws_tornado['A2'] = "Total devido na base:"
+                ws_tornado['B2'] = base
+                ws_tornado['B2'].number_format = '#,##0.00'
+
+                cabecalhos = ["Parâmetro", "Valor Baixo", "Valor Alto", "Variação (Baixo)", "Variação (Alto)",
+                              "Amplitude"]
+                for col, header in enumerate(cabecalhos, 1):
+                    cell = ws_tornado.cell(row=4, column=col, value=header)
+                    cell.font = Font(bold=True)
+                    cell.fill = PatternFill(start_color='DDDDDD', end_color='DDDDDD', fill_type='solid')
+
+                for i, item in enumerate(impactos, 5):
+                    valores = [item["rotulo"], float(item["valor_baixo"][0]), float(item["valor_alto"][0]),
+                               item["delta_baixo"], item["delta_alto"], item["amplitude"]]
+                    for col, valor in enumerate(valores, 1):
+                        cell = ws_tornado.cell(row=i, column=col, value=valor)
+                        if col > 3:
+                            cell.number_format = '#,##0.00'
+
+                ws_tornado.column_dimensions['A'].width = 35
+                for col in "BCDEF":
+                    ws_tornado.column_dimensions[col].width = 18
+
+                if impactos:
+                    tornado_chart = BarChart()
+                    tornado_chart.type = "bar"
+                    tornado_chart.grouping = "clustered"
+                    tornado_chart.overlap = 100
+                    tornado_chart.title = "Sensibilidade do Total Devido"
+                    tornado_chart.x_axis.title = "Parâmetro"
+                    tornado_chart.y_axis.title = "Variação (R$)"
+                    # Maior amplitude no topo do gráfico de barras horizontais
+                    tornado_chart.x_axis.scaling.orientation = "maxMin"
+
+                    dados_tornado = Reference(ws_tornado, min_col=4, max_col=5, min_row=4, max_row=4 + len(impactos))
+                    categorias_tornado = Reference(ws_tornado, min_col=1, min_row=5, max_row=4 + len(impactos))
+                    tornado_chart.add_data(dados_tornado, titles_from_data=True)
+                    tornado_chart.set_categories(categorias_tornado)
+                    tornado_chart.height = 10
+                    tornado_chart.width = 20
+
+                    ws_tornado.add_chart(tornado_chart, f"A{len(impactos) + 7}")
+
                 # Adicionar na função exportar_excel, após a criação da aba de parâmetros:
 
                 # Adicionar uma nova aba para incentivos fiscais
@@ -3584,11 +9998,11 @@ class InterfaceSimulador(QMainWindow):
                     row_start = 7
                     ws_incentivos[f'A{row_start}'] = "Incentivos Fiscais de Saída"
                     ws_incentivos[f'A{row_start}'].font = Font(bold=True)
-                    ws_incentivos.merge_cells(f'A{row_start}:E{row_start}')
+                    ws_incentivos.merge_cells(f'A{row_start}:F{row_start}')
 
                     # Cabeçalho da tabela
                     row_start += 1
-                    headers = ["Descrição", "Tipo", "Percentual", "% Operações", "Impacto Estimado"]
+                    headers = ["Descrição", "Tipo", "Percentual", "% Operações", "Economia Atribuída", "Perda se Excluído"]
                     for col, header in enumerate(headers, 1):
                         cell = ws_incentivos.cell(row=row_start, column=col, value=header)
                         cell.font = Font(bold=True)
@@ -3603,17 +10017,9 @@ class InterfaceSimulador(QMainWindow):
                         percentual = float(self.tabelaIncentivosSaida.item(row, 2).text().replace('%', '')) / 100
                         perc_operacoes = float(self.tabelaIncentivosSaida.item(row, 3).text().replace('%', '')) / 100
 
-                        # Cálculo do impacto estimado (simplificado para demonstração)
-                        # Em uma implementação real, este valor seria obtido do cálculo detalhado
-                        impacto_estimado = 0
-                        if self.resultados:
-                            # Usando o primeiro ano como referência
-                            primeiro_ano = min(self.resultados.keys())
-                            economia_total = self.resultados[primeiro_ano]["impostos_atuais"].get("economia_icms", 0)
-
-                            # Distribuindo proporcionalmente à participação do incentivo
-                            if self.tabelaIncentivosSaida.rowCount() > 0:
-                                impacto_estimado = economia_total / self.tabelaIncentivosSaida.rowCount()
+                        # Economia atribuída ao incentivo (Shapley) e perdida ao excluí-lo do pacote
+                        impacto_atribuido = self.economia_atribuida("saida", row)
+                        impacto_exclusao = self.economia_atribuida("saida", row, "exclusao")
 
                         ws_incentivos.cell(row=row_start, column=1, value=descricao)
                         ws_incentivos.cell(row=row_start, column=2, value=tipo)
@@ -3624,9 +10030,12 @@ class InterfaceSimulador(QMainWindow):
                         cell_operacoes = ws_incentivos.cell(row=row_start, column=4, value=perc_operacoes)
                         cell_operacoes.number_format = '0.00%'
 
-                        cell_impacto = ws_incentivos.cell(row=row_start, column=5, value=impacto_estimado)
+                        cell_impacto = ws_incentivos.cell(row=row_start, column=5, value=impacto_atribuido)
                         cell_impacto.number_format = '#,##0.00'
 
+                        cell_exclusao = ws_incentivos.cell(row=row_start, column=6, value=impacto_exclusao)
+                        cell_exclusao.number_format = '#,##0.00'
+
                     # Ajustar altura da linha após a tabela
                     row_start += 1
                     ws_incentivos.row_dimensions[row_start].height = 20
@@ -3637,11 +10046,11 @@ class InterfaceSimulador(QMainWindow):
                     row_start += 2  # Espaço após a seção anterior
                     ws_incentivos[f'A{row_start}'] = "Incentivos Fiscais de Entrada"
                     ws_incentivos[f'A{row_start}'].font = Font(bold=True)
-                    ws_incentivos.merge_cells(f'A{row_start}:E{row_start}')
+                    ws_incentivos.merge_cells(f'A{row_start}:F{row_start}')
 
                     # Cabeçalho da tabela
                     row_start += 1
-                    headers = ["Descrição", "Tipo", "Percentual", "% Operações", "Impacto Estimado"]
+                    headers = ["Descrição", "Tipo", "Percentual", "% Operações", "Economia Atribuída", "Perda se Excluído"]
                     for col, header in enumerate(headers, 1):
                         cell = ws_incentivos.cell(row=row_start, column=col, value=header)
                         cell.font = Font(bold=True)
@@ -3656,9 +10065,9 @@ class InterfaceSimulador(QMainWindow):
                         percentual = float(self.tabelaIncentivosEntrada.item(row, 2).text().replace('%', '')) / 100
                         perc_operacoes = float(self.tabelaIncentivosEntrada.item(row, 3).text().replace('%', '')) / 100
 
-                        # Cálculo do impacto estimado (simplificado para demonstração)
-                        impacto_estimado = 0
-                        # Na prática, o impacto dos incentivos de entrada seria calculado separadamente
+                        # Economia atribuída ao incentivo (Shapley) e perdida ao excluí-lo do pacote
+                        impacto_atribuido = self.economia_atribuida("entrada", row)
+                        impacto_exclusao = self.economia_atribuida("entrada", row, "exclusao")
 
                         ws_incentivos.cell(row=row_start, column=1, value=descricao)
                         ws_incentivos.cell(row=row_start, column=2, value=tipo)
@@ -3669,20 +10078,23 @@ class InterfaceSimulador(QMainWindow):
                         cell_operacoes = ws_incentivos.cell(row=row_start, column=4, value=perc_operacoes)
                         cell_operacoes.number_format = '0.00%'
 
-                        cell_impacto = ws_incentivos.cell(row=row_start, column=5, value=impacto_estimado)
+                        cell_impacto = ws_incentivos.cell(row=row_start, column=5, value=impacto_atribuido)
                         cell_impacto.number_format = '#,##0.00'
 
+                        cell_exclusao = ws_incentivos.cell(row=row_start, column=6, value=impacto_exclusao)
+                        cell_exclusao.number_format = '#,##0.00'
+
                 # Seção de incentivos de apuração
                 if hasattr(self, 'tabelaIncentivosApuracao') and self.tabelaIncentivosApuracao.rowCount() > 0:
                     # Título da seção
                     row_start += 2  # Espaço após a seção anterior
                     ws_incentivos[f'A{row_start}'] = "Incentivos Fiscais de Apuração"
                     ws_incentivos[f'A{row_start}'].font = Font(bold=True)
-                    ws_incentivos.merge_cells(f'A{row_start}:E{row_start}')
+                    ws_incentivos.merge_cells(f'A{row_start}:F{row_start}')
 
                     # Cabeçalho da tabela
                     row_start += 1
-                    headers = ["Descrição", "Tipo", "Percentual", "% do Saldo", "Impacto Estimado"]
+                    headers = ["Descrição", "Tipo", "Percentual", "% do Saldo", "Economia Atribuída", "Perda se Excluído"]
                     for col, header in enumerate(headers, 1):
                         cell = ws_incentivos.cell(row=row_start, column=col, value=header)
                         cell.font = Font(bold=True)
@@ -3697,9 +10109,9 @@ class InterfaceSimulador(QMainWindow):
                         percentual = float(self.tabelaIncentivosApuracao.item(row, 2).text().replace('%', '')) / 100
                         perc_saldo = float(self.tabelaIncentivosApuracao.item(row, 3).text().replace('%', '')) / 100
 
-                        # Cálculo do impacto estimado (simplificado para demonstração)
-                        impacto_estimado = 0
-                        # Na prática, o impacto dos incentivos de apuração seria calculado separadamente
+                        # Economia atribuída ao incentivo (Shapley) e perdida ao excluí-lo do pacote
+                        impacto_atribuido = self.economia_atribuida("apuracao", row)
+                        impacto_exclusao = self.economia_atribuida("apuracao", row, "exclusao")
 
                         ws_incentivos.cell(row=row_start, column=1, value=descricao)
                         ws_incentivos.cell(row=row_start, column=2, value=tipo)
@@ -3710,9 +10122,12 @@ class InterfaceSimulador(QMainWindow):
                         cell_saldo = ws_incentivos.cell(row=row_start, column=4, value=perc_saldo)
                         cell_saldo.number_format = '0.00%'
 
-                        cell_impacto = ws_incentivos.cell(row=row_start, column=5, value=impacto_estimado)
+                        cell_impacto = ws_incentivos.cell(row=row_start, column=5, value=impacto_atribuido)
                         cell_impacto.number_format = '#,##0.00'
 
+                        cell_exclusao = ws_incentivos.cell(row=row_start, column=6, value=impacto_exclusao)
+                        cell_exclusao.number_format = '#,##0.00'
+
                 # Adicionar nota explicativa
                 row_start += 3
                 ws_incentivos[f'A{row_start}'] = "Nota sobre Incentivos Fiscais:"
@@ -3724,12 +10139,13 @@ class InterfaceSimulador(QMainWindow):
                 consequentemente, a carga tributária total da empresa. A simulação considera tanto incentivos 
                 aplicados às operações de saída (vendas) quanto às operações de entrada (compras).
 
-                O impacto estimado é calculado considerando o percentual do incentivo e a proporção de operações 
-                abrangidas, em relação ao faturamento ou aos custos tributáveis da empresa.
+                A economia atribuída é o valor de Shapley do incentivo: a média da redução de ICMS que ele provoca 
+                ao ser acrescentado a todas as combinações dos demais incentivos (a soma das parcelas é a economia 
+                do pacote). A perda se excluído é o aumento do ICMS ao retirar apenas aquele incentivo do pacote.
                 """
                 ws_incentivos[f'A{row_start}'] = nota.strip()
                 ws_incentivos[f'A{row_start}'].alignment = Alignment(wrap_text=True)
-                ws_incentivos.merge_cells(f'A{row_start}:E{row_start + 3}')
+                ws_incentivos.merge_cells(f'A{row_start}:F{row_start + 3}')
                 ws_incentivos.row_dimensions[row_start].height = 80
 
                 # Ajustar largura das colunas
@@ -3738,6 +10154,7 @@ class InterfaceSimulador(QMainWindow):
                 ws_incentivos.column_dimensions['C'].width = 12
                 ws_incentivos.column_dimensions['D'].width = 12
                 ws_incentivos.column_dimensions['E'].width = 18
+                ws_incentivos.column_dimensions['F'].width = 18
 
                 # Se existirem dados suficientes, criar um gráfico de comparação
                 if hasattr(self,
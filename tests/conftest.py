@@ -0,0 +1,15 @@
+import importlib.util
+import os
+
+import pytest
+
+CAMINHO_SIMULADOR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simulador-rt-v8.py")
+
+
+@pytest.fixture(scope="session")
+def simulador():
+    """Módulo do simulador (o nome do arquivo não é um identificador Python válido)."""
+    spec = importlib.util.spec_from_file_location("simulador_rt_v8", CAMINHO_SIMULADOR)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
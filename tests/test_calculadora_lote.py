@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+METRICAS_IVA = ["base_tributavel", "cbs", "ibs", "imposto_bruto", "creditos", "imposto_devido",
+                "total_devido", "aliquota_efetiva"]
+METRICAS_ATUAIS = ["PIS", "COFINS", "ICMS", "ISS", "IPI"]
+
+
+def empresas_aleatorias(simulador, configuracao, n, semente):
+    """Empresas válidas com setores, regimes e incentivos do ICMS sorteados."""
+    gerador = np.random.default_rng(semente)
+    setores = list(configuracao.setores_especiais)
+    empresas = []
+    for i in range(n):
+        regime = "simples" if gerador.random() < 0.2 else "real"
+        teto = configuracao.limite_simples if regime == "simples" else 2e7
+        faturamento = float(gerador.uniform(1e5, teto))
+        incentivos_saida = []
+        if gerador.random() < 0.5:
+            incentivos_saida.append({"descricao": "Crédito presumido", "tipo": "Crédito Presumido/Outorgado",
+                                     "percentual": float(gerador.uniform(0.05, 0.5)),
+                                     "percentual_operacoes": float(gerador.uniform(0.1, 0.6))})
+        if gerador.random() < 0.5:
+            incentivos_saida.append({"descricao": "Diferimento", "tipo": "Diferimento",
+                                     "percentual": float(gerador.uniform(0.1, 1.0)),
+                                     "percentual_operacoes": float(gerador.uniform(0.1, 0.4))})
+        incentivos_apuracao = []
+        if gerador.random() < 0.3:
+            incentivos_apuracao.append({"descricao": "Redução", "tipo": "Redução do Saldo Devedor",
+                                        "percentual": float(gerador.uniform(0.05, 0.3)),
+                                        "percentual_operacoes": 1.0})
+        empresas.append({
+            "nome": f"Empresa {i + 1}",
+            "faturamento": faturamento,
+            "custos_tributaveis": float(faturamento * gerador.uniform(0, 1.0)),
+            "custos_simples": float(faturamento * gerador.uniform(0, 0.2)),
+            "creditos_anteriores": float(faturamento * gerador.uniform(0, 0.1)) if gerador.random() < 0.5 else 0.0,
+            "setor": str(gerador.choice(setores)),
+            "regime": regime,
+            "icms_config": {
+                "aliquota_saida": float(gerador.choice([0.12, 0.17, 0.19])),
+                "aliquota_entrada": float(gerador.choice([0.07, 0.12, 0.19])),
+                "incentivos_saida": incentivos_saida,
+                "incentivos_entrada": [],
+                "incentivos_apuracao": incentivos_apuracao
+            }
+        })
+    return empresas
+
+
+@pytest.mark.parametrize("cronograma_ativo", [False, True])
+@pytest.mark.parametrize("encadeado", [False, True])
+def test_lote_reproduz_calculadora_escalar(simulador, encadeado, cronograma_ativo):
+    configuracao = simulador.ConfiguracaoTributaria()
+    configuracao.cronograma_incentivos_icms["ativo"] = cronograma_ativo
+    if cronograma_ativo:
+        configuracao.cronograma_incentivos_icms["multiplicadores"] = {2029: 0.5}
+        configuracao.cronograma_incentivos_icms["compensacao"][2030] = 0.5
+    empresas = empresas_aleatorias(simulador, configuracao, 25, semente=7)
+
+    lote = simulador.CalculadoraLote(configuracao)
+    resultados = lote.calcular_comparativo(simulador.CarteiraEmpresas.de_dados(empresas), encadeado=encadeado)
+    escalar = simulador.CalculadoraIVADual(configuracao)
+
+    for i, empresa in enumerate(empresas):
+        esperado = escalar.calcular_comparativo(dict(empresa), encadeado=encadeado)
+        for ano, resultado in esperado.items():
+            for metrica in METRICAS_IVA:
+                np.testing.assert_allclose(resultados[ano][metrica][i], resultado[metrica], rtol=1e-9, atol=1e-6,
+                                           err_msg=f"{empresa['nome']} {ano} {metrica}")
+            for imposto in METRICAS_ATUAIS:
+                np.testing.assert_allclose(resultados[ano][imposto][i], resultado["impostos_atuais"][imposto],
+                                           rtol=1e-9, atol=1e-6, err_msg=f"{empresa['nome']} {ano} {imposto}")
+
+
+def test_regras_da_configuracao_nao_alteram_o_resultado(simulador):
+    configuracao = simulador.ConfiguracaoTributaria()
+    configuracao.cronograma_incentivos_icms["ativo"] = True
+    carteira = simulador.CarteiraEmpresas.de_dados(empresas_aleatorias(simulador, configuracao, 10, semente=3))
+    lote = simulador.CalculadoraLote(configuracao)
+
+    sem_regras = lote.calcular_comparativo(carteira)
+    com_regras = lote.calcular_comparativo(carteira, regras=simulador.RegrasVigencia.de_configuracao(configuracao))
+    for ano in sem_regras:
+        for metrica in lote.METRICAS:
+            np.testing.assert_allclose(com_regras[ano][metrica], sem_regras[ano][metrica], rtol=1e-12, atol=1e-9)
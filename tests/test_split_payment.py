@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def simulador_split(simulador):
+    return simulador.SimuladorSplitPayment("2027-01-01")
+
+
+def test_vendas_retidas_na_liquidacao_nao_geram_recolhimento(simulador_split):
+    transacoes = simulador_split.gerar_transacoes(90, 365e4, 0, 0.265, prazo_recebimento=0, prazo_pagamento=0)
+    resultado = simulador_split.simular(transacoes)
+
+    np.testing.assert_allclose(resultado["recolhimentos"]["split"], 0, atol=1e-6)
+    np.testing.assert_allclose(resultado["ressarcimentos"]["split"], 0, atol=1e-6)
+    # Modelo atual: o débito de cada mês de emissão é recolhido integralmente
+    np.testing.assert_allclose(resultado["recolhimentos"]["atual"][0], [82150, 74200, 82150])
+
+
+def test_creditos_do_modelo_atual_pelo_mes_de_emissao(simulador_split):
+    transacoes = simulador_split.gerar_transacoes(90, 365e4, 182.5e4, 0.265, prazo_recebimento=0, prazo_pagamento=0)
+    resultado = simulador_split.simular(transacoes)
+
+    np.testing.assert_allclose(resultado["recolhimentos"]["atual"][0], [41075, 37100, 41075])
+    np.testing.assert_allclose(resultado["ressarcimentos"]["atual"], 0, atol=1e-6)
+    # Split: vendas retidas, créditos das compras ressarcidos
+    np.testing.assert_allclose(resultado["recolhimentos"]["split"], 0, atol=1e-6)
+    np.testing.assert_allclose(resultado["ressarcimentos"]["split"][0], [41075, 37100, 41075])
+
+
+@pytest.mark.parametrize("prazos", [(0, 0), (30, 30), (45, 10), (10, 60)])
+def test_recolhimento_liquido_e_caixa_final(simulador_split, prazos):
+    prazo_recebimento, prazo_pagamento = prazos
+    transacoes = simulador_split.gerar_transacoes(120, 5e6, 3e6, 0.265, notas_por_dia=2,
+                                                  prazo_recebimento=prazo_recebimento,
+                                                  prazo_pagamento=prazo_pagamento)
+    resultado = simulador_split.simular(transacoes)
+
+    tributo = transacoes["valor"] * transacoes["aliquota"]
+    debitos, creditos = tributo[transacoes["venda"]].sum(), tributo[~transacoes["venda"]].sum()
+    liquido = {modelo: resultado["recolhimentos"][modelo].sum() - resultado["ressarcimentos"][modelo].sum()
+               for modelo in simulador_split.MODELOS}
+    np.testing.assert_allclose(liquido["atual"], debitos - creditos, rtol=1e-9)
+    np.testing.assert_allclose(liquido["split"], -creditos, rtol=1e-9)
+    for modelo in simulador_split.MODELOS:
+        assert np.all(resultado["recolhimentos"][modelo] >= 0)
+        assert np.all(resultado["ressarcimentos"][modelo] >= 0)
+    # Liquidados todos os fluxos, os dois modelos terminam com o mesmo caixa
+    np.testing.assert_allclose(resultado["diferenca"][:, -1], 0, atol=1e-6)
+
+
+def test_empresas_independentes(simulador_split):
+    uma = simulador_split.gerar_transacoes(60, 2e6, 1e6, 0.265)
+    outra = simulador_split.gerar_transacoes(60, 8e6, 6e6, 0.265, prazo_recebimento=15)
+    juntas = {chave: np.concatenate([np.broadcast_to(uma[chave], np.shape(uma["valor"])),
+                                     np.broadcast_to(outra[chave], np.shape(outra["valor"]))])
+              for chave in ("venda", "emissao", "pagamento", "valor", "aliquota")}
+    juntas["empresa"] = np.repeat([0, 1], [len(uma["valor"]), len(outra["valor"])])
+
+    n_dias = simulador_split.simular(juntas)["dias"].size
+    resultado = simulador_split.simular(juntas, n_dias=n_dias)
+    for empresa, transacoes in enumerate((uma, outra)):
+        individual = simulador_split.simular(transacoes, n_dias=n_dias)
+        for modelo in simulador_split.MODELOS:
+            np.testing.assert_allclose(resultado[f"caixa_{modelo}"][empresa], individual[f"caixa_{modelo}"][0])
+
+
+def test_validacao(simulador):
+    with pytest.raises(ValueError):
+        simulador.SimuladorSplitPayment("2027-01-01", dia_vencimento=29)
+    with pytest.raises(ValueError):
+        simulador.SimuladorSplitPayment("2027-01-01", prazo_ressarcimento=-1)
+    simulador_split = simulador.SimuladorSplitPayment("2027-01-01")
+    with pytest.raises(ValueError):
+        simulador_split.simular({"venda": [True], "emissao": [10], "pagamento": [5], "valor": [100.0],
+                                 "aliquota": 0.265})